@@ -0,0 +1,159 @@
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, Integer, case, cast, func, literal, select
+from models import db, Song
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Numeric song columns that can be aggregated, by column name
+NUMERIC_FEATURES = {
+    column.name: column
+    for column in Song.__table__.columns
+    if column.type.python_type in (int, float) and not column.primary_key
+}
+
+MAX_BINS = 1000
+MAX_POINTS = 5000
+MAX_SERIES_LIMIT = 100
+
+
+def feature_column(name: str):
+    """Table column for a numeric feature name"""
+    if name == 'index':
+        return Song.__table__.c['index']
+    if name not in NUMERIC_FEATURES:
+        raise ValueError(f"Invalid feature '{name}'. Valid features: {sorted(NUMERIC_FEATURES)}")
+    return NUMERIC_FEATURES[name]
+
+
+class ChartAggregates:
+    """
+    Chart data computed in the database: histograms via GROUP BY over a
+    bucket expression, downsampled scatter series and short head series.
+    Each query returns at most a few thousand values, whatever the table size.
+    """
+
+    @staticmethod
+    def histogram(feature: str, bins: int = 10, edges: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """
+        Count a feature's values per bin.
+
+        Bins are half-open [edge_i, edge_i+1). Without explicit edges, `bins`
+        equal-width bins span the feature's range, the last one closed so
+        the maximum is counted.
+
+        Returns:
+            Dictionary with edges, counts, underflow/overflow (values outside
+            explicit edges) and nulls
+        """
+        column = feature_column(feature)
+
+        if edges is not None:
+            edges = [float(edge) for edge in edges]
+            if len(edges) < 2 or any(b <= a for a, b in zip(edges, edges[1:])):
+                raise ValueError("edges must hold at least two strictly increasing values")
+            # -1 below the first edge, len(edges) - 1 from the last one on
+            bucket = case(
+                *[(column < edge, position - 1) for position, edge in enumerate(edges)],
+                else_=len(edges) - 1
+            )
+        else:
+            if bins < 1 or bins > MAX_BINS:
+                raise ValueError(f"bins must be between 1 and {MAX_BINS}")
+            low, high = db.session.execute(select(func.min(column), func.max(column))).one()
+            if low is None:
+                edges = []
+                bucket = None
+            else:
+                low, high = float(low), float(high)
+                width = (high - low) / bins or 1.0
+                edges = [low + width * position for position in range(bins)] + [high]
+                raw = cast((cast(column, Float) - literal(low)) / literal(width), Integer)
+                bucket = case((raw >= bins, bins - 1), else_=raw)
+
+        total = db.session.scalar(select(func.count()).select_from(Song))
+        counts = [0] * max(len(edges) - 1, 0)
+        underflow = overflow = 0
+        if bucket is not None:
+            rows = db.session.execute(
+                select(bucket.label('bucket'), func.count())
+                .where(column.isnot(None))
+                .group_by('bucket')
+            ).all()
+            for position, count in rows:
+                if position < 0:
+                    underflow += count
+                elif position >= len(counts):
+                    overflow += count
+                else:
+                    counts[position] = count
+
+        return {
+            'edges': edges,
+            'counts': counts,
+            'underflow': underflow,
+            'overflow': overflow,
+            'nulls': total - sum(counts) - underflow - overflow
+        }
+
+    @staticmethod
+    def scatter(x: str, y: str, points: int = 500) -> Dict[str, Any]:
+        """
+        Downsampled (x, y) pairs in index order.
+
+        The songs with both values are numbered in index order (ROW_NUMBER)
+        and every stride-th one is kept, with the stride chosen so at most
+        `points` pairs come back, evenly spread whatever gaps the index has.
+        """
+        if points < 1 or points > MAX_POINTS:
+            raise ValueError(f"points must be between 1 and {MAX_POINTS}")
+        x_column, y_column = feature_column(x), feature_column(y)
+        index = Song.__table__.c['index']
+        present_filter = (x_column.isnot(None), y_column.isnot(None))
+
+        present = db.session.scalar(select(func.count()).select_from(Song).where(*present_filter))
+        stride = max(1, math.ceil(present / points))
+        numbered = select(
+            x_column.label('x'),
+            y_column.label('y'),
+            (func.row_number().over(order_by=index) - 1).label('row')
+        ).where(*present_filter).subquery()
+        statement = select(numbered.c.x, numbered.c.y)
+        if stride > 1:
+            statement = statement.where(numbered.c.row % stride == 0)
+        rows = db.session.execute(statement.order_by(numbered.c.row).limit(points)).all()
+
+        return {
+            'x': x,
+            'y': y,
+            'stride': stride,
+            'total': present,
+            'points': [[row[0], row[1]] for row in rows]
+        }
+
+    @staticmethod
+    def series(feature: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """The first `limit` songs (by index) that have a value for the feature"""
+        if limit < 1 or limit > MAX_SERIES_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_SERIES_LIMIT}")
+        column = feature_column(feature)
+        index = Song.__table__.c['index']
+
+        rows = db.session.execute(
+            select(index, Song.title, column)
+            .where(column.isnot(None))
+            .order_by(index)
+            .limit(limit)
+        ).all()
+        return [{'index': row[0], 'title': row[1], 'value': row[2]} for row in rows]
+
+
+def parse_scatter_spec(spec: str) -> Tuple[str, str]:
+    """'y' or 'x:y' -> (x, y); x defaults to the song index"""
+    if ':' in spec:
+        x, y = spec.split(':', 1)
+        return x, y
+    return 'index', spec
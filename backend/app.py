@@ -1,16 +1,44 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from sqlalchemy import func
-from models import db, Song
+from sqlalchemy import func, select
+from models import db, Song, UploadJob
 from config import config
-from data_processor import DataProcessor
+from engine_profile import configure_engine_options, init_engine_profile
+from data_processor import (DEFERRED_STATEMENTS_PER_BATCH, DEFERRED_STATEMENTS_PER_CHUNK,
+                            DEFERRED_TRIGGER_STATEMENTS, SQL_VARIABLE_CHUNK, DataProcessor)
+from pagination import keyset_page, cursor_pagination
+from serialization import select_songs
+from response_formats import aggregates_response, init_compression, negotiate_format, songs_response
+from export import available_export_formats, export_response, statement_partitions
+from filters import parse_filter, apply_filters
+from query_planner import QueryPlanner, query_planner
+from aggregates import ChartAggregates, parse_scatter_spec
+from search_index import TitleSearch
+from trigram_index import init_title_index
+from similar_songs import init_feature_index
+from column_store import init_column_store
+from stats_summary import StatsSummary, start_reconciler
+from response_cache import cached_response, init_response_cache
+from data_version import LOG_WRITES_STATEMENTS, init_data_version
+from ratings import RATING_CHUNK, RatingUpdates, init_rating_writer
+from seeding import init_seed_loader
+from signals import songs_upserted
+from metrics import PROMETHEUS_CONTENT_TYPE, init_metrics
+from query_budget import chunk_count, init_query_budgets, statement_budget
+from upload_jobs import UploadConflict, UploadJobs, init_upload_jobs, parse_content_range
+import click
 import logging
+import math
 import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columns the listing and the export can sort by
+VALID_SORT_COLUMNS = ['index', 'id', 'title', 'danceability', 'energy', 
+                      'tempo', 'duration_ms', 'star_rating', 'created_at']
+
 
 def create_app(config_name='default'):
     """Application factory pattern"""
@@ -21,38 +49,266 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     
     # Initialize extensions
+    sqlite_profile = configure_engine_options(app)
     db.init_app(app)
     CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
     
     # Create tables and load raw data
     with app.app_context():
+        # WAL, PRAGMAs and the read-only engine used by GET requests
+        if sqlite_profile:
+            init_engine_profile(app, db)
+        
         db.create_all()
+        # create_all() skips indexes added to tables that already exist
+        for index in Song.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
         logger.info("Database tables created successfully")
+        
+        # Request latency, SQL and ingestion metrics for /metrics
+        if app.config['METRICS_ENABLED']:
+            init_metrics(app, db)
 
-        # Path to raw_songs.json (same folder as app.py)
-        file_path = os.path.join(os.path.dirname(__file__), "raw_songs.json")
+        # Full-text title search (FTS5 table kept in sync by triggers)
+        app.config['SEARCH_FTS_AVAILABLE'] = app.config['SEARCH_FTS_ENABLED'] and TitleSearch.install()
 
-        if os.path.exists(file_path):
-            # Load only if DB is empty (prevents duplicate reload)
-            if Song.query.count() == 0:
-                inserted_count = DataProcessor.process_json_file(file_path)
-                logger.info(f"Raw songs loaded successfully ({inserted_count} inserted)")
-            else:
-                logger.info("Database already contains data. Skipping JSON load.")
-        else:
-            logger.warning("raw_songs.json not found.")
+        # Materialized /api/stats aggregates (kept in sync by triggers)
+        app.config['STATS_SUMMARY_AVAILABLE'] = app.config['STATS_SUMMARY_ENABLED'] and StatsSummary.install()
+
+        # Songs written by other processes (shared version kept by triggers),
+        # picked up before each request and applied to the caches and
+        # in-memory indexes below through songs_upserted
+        if app.config['DATA_VERSION_ENABLED']:
+            init_data_version(app)
+
+        # In-memory trigram index for fuzzy search and autocomplete
+        if app.config['TITLE_INDEX_ENABLED']:
+            init_title_index(app)
+
+        # Audio feature vectors for similar-song lookups
+        if app.config['SIMILAR_SONGS_ENABLED']:
+            init_feature_index(app)
+
+        # NumPy replica of the songs table for filter scans no index serves
+        # and listing pages (sort permutations precomputed per sort column)
+        if app.config['COLUMN_STORE_ENABLED']:
+            init_column_store(app, VALID_SORT_COLUMNS)
+
+        # Cached GET responses; created last so its invalidation runs after
+        # the in-memory indexes have applied a write
+        if app.config['RESPONSE_CACHE_ENABLED']:
+            init_response_cache(app)
+
+    # Load raw_songs.json (same folder as app.py), or SEED_SNAPSHOT when set,
+    # without holding up startup; in-memory indexes pick the rows up as each
+    # batch commits
+    file_path = app.config['SEED_SNAPSHOT'] or os.path.join(os.path.dirname(__file__), "raw_songs.json")
+    init_seed_loader(app, file_path, background=app.config['SEED_IN_BACKGROUND'])
+    
+    # Coalesce single rating updates into group commits
+    if app.config['RATING_WRITE_BEHIND_ENABLED']:
+        init_rating_writer(app)
+    
+    # Background ingestion of upload jobs; jobs a restart interrupted resume
+    # after their last committed batch
+    if app.config['UPLOAD_JOBS_ENABLED']:
+        init_upload_jobs(app)
+    
+    # Periodically check the stats summary against the real data
+    if app.config['STATS_SUMMARY_AVAILABLE']:
+        start_reconciler(app, app.config['STATS_RECONCILE_INTERVAL'])
 
     # Register routes
     register_routes(app)
+    register_commands(app)
+    
+    # br/gzip per Accept-Encoding; streamed bodies chunk by chunk
+    if app.config['COMPRESSION_ENABLED']:
+        init_compression(app)
+    
+    # Per-route SQL statement budgets (QUERY_BUDGET_MODE)
+    init_query_budgets(app)
     
     return app
 
 
+def register_commands(app):
+    """Register Flask CLI commands"""
+    
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """Rebuild the full-text title search index from the songs table"""
+        if not app.config['SEARCH_FTS_AVAILABLE']:
+            print("Full-text search is not available for this database")
+            return
+        TitleSearch.rebuild()
+        print("Search index rebuilt")
+    
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats():
+        """Check the materialized stats against the songs table and repair drift"""
+        if not app.config['STATS_SUMMARY_AVAILABLE']:
+            print("Materialized stats are not available for this database")
+            return
+        result = StatsSummary.reconcile()
+        print(f"Stats reconciled ({len(result['drift'])} fields repaired)")
+    
+    @app.cli.command('export-snapshot')
+    @click.argument('path')
+    def export_snapshot(path):
+        """Write the songs table to a binary columnar snapshot file"""
+        result = DataProcessor.export_snapshot(path)
+        print(f"Wrote {result['rows']} songs ({result['bytes']} bytes) to {path}")
+    
+    @app.cli.command('import-snapshot')
+    @click.argument('path')
+    def import_snapshot(path):
+        """Load a binary columnar snapshot file into the songs table"""
+        result = DataProcessor.import_snapshot(path)
+        print(f"Loaded {path}: {result['inserted']} inserted, {result['updated']} updated "
+              f"in {result['elapsed_seconds']:.2f}s")
+
+
 
 def register_routes(app):
     """Register all API routes"""
     
+    valid_sort_columns = VALID_SORT_COLUMNS
+    
+    def parse_sort_args():
+        """
+        Read the sort_by/order query parameters shared by the listing and the export
+        
+        Returns:
+            (sort_by, order) with order normalized to 'asc' or 'desc'
+        
+        Raises:
+            ValueError: If sort_by is not a valid sort column
+        """
+        sort_by = request.args.get('sort_by', 'index', type=str)
+        order = request.args.get('order', 'asc', type=str).lower()
+        if order != 'desc':
+            order = 'asc'
+        
+        if sort_by not in valid_sort_columns:
+            raise ValueError(f'Invalid sort_by column. Valid columns: {valid_sort_columns}')
+        return sort_by, order
+    
+    def sort_column_for(sort_by):
+        """Song column for a sort_by value ('class' maps to class_field)"""
+        if sort_by == 'class':
+            return Song.class_field
+        return getattr(Song, sort_by)
+    
+    planner = query_planner(app)
+    
+    def parse_filter_args():
+        """
+        Read the filter/explain query parameters shared by the listing and the export
+        
+        Returns:
+            (conditions, explain)
+        
+        Raises:
+            ValueError: If the filter expression is invalid
+        """
+        conditions = parse_filter(request.args.get('filter', '', type=str))
+        explain = request.args.get('explain', 'false', type=str).lower() == 'true'
+        return conditions, explain
+    
+    def ordered_by(sort_by, order):
+        """(sort column, index) in the requested direction; index keeps the order stable"""
+        sort_column = sort_column_for(sort_by)
+        if order == 'desc':
+            return [sort_column.desc(), Song.index.desc()]
+        return [sort_column.asc(), Song.index.asc()]
+    
+    # Statement budgets of the routes whose work grows with the request
+    # (see query_budget.statement_budget): a fixed allowance per chunk,
+    # never per row
+    
+    def listing_budget(req):
+        """
+        Page and count, or two keyset segments (the NULL and the non-NULL run)
+        plus a count with include_total; one more for a filter's plan (the
+        table size, without a column store) and one for explain. Column-store
+        refreshes declare their own statements.
+        """
+        flag = lambda name: req.args.get(name, 'false', type=str).lower() == 'true'
+        budget = 2
+        if 'cursor' in req.args:
+            budget += flag('include_total')
+        if req.args.get('filter', '', type=str):
+            budget += 1
+        return budget + flag('explain')
+    
+    def export_budget(req):
+        """The export's query (or its EXPLAIN), plus the table size a filter's plan reads without a column store"""
+        return 2 if req.args.get('filter', '', type=str) else 1
+    
+    def ratings_budget(req):
+        """UPDATE and id check per RATING_CHUNK ratings, plus the receivers' lookups and the data version log"""
+        payload = req.get_json(silent=True)
+        items = payload.get('ratings') if isinstance(payload, dict) else payload
+        return 2 + LOG_WRITES_STATEMENTS + 3 * chunk_count(items if isinstance(items, list) else None, RATING_CHUNK)
+    
+    def upload_budget(req):
+        """
+        Per INGEST_BATCH_SIZE batch: an INSERT and the data version log, plus
+        an id SELECT and two receiver lookups per SQL_VARIABLE_CHUNK ids;
+        batches large enough to defer the per-row triggers add their
+        DROP/CREATE round and the search index and stats updates
+        """
+        if req.args.get('async', 'false', type=str).lower() == 'true':
+            return 5  # job INSERT, UPDATE and three reloads (one under the spool lock); ingestion in the worker
+        payload = req.get_json(silent=True)
+        column = next(iter(payload.values()), None) if isinstance(payload, dict) else None
+        records = len(column) if isinstance(column, dict) else 0
+        batch_size = app.config['INGEST_BATCH_SIZE']
+        full_batches, rest = divmod(records, batch_size)
+        
+        def per_batch(size):
+            if not size:
+                return 0
+            chunks = math.ceil(size / SQL_VARIABLE_CHUNK)
+            statements = 1 + LOG_WRITES_STATEMENTS + 3 * chunks
+            if size >= app.config['INGEST_DEFER_TRIGGERS_ROWS']:
+                statements += (DEFERRED_TRIGGER_STATEMENTS + DEFERRED_STATEMENTS_PER_BATCH
+                               + DEFERRED_STATEMENTS_PER_CHUNK * chunks)
+            return statements
+        
+        return 1 + full_batches * per_batch(batch_size) + per_batch(rest)
+    
+    def aggregates_budget(req):
+        """Three statements per histogram, two per scatter series, one per series"""
+        requested = lambda name: len([item for item in req.args.get(name, '', type=str).split(',') if item])
+        return 3 * requested('histogram') + 2 * requested('scatter') + requested('series')
+    
+    @app.route('/healthz', methods=['GET'])
+    @statement_budget(0)
+    def healthz():
+        """Liveness: the process is up and serving requests"""
+        return jsonify({'status': 'ok'}), 200
+    
+    @app.route('/readyz', methods=['GET'])
+    @statement_budget(0)
+    def readyz():
+        """
+        Readiness: the seed data has been loaded (or there was nothing to load)
+        
+        Returns:
+            200 when ready, 503 while seeding or after a failed seed, with the
+            seed loader's progress either way
+        """
+        loader = app.extensions.get('seed_loader')
+        ready = loader is None or loader.ready
+        return jsonify({
+            'status': 'ready' if ready else 'not_ready',
+            'seed': loader.progress() if loader is not None else None
+        }), 200 if ready else 503
+    
     @app.route('/', methods=['GET'])
+    @statement_budget(0)
     def index():
         """Health check endpoint"""
         return jsonify({
@@ -62,10 +318,21 @@ def register_routes(app):
             'endpoints': {
                 'GET /api/songs': 'Get all songs with pagination',
                 'GET /api/songs/<id>': 'Get song by ID',
+                'GET /api/songs/<id>/similar': 'Get songs with similar audio features',
+                'GET /api/songs/export': 'Download all songs (NDJSON, CSV, MessagePack or Arrow)',
                 'GET /api/songs/search': 'Search songs by title',
+                'GET /api/songs/autocomplete': 'Suggest titles by prefix',
                 'PUT /api/songs/<id>/rating': 'Update song rating',
-                'POST /api/songs/upload': 'Upload JSON data',
-                'GET /api/stats': 'Get database statistics'
+                'PUT /api/songs/ratings': 'Update many song ratings at once',
+                'POST /api/songs/upload': 'Upload JSON data (?async=true: as a background job)',
+                'POST /api/jobs': 'Start a chunked, resumable upload job',
+                'PUT /api/jobs/<id>/data': 'Send an upload chunk (Content-Range)',
+                'GET /api/jobs/<id>': 'Get upload job progress',
+                'GET /api/stats': 'Get database statistics',
+                'GET /api/aggregates': 'Get chart histograms and series',
+                'GET /api/cache/stats': 'Get response cache statistics',
+                'GET /api/column-store/stats': 'Get column store version and memory footprint',
+                'GET /metrics': 'Request, SQL and ingestion metrics (Prometheus text format)'
             }
         }), 200
     
@@ -74,6 +341,8 @@ def register_routes(app):
     # 1.2.1 [MUST HAVE] Get all songs with pagination
     # ===========================================
     @app.route('/api/songs', methods=['GET'])
+    @statement_budget(listing_budget)
+    @cached_response
     def get_all_songs():
         """
         Get all songs with pagination support
@@ -83,16 +352,22 @@ def register_routes(app):
             per_page (int): Items per page (default: 10, max: 100)
             sort_by (str): Column to sort by (default: index)
             order (str): Sort order - 'asc' or 'desc' (default: asc)
+            cursor (str): Opt-in keyset pagination. Pass an empty cursor for the
+                first page, then the returned next_cursor. page is ignored.
+            include_total (bool): In cursor mode, also return total_items (default: false)
+            filter (str): Comma-separated conditions that must all hold, e.g.
+                tempo:120..130,energy>0.8,mode=1 (see filters.parse_filter)
+            explain (bool): Add the chosen query plan to the response (default: false)
         
         Returns:
-            JSON response with paginated songs
+            Paginated songs as JSON, or per the Accept header column-major JSON
+            (application/vnd.songs.columns+json), MessagePack (application/msgpack)
+            or an Arrow IPC stream (application/vnd.apache.arrow.stream)
         """
         try:
             # Get query parameters
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', app.config['DEFAULT_PAGE_SIZE'], type=int)
-            sort_by = request.args.get('sort_by', 'index', type=str)
-            order = request.args.get('order', 'asc', type=str).lower()
             
             # Validate parameters
             if page < 1:
@@ -102,58 +377,208 @@ def register_routes(app):
                 return jsonify({'error': f'per_page must be between 1 and {app.config["MAX_PAGE_SIZE"]}'}), 400
             
             # Validate sort column
-            valid_sort_columns = ['index', 'id', 'title', 'danceability', 'energy', 
-                                  'tempo', 'duration_ms', 'star_rating', 'created_at']
-            if sort_by not in valid_sort_columns:
-                return jsonify({'error': f'Invalid sort_by column. Valid columns: {valid_sort_columns}'}), 400
+            try:
+                sort_by, order = parse_sort_args()
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
-            # Build query with sorting
-            query = Song.query
+            try:
+                conditions, explain = parse_filter_args()
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
             
-            # Handle special case for 'class' field
-            if sort_by == 'class':
-                sort_column = Song.class_field
-            else:
-                sort_column = getattr(Song, sort_by)
+            if conditions:
+                return filtered_songs(conditions, explain, sort_by, order, page, per_page)
             
-            # Apply sorting
-            if order == 'desc':
-                query = query.order_by(sort_column.desc())
-            else:
-                query = query.order_by(sort_column.asc())
+            # Keyset pagination: constant cost per page, count only on request
+            if 'cursor' in request.args:
+                include_total = request.args.get('include_total', 'false', type=str).lower() == 'true'
+                try:
+                    rows, next_cursor = keyset_page(
+                        select_songs(), sort_by, order, per_page, request.args.get('cursor') or None
+                    )
+                except ValueError as e:
+                    return jsonify({'status': 'error', 'message': str(e)}), 400
+                
+                return songs_response({
+                    'status': 'success',
+                    'pagination': cursor_pagination(
+                        per_page, next_cursor, Song.query.count() if include_total else None
+                    )
+                }, rows)
             
-            # Execute pagination
-            pagination = query.paginate(
-                page=page,
-                per_page=per_page,
-                error_out=False
-            )
+            store = app.extensions.get('column_store')
+            if store is not None and app.config['COLUMN_STORE_LISTINGS']:
+                # Slice the replica's sort permutation, then fetch the page by primary key
+                snapshot = store.ensure_fresh()
+                total = snapshot.size
+                rows = QueryPlanner.fetch_by_index(
+                    snapshot.page(sort_by, order, (page - 1) * per_page, per_page)
+                )
+            else:
+                # Song rows come back as column tuples and are encoded without ORM objects
+                query = select_songs().order_by(*ordered_by(sort_by, order))
+                
+                # Execute pagination
+                total = db.session.scalar(select(func.count()).select_from(Song))
+                rows = db.session.execute(query.limit(per_page).offset((page - 1) * per_page)).all()
+            total_pages = math.ceil(total / per_page)
             
             # Build response
             response = {
                 'status': 'success',
-                'data': [song.to_dict() for song in pagination.items],
                 'pagination': {
                     'page': page,
                     'per_page': per_page,
-                    'total_pages': pagination.pages,
-                    'total_items': pagination.total,
-                    'has_next': pagination.has_next,
-                    'has_prev': pagination.has_prev
+                    'total_pages': total_pages,
+                    'total_items': total,
+                    'has_next': page < total_pages,
+                    'has_prev': page > 1
                 }
             }
             
-            return jsonify(response), 200
+            return songs_response(response, rows)
             
         except Exception as e:
             logger.error(f"Error getting songs: {str(e)}")
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
+    def filtered_songs(conditions, explain, sort_by, order, page, per_page):
+        """
+        Listing page for a filter, answered by the planner's chosen plan
+        
+        Index and table plans run in SQL, ordered by (sort column, index).
+        Scan plans find and order the matching indexes in the column store,
+        then read just the page's rows by primary key. Cursor mode always
+        runs in SQL, since the cursor seeks past the last row there.
+        """
+        plan = planner.plan(conditions, sort_by)
+        
+        if 'cursor' in request.args:
+            if plan['kind'] == 'scan':
+                plan['kind'] = 'table'
+            include_total = request.args.get('include_total', 'false', type=str).lower() == 'true'
+            statement = QueryPlanner.hinted(apply_filters(select_songs(), conditions), plan)
+            try:
+                rows, next_cursor = keyset_page(
+                    statement, sort_by, order, per_page, request.args.get('cursor') or None
+                )
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            
+            response = {
+                'status': 'success',
+                'pagination': cursor_pagination(
+                    per_page, next_cursor, QueryPlanner.sql_count(conditions, plan) if include_total else None
+                )
+            }
+            if explain:
+                plan['query_plan'] = QueryPlanner.explain(statement)
+                response['plan'] = plan
+            return songs_response(response, rows)
+        
+        offset = (page - 1) * per_page
+        if plan['kind'] == 'scan':
+            indexes = planner.matching_indexes(conditions, sort_by, order)
+            total = len(indexes)
+            statement = QueryPlanner.fetch_statement(indexes[offset:offset + per_page])
+            rows = QueryPlanner.fetch_by_index(indexes[offset:offset + per_page])
+        else:
+            statement = QueryPlanner.sql_statement(conditions, plan, ordered_by(sort_by, order))
+            statement = statement.limit(per_page).offset(offset)
+            total = QueryPlanner.sql_count(conditions, plan)
+            rows = db.session.execute(statement).all()
+        total_pages = math.ceil(total / per_page)
+        
+        response = {
+            'status': 'success',
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total_pages': total_pages,
+                'total_items': total,
+                'has_next': page < total_pages,
+                'has_prev': page > 1
+            }
+        }
+        if explain:
+            plan['query_plan'] = QueryPlanner.explain(statement)
+            response['plan'] = plan
+        return songs_response(response, rows)
+    
+    
+    # ===========================================
+    # Export all songs (streaming download)
+    # ===========================================
+    @app.route('/api/songs/export', methods=['GET'])
+    @statement_budget(export_budget)
+    def export_songs():
+        """
+        Stream every song as NDJSON, CSV, MessagePack or an Arrow IPC stream
+        
+        Rows are read from a server-side cursor and written out chunk by chunk,
+        so memory use does not grow with the table.
+        
+        Query Parameters:
+            format (str): 'ndjson', 'csv', 'msgpack' or 'arrow' (default: from
+                the Accept header, else ndjson)
+            sort_by (str): Column to sort by (default: index)
+            order (str): Sort order - 'asc' or 'desc' (default: asc)
+            filter (str): Only export songs matching these conditions (as for the listing)
+            explain (bool): Return the chosen query plan as JSON instead of the download
+        
+        Returns:
+            Streaming download (Content-Disposition: attachment)
+        """
+        try:
+            formats = available_export_formats()
+            export_format = request.args.get('format', type=str)
+            export_format = export_format.lower() if export_format else negotiate_format(formats)
+            if export_format not in formats:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Invalid format. Valid formats: {formats}'
+                }), 400
+            
+            try:
+                sort_by, order = parse_sort_args()
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            
+            try:
+                conditions, explain = parse_filter_args()
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            
+            chunk_size = app.config['EXPORT_CHUNK_SIZE']
+            plan = planner.plan(conditions, sort_by) if conditions else {'kind': 'table'}
+            
+            if plan['kind'] == 'scan':
+                if explain:
+                    return jsonify({'status': 'success', 'plan': plan}), 200
+                return export_response(
+                    planner.scan_partitions(conditions, sort_by, order, chunk_size), export_format
+                )
+            
+            # index breaks ties so the order is stable across the whole export
+            statement = QueryPlanner.sql_statement(conditions, plan, ordered_by(sort_by, order))
+            if explain:
+                plan['query_plan'] = QueryPlanner.explain(statement)
+                return jsonify({'status': 'success', 'plan': plan}), 200
+            
+            return export_response(statement_partitions(statement, chunk_size), export_format)
+            
+        except Exception as e:
+            logger.error(f"Error exporting songs: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
     
     # ===========================================
     # 1.2.2 [MUST HAVE] Get song by title
     # ===========================================
     @app.route('/api/songs/search', methods=['GET'])
+    @statement_budget(1)
+    @cached_response
     def search_song_by_title():
         """
         Search for songs by title (exact match or partial match)
@@ -161,6 +586,11 @@ def register_routes(app):
         Query Parameters:
             title (str): Song title to search for
             exact (bool): If true, exact match; if false, partial match (default: false)
+            mode (str): Partial match mode - 'prefix', 'tokens', 'phrase' (full-text,
+                BM25-ranked), 'fuzzy' (typo-tolerant trigram match) or
+                'substring' (LIKE scan) (default: prefix)
+            page (int): Page number (default: 1)
+            per_page (int): Items per page (default: MAX_PAGE_SIZE)
         
         Returns:
             JSON response with matching songs
@@ -168,15 +598,50 @@ def register_routes(app):
         try:
             title = request.args.get('title', '', type=str)
             exact = request.args.get('exact', 'false', type=str).lower() == 'true'
+            mode = request.args.get('mode', 'prefix', type=str).lower()
+            page = request.args.get('page', 1, type=int)
+            per_page = request.args.get('per_page', app.config['MAX_PAGE_SIZE'], type=int)
             
             if not title:
                 return jsonify({'status': 'error', 'message': 'Title parameter is required'}), 400
             
+            if page < 1:
+                return jsonify({'status': 'error', 'message': 'Page number must be >= 1'}), 400
+            
+            if per_page < 1 or per_page > app.config['MAX_PAGE_SIZE']:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'per_page must be between 1 and {app.config["MAX_PAGE_SIZE"]}'
+                }), 400
+            
             # Search for songs
+            has_next = False
             if exact:
                 songs = Song.query.filter_by(title=title).all()
+            elif mode == 'substring' or not app.config['SEARCH_FTS_AVAILABLE']:
+                songs = (
+                    Song.query.filter(Song.title.ilike(f'%{title}%'))
+                    .order_by(Song.index)
+                    .limit(per_page + 1)
+                    .offset((page - 1) * per_page)
+                    .all()
+                )
+                songs, has_next = songs[:per_page], len(songs) > per_page
+            elif mode == 'fuzzy':
+                title_index = app.extensions.get('title_index')
+                if title_index is None:
+                    return jsonify({'status': 'error', 'message': 'Fuzzy search is not enabled'}), 400
+                
+                matches = title_index.search(title, limit=page * per_page + 1)
+                has_next = len(matches) > page * per_page
+                ranked = [doc for doc, _ in matches[(page - 1) * per_page:page * per_page]]
+                by_index = {song.index: song for song in Song.query.filter(Song.index.in_(ranked)).all()}
+                songs = [by_index[doc] for doc in ranked if doc in by_index]
             else:
-                songs = Song.query.filter(Song.title.ilike(f'%{title}%')).all()
+                try:
+                    songs, has_next = TitleSearch.search(title, mode, page, per_page)
+                except ValueError as e:
+                    return jsonify({'status': 'error', 'message': str(e)}), 400
             
             if not songs:
                 return jsonify({
@@ -188,7 +653,12 @@ def register_routes(app):
             return jsonify({
                 'status': 'success',
                 'data': [song.to_dict() for song in songs],
-                'count': len(songs)
+                'count': len(songs),
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'has_next': has_next
+                }
             }), 200
             
         except Exception as e:
@@ -196,10 +666,59 @@ def register_routes(app):
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     
+    # ===========================================
+    # Autocomplete song titles
+    # ===========================================
+    @app.route('/api/songs/autocomplete', methods=['GET'])
+    @statement_budget(1)
+    def autocomplete_titles():
+        """
+        Suggest song titles starting with a prefix
+        
+        Query Parameters:
+            prefix (str): Title prefix (case and accent insensitive)
+            limit (int): Maximum suggestions (default: 10, max: 50)
+        
+        Returns:
+            JSON response with suggestions, shortest titles first
+        """
+        try:
+            prefix = request.args.get('prefix', '', type=str)
+            limit = request.args.get('limit', 10, type=int)
+            
+            if not prefix:
+                return jsonify({'status': 'error', 'message': 'Prefix parameter is required'}), 400
+            
+            if limit < 1 or limit > 50:
+                return jsonify({'status': 'error', 'message': 'limit must be between 1 and 50'}), 400
+            
+            title_index = app.extensions.get('title_index')
+            if title_index is None:
+                return jsonify({'status': 'error', 'message': 'Autocomplete is not enabled'}), 400
+            
+            ranked = title_index.autocomplete(prefix, limit)
+            rows = db.session.query(Song.index, Song.id, Song.title).filter(Song.index.in_(ranked)).all()
+            by_index = {row.index: row for row in rows}
+            
+            return jsonify({
+                'status': 'success',
+                'data': [
+                    {'index': doc, 'id': by_index[doc].id, 'title': by_index[doc].title}
+                    for doc in ranked if doc in by_index
+                ]
+            }), 200
+            
+        except Exception as e:
+            logger.error(f"Error autocompleting titles: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    
     # ===========================================
     # Get song by ID
     # ===========================================
     @app.route('/api/songs/<song_id>', methods=['GET'])
+    @statement_budget(1)
+    @cached_response
     def get_song_by_id(song_id):
         """
         Get a specific song by its ID
@@ -229,10 +748,70 @@ def register_routes(app):
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     
+    # ===========================================
+    # Similar songs
+    # ===========================================
+    @app.route('/api/songs/<song_id>/similar', methods=['GET'])
+    @statement_budget(2)
+    @cached_response
+    def get_similar_songs(song_id):
+        """
+        Get the songs nearest to a song in audio feature space
+        
+        Args:
+            song_id (str): Song ID
+        
+        Query Parameters:
+            k (int): Number of similar songs (default: 10, max: 100)
+            exact (bool): Force an exact search on a partitioned index (default: false)
+        
+        Returns:
+            JSON response with similar songs, nearest first, each with its distance
+        """
+        try:
+            k = request.args.get('k', 10, type=int)
+            exact = request.args.get('exact', 'false', type=str).lower() == 'true'
+            
+            if k < 1 or k > 100:
+                return jsonify({'status': 'error', 'message': 'k must be between 1 and 100'}), 400
+            
+            feature_index = app.extensions.get('feature_index')
+            if feature_index is None:
+                return jsonify({'status': 'error', 'message': 'Similar songs are not enabled'}), 400
+            
+            song_index = db.session.scalar(select(Song.index).where(Song.id == song_id))
+            if song_index is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Song with ID {song_id} not found'
+                }), 404
+            
+            neighbours = feature_index.neighbours(song_index, k, exact=exact)
+            by_index = {
+                song.index: song
+                for song in Song.query.filter(Song.index.in_([doc for doc, _ in neighbours])).all()
+            }
+            
+            return jsonify({
+                'status': 'success',
+                'data': [
+                    dict(by_index[doc].to_dict(), distance=distance)
+                    for doc, distance in neighbours if doc in by_index
+                ],
+                'count': len(neighbours),
+                'mode': 'partitioned' if feature_index.partitioned and not exact else 'exact'
+            }), 200
+            
+        except Exception as e:
+            logger.error(f"Error finding similar songs: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    
     # ===========================================
     # 1.2.3 [NICE TO HAVE] Update song rating
     # ===========================================
     @app.route('/api/songs/<song_id>/rating', methods=['PUT'])
+    @statement_budget(6)
     def update_song_rating(song_id):
         """
         Update the star rating for a song
@@ -266,25 +845,35 @@ def register_routes(app):
             except ValueError as e:
                 return jsonify({'status': 'error', 'message': str(e)}), 400
             
-            # Find song
-            song = Song.query.filter_by(id=song_id).first()
+            # Write-behind: queue the update for the next group commit (the
+            # same path as bulk updates), else one UPDATE and commit now
+            writer = app.extensions.get('rating_writer')
+            if writer is not None:
+                future = writer.submit({song_id: rating})
+                if writer.durability == 'async':
+                    return jsonify({
+                        'status': 'success',
+                        'message': 'Rating update queued',
+                        'data': {'id': song_id, 'star_rating': rating}
+                    }), 202
+                _, missing = future.result(timeout=app.config['RATING_WAIT_TIMEOUT'])
+            else:
+                _, missing = RatingUpdates.apply({song_id: rating})
+                if not missing:
+                    songs_upserted.send(app, ids=[song_id])
             
-            if not song:
+            if missing:
                 return jsonify({
                     'status': 'error',
                     'message': f'Song with ID {song_id} not found'
                 }), 404
             
-            # Update rating
-            song.star_rating = rating
-            db.session.commit()
-            
             logger.info(f"Updated rating for song {song_id} to {rating}")
             
             return jsonify({
                 'status': 'success',
                 'message': 'Rating updated successfully',
-                'data': song.to_dict()
+                'data': Song.query.filter_by(id=song_id).first().to_dict()
             }), 200
             
         except Exception as e:
@@ -293,22 +882,94 @@ def register_routes(app):
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     
+    # ===========================================
+    # Bulk rating updates
+    # ===========================================
+    @app.route('/api/songs/ratings', methods=['PUT'])
+    @statement_budget(ratings_budget)
+    def update_song_ratings():
+        """
+        Update the star ratings of many songs in one request
+        
+        Ratings are written with one UPDATE statement per chunk of songs and a
+        single commit (or through the write-behind queue when it is enabled).
+        
+        Request Body:
+            {
+                "ratings": [{"id": "5vYA1mW9g2Coh1HUFUSmlb", "rating": 4}, ...]
+            }
+        
+        Returns:
+            JSON response with the updated count and the ids that were not found
+        """
+        try:
+            try:
+                ratings = RatingUpdates.parse(request.get_json(silent=True))
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            
+            if len(ratings) > app.config['MAX_RATING_BATCH']:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'At most {app.config["MAX_RATING_BATCH"]} ratings per request'
+                }), 400
+            
+            writer = app.extensions.get('rating_writer')
+            if writer is not None:
+                future = writer.submit(ratings)
+                if writer.durability == 'async':
+                    return jsonify({
+                        'status': 'success',
+                        'message': f'Queued {len(ratings)} rating updates',
+                        'queued_count': len(ratings)
+                    }), 202
+                updated, missing = future.result(timeout=app.config['RATING_WAIT_TIMEOUT'])
+            else:
+                updated, missing = RatingUpdates.apply(ratings)
+                if updated:
+                    songs_upserted.send(app, ids=updated)
+            
+            logger.info(f"Updated ratings for {len(updated)} songs ({len(missing)} not found)")
+            
+            return jsonify({
+                'status': 'success',
+                'message': f'Updated {len(updated)} ratings',
+                'updated_count': len(updated),
+                'missing_ids': missing
+            }), 200
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error updating ratings: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    
     # ===========================================
     # Upload JSON data
     # ===========================================
     @app.route('/api/songs/upload', methods=['POST'])
+    @statement_budget(upload_budget)
     def upload_json_data():
         """
         Upload and process JSON song data
         
+        Query Parameters:
+            async (str): 'true' to spool the body to an upload job and ingest it
+                in the background (see /api/jobs) instead of within the request
+        
         Request Body:
             JSON data in the specified format
         
         Returns:
-            JSON response with upload status
+            JSON response with upload status (201), or the queued job (202)
         """
         try:
-            data = request.get_json()
+            if request.args.get('async', 'false', type=str).lower() == 'true':
+                if 'upload_jobs' not in app.extensions:
+                    return jsonify({'status': 'error', 'message': 'Upload jobs are not enabled'}), 400
+                return receive_upload(UploadJobs.create(), 0, complete=True)
+            
+            data = request.get_json(silent=True)
             
             if not data:
                 return jsonify({
@@ -320,12 +981,14 @@ def register_routes(app):
             normalized_data = DataProcessor.normalize_json(data)
             
             # Load to database
-            inserted_count = DataProcessor.load_data_to_db(normalized_data)
+            result = DataProcessor.bulk_upsert(normalized_data)
+            inserted_count = result['inserted']
             
             return jsonify({
                 'status': 'success',
                 'message': f'Successfully uploaded {inserted_count} songs',
-                'inserted_count': inserted_count
+                'inserted_count': inserted_count,
+                'updated_count': result['updated']
             }), 201
             
         except ValueError as e:
@@ -335,10 +998,127 @@ def register_routes(app):
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     
+    # ===========================================
+    # Upload jobs (chunked, resumable, ingested in the background)
+    # ===========================================
+    def upload_job_response(job, status):
+        """JSON description of an upload job, with its Location and upload URL"""
+        response = jsonify({
+            'status': 'success',
+            'data': job.to_dict(),
+            'upload_url': f'/api/jobs/{job.id}/data'
+        })
+        response.headers['Location'] = f'/api/jobs/{job.id}'
+        return response, status
+    
+    def receive_upload(job, start, length=None, total=None, complete=False):
+        """
+        Spool the request body into an upload job as one chunk, queueing the
+        job for ingestion once the whole upload has arrived
+        
+        Returns:
+            202 response once the job is queued, otherwise 200 with the bytes received
+        """
+        job = UploadJobs.append(job, request.stream, start, length, total, complete)
+        if job.state == 'queued':
+            app.extensions['upload_jobs'].submit(job.id)
+            return upload_job_response(job, 202)
+        return upload_job_response(job, 200)
+    
+    @app.route('/api/jobs', methods=['POST'])
+    @statement_budget(2)
+    def create_upload_job():
+        """
+        Start a chunked, resumable upload
+        
+        Request Body (optional):
+            {"size": <total upload bytes>}
+        
+        Returns:
+            JSON response with the new job (201); the data goes to its upload_url
+        """
+        if 'upload_jobs' not in app.extensions:
+            return jsonify({'status': 'error', 'message': 'Upload jobs are not enabled'}), 400
+        
+        try:
+            payload = request.get_json(silent=True)
+            size = payload.get('size') if isinstance(payload, dict) else None
+            if size is not None and (not isinstance(size, int) or isinstance(size, bool)):
+                raise ValueError('size must be an integer number of bytes')
+            return upload_job_response(UploadJobs.create(size), 201)
+            
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error creating upload job: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    @app.route('/api/jobs/<job_id>/data', methods=['PUT'])
+    @statement_budget(4)
+    def upload_job_data(job_id):
+        """
+        Send the next chunk of an upload
+        
+        Headers:
+            Content-Range: 'bytes <first>-<last>/<total or *>' for a chunk, or
+                'bytes */<total>' with an empty body to complete the upload;
+                without it the body is the whole upload
+        
+        Request Body:
+            The chunk's bytes of the JSON document
+        
+        Returns:
+            200 with bytes_received while receiving, 202 once the upload is
+            complete and queued, 409 (with bytes_received to resume from)
+            when the chunk does not start where the received bytes end or
+            another chunk of the job is being received
+        """
+        job = db.session.get(UploadJob, job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Upload job not found'}), 404
+        
+        try:
+            content_range = request.headers.get('Content-Range')
+            if content_range is None:
+                return receive_upload(job, 0, complete=True)
+            start, length, total = parse_content_range(content_range)
+            return receive_upload(job, start, length, total)
+            
+        except UploadConflict as e:
+            return jsonify({'status': 'error', 'message': str(e), 'data': e.job.to_dict()}), 409
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error receiving upload job data: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    @statement_budget(1)
+    def get_upload_job(job_id):
+        """
+        Get an upload job's transfer and ingestion progress
+        
+        Returns:
+            JSON response with state, bytes received, rows processed of
+            rows_total, inserted/updated counts, rows per second and the
+            last error
+        """
+        job = db.session.get(UploadJob, job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Upload job not found'}), 404
+        
+        return jsonify({
+            'status': 'success',
+            'data': job.to_dict()
+        }), 200
+    
+    
     # ===========================================
     # Get statistics
     # ===========================================
     @app.route('/api/stats', methods=['GET'])
+    @statement_budget(2)
+    @cached_response
     def get_stats():
         """
         Get database statistics
@@ -347,38 +1127,15 @@ def register_routes(app):
             JSON response with statistics
         """
         try:
-            total_songs = Song.query.count()
-            
-            # Average stats
-            stats = db.session.query(
-                func.avg(Song.danceability).label('avg_danceability'),
-                func.avg(Song.energy).label('avg_energy'),
-                func.avg(Song.tempo).label('avg_tempo'),
-                func.avg(Song.duration_ms).label('avg_duration_ms'),
-                func.min(Song.duration_ms).label('min_duration_ms'),
-                func.max(Song.duration_ms).label('max_duration_ms')
-            ).first()
-            
-            # Rating distribution
-            rating_dist = db.session.query(
-                Song.star_rating,
-                func.count(Song.star_rating)
-            ).group_by(Song.star_rating).all()
+            # Materialized summary when available, full aggregation otherwise
+            if app.config['STATS_SUMMARY_AVAILABLE']:
+                data = StatsSummary.read()
+            else:
+                data = StatsSummary.read_live()
             
             return jsonify({
                 'status': 'success',
-                'data': {
-                    'total_songs': total_songs,
-                    'average_danceability': float(stats.avg_danceability) if stats.avg_danceability else 0,
-                    'average_energy': float(stats.avg_energy) if stats.avg_energy else 0,
-                    'average_tempo': float(stats.avg_tempo) if stats.avg_tempo else 0,
-                    'average_duration_ms': float(stats.avg_duration_ms) if stats.avg_duration_ms else 0,
-                    'min_duration_ms': stats.min_duration_ms,
-                    'max_duration_ms': stats.max_duration_ms,
-                    'rating_distribution': {
-                        str(rating): count for rating, count in rating_dist
-                    }
-                }
+                'data': data
             }), 200
             
         except Exception as e:
@@ -386,6 +1143,133 @@ def register_routes(app):
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     
+    # ===========================================
+    # Chart aggregates
+    # ===========================================
+    @app.route('/api/aggregates', methods=['GET'])
+    @statement_budget(aggregates_budget)
+    @cached_response
+    def get_aggregates():
+        """
+        Get chart data computed server-side
+        
+        Query Parameters:
+            histogram (str): Comma-separated numeric features to bin
+            bins (int): Equal-width bins per histogram (default: 10, max: 1000)
+            edges.<feature> (str): Explicit comma-separated bin edges for a feature
+            scatter (str): Comma-separated series, each 'y' (against index) or 'x:y'
+            points (int): Maximum points per scatter series (default: 500, max: 5000)
+            series (str): Comma-separated features to return for the first songs
+            limit (int): Songs per series (default: 20, max: 100)
+        
+        Returns:
+            JSON response with histograms, scatter and series keyed by feature;
+            column-major JSON or MessagePack per the Accept header
+        """
+        try:
+            histogram = [name for name in request.args.get('histogram', '', type=str).split(',') if name]
+            scatter = [spec for spec in request.args.get('scatter', '', type=str).split(',') if spec]
+            series = [name for name in request.args.get('series', '', type=str).split(',') if name]
+            bins = request.args.get('bins', 10, type=int)
+            points = request.args.get('points', 500, type=int)
+            limit = request.args.get('limit', 20, type=int)
+            
+            if not (histogram or scatter or series):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'At least one of histogram, scatter or series is required'
+                }), 400
+            
+            try:
+                data = {'histograms': {}, 'scatter': {}, 'series': {}}
+                for name in histogram:
+                    edges = request.args.get(f'edges.{name}', type=str)
+                    if edges:
+                        edges = [float(edge) for edge in edges.split(',')]
+                    data['histograms'][name] = ChartAggregates.histogram(name, bins, edges or None)
+                for spec in scatter:
+                    x, y = parse_scatter_spec(spec)
+                    data['scatter'][spec] = ChartAggregates.scatter(x, y, points)
+                for name in series:
+                    data['series'][name] = ChartAggregates.series(name, limit)
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            
+            return aggregates_response({
+                'status': 'success',
+                'data': data
+            })
+            
+        except Exception as e:
+            logger.error(f"Error computing aggregates: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    
+    # ===========================================
+    # Response cache statistics
+    # ===========================================
+    @app.route('/api/cache/stats', methods=['GET'])
+    @statement_budget(0)
+    def get_cache_stats():
+        """
+        Get response cache hit/miss counters and size
+        
+        Returns:
+            JSON response with cache statistics
+        """
+        cache = app.extensions.get('response_cache')
+        if cache is None:
+            return jsonify({'status': 'error', 'message': 'Response cache is not enabled'}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'data': cache.stats()
+        }), 200
+    
+    
+    # ===========================================
+    # Column store statistics
+    # ===========================================
+    @app.route('/api/column-store/stats', methods=['GET'])
+    @statement_budget(0)
+    def get_column_store_stats():
+        """
+        Get the column store's version counters, refresh timings and memory
+        footprint per column and per sort permutation
+        
+        Returns:
+            JSON response with column store statistics
+        """
+        store = app.extensions.get('column_store')
+        if store is None:
+            return jsonify({'status': 'error', 'message': 'Column store is not enabled'}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'data': store.stats()
+        }), 200
+    
+    
+    # ===========================================
+    # Prometheus metrics
+    # ===========================================
+    @app.route('/metrics', methods=['GET'])
+    @statement_budget(0)
+    def get_metrics():
+        """
+        Per-route latency, response size and SQL histograms, SQL totals and
+        ingestion throughput in the Prometheus text exposition format
+        
+        Returns:
+            text/plain metrics response
+        """
+        metrics = app.extensions.get('metrics')
+        if metrics is None:
+            return jsonify({'status': 'error', 'message': 'Metrics are not enabled'}), 400
+        
+        return app.response_class(metrics.render(), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
+    
+    
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
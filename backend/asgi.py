@@ -0,0 +1,261 @@
+"""
+ASGI serving mode: the routes from register_routes behind an ASGI server.
+
+Usage:
+    uvicorn --factory asgi:asgi_app --host 0.0.0.0 --port 5000
+    python asgi.py  (same, with the host/port from ASGI_HOST/ASGI_PORT)
+
+The event loop owns the client connections, so thousands of idle or slow
+dashboard clients cost a coroutine each rather than a thread. Each request
+still runs the normal Flask view, in a thread pool sized to the database
+connections that can serve it: GET/HEAD views share ASGI_READ_WORKERS
+threads (concurrent WAL readers on the read-only engine), other views
+ASGI_WRITE_WORKERS (SQLite has a single writer). Requests beyond the pools
+wait in the loop instead of holding a thread blocked on a connection, and
+more than ASGI_MAX_PENDING waiting requests are shed with a 503.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import create_app
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def build_environ(scope: Dict[str, Any], body) -> Dict[str, Any]:
+    """PEP 3333 environ for an ASGI http scope and its spooled request body"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] if server[1] is not None else 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': None,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            key = 'CONTENT_TYPE'
+        elif name == 'CONTENT_LENGTH':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class FlaskASGI:
+    """
+    ASGI application serving a Flask app's WSGI callable from bounded
+    reader and writer thread pools.
+
+    Response bodies are sent chunk by chunk as the view yields them, so
+    streamed exports keep their bounded memory; a slow client applies
+    backpressure to the worker thread producing its response.
+    """
+
+    def __init__(self, app, read_workers: int = 8, write_workers: int = 2,
+                 max_pending: int = 10000, spool_bytes: int = 1024 * 1024):
+        self.app = app
+        self.readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='asgi-read')
+        self.writers = ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix='asgi-write')
+        self.max_pending = max_pending
+        self.spool_bytes = spool_bytes
+        self.pending = 0
+        self.served = 0
+        self.shed = 0  # pending and the counters are only touched on the event loop
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise NotImplementedError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            await self._send_error(send, 503, 'Server is overloaded, retry later')
+            return
+
+        self.pending += 1
+        try:
+            body = await self._read_body(receive)
+            if body is None:
+                return  # client went away
+            executor = self.readers if scope['method'] in READ_METHODS else self.writers
+            loop = asyncio.get_running_loop()
+            with body:
+                response = await loop.run_in_executor(executor, self._run_wsgi, scope, body, send, loop)
+            if response is not None:
+                status, headers, content = response
+                await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': content})
+            self.served += 1
+        finally:
+            self.pending -= 1
+
+    async def _read_body(self, receive: Callable):
+        """Request body spooled to disk above spool_bytes, or None on disconnect"""
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    def _run_wsgi(self, scope: Dict[str, Any], body, send: Callable, loop) -> Optional[Tuple[int, List, bytes]]:
+        """
+        Call the WSGI app in a worker thread.
+
+        Returns:
+            (status, headers, body) for a response with a Content-Length, which
+            the loop sends itself; None once a streamed response (no length)
+            has been relayed to the loop chunk by chunk
+        """
+        status_headers: List[Tuple[int, List[Tuple[bytes, bytes]]]] = []
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            if exc_info is not None and status_headers:
+                raise exc_info[1].with_traceback(exc_info[2])
+            status_headers[:] = [(int(status.split(' ', 1)[0]), [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ])]
+
+        def relay(message: Dict[str, Any]) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        environ = build_environ(scope, body)
+        environ['wsgi.errors'] = _LogStream()
+        result = self.app.wsgi_app(environ, start_response)
+        try:
+            chunks = iter(result)
+            first = next(chunks, b'')  # start_response may be deferred to the first chunk
+            status, headers = status_headers[0]
+            if any(name == b'content-length' for name, _ in headers):
+                return status, headers, b''.join([first, *chunks])
+
+            relay({'type': 'http.response.start', 'status': status, 'headers': headers})
+            if first:
+                relay({'type': 'http.response.body', 'body': bytes(first), 'more_body': True})
+            for chunk in chunks:
+                if chunk:
+                    relay({'type': 'http.response.body', 'body': bytes(chunk), 'more_body': True})
+            relay({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return None
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    async def _send_error(send: Callable, status: int, message: str) -> None:
+        body = json.dumps({'status': 'error', 'message': message}).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+            (b'retry-after', b'1'),
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def stats(self) -> Dict[str, Any]:
+        return {'pending': self.pending, 'served': self.served, 'shed': self.shed}
+
+    def close(self) -> None:
+        self.readers.shutdown(wait=True)
+        self.writers.shutdown(wait=True)
+
+
+class _LogStream:
+    """wsgi.errors that writes to this module's logger"""
+
+    def write(self, message: str) -> None:
+        if message.strip():
+            logger.error(message.rstrip())
+
+    def writelines(self, lines) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        pass
+
+
+def create_asgi_app(config_name: str = 'default', app=None) -> FlaskASGI:
+    """
+    Create the Flask app (unless one is given) and wrap it for ASGI servers
+
+    Args:
+        config_name: Configuration name passed to create_app
+        app: An already created Flask app to serve instead
+
+    Returns:
+        The ASGI application
+    """
+    if app is None:
+        app = create_app(config_name)
+    asgi = FlaskASGI(
+        app,
+        read_workers=app.config['ASGI_READ_WORKERS'],
+        write_workers=app.config['ASGI_WRITE_WORKERS'],
+        max_pending=app.config['ASGI_MAX_PENDING'],
+        spool_bytes=app.config['ASGI_BODY_SPOOL_BYTES']
+    )
+    app.extensions['asgi'] = asgi
+    return asgi
+
+
+def asgi_app() -> FlaskASGI:
+    """Factory for `uvicorn --factory asgi:asgi_app`"""
+    return create_asgi_app(os.getenv('FLASK_ENV', 'development'))
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is not installed: pip install uvicorn")
+
+    uvicorn.run(
+        'asgi:asgi_app',
+        factory=True,
+        host=os.getenv('ASGI_HOST', '0.0.0.0'),
+        port=int(os.getenv('ASGI_PORT', 5000)),
+        log_level='info'
+    )
@@ -0,0 +1 @@
+"""Benchmarks: the suite (bench_suite) and the synthetic catalogs it runs on (catalog)"""
@@ -0,0 +1,785 @@
+"""
+Benchmark suite: ingestion, requests, response formats, serialization, similar songs, snapshots and concurrent serving on a synthetic catalog, compared against a stored baseline.
+
+Usage (from backend/):
+    python -m bench.bench_suite [--size 10k|1m|10m] [--repeat 20] [--output results.json]
+                                [--baseline bench/bench_baseline.json] [--threshold 0.25]
+                                [--save-baseline] [--only requests page_deep asgi ...]
+                                [--workers 4] [--readers 4] [--clients 200] [--duration 10]
+
+Scenarios (--only takes scenario or benchmark names):
+    ingest_json      raw_songs.json-format catalog through DataProcessor.process_json_file
+    ingest_pipeline  the same file through the multi-process pipeline, one worker vs --workers
+    bulk_upsert      DataProcessor.bulk_upsert inserts, then updates of the same songs
+    requests         listing pages, search, stats and rating updates via the Flask test client
+    formats          listing encodings (JSON, column-major JSON, MessagePack, Arrow) and gzip/br
+    serialization    ORM + to_dict + jsonify versus the Core tuple row encoder
+    similar          similar-song lookups, exact brute force versus the partitioned index
+    snapshot         binary columnar snapshot export, map/decode and import into an empty database
+    sqlite_engine    listing reads during a bulk upload, without and with the SQLite engine profile
+    asgi             listing load test over threaded WSGI and uvicorn ASGI (needs uvicorn)
+
+Fixtures are built in a temporary directory from catalog.py. Ingestion
+runs in a child process, timed once, with the child's peak RSS growth as
+its memory. The catalog loaded directly into a database serves requests,
+formats, serialization, snapshot and asgi, with the response cache off.
+In-process benchmarks record median, p95 and min wall time over --repeat
+runs after a warm-up, and the peak traced Python heap of one extra run.
+The load tests (sqlite_engine, asgi) record their request latencies and
+throughput.
+
+bulk_upsert times the database write path alone: pre-built records (at
+most UPSERT_MAX_ROWS) with the search index, stats summary and data
+version maintained and the in-process indexes off. Its insert and update
+throughput must stay above --min-rows-per-s (tens of thousands of rows/s,
+default 10000) whatever the baseline.
+
+Results are written as JSON. When the baseline file has results for the
+same row count, benchmarks whose median time (or peak memory, beyond 1 MiB)
+grew by more than --threshold are flagged and the exit status is 1, as it
+is for a bulk_upsert below the throughput floor.
+--save-baseline stores this run as the baseline for its row count. Other
+features can be switched off through their environment variables (e.g.
+TITLE_INDEX_ENABLED=False for very large catalogs).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime
+
+from flask import jsonify
+from bench.catalog import chunk_records, generate_chunk, iter_chunks, load_catalog, parse_size, write_catalog_json
+from config import config, TestingConfig
+from models import db, Song
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+SCENARIOS = ['ingest_json', 'ingest_pipeline', 'bulk_upsert', 'requests', 'formats', 'serialization', 'similar',
+             'snapshot', 'sqlite_engine', 'asgi']
+
+# Peak memory changes smaller than this are noise, whatever the ratio
+MEMORY_NOISE_KIB = 1024
+
+# Songs the bulk_upsert scenario builds in memory and writes
+UPSERT_MAX_ROWS = 100000
+
+SEARCH_TERMS = ['Lo', 'Mid', 'Sum', 'Ele', 'Gold', 'Thun', 'Par', 'Ri', 'Bro', 'Ech']
+
+# Listing sizes (rows per response) for the formats and serialization scenarios
+LISTING_ROWS = [50, 1000, 10000]
+
+# Sort columns of the load tests' random listing pages
+LOAD_SORT_COLUMNS = ['index', 'title', 'energy', 'tempo', 'danceability', 'star_rating']
+
+
+def make_app(name, path, **settings):
+    """App on an (initially empty) database file; settings override config values"""
+    from app import create_app
+
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SEED_SNAPSHOT = f'{path}.missing'  # start empty
+        UPLOAD_SPOOL_DIR = os.path.join(os.path.dirname(path), 'uploads')
+        RESPONSE_CACHE_ENABLED = False
+    for key, value in settings.items():
+        setattr(BenchConfig, key, value)
+    config[name] = BenchConfig
+    app = create_app(name)
+    app.json.compact = True  # as in production (TestingConfig runs with DEBUG)
+    return app
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': numpy_version,
+        'commit': commit or None,
+    }
+
+
+def timings(samples_ms):
+    """Summary of wall-time samples (at least one)"""
+    samples = sorted(samples_ms)
+    return {
+        'runs': len(samples),
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        'min_ms': round(samples[0], 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+    }
+
+
+def sample_ms(function, repeat):
+    """Wall times of repeat calls of function() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+# ----- Ingestion -------------------------------------------------------------
+
+def _ingest(database_path, catalog_path, results, workers=None):
+    from data_processor import DataProcessor
+
+    app = make_app('bench-ingest', database_path)
+    with app.app_context():
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        if workers is None:
+            inserted = DataProcessor.process_json_file(catalog_path)
+        else:
+            inserted = DataProcessor.run_pipeline(catalog_path, workers)['inserted']
+        elapsed = time.perf_counter() - started
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({'inserted': inserted, 'seconds': elapsed, 'peak_kib': after - before})
+
+
+def _ingest_in_child(directory, catalog_path, workers=None):
+    """Ingest the catalog into a fresh database in a child process; its outcome"""
+    database_path = os.path.join(directory, f'ingest-{workers}.db')
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=_ingest, args=(database_path, catalog_path, results, workers))
+    child.start()
+    outcome = results.get()
+    child.join()
+    os.remove(database_path)
+    return outcome
+
+
+def bench_ingest(directory, rows, seed):
+    catalog_path = os.path.join(directory, 'catalog.json')
+    written = write_catalog_json(catalog_path, rows, seed)
+    outcome = _ingest_in_child(directory, catalog_path)
+    os.remove(catalog_path)
+
+    result = timings([outcome['seconds'] * 1000.0])
+    result.update({
+        'rows': outcome['inserted'],
+        'rows_per_s': round(outcome['inserted'] / outcome['seconds'], 1),
+        'catalog_bytes': written['bytes'],
+        'peak_memory_kib': outcome['peak_kib'],
+        'memory': 'rss',
+    })
+    return result
+
+
+def bench_ingest_pipeline(directory, rows, seed, workers):
+    """
+    DataProcessor.run_pipeline with one worker process and with `workers`;
+    the timing is the multi-worker run's, with the measured speedup over one.
+    """
+    catalog_path = os.path.join(directory, 'catalog.json')
+    write_catalog_json(catalog_path, rows, seed)
+    single = _ingest_in_child(directory, catalog_path, 1)
+    outcome = _ingest_in_child(directory, catalog_path, workers)
+    os.remove(catalog_path)
+
+    result = timings([outcome['seconds'] * 1000.0])
+    result.update({
+        'rows': outcome['inserted'],
+        'workers': workers,
+        'rows_per_s': round(outcome['inserted'] / outcome['seconds'], 1),
+        'single_worker_rows_per_s': round(single['inserted'] / single['seconds'], 1),
+        'speedup': round(single['seconds'] / outcome['seconds'], 3),
+        'peak_memory_kib': outcome['peak_kib'],
+        'memory': 'rss',
+    })
+    return result
+
+
+def bench_bulk_upsert(directory, rows, seed):
+    """
+    DataProcessor.bulk_upsert of up to UPSERT_MAX_ROWS songs into an empty
+    database, then of the same songs again (every row an update), each
+    timed once.
+    """
+    from data_processor import DataProcessor
+
+    rows = min(rows, UPSERT_MAX_ROWS)
+    records = [record for chunk in iter_chunks(rows, seed) for record in chunk_records(chunk)]
+    app = make_app('bench-upsert', os.path.join(directory, 'upsert.db'), TITLE_INDEX_ENABLED=False,
+                   SIMILAR_SONGS_ENABLED=False, COLUMN_STORE_ENABLED=False)
+    results = {}
+    with app.app_context():
+        for name in ('bulk_upsert_insert', 'bulk_upsert_update'):
+            started = time.perf_counter()
+            DataProcessor.bulk_upsert(records)
+            elapsed = time.perf_counter() - started
+            results[name] = timings([elapsed * 1000.0])
+            results[name].update({'rows': rows, 'rows_per_s': round(rows / elapsed, 1)})
+        for engine in db.engines.values():
+            engine.dispose()
+    return results
+
+
+# ----- Requests against the loaded catalog -----------------------------------
+
+def request_benchmarks(client, rows, ids):
+    """Benchmark name -> callable making one request with inputs from an rng"""
+    last_page = max(1, (rows + 49) // 50)
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code, response.get_data()[:200])
+
+    def put(url, payload):
+        response = client.put(url, json=payload)
+        assert response.status_code in (200, 202), (url, response.status_code, response.get_data()[:200])
+
+    return {
+        'page_shallow': lambda rng: get('/api/songs?page=1&per_page=50'),
+        'page_shallow_sorted': lambda rng: get('/api/songs?page=1&per_page=50&sort_by=energy&order=desc'),
+        'page_deep': lambda rng: get(f'/api/songs?page={max(1, last_page - rng.randrange(10))}&per_page=50'),
+        'page_deep_sorted': lambda rng: get(f'/api/songs?page={max(1, last_page - rng.randrange(10))}&per_page=50&sort_by=tempo'),
+        'search_prefix': lambda rng: get(f'/api/songs/search?title={rng.choice(SEARCH_TERMS)}&per_page=50'),
+        'search_tokens': lambda rng: get(f'/api/songs/search?title={rng.choice(SEARCH_TERMS)}&mode=tokens&per_page=50'),
+        'stats': lambda rng: get('/api/stats'),
+        'rating_update': lambda rng: put(f'/api/songs/{rng.choice(ids)}/rating', {'rating': rng.randrange(6)}),
+        'ratings_bulk_1000': lambda rng: put('/api/songs/ratings', {'ratings': [
+            {'id': rng.choice(ids), 'rating': rng.randrange(6)} for _ in range(1000)
+        ]}),
+    }
+
+
+def run_benchmark(operation, repeat, seed):
+    """Timings of operation(rng) over repeat runs after a warm-up, and the peak traced heap of one more"""
+    rng = random.Random(seed)
+    operation(rng)  # warm-up: first-use loads (column store, caches) are not timed
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation(rng)
+        samples.append((time.perf_counter() - started) * 1000.0)
+
+    tracemalloc.start()
+    try:
+        operation(rng)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = timings(samples)
+    result.update({'peak_memory_kib': peak // 1024, 'memory': 'tracemalloc'})
+    return result
+
+
+# ----- Response formats and serialization ------------------------------------
+
+def listing_rows(rows):
+    return [count for count in LISTING_ROWS if count <= rows] or [rows]
+
+
+def bench_formats(app, rows, repeat, seed):
+    """
+    Encode time and payload size of each listing format, uncompressed and
+    with the app's gzip/br settings. Rows are fetched once per size and
+    encoded by response_formats.songs_response under a request whose Accept
+    header selects the format, so the SQL is not timed. Formats whose
+    library is not installed are skipped.
+    """
+    from response_formats import LISTING_FORMATS, MEDIA_TYPES, brotli, compress_body, format_available, songs_response
+    from serialization import select_songs
+
+    formats = [name for name in LISTING_FORMATS if format_available(name)]
+    encodings = ['gzip', 'br'] if brotli is not None else ['gzip']
+    gzip_level, brotli_quality = app.config['GZIP_LEVEL'], app.config['BROTLI_QUALITY']
+    results = {}
+
+    for count in listing_rows(rows):
+        with app.app_context():
+            songs = db.session.execute(select_songs().order_by(Song.index).limit(count)).all()
+        envelope = {'status': 'success', 'pagination': {'page': 1, 'per_page': count}}
+        for name in formats:
+            with app.test_request_context(headers={'Accept': MEDIA_TYPES[name][0]}):
+                encode = lambda: songs_response(envelope, songs).get_data()
+                result = run_benchmark(lambda rng: encode(), repeat, seed)
+                body = encode()
+            result.update({'rows': count, 'bytes': len(body), 'bytes_per_row': round(len(body) / count, 1)})
+            for encoding in encodings:
+                compress = lambda: compress_body(body, encoding, gzip_level, brotli_quality)
+                compressed = timings(sample_ms(compress, repeat))
+                result[encoding] = {'bytes': len(compress()), 'compress_median_ms': compressed['median_ms']}
+            results[f'format_{name}_{count}'] = result
+    return results
+
+
+def bench_serialization(app, rows, repeat, seed):
+    """A listing of each size through ORM objects + to_dict + jsonify and through Core tuples + the row encoder"""
+    from serialization import select_songs, songs_response
+
+    def orm_listing(count):
+        songs = Song.query.order_by(Song.index).limit(count).all()
+        return jsonify({'status': 'success', 'data': [song.to_dict() for song in songs]}).get_data()
+
+    def core_listing(count):
+        result = db.session.execute(select_songs().order_by(Song.index).limit(count)).all()
+        return songs_response({'status': 'success'}, result).get_data()
+
+    results = {}
+    for count in listing_rows(rows):
+        with app.test_request_context():
+            for name, listing in (('orm', orm_listing), ('core', core_listing)):
+                def operation(rng):
+                    db.session.remove()  # fresh session (no identity map) each run
+                    listing(count)
+                result = run_benchmark(operation, repeat, seed)
+                result.update({'rows': count, 'rows_per_s': round(count / (result['median_ms'] / 1000.0), 1)})
+                results[f'listing_{name}_{count}'] = result
+        orm, core = results[f'listing_orm_{count}'], results[f'listing_core_{count}']
+        core['speedup'] = round(orm['median_ms'] / core['median_ms'], 3)
+    return results
+
+
+# ----- Similar songs ---------------------------------------------------------
+
+def bench_similar(rows, repeat, seed, k=10, nprobe=8, recall_queries=200):
+    """
+    FeatureIndex over the catalog's feature vectors (no database): build
+    time, query timings of the exact and the partitioned path, and the
+    partitioned path's recall@k against the exact one.
+    """
+    from similar_songs import FEATURES, FeatureIndex
+
+    vectors = []
+    for columns in iter_chunks(rows, seed):
+        vectors.extend(zip(columns['index'].tolist(), *(columns[name].tolist() for name in FEATURES)))
+
+    index = FeatureIndex(partition_threshold=min(rows, 50000), nprobe=nprobe)
+    started = time.perf_counter()
+    index.build(vectors)
+    build = timings([(time.perf_counter() - started) * 1000.0])
+    del vectors
+    build.update({'rows': rows, **index.stats()})
+    results = {'similar_build': build}
+
+    for name, exact in (('exact', True), ('partitioned', False)):
+        results[f'similar_{name}'] = run_benchmark(lambda rng: index.neighbours(rng.randrange(rows), k, exact=exact),
+                                                   repeat, seed)
+    queries = random.Random(seed).sample(range(rows), min(rows, recall_queries))
+    recalls = []
+    for doc in queries:
+        truth = {found for found, _ in index.neighbours(doc, k, exact=True)}
+        found = {found for found, _ in index.neighbours(doc, k, exact=False)}
+        recalls.append(len(found & truth) / max(len(truth), 1))
+    results['similar_partitioned'][f'recall_at_{k}'] = round(statistics.fmean(recalls), 4)
+    return results
+
+
+# ----- Snapshots -------------------------------------------------------------
+
+def bench_snapshot(app, directory, repeat, seed):
+    """
+    Export the loaded catalog to a binary columnar snapshot, map it and
+    decode every column (the import cost before any INSERT), and load it
+    into a fresh, empty database. Export and import are timed once.
+    """
+    from data_processor import DataProcessor
+    from snapshot import SongSnapshot
+
+    snapshot_path = os.path.join(directory, 'songs.songsnap')
+    with app.app_context():
+        exported = DataProcessor.export_snapshot(snapshot_path)
+    export = timings([exported['elapsed_seconds'] * 1000.0])
+    export.update({'rows': exported['rows'], 'bytes': exported['bytes']})
+
+    def decode(rng):
+        with SongSnapshot(snapshot_path) as snapshot:
+            for column in snapshot.header['columns']:
+                if column['kind'] == 'str':
+                    snapshot.strings(column['name'])
+                else:
+                    snapshot.values(column['name'])
+    decoded = run_benchmark(decode, repeat, seed)
+
+    target_path = os.path.join(directory, 'snapshot-target.db')
+    target = make_app('bench-snapshot-target', target_path, TITLE_INDEX_ENABLED=False, SIMILAR_SONGS_ENABLED=False)
+    with target.app_context():
+        imported = DataProcessor.import_snapshot(snapshot_path)
+        for engine in db.engines.values():
+            engine.dispose()
+    load = timings([imported['elapsed_seconds'] * 1000.0])
+    load.update({'rows': imported['inserted'],
+                 'rows_per_s': round(imported['inserted'] / max(imported['elapsed_seconds'], 1e-9), 1)})
+    os.remove(snapshot_path)
+    return {'snapshot_export': export, 'snapshot_decode': decoded, 'snapshot_import': load}
+
+
+# ----- Load tests: SQLite engine profile, WSGI vs ASGI -----------------------
+
+def load_summary(latencies, failed, seconds):
+    """Timings of a load test's successful requests, with throughput and failures"""
+    result = timings(latencies) if latencies else {'runs': 0}
+    result.update({'requests_per_s': round(len(latencies) / seconds, 1), 'failed': failed})
+    return result
+
+
+def bench_sqlite_engine(directory, rows, seed, readers, per_page=20):
+    """
+    Listing reads while one thread bulk-upserts the catalog (10000 songs per
+    batch) into a fresh database, with SQLITE_ENGINE_PROFILE off and on;
+    each reader requests random pages until the upload is done.
+    """
+    from data_processor import DataProcessor
+
+    results = {}
+    for profile in (False, True):
+        name = 'profile' if profile else 'default'
+        path = os.path.join(directory, f'engine-{name}.db')
+        app = make_app(f'bench-engine-{name}', path, SQLITE_ENGINE_PROFILE=profile,
+                       TITLE_INDEX_ENABLED=False, SIMILAR_SONGS_ENABLED=False)
+
+        uploading = threading.Event()
+        uploading.set()
+        latencies, failures = [], [0]
+        lock = threading.Lock()
+        upload_seconds = [0.0]
+
+        def upload():
+            started = time.perf_counter()
+            with app.app_context():
+                for start in range(0, rows, 10000):
+                    DataProcessor.bulk_upsert(chunk_records(generate_chunk(start, min(10000, rows - start), seed)))
+            upload_seconds[0] = time.perf_counter() - started
+            uploading.clear()
+
+        def read(reader):
+            client = app.test_client()
+            rng = random.Random(seed + reader)
+            while True:
+                started = time.perf_counter()
+                response = client.get(f'/api/songs?page={rng.randrange(1, 50)}&per_page={per_page}')
+                elapsed = (time.perf_counter() - started) * 1000.0
+                with lock:
+                    if response.status_code == 200:
+                        latencies.append(elapsed)
+                    else:
+                        failures[0] += 1
+                if not uploading.is_set():
+                    return
+
+        threads = [threading.Thread(target=upload)] + [
+            threading.Thread(target=read, args=(reader,)) for reader in range(readers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result = results[f'engine_reads_{name}'] = load_summary(latencies, failures[0], upload_seconds[0])
+        result.update({'readers': readers, 'upload_s': round(upload_seconds[0], 3)})
+
+        app.extensions['upload_jobs'].close()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        read_engine = app.extensions.get('sqlite_read_engine')
+        if read_engine is not None:
+            read_engine.dispose()
+        os.remove(path)
+    return results
+
+
+def _serve(mode, path, port):
+    app = make_app(f'bench-serve-{mode}', path, TITLE_INDEX_ENABLED=False, SIMILAR_SONGS_ENABLED=False)
+    if mode == 'wsgi':
+        from werkzeug.serving import make_server
+        make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+        from asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(app=app), host='127.0.0.1', port=port,
+                    log_level='warning', access_log=False, backlog=4096)
+
+
+async def _http_get(reader, writer, path):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode('ascii'))
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    headers = dict(line.lower().split(': ', 1) for line in lines[1:] if ': ' in line)
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        headers['connection'] = 'close'
+    return status, headers.get('connection') == 'close'
+
+
+async def _load_client(port, deadline, seed, latencies, failures):
+    rng = random.Random(seed)
+    connection = None
+    while time.perf_counter() < deadline:
+        path = f'/api/songs?page={rng.randrange(1, 200)}&per_page=20&sort_by={rng.choice(LOAD_SORT_COLUMNS)}'
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection('127.0.0.1', port)
+            status, close = await _http_get(*connection, path)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            failures[0] += 1
+            connection = None
+            await asyncio.sleep(0.01)
+            continue
+        if status == 200:
+            latencies.append((time.perf_counter() - started) * 1000.0)
+        else:
+            failures[0] += 1
+        if close:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def _load(port, clients, duration, seed):
+    latencies, failures = [], [0]
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(_load_client(port, deadline, seed + client, latencies, failures)
+                           for client in range(clients)))
+    return latencies, failures[0]
+
+
+def _wait_ready(port, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/readyz', timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not become ready')
+
+
+def bench_asgi(database_path, seed, clients, duration, port):
+    """
+    The loaded catalog served over threaded Werkzeug (as app.run) and over
+    uvicorn with asgi.py, each in its own process; --clients keep-alive
+    connections from one asyncio client request random listing pages
+    (random sort columns) for --duration seconds each.
+    """
+    results = {}
+    for mode in ('wsgi', 'asgi'):
+        server = multiprocessing.Process(target=_serve, args=(mode, database_path, port), daemon=True)
+        server.start()
+        try:
+            _wait_ready(port)
+            latencies, failed = asyncio.run(_load(port, clients, duration, seed))
+        finally:
+            server.terminate()
+            server.join()
+        result = results[f'serve_{mode}'] = load_summary(latencies, failed, duration)
+        result['clients'] = clients
+    return results
+
+
+# ----- Baseline comparison ---------------------------------------------------
+
+def compare(results, baseline, threshold):
+    """Per-benchmark time and memory ratios against the baseline, with regressions flagged"""
+    comparison = {}
+    for name, current in results['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None or 'median_ms' not in current or 'median_ms' not in previous:
+            continue
+        time_ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+        regressions = []
+        if time_ratio > 1.0 + threshold:
+            regressions.append('time')
+        row = {
+            'baseline_median_ms': previous['median_ms'],
+            'time_ratio': round(time_ratio, 3),
+            'regressions': regressions,
+        }
+        # Load tests record no memory
+        if 'peak_memory_kib' in current and 'peak_memory_kib' in previous:
+            memory_growth = current['peak_memory_kib'] - previous['peak_memory_kib']
+            memory_ratio = (current['peak_memory_kib'] / previous['peak_memory_kib']
+                            if previous['peak_memory_kib'] else 1.0)
+            if memory_ratio > 1.0 + threshold and memory_growth > MEMORY_NOISE_KIB:
+                regressions.append('memory')
+            row.update({'baseline_peak_memory_kib': previous['peak_memory_kib'], 'memory_ratio': round(memory_ratio, 3)})
+        comparison[name] = row
+    return comparison
+
+
+def summary_line(name, result):
+    """One line per benchmark as it finishes"""
+    if 'median_ms' not in result:
+        return f"{name}: no successful requests ({result['failed']} failed)"
+    line = f"{name}: median {result['median_ms']:.3f} ms"
+    for key, unit in (('rows_per_s', 'rows/s'), ('requests_per_s', 'req/s')):
+        if key in result:
+            line += f", {result[key]:,.0f} {unit}"
+    if 'p95_ms' in result and 'requests_per_s' in result:
+        line += f", p95 {result['p95_ms']:.2f} ms, {result['failed']} failed"
+    if 'bytes' in result:
+        line += f", {result['bytes']:,} bytes"
+    if 'speedup' in result:
+        line += f", {result['speedup']:.2f}x"
+    for key in result:
+        if key.startswith('recall_at_'):
+            line += f", {key.replace('_at_', '@')} {result[key]:.3f}"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='10k', help='catalog rows, e.g. 10k, 1m, 10m')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per request benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--min-rows-per-s', type=float, default=10000,
+                        help='bulk_upsert throughput floor, inserts and updates alike')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help=f'run just these scenarios ({", ".join(SCENARIOS)}) or request benchmarks')
+    parser.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 1),
+                        help='worker processes for ingest_pipeline (default: all cores, at least 2)')
+    parser.add_argument('--readers', type=int, default=4, help='reader threads for sqlite_engine')
+    parser.add_argument('--clients', type=int, default=200, help='concurrent connections for asgi')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per server for asgi')
+    parser.add_argument('--port', type=int, default=5077, help='port for asgi')
+    args = parser.parse_args()
+
+    rows = parse_size(args.size)
+    results = {
+        'rows': rows,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'environment': environment(),
+        'benchmarks': {},
+    }
+    wanted = lambda name: not args.only or name in args.only
+    benchmarks = results['benchmarks']
+
+    def record(scenario_results):
+        for name, result in scenario_results.items():
+            benchmarks[name] = result
+            print(summary_line(name, result))
+
+    with tempfile.TemporaryDirectory() as directory:
+        if wanted('ingest_json'):
+            record({'ingest_json': bench_ingest(directory, rows, args.seed)})
+        if wanted('ingest_pipeline'):
+            record({'ingest_pipeline': bench_ingest_pipeline(directory, rows, args.seed, args.workers)})
+        if wanted('bulk_upsert'):
+            record(bench_bulk_upsert(directory, rows, args.seed))
+
+        database_path = os.path.join(directory, 'songs.db')
+        app = make_app('bench-suite', database_path)
+        with app.app_context():
+            load_catalog(rows, args.seed)
+            ids = [row[0] for row in db.session.query(Song.id).limit(100000)]
+
+        client = app.test_client()
+        for name, operation in request_benchmarks(client, rows, ids).items():
+            if wanted('requests') or wanted(name):
+                record({name: run_benchmark(operation, args.repeat, args.seed)})
+
+        if wanted('formats'):
+            record(bench_formats(app, rows, args.repeat, args.seed))
+        if wanted('serialization'):
+            record(bench_serialization(app, rows, args.repeat, args.seed))
+        if wanted('similar'):
+            record(bench_similar(rows, args.repeat, args.seed))
+        if wanted('snapshot'):
+            record(bench_snapshot(app, directory, args.repeat, args.seed))
+        if wanted('sqlite_engine'):
+            record(bench_sqlite_engine(directory, rows, args.seed, args.readers))
+        if wanted('asgi'):
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                print("asgi: skipped, uvicorn is not installed")
+            else:
+                record(bench_asgi(database_path, args.seed, args.clients, args.duration, args.port))
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('sizes', {}).get(str(rows))
+    if baseline is not None:
+        results['comparison'] = compare(results, baseline, args.threshold)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    regressed = []
+    if baseline is not None:
+        print(f"\n{'benchmark':<26} {'median ms':>10} {'baseline':>10} {'ratio':>7} {'peak KiB':>10} {'baseline':>10}  flag")
+        for name, row in results['comparison'].items():
+            current = results['benchmarks'][name]
+            flag = f"REGRESSION ({', '.join(row['regressions'])})" if row['regressions'] else ''
+            print(f"{name:<26} {current['median_ms']:>10.3f} {row['baseline_median_ms']:>10.3f} {row['time_ratio']:>7.2f} "
+                  f"{current.get('peak_memory_kib', '-'):>10} {row.get('baseline_peak_memory_kib', '-'):>10}  {flag}")
+            if row['regressions']:
+                regressed.append(name)
+    else:
+        print(f"No baseline for {rows} rows in {args.baseline}")
+
+    for name in ('bulk_upsert_insert', 'bulk_upsert_update'):
+        if name in benchmarks and benchmarks[name]['rows_per_s'] < args.min_rows_per_s:
+            print(f"{name}: {benchmarks[name]['rows_per_s']:,.0f} rows/s is below the "
+                  f"{args.min_rows_per_s:,.0f} rows/s floor")
+            regressed.append(name)
+
+    if args.save_baseline:
+        stored = {'sizes': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                stored = json.load(f)
+        results.pop('comparison', None)
+        stored.setdefault('sizes', {})[str(rows)] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(stored, f, indent=2)
+        print(f"Baseline for {rows} rows saved to {args.baseline}")
+
+    if regressed:
+        print(f"\n{len(regressed)} benchmark(s) regressed beyond {args.threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Synthetic song catalogs for benchmarks: raw_songs.json-format files and
+direct database fixtures.
+
+Usage (from backend/):
+    python -m bench.catalog --rows 1m --output catalog_1m.json [--seed 0]
+
+Feature distributions follow the shipped raw_songs.json: danceability and
+energy skew high, loudness tracks energy, instrumentalness is mostly near
+zero, tempo centres on 120 BPM, durations are log-normal around 3.5
+minutes, and bars, sections and segments are derived from duration, tempo
+and time signature. Output depends only on the row count and seed.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+from flask import current_app
+from data_processor import DataProcessor
+from models import db, Song
+from signals import songs_upserted
+from snapshot import insert_rows
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns of raw_songs.json, in file order
+RAW_FIELDS = [
+    'id', 'title', 'danceability', 'energy', 'key', 'loudness', 'mode', 'acousticness',
+    'instrumentalness', 'liveness', 'valence', 'tempo', 'duration_ms', 'time_signature',
+    'num_bars', 'num_sections', 'num_segments', 'class'
+]
+
+# Rows generated per RNG stream; fixed so output does not depend on batch sizes
+CATALOG_CHUNK = 100000
+
+SIZES = {'k': 1000, 'm': 1000000}
+
+_ID_ALPHABET = b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+_KEY_WEIGHTS = [0.125, 0.105, 0.11, 0.03, 0.075, 0.085, 0.07, 0.115, 0.065, 0.1, 0.055, 0.065]
+_WORDS = (
+    'love night heart fire dream light time summer rain blue gold wild home road city '
+    'river midnight morning shadow stars moon sun ocean storm dance broken forever young '
+    'lost alone together falling rising electric golden silver secret sweet paradise '
+    'highway thunder echo memory ghost angel diamond crazy lonely happy dark bright cold '
+    'warm fast slow high low free last first little big new old never always tonight '
+    'yesterday tomorrow baby girl boy world money back down up over under outside inside '
+    'rolling running waiting burning shining calling hold touch feel breathe remember'
+).split()
+
+
+def parse_size(text: str) -> int:
+    """Row count from '10000', '10k' or '1m'"""
+    match = re.fullmatch(r'\s*(\d+)\s*([kKmM]?)\s*', str(text))
+    if match is None:
+        raise ValueError(f'Invalid catalog size: {text!r}')
+    return int(match.group(1)) * SIZES.get(match.group(2).lower(), 1)
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError('Catalog generation requires NumPy')
+
+
+def generate_chunk(start: int, count: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Columns for songs start .. start + count - 1, drawn from an RNG seeded
+    with (seed, start).
+
+    Returns:
+        Dictionary of column name -> NumPy array ('id' and 'title' are lists),
+        with an 'index' column added to RAW_FIELDS
+    """
+    _require_numpy()
+    rng = np.random.default_rng([seed, start])
+
+    ids = rng.integers(0, len(_ID_ALPHABET), size=(count, 22), dtype=np.uint8)
+    ids = np.frombuffer(_ID_ALPHABET, dtype=np.uint8)[ids]
+    words = np.array(_WORDS, dtype=object)
+    lengths = rng.choice([1, 2, 3, 4], size=count, p=[0.3, 0.35, 0.25, 0.1])
+    picks = rng.integers(0, len(words), size=(count, 4))
+    titles = [
+        ' '.join(word.capitalize() for word in words[row[:length]])
+        for row, length in zip(picks, lengths.tolist())
+    ]
+
+    energy = rng.beta(4.0, 2.0, count)
+    duration_s = np.clip(np.exp(rng.normal(np.log(205.0), 0.3, count)), 30.0, 1200.0)
+    tempo = np.clip(rng.normal(120.0, 28.0, count), 40.0, 220.0)
+    time_signature = rng.choice([1, 3, 4, 5], size=count, p=[0.01, 0.08, 0.89, 0.02])
+    instrumental = rng.random(count) < 0.35
+
+    columns = {
+        'index': np.arange(start, start + count, dtype=np.int64),
+        'id': ids.view('S22').ravel().astype(str).tolist(),
+        'title': titles,
+        'danceability': rng.beta(5.5, 3.5, count),
+        'energy': energy,
+        'key': rng.choice(12, size=count, p=_KEY_WEIGHTS),
+        'loudness': np.clip(-3.0 - 14.0 * (1.0 - energy) + rng.normal(0.0, 2.0, count), -40.0, 0.0),
+        'mode': (rng.random(count) < 0.6).astype(np.int64),
+        'acousticness': np.clip(rng.beta(0.45, 1.6, count) * (1.3 - energy), 0.0, 0.996),
+        'instrumentalness': np.where(instrumental, rng.beta(0.5, 1.5, count), rng.random(count) * 1e-4),
+        'liveness': np.clip(np.exp(rng.normal(np.log(0.15), 0.6, count)), 0.01, 1.0),
+        'valence': rng.beta(2.5, 2.7, count),
+        'tempo': tempo,
+        'duration_ms': np.rint(duration_s * 1000.0).astype(np.int64),
+        'time_signature': time_signature,
+        'num_bars': np.maximum(1, np.rint(duration_s * tempo / 60.0 / np.maximum(time_signature, 1))).astype(np.int64),
+        'num_sections': np.maximum(1, np.rint(duration_s / 23.0 + rng.normal(0.0, 1.5, count))).astype(np.int64),
+        'num_segments': np.maximum(1, np.rint(duration_s * 3.7 + rng.normal(0.0, 60.0, count))).astype(np.int64),
+        'class': (rng.random(count) < 0.5).astype(np.int64),
+    }
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+            columns[name] = np.round(values, 6)
+    return columns
+
+
+def iter_chunks(rows: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """generate_chunk for every CATALOG_CHUNK rows of a rows-song catalog"""
+    for start in range(0, rows, CATALOG_CHUNK):
+        yield generate_chunk(start, min(CATALOG_CHUNK, rows - start), seed)
+
+
+def chunk_records(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Song records (DataProcessor.bulk_upsert input) for one generated chunk"""
+    names = list(columns)
+    values = [columns[name] if isinstance(columns[name], list) else columns[name].tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def _dumps(values: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(values)
+    return json.dumps(values, separators=(',', ':')).encode('utf-8')
+
+
+def write_catalog_json(path: str, rows: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Write a rows-song catalog in raw_songs.json's column-oriented format.
+
+    Each column is written to its own temporary file in one pass over the
+    chunks, then the files are joined, so memory stays at one chunk.
+
+    Returns:
+        Dictionary with rows, bytes and elapsed_seconds
+    """
+    started = time.perf_counter()
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryDirectory(dir=directory) as parts:
+        files = {name: open(os.path.join(parts, f'{position}.part'), 'wb')
+                 for position, name in enumerate(RAW_FIELDS)}
+        try:
+            for columns in iter_chunks(rows, seed):
+                keys = [str(index) for index in columns['index'].tolist()]
+                for name in RAW_FIELDS:
+                    values = columns[name]
+                    values = values if isinstance(values, list) else values.tolist()
+                    fragment = _dumps(dict(zip(keys, values)))[1:-1]
+                    if fragment:
+                        if files[name].tell():
+                            files[name].write(b',')
+                        files[name].write(fragment)
+        finally:
+            for f in files.values():
+                f.close()
+
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as out:
+            out.write(b'{')
+            for position, name in enumerate(RAW_FIELDS):
+                out.write(b'%s%s:{' % (b',' if position else b'', _dumps(name)))
+                with open(os.path.join(parts, f'{position}.part'), 'rb') as part:
+                    shutil.copyfileobj(part, out, 1024 * 1024)
+                out.write(b'}')
+            out.write(b'}')
+        os.replace(temporary, path)
+
+    return {'rows': rows, 'bytes': os.path.getsize(path), 'elapsed_seconds': time.perf_counter() - started}
+
+
+def load_catalog(rows: int, seed: int = 0, rated_fraction: float = 0.25) -> Dict[str, Any]:
+    """
+    Fill the songs table with a rows-song catalog directly (no JSON).
+
+    An empty table gets plain INSERTs with deferred indexes (see
+    snapshot.insert_rows); otherwise the songs are upserted by id. A
+    rated_fraction of songs get a 1-5 star rating and creation times are
+    spread over the preceding year. Must run in an app context.
+
+    Returns:
+        Dictionary with rows and elapsed_seconds
+    """
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    def with_extras(columns: Dict[str, Any]) -> Dict[str, Any]:
+        rng = np.random.default_rng([seed, columns['index'][0] if len(columns['index']) else 0, 1])
+        count = len(columns['index'])
+        ratings = np.where(rng.random(count) < rated_fraction, rng.integers(1, 6, count), 0)
+        ages = rng.integers(0, 365 * 24 * 3600, count).tolist()
+        created = [(now - timedelta(seconds=age)).isoformat(sep=' ') for age in ages]
+        return dict(columns, star_rating=ratings, created_at=created, updated_at=created)
+
+    empty = db.session.query(Song.index).first() is None
+    if empty:
+        fields = ['index'] + RAW_FIELDS + ['star_rating', 'created_at', 'updated_at']
+        ids: List[str] = []
+
+        def batches() -> Iterator[List[tuple]]:
+            for columns in iter_chunks(rows, seed):
+                columns = with_extras(columns)
+                ids.extend(columns['id'])
+                values = [columns[name] if isinstance(columns[name], list) else columns[name].tolist()
+                          for name in fields]
+                yield list(zip(*values))
+
+        insert_rows(fields, batches())
+        songs_upserted.send(current_app._get_current_object(), ids=ids)
+    else:
+        for columns in iter_chunks(rows, seed):
+            DataProcessor.bulk_upsert(chunk_records(columns))
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Loaded a {rows}-song synthetic catalog in {elapsed:.2f}s")
+    return {'rows': rows, 'elapsed_seconds': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', default='10k', help='row count, e.g. 10000, 10k, 1m, 10m')
+    parser.add_argument('--output', default='catalog.json')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = write_catalog_json(args.output, parse_size(args.rows), args.seed)
+    print(f"Wrote {result['rows']} songs to {args.output} ({result['bytes'] / 1e6:.1f} MB) "
+          f"in {result['elapsed_seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,399 @@
+import logging
+import math
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import String, select, type_coerce
+from models import db, Song
+from signals import songs_upserted
+from query_budget import allow_statements
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Numeric song columns held in memory (column name -> table column), 'index' first
+STORE_COLUMNS = {
+    column.name: column
+    for column in Song.__table__.columns
+    if column.type.python_type in (int, float)
+}
+
+# Other columns the replica holds so it can sort by them
+DATETIME_COLUMNS = ('created_at',)
+STRING_COLUMNS = ('id', 'title')
+
+# Stay well below SQLite's host parameter limit for IN (...) lookups
+LOOKUP_CHUNK = 900
+
+# created_at NULLs sort first ascending, as in SQLite
+_NULL_DATETIME = np.iinfo(np.int64).min if np is not None else None
+
+
+def _load_columns() -> List[Any]:
+    table = Song.__table__
+    columns = list(STORE_COLUMNS.values())
+    columns += [type_coerce(table.c[name], String) for name in DATETIME_COLUMNS]
+    columns += [table.c[name] for name in STRING_COLUMNS]
+    return columns
+
+
+_FIELDS = list(STORE_COLUMNS) + list(DATETIME_COLUMNS) + list(STRING_COLUMNS)
+
+
+def _to_arrays(rows: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    """Replica arrays for rows in _load_columns order"""
+    if rows:
+        transposed = list(zip(*rows))
+    else:
+        transposed = [()] * len(_FIELDS)
+    arrays = {}
+    for name, values in zip(_FIELDS, transposed):
+        if name in STORE_COLUMNS:
+            array = np.array(values, dtype=np.float64)  # None -> NaN
+            arrays[name] = array.astype(np.int64) if name == 'index' else array
+        elif name in DATETIME_COLUMNS:
+            stamps = np.array(['NaT' if value is None else value for value in values], dtype='datetime64[us]')
+            array = stamps.astype(np.int64)
+            array[np.isnat(stamps)] = _NULL_DATETIME
+            arrays[name] = array
+        else:
+            arrays[name] = np.array(values, dtype=object)
+    return arrays
+
+
+def _sort_keys(values):
+    """Keys ordering like SQLite: NULL (NaN) before every number"""
+    if values.dtype.kind == 'f':
+        return np.where(np.isnan(values), -np.inf, values)
+    return values
+
+
+def _array_bytes(array) -> int:
+    if array.dtype == object:
+        return int(array.nbytes) + sum(sys.getsizeof(value) for value in array)
+    return int(array.nbytes)
+
+
+class ColumnSnapshot:
+    """
+    One consistent version of the replica: a NumPy array per column, all in
+    song index order (NULL -> NaN), plus sort permutations.
+
+    orders[column] holds the row positions in (column, index) ascending
+    order; descending order is the same permutation reversed. sorted[column]
+    holds the column's non-NULL values in ascending order, for counting
+    matches with binary searches.
+    """
+
+    def __init__(self, columns: Dict[str, Any], version: int, orders: Optional[Dict[str, Any]] = None):
+        self.columns = columns
+        self.version = version
+        self.size = len(columns['index'])
+        self.orders: Dict[str, Any] = orders or {}
+        self.sorted: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def column(self, name: str):
+        return self.columns[name]
+
+    def can_sort(self, name: str) -> bool:
+        return name in self.columns
+
+    def order(self, name: str):
+        """Positions in (name, index) order, computed on first use"""
+        order = self.orders.get(name)
+        if order is None:
+            with self._lock:
+                order = self.orders.get(name)
+                if order is None:
+                    order = np.argsort(_sort_keys(self.columns[name]), kind='stable')
+                    self.orders[name] = order
+        return order
+
+    def sorted_values(self, name: str):
+        """Non-NULL values of a column in ascending order, computed on first use"""
+        values = self.sorted.get(name)
+        if values is None:
+            # Gathering through an existing permutation avoids a sort
+            order = self.orders.get(name)
+            values = self.columns[name][order] if order is not None else np.sort(self.columns[name])
+            if values.dtype.kind == 'f':
+                nulls = np.count_nonzero(np.isnan(values))
+                values = values[nulls:] if order is not None else values[:values.size - nulls]
+            self.sorted[name] = values
+        return values
+
+    def ordered_positions(self, sort_by: str, order: str, mask=None):
+        """Positions sorted for a listing, optionally only those where mask is set"""
+        positions = self.order(sort_by)
+        if mask is not None:
+            positions = positions[mask[positions]]
+        return positions[::-1] if order == 'desc' else positions
+
+    def page(self, sort_by: str, order: str, offset: int, limit: int):
+        """Song indexes of one listing page"""
+        positions = self.ordered_positions(sort_by, order)
+        return self.columns['index'][positions[offset:offset + limit]]
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """Bytes held per column and per sort permutation, and in total"""
+        columns = {name: _array_bytes(array) for name, array in self.columns.items()}
+        orders = {name: int(array.nbytes) for name, array in self.orders.items()}
+        sorted_values = {name: int(array.nbytes) for name, array in self.sorted.items()}
+        return {
+            'columns': columns,
+            'orders': orders,
+            'sorted': sorted_values,
+            'total_bytes': sum(columns.values()) + sum(orders.values()) + sum(sorted_values.values())
+        }
+
+
+class ColumnStore:
+    """
+    In-process columnar read replica of the songs table.
+
+    Serves listing pages, sorting and scans no database index can serve by
+    slicing NumPy arrays and precomputed sort permutations. Each song write
+    bumps a version counter and records the written ids; the next read
+    applies them incrementally (re-reading just those rows and repairing
+    the affected permutations), or reloads everything when more than
+    refresh_ratio of the table changed.
+    """
+
+    def __init__(self, sort_columns: Iterable[str] = (), refresh_ratio: float = 0.05):
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self.sort_columns = [name for name in sort_columns if name in _FIELDS]
+        self.refresh_ratio = refresh_ratio
+        self.version = 0
+        self._changed: set = set()
+        self._full_reload = True
+        self._snapshot: Optional[ColumnSnapshot] = None
+        self.loads = 0
+        self.incremental_refreshes = 0
+        self.last_refresh_seconds = 0.0
+
+    # Compatibility accessors over the current snapshot
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def stale(self) -> bool:
+        return self._snapshot is None or self._snapshot.version != self.version
+
+    @property
+    def size(self) -> int:
+        return self._snapshot.size if self._snapshot is not None else 0
+
+    @property
+    def columns(self) -> Dict[str, Any]:
+        return self._snapshot.columns if self._snapshot is not None else {}
+
+    def column(self, name: str):
+        return self._snapshot.column(name)
+
+    def mark_changed(self, ids: Optional[Iterable[str]] = None) -> None:
+        """Record written song ids (None: everything) and bump the version"""
+        with self._pending_lock:
+            if ids is None:
+                self._full_reload = True
+            else:
+                self._changed.update(ids)
+            self.version += 1
+
+    def mark_stale(self) -> None:
+        self.mark_changed(None)
+
+    def ensure_fresh(self) -> ColumnSnapshot:
+        """
+        Current snapshot, refreshed first if writes happened; must run in an
+        app context. The refresh's statements are declared to the request's
+        statement budget (query_budget.allow_statements).
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == self.version:
+                return snapshot
+
+            with self._pending_lock:
+                version, changed, full = self.version, self._changed, self._full_reload
+                self._changed, self._full_reload = set(), False
+            started = time.perf_counter()
+            try:
+                if full or snapshot is None or len(changed) > self.refresh_ratio * max(snapshot.size, 1):
+                    statements = 1
+                    snapshot = self._load(version)
+                else:
+                    statements = math.ceil(len(changed) / LOOKUP_CHUNK)
+                    refreshed = self._refresh(snapshot, changed, version)
+                    if refreshed is None:
+                        statements += 1
+                        refreshed = self._load(version)
+                    snapshot = refreshed
+            except Exception:
+                with self._pending_lock:
+                    self._full_reload = True
+                raise
+            self.last_refresh_seconds = time.perf_counter() - started
+            self._snapshot = snapshot
+            allow_statements(statements)
+            return snapshot
+
+    def _load(self, version: int, chunk_size: int = 50000) -> ColumnSnapshot:
+        """Read the replicated columns of every song"""
+        parts: List[Dict[str, Any]] = []
+        result = db.session.execute(
+            select(*_load_columns())
+            .order_by(Song.index)
+            .execution_options(yield_per=chunk_size)
+        )
+        for rows in result.partitions():
+            parts.append(_to_arrays(rows))
+
+        if parts:
+            columns = {name: np.concatenate([part[name] for part in parts]) for name in _FIELDS}
+        else:
+            columns = _to_arrays([])
+        snapshot = ColumnSnapshot(columns, version)
+        for name in self.sort_columns:
+            snapshot.order(name)
+
+        self.loads += 1
+        logger.info(f"Column store loaded: {snapshot.size} songs, {len(columns)} columns, "
+                    f"{len(snapshot.orders)} sort orders")
+        return snapshot
+
+    def _refresh(self, snapshot: ColumnSnapshot, changed: set, version: int) -> Optional[ColumnSnapshot]:
+        """
+        Apply re-read rows for the changed ids to a copy of the snapshot.
+
+        Returns:
+            The new snapshot, or None when the change cannot be applied
+            incrementally (a new song below the highest index, or an id
+            that moved to another index)
+        """
+        rows = []
+        ids = list(changed)
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            rows.extend(db.session.execute(
+                select(*_load_columns()).where(Song.id.in_(ids[start:start + LOOKUP_CHUNK]))
+            ).all())
+        rows.sort(key=lambda row: row[0])
+        fresh = _to_arrays(rows)
+
+        old = snapshot.columns
+        indexes = fresh['index']
+        positions = np.searchsorted(old['index'], indexes)
+        if snapshot.size:
+            clipped = np.minimum(positions, snapshot.size - 1)
+            existing = (positions < snapshot.size) & (old['index'][clipped] == indexes)
+        else:
+            existing = np.zeros(len(indexes), dtype=bool)
+        appended = ~existing
+
+        if snapshot.size and appended.any() and indexes[appended].min() <= old['index'][-1]:
+            return None
+        if existing.any() and (old['id'][positions[existing]] != fresh['id'][existing]).any():
+            return None
+
+        updated = positions[existing]
+        columns = {}
+        changed_columns = set()
+        for name in _FIELDS:
+            array = np.concatenate([old[name], fresh[name][appended]])
+            if updated.size:
+                before = old[name][updated]
+                after = fresh[name][existing]
+                if array.dtype.kind == 'f':
+                    same = (before == after) | (np.isnan(before) & np.isnan(after))
+                else:
+                    same = before == after
+                if not np.all(same):
+                    changed_columns.add(name)
+                array[updated] = after
+            columns[name] = array
+
+        size = len(columns['index'])
+        new_positions = np.arange(snapshot.size, size)
+        orders = {}
+        for name, order in snapshot.orders.items():
+            moved = updated if name in changed_columns else updated[:0]
+            orders[name] = _repair_order(order, _sort_keys(columns[name]), moved, new_positions)
+
+        self.incremental_refreshes += 1
+        return ColumnSnapshot(columns, version, orders)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'loaded': snapshot is not None,
+            'songs': snapshot.size if snapshot is not None else 0,
+            'version': self.version,
+            'snapshot_version': snapshot.version if snapshot is not None else None,
+            'full_loads': self.loads,
+            'incremental_refreshes': self.incremental_refreshes,
+            'last_refresh_seconds': round(self.last_refresh_seconds, 6),
+            'memory': snapshot.memory_usage() if snapshot is not None else None
+        }
+
+    def memory_usage(self) -> Dict[str, Any]:
+        return self._snapshot.memory_usage() if self._snapshot is not None else {'total_bytes': 0}
+
+
+def _repair_order(order, keys, moved, added):
+    """
+    Re-place rows in a (key, position) permutation without a full sort.
+
+    moved: existing positions whose key changed; added: new positions.
+    The rest of the permutation is kept and the moved/added positions are
+    inserted where they now belong: O(n) instead of O(n log n).
+    """
+    items = np.concatenate([moved, added]).astype(order.dtype)
+    if not items.size:
+        return order
+    keep = order[~np.isin(order, moved)] if moved.size else order
+    items = np.sort(items)
+    items = items[np.argsort(keys[items], kind='stable')]
+
+    keep_keys = keys[keep]
+    low = np.searchsorted(keep_keys, keys[items], side='left')
+    high = np.searchsorted(keep_keys, keys[items], side='right')
+    # Among equal keys, positions (song index order) break the tie
+    slots = [
+        lo + int(np.searchsorted(keep[lo:hi], item)) if hi > lo else lo
+        for lo, hi, item in zip(low.tolist(), high.tolist(), items.tolist())
+    ]
+    return np.insert(keep, slots, items)
+
+
+def init_column_store(app, sort_columns: Iterable[str] = ()) -> Optional[ColumnStore]:
+    """
+    Create the app's column store and record every song write against it.
+
+    The replica is loaded on first use; sort_columns get their permutations
+    precomputed at each full load.
+    """
+    if np is None:
+        logger.warning("NumPy is not installed; the in-memory column store is disabled")
+        return None
+
+    store = ColumnStore(sort_columns, app.config['COLUMN_STORE_REFRESH_RATIO'])
+    app.extensions['column_store'] = store
+
+    def on_songs_upserted(sender, ids=None, **extra: Any) -> None:
+        store.mark_changed(ids)
+
+    songs_upserted.connect(on_songs_upserted, sender=app, weak=False)
+    return store
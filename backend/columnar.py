@@ -0,0 +1,201 @@
+import logging
+import math
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import Float, Integer
+from models import Song
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _build_schema() -> Dict[str, str]:
+    """Derive {column name: 'int' | 'float' | 'str'} from the Song model"""
+    schema = {}
+    for column in Song.__table__.columns:
+        if isinstance(column.type, Integer):
+            schema[column.name] = 'int'
+        elif isinstance(column.type, Float):
+            schema[column.name] = 'float'
+        else:
+            schema[column.name] = 'str'
+    return schema
+
+
+# Column types resolved once, instead of per cell
+SONG_SCHEMA = _build_schema()
+
+# Elementwise str() that keeps plain Python strings in object arrays
+_to_str = np.frompyfunc(str, 1, 1) if np is not None else None
+
+
+class ColumnBatch:
+    """
+    Typed, column-major block of song records.
+
+    columns holds one array per column (int64 / float64 NumPy arrays, or
+    object arrays for strings) and masks holds a boolean null mask per column.
+    Without NumPy both are plain lists.
+    """
+
+    def __init__(self, columns: Dict[str, Any], masks: Dict[str, Any], num_rows: int,
+                 start_index: int = 0):
+        self.columns = columns
+        self.masks = masks
+        self.num_rows = num_rows
+        self.start_index = start_index
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def column_values(self, name: str) -> List[Any]:
+        """Return one column as Python values with None for nulls"""
+        values = self.columns[name]
+        mask = self.masks[name]
+        if np is not None:
+            values = values.tolist()
+            mask = mask.tolist()
+        return [None if is_null else value for value, is_null in zip(values, mask)]
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Yield records in the same shape as DataProcessor.normalize_json"""
+        names = list(self.columns)
+        columns = [self.column_values(name) for name in names]
+        names.append('index')
+        columns.append(range(self.start_index, self.start_index + self.num_rows))
+
+        for row in zip(*columns):
+            yield dict(zip(names, row))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self.iter_rows())
+
+
+class ColumnarNormalizer:
+    """Convert whole columns of raw JSON values at once"""
+
+    @staticmethod
+    def normalize_json(json_data: Dict[str, Dict[str, Any]]) -> ColumnBatch:
+        """
+        Normalize a {column: {row: value}} document into a ColumnBatch.
+
+        Like DataProcessor.normalize_json, the first column decides the number
+        of records and rows are looked up by their string position.
+        """
+        if not json_data:
+            raise ValueError("JSON data is empty")
+
+        columns = list(json_data.keys())
+
+        if not columns:
+            raise ValueError("No columns found in JSON data")
+
+        num_records = len(json_data[columns[0]])
+        keys = [str(i) for i in range(num_records)]
+
+        block = {}
+        for column in columns:
+            cells = json_data[column]
+            block[column] = [cells.get(key) for key in keys]
+
+        return ColumnarNormalizer.normalize_block(block)
+
+    @staticmethod
+    def normalize_block(block: Dict[str, List[Any]], start_index: int = 0) -> ColumnBatch:
+        """
+        Convert a {column: [raw values]} block into typed columns.
+
+        Args:
+            block: Equal-length lists of raw values per column
+            start_index: Index assigned to the first row
+        """
+        num_rows = len(next(iter(block.values()))) if block else 0
+        columns = {}
+        masks = {}
+
+        for name, raw in block.items():
+            kind = SONG_SCHEMA.get(name, 'str')
+            columns[name], masks[name] = ColumnarNormalizer.convert_column(kind, raw)
+
+        return ColumnBatch(columns, masks, num_rows, start_index)
+
+    @staticmethod
+    def convert_column(kind: str, raw: List[Any]):
+        """
+        Convert one column of raw values.
+
+        None and empty strings become nulls; values that do not parse as the
+        column type, and NaN / infinite floats, are coerced to null.
+
+        Returns:
+            (values, null_mask)
+        """
+        if np is None:
+            return ColumnarNormalizer._convert_column_python(kind, raw)
+
+        values = np.array(raw, dtype=object)
+        mask = (values == None) | (values == '')  # noqa: E711 - elementwise comparison
+
+        if kind == 'str':
+            values[~mask] = _to_str(values[~mask])
+            return values, mask
+
+        dtype = np.int64 if kind == 'int' else np.float64
+        filled = values.copy()
+        filled[mask] = 0
+        try:
+            out = filled.astype(dtype)
+        except (ValueError, TypeError, OverflowError):
+            pass
+        else:
+            if kind == 'float':
+                ColumnarNormalizer._mask_non_finite(out, mask)
+            return out, mask
+
+        # Slow path: at least one invalid cell, convert cell by cell
+        cast = int if kind == 'int' else float
+        out = np.zeros(len(values), dtype=dtype)
+        for i, value in enumerate(filled):
+            if mask[i]:
+                continue
+            try:
+                out[i] = cast(value)
+            except (ValueError, TypeError, OverflowError):
+                mask[i] = True
+        if kind == 'float':
+            ColumnarNormalizer._mask_non_finite(out, mask)
+        return out, mask
+
+    @staticmethod
+    def _mask_non_finite(out, mask) -> None:
+        """Null out NaN / infinite cells of a float column in place (stored as 0 like other nulls)"""
+        non_finite = ~np.isfinite(out)
+        if non_finite.any():
+            mask |= non_finite
+            out[non_finite] = 0
+
+    @staticmethod
+    def _convert_column_python(kind: str, raw: List[Any]):
+        """Pure-Python fallback used when NumPy is not installed"""
+        cast = {'int': int, 'float': float, 'str': str}[kind]
+        values = []
+        mask = []
+        for value in raw:
+            if value is None or value == '':
+                values.append(None)
+                mask.append(True)
+                continue
+            try:
+                value = cast(value)
+            except (ValueError, TypeError, OverflowError):
+                value = None
+            if kind == 'float' and value is not None and not math.isfinite(value):
+                value = None
+            values.append(value)
+            mask.append(value is None)
+        return values, mask
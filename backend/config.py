@@ -12,6 +12,36 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
     
+    # SQLite engine profile (on-disk databases only): WAL journal, per-connection
+    # PRAGMAs, a single-connection writer pool and a read-only engine for GETs
+    SQLITE_ENGINE_PROFILE = os.getenv('SQLITE_ENGINE_PROFILE', 'True').lower() == 'true'
+    SQLITE_WAL_ENABLED = os.getenv('SQLITE_WAL_ENABLED', 'True').lower() == 'true'
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable across app crashes in WAL mode
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64000))  # negative = KiB per connection
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_READ_ENGINE_ENABLED = os.getenv('SQLITE_READ_ENGINE_ENABLED', 'True').lower() == 'true'
+    SQLITE_READ_POOL_SIZE = int(os.getenv('SQLITE_READ_POOL_SIZE', 8))  # match the server's worker threads
+    SQLITE_POOL_TIMEOUT = float(os.getenv('SQLITE_POOL_TIMEOUT', 30))  # seconds to wait for a pooled connection
+    
+    # Instrumentation: /metrics (Prometheus text format) and a warning with
+    # the SQL executed for requests slower than SLOW_REQUEST_MS (0: off)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))
+    SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv('SLOW_REQUEST_MAX_STATEMENTS', 50))
+    
+    # SQL statements per request checked against each route's statement_budget
+    # (query_budget.py): 'off', 'log' (warn) or 'raise' (fail the request)
+    QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'off').lower()
+    
+    # ASGI serving mode (asgi.py): worker threads for GET/HEAD views and for
+    # other views, waiting requests before shedding with 503, and request
+    # bytes held in memory before spooling to disk
+    ASGI_READ_WORKERS = int(os.getenv('ASGI_READ_WORKERS', SQLITE_READ_POOL_SIZE))
+    ASGI_WRITE_WORKERS = int(os.getenv('ASGI_WRITE_WORKERS', 2))
+    ASGI_MAX_PENDING = int(os.getenv('ASGI_MAX_PENDING', 10000))
+    ASGI_BODY_SPOOL_BYTES = int(os.getenv('ASGI_BODY_SPOOL_BYTES', 1024 * 1024))
+    
     # Flask
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
@@ -23,6 +53,79 @@ class Config:
     DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 10))
     MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
     
+    # Export (rows per server-side cursor fetch / streamed chunk)
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+    
+    # Filtered listings (scan the in-memory column store when the best index
+    # would still visit more than this fraction of the table)
+    COLUMN_STORE_ENABLED = os.getenv('COLUMN_STORE_ENABLED', 'True').lower() == 'true'
+    FILTER_SCAN_FRACTION = float(os.getenv('FILTER_SCAN_FRACTION', 0.25))
+    # Serve unfiltered listing pages from the column store's sort permutations
+    COLUMN_STORE_LISTINGS = os.getenv('COLUMN_STORE_LISTINGS', 'True').lower() == 'true'
+    # Writes touching more than this fraction of songs trigger a full reload
+    COLUMN_STORE_REFRESH_RATIO = float(os.getenv('COLUMN_STORE_REFRESH_RATIO', 0.05))
+    
+    # Startup: load raw_songs.json in a background thread (see /readyz)
+    SEED_IN_BACKGROUND = os.getenv('SEED_IN_BACKGROUND', 'True').lower() == 'true'
+    SEED_SNAPSHOT = os.getenv('SEED_SNAPSHOT')  # binary snapshot to seed from instead of raw_songs.json
+    SNAPSHOT_BATCH_SIZE = int(os.getenv('SNAPSHOT_BATCH_SIZE', 50000))  # rows per INSERT executemany
+    
+    # Ratings: bulk request limit and the optional write-behind queue that
+    # merges single updates into group commits. Durability 'group' answers
+    # after the commit, 'async' as soon as the update is queued.
+    MAX_RATING_BATCH = int(os.getenv('MAX_RATING_BATCH', 10000))
+    RATING_WRITE_BEHIND_ENABLED = os.getenv('RATING_WRITE_BEHIND_ENABLED', 'False').lower() == 'true'
+    RATING_FLUSH_INTERVAL = float(os.getenv('RATING_FLUSH_INTERVAL', 0.05))  # seconds between group commits
+    RATING_MAX_PENDING = int(os.getenv('RATING_MAX_PENDING', 1000))  # songs queued before an early flush
+    RATING_DURABILITY = os.getenv('RATING_DURABILITY', 'group')
+    RATING_WAIT_TIMEOUT = float(os.getenv('RATING_WAIT_TIMEOUT', 30))  # seconds a 'group' request waits
+    
+    # Search
+    SEARCH_FTS_ENABLED = os.getenv('SEARCH_FTS_ENABLED', 'True').lower() == 'true'
+    TITLE_INDEX_ENABLED = os.getenv('TITLE_INDEX_ENABLED', 'True').lower() == 'true'  # fuzzy search + autocomplete
+    TITLE_INDEX_COMPACT_RATIO = float(os.getenv('TITLE_INDEX_COMPACT_RATIO', 0.5))  # stale share before a rebuild
+    
+    # Similar songs (kNN over audio features)
+    SIMILAR_SONGS_ENABLED = os.getenv('SIMILAR_SONGS_ENABLED', 'True').lower() == 'true'
+    SIMILAR_PARTITION_THRESHOLD = int(os.getenv('SIMILAR_PARTITION_THRESHOLD', 50000))  # songs before partitioning
+    SIMILAR_NPROBE = int(os.getenv('SIMILAR_NPROBE', 8))  # partitions scanned per query
+    SIMILAR_REBUILD_RATIO = float(os.getenv('SIMILAR_REBUILD_RATIO', 0.2))  # changed fraction before a rebuild
+    
+    # Statistics (materialized summary + periodic reconciliation)
+    STATS_SUMMARY_ENABLED = os.getenv('STATS_SUMMARY_ENABLED', 'True').lower() == 'true'
+    STATS_RECONCILE_INTERVAL = float(os.getenv('STATS_RECONCILE_INTERVAL', 3600))  # seconds, 0 disables
+    
+    # Response cache (GET bodies keyed on the dataset version, ETag/304)
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))  # entries
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # Shared data version (other processes' song writes, checked per request)
+    DATA_VERSION_ENABLED = os.getenv('DATA_VERSION_ENABLED', 'True').lower() == 'true'
+    DATA_VERSION_MAX_IDS = int(os.getenv('DATA_VERSION_MAX_IDS', 10000))  # more changes: rebuild everything
+    
+    # Response compression (br preferred, then gzip, per Accept-Encoding)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))  # smaller bodies are sent as is
+    GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+    BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))  # 0-11; above ~5 costs more CPU than it saves
+    
+    # Ingestion (bulk upsert)
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 1000))
+    INGEST_COMMIT_EVERY = int(os.getenv('INGEST_COMMIT_EVERY', 1))  # batches per commit
+    # Batches this large skip the per-row search index triggers and update the index per batch
+    INGEST_DEFER_TRIGGERS_ROWS = int(os.getenv('INGEST_DEFER_TRIGGERS_ROWS', 500))
+    INGEST_STREAM_THRESHOLD_BYTES = int(os.getenv('INGEST_STREAM_THRESHOLD_BYTES', 64 * 1024 * 1024))
+    INGEST_SPILL_DIR = os.getenv('INGEST_SPILL_DIR')  # None -> system temp directory
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 1))  # >1 enables the process pool, 0 = all cores
+    INGEST_QUEUE_DEPTH = int(os.getenv('INGEST_QUEUE_DEPTH', 0)) or None  # default 2 x workers
+    
+    # Upload jobs (chunked uploads spooled to disk, ingested in the background)
+    UPLOAD_JOBS_ENABLED = os.getenv('UPLOAD_JOBS_ENABLED', 'True').lower() == 'true'
+    UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR')  # None -> uploads/ in the instance folder
+    UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+    UPLOAD_JOB_MAX_ATTEMPTS = int(os.getenv('UPLOAD_JOB_MAX_ATTEMPTS', 3))  # retries of database errors
+    
     # JSON formatting
     JSON_SORT_KEYS = False
     JSONIFY_PRETTYPRINT_REGULAR = True
@@ -44,7 +147,10 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    STATS_RECONCILE_INTERVAL = 0
+    SEED_IN_BACKGROUND = False
     WTF_CSRF_ENABLED = False
+    QUERY_BUDGET_MODE = 'raise'
 
 
 # Configuration dictionary
@@ -1,11 +1,64 @@
 import json
 import logging
-from typing import Dict, List, Any
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+from typing import Callable, Dict, List, Any, Iterable, Iterator, Optional, Tuple
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from models import db, Song
+from signals import songs_ingested, songs_upserted
+from json_stream import spill_json_file
+from columnar import ColumnarNormalizer
+from ingest_pipeline import IngestPipeline
+from snapshot import SnapshotWriter, load_snapshot
+from search_index import FTS_TABLE, TitleSearch
+from stats_summary import StatsSummary
+from data_version import DataVersion
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Record field name -> songs table column key (accepts both 'class' and 'class_field')
+SONG_COLUMN_KEYS = {column.name: column.key for column in Song.__table__.columns}
+SONG_COLUMN_KEYS['class_field'] = Song.__table__.c['class'].key
+
+# NOT NULL columns every INSERT must supply; rows without them can only
+# update existing songs
+REQUIRED_INSERT_KEYS = frozenset(
+    column.key for column in Song.__table__.columns
+    if not column.nullable and not column.primary_key
+)
+
+# Dialect name -> songs column key -> bind processor (None: passed through as is)
+_BIND_PROCESSORS: Dict[str, Dict[str, Optional[Callable[[Any], Any]]]] = {}
+
+# Stay well below SQLite's host parameter limit for IN (...) lookups
+SQL_VARIABLE_CHUNK = 900
+
+# Name prefixes of the per-row songs triggers that large bulk upsert batches
+# run without; what they maintain (the full-text index, the stats summary)
+# is updated once per batch instead
+BULK_DEFERRED_TRIGGERS = (FTS_TABLE, 'song_stats')
+
+# Statements a batch spends on the deferral: once per transaction the trigger
+# lookup plus a DROP and a CREATE per trigger (insert, update and delete per
+# prefix); per SQL_VARIABLE_CHUNK ids the search index removal and insert and
+# the stats totals before and after; per batch the summary UPDATE and the
+# rating counts
+DEFERRED_TRIGGER_STATEMENTS = 1 + 2 * 3 * len(BULK_DEFERRED_TRIGGERS)
+DEFERRED_STATEMENTS_PER_CHUNK = 4
+DEFERRED_STATEMENTS_PER_BATCH = 2
+
+
+def _chunked(ids: List[str]) -> Iterator[List[str]]:
+    """Split ids into SQL_VARIABLE_CHUNK-sized lists for IN (...) lookups"""
+    for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+        yield ids[i:i + SQL_VARIABLE_CHUNK]
+
 
 class DataProcessor:
     """Process and normalize JSON song data"""
@@ -42,120 +95,498 @@ class DataProcessor:
         
         logger.info(f"Processing {num_records} records with {len(columns)} columns")
         
-        # Normalize data
-        normalized_data = []
-        
-        for i in range(num_records):
-            record = {}
-            key = str(i)
-            
-            for column in columns:
-                if key in json_data[column]:
-                    value = json_data[column][key]
-                    
-                    # Convert data types appropriately
-                    record[column] = DataProcessor._convert_value(column, value)
-                else:
-                    record[column] = None
-            
-            # Add index
-            record['index'] = i
-            normalized_data.append(record)
+        # Convert column by column, then pivot to records
+        normalized_data = ColumnarNormalizer.normalize_json(json_data).to_records()
         
         logger.info(f"Successfully normalized {len(normalized_data)} records")
         return normalized_data
     
     @staticmethod
-    def _convert_value(column: str, value: str) -> Any:
-        """Convert string values to appropriate data types"""
-        if value == '' or value is None:
-            return None
-        
-        # Integer columns
-        if column in ['index', 'key', 'mode', 'time_signature', 'duration_ms', 
-                      'num_bars', 'num_sections', 'num_segments', 'class', 'star_rating']:
-            try:
-                return int(value)
-            except (ValueError, TypeError):
-                return None
-        
-        # Float columns
-        if column in ['danceability', 'energy', 'loudness', 'acousticness', 
-                      'instrumentalness', 'liveness', 'valence', 'tempo']:
-            try:
-                return float(value)
-            except (ValueError, TypeError):
-                return None
+    def load_data_to_db(normalized_data: Iterable[Dict[str, Any]], batch_size: Optional[int] = None,
+                        commit_every: Optional[int] = None) -> int:
+        """
+        Load normalized data into the database.
         
-        # String columns (id, title)
-        return str(value)
+        Args:
+            normalized_data: Iterable of normalized song records
+            batch_size: Number of records to upsert per statement
+            commit_every: Number of batches per commit
+            
+        Returns:
+            Number of records inserted
+        """
+        result = DataProcessor.bulk_upsert(normalized_data, batch_size=batch_size,
+                                           commit_every=commit_every)
+        return result['inserted']
     
     @staticmethod
-    def load_data_to_db(normalized_data: List[Dict[str, Any]], batch_size: int = 100) -> int:
+    def bulk_upsert(records: Iterable[Dict[str, Any]], batch_size: Optional[int] = None,
+                    commit_every: Optional[int] = None,
+                    before_commit: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, Any]:
         """
-        Load normalized data into the database.
+        Upsert song records in set-based batches.
+        
+        Each batch costs one SELECT (to tell inserts from updates) and one
+        executemany INSERT ... ON CONFLICT(id) DO UPDATE, instead of one
+        SELECT plus ORM flush per record, and logs the batch's ids in the
+        shared data version with one bump. Batches of at least
+        INGEST_DEFER_TRIGGERS_ROWS rows run without the per-row
+        BULK_DEFERRED_TRIGGERS (dropped and recreated within each
+        transaction) and update the search index and stats summary
+        set-based, per batch.
         
         Args:
-            normalized_data: List of normalized song records
-            batch_size: Number of records to insert at once
+            records: Iterable of normalized song records
+            batch_size: Records per batch (default: INGEST_BATCH_SIZE)
+            commit_every: Batches per commit (default: INGEST_COMMIT_EVERY)
+            before_commit: Called with (rows, inserted, updated) so far right
+                before each commit; changes it makes to the session commit
+                atomically with the batches (e.g. a resume checkpoint)
             
         Returns:
-            Number of records inserted
+            Dictionary with inserted, updated, batches and rows_per_second
         """
+        batch_size = batch_size or DataProcessor._config('INGEST_BATCH_SIZE', 1000)
+        commit_every = commit_every or DataProcessor._config('INGEST_COMMIT_EVERY', 1)
+        defer_rows = DataProcessor._config('INGEST_DEFER_TRIGGERS_ROWS', 500)
+        
+        if batch_size < 1 or commit_every < 1:
+            raise ValueError("batch_size and commit_every must be >= 1")
+        
+        inserted_count = 0
+        updated_count = 0
+        batch_count = 0
+        row_count = 0
+        pending_ids = []
+        deferred = None  # triggers dropped in the open transaction (None: not checked yet)
+        started = time.perf_counter()
+        
         try:
-            inserted_count = 0
-            
-
+            iterator = iter(records)
             
-            # Insert in batches
-            for i in range(0, len(normalized_data), batch_size):
-                batch = normalized_data[i:i + batch_size]
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
                 
-                for record in batch:
-                    # Check if song already exists
-                    existing_song = Song.query.filter_by(id=record.get('id')).first()
-                    
-                    if existing_song:
-                        # Update existing song
-                        for key, value in record.items():
-                            if key == 'class':
-                                setattr(existing_song, 'class_field', value)
-                            elif hasattr(existing_song, key):
-                                setattr(existing_song, key, value)
-                    else:
-                        # Create new song
-                        song_data = record.copy()
-                        if 'class' in song_data:
-                            song_data['class_field'] = song_data.pop('class')
-                        
-                        song = Song(**song_data)
-                        db.session.add(song)
-                        inserted_count += 1
+                if deferred is None and len(batch) >= defer_rows:
+                    deferred = DataProcessor._drop_triggers()
+                inserted, updated = DataProcessor._upsert_batch(batch, deferred or [])
+                inserted_count += inserted
+                updated_count += updated
+                batch_count += 1
+                row_count += len(batch)
+                pending_ids.extend(record.get('id') for record in batch)
                 
-                # Commit batch
-                db.session.commit()
-                logger.info(f"Inserted batch {i // batch_size + 1}: {len(batch)} records")
+                # Commit every N batches
+                if batch_count % commit_every == 0:
+                    DataProcessor._restore_triggers(deferred)
+                    deferred = None
+                    if before_commit is not None:
+                        before_commit(row_count, inserted_count, updated_count)
+                    db.session.commit()
+                    DataProcessor._notify_upserted(pending_ids)
+                    pending_ids = []
+                logger.info(f"Upserted batch {batch_count}: {inserted} inserted, {updated} updated")
             
-            logger.info(f"Successfully loaded {inserted_count} new records to database")
-            return inserted_count
+            DataProcessor._restore_triggers(deferred)
+            if before_commit is not None and pending_ids:
+                before_commit(row_count, inserted_count, updated_count)
+            db.session.commit()
+            DataProcessor._notify_upserted(pending_ids)
             
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error loading data to database: {str(e)}")
             raise
+        
+        elapsed = time.perf_counter() - started
+        total = inserted_count + updated_count
+        rows_per_second = total / elapsed if elapsed > 0 else 0.0
+        
+        logger.info(f"Successfully loaded {inserted_count} new and {updated_count} updated records "
+                    f"to database ({rows_per_second:.0f} rows/s)")
+        if has_app_context():
+            songs_ingested.send(current_app._get_current_object(), inserted=inserted_count,
+                                updated=updated_count, elapsed_seconds=elapsed)
+        return {
+            'inserted': inserted_count,
+            'updated': updated_count,
+            'batches': batch_count,
+            'elapsed_seconds': elapsed,
+            'rows_per_second': rows_per_second
+        }
+    
+    @staticmethod
+    def _upsert_batch(batch: List[Dict[str, Any]],
+                      deferred: List[Tuple[str, str]]) -> Tuple[int, int]:
+        """
+        Upsert one batch of records, returning (inserted, updated) counts.
+        
+        deferred lists the (name, sql) of the triggers dropped for the
+        transaction; their work is done here, for the batch as a whole.
+        """
+        rows = [DataProcessor._to_row(record) for record in batch]
+        if any('id' not in row for row in rows):
+            raise ValueError("Records must contain an 'id' column")
+        
+        # Existing ids tell inserts apart from updates (one query per batch)
+        batch_ids = {row['id'] for row in rows}
+        existing_titles = {}
+        id_list = list(batch_ids)
+        for chunk in _chunked(id_list):
+            existing_titles.update(
+                db.session.execute(select(Song.id, Song.title).where(Song.id.in_(chunk))).all()
+            )
+        existing_ids = set(existing_titles)
+        new_ids = batch_ids - existing_ids
+        inserted = len(new_ids)
+        updated = len(rows) - inserted
+        
+        connection = db.session.connection()
+        sync_titles = any(name.startswith(FTS_TABLE) for name, _ in deferred)
+        sync_stats = any(name.startswith('song_stats') for name, _ in deferred)
+        
+        # Only new songs and changed titles touch the search index
+        retitled = []
+        if sync_titles:
+            titles = {row['id']: row['title'] for row in rows if 'title' in row}
+            retitled = [song_id for song_id, title in titles.items()
+                        if song_id in existing_titles and existing_titles[song_id] != title]
+            for chunk in _chunked(retitled):
+                TitleSearch.unindex_titles(connection, chunk)
+        stats_before = []
+        if sync_stats:
+            for chunk in _chunked(list(existing_ids)):
+                stats_before.extend(StatsSummary.batch_totals(connection, chunk))
+        
+        # Every row in an executemany must carry the same keys, and padding a
+        # missing column with NULL would overwrite it, so write each run of
+        # rows sharing a key set separately (normally the whole batch)
+        seen_ids = set(existing_ids)
+        run_keys = None
+        run = []
+        for row in rows:
+            keys = frozenset(row)
+            if keys != run_keys and run:
+                DataProcessor._write_rows(run, run_keys, seen_ids)
+                run = []
+            run_keys = keys
+            run.append(row)
+        if run:
+            DataProcessor._write_rows(run, run_keys, seen_ids)
+        
+        if sync_titles:
+            for chunk in _chunked(retitled + list(new_ids)):
+                TitleSearch.index_titles(connection, chunk)
+        if sync_stats:
+            stats_after = []
+            for chunk in _chunked(id_list):
+                stats_after.extend(StatsSummary.batch_totals(connection, chunk))
+            StatsSummary.apply_batch(connection, stats_before, stats_after)
+        DataVersion.log_writes(connection, id_list)
+        
+        return inserted, updated
+    
+    @staticmethod
+    def _drop_triggers() -> List[Tuple[str, str]]:
+        """
+        Drop the BULK_DEFERRED_TRIGGERS on songs for the open transaction.
+        
+        Returns:
+            (name, sql) of each dropped trigger, for _restore_triggers
+        """
+        connection = db.session.connection()
+        if connection.dialect.name != 'sqlite':
+            return []
+        triggers = [
+            (name, sql) for name, sql in connection.exec_driver_sql(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                (Song.__tablename__,)
+            )
+            if name.startswith(BULK_DEFERRED_TRIGGERS)
+        ]
+        for name, _ in triggers:
+            connection.exec_driver_sql(f'DROP TRIGGER "{name}"')
+        return triggers
+    
+    @staticmethod
+    def _restore_triggers(triggers: Optional[List[Tuple[str, str]]]) -> None:
+        """Recreate dropped triggers before the transaction commits"""
+        if triggers:
+            connection = db.session.connection()
+            for _, sql in triggers:
+                connection.exec_driver_sql(sql)
+    
+    @staticmethod
+    def _write_rows(rows: List[Dict[str, Any]], keys: frozenset, seen_ids: set) -> None:
+        """Upsert rows that all carry the same keys"""
+        table = Song.__table__
+        dialect = db.session.get_bind().dialect.name
+        # NOT NULL checks run before ON CONFLICT, so partial rows are plain updates
+        if not REQUIRED_INSERT_KEYS <= keys:
+            dialect = None
+        
+        if dialect == 'sqlite':
+            DataProcessor._sqlite_upsert(rows, keys)
+        elif dialect == 'postgresql':
+            stmt = postgresql_insert(table)
+            # The primary key is never rewritten on conflict; only payload columns are
+            update_columns = {
+                key: stmt.excluded[key]
+                for key in keys if key not in ('index', 'id', 'created_at')
+            }
+            update_columns['updated_at'] = datetime.utcnow()
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.id], set_=update_columns)
+            db.session.execute(stmt, rows)
+        else:
+            # Portable fallback: split the rows into an INSERT and an UPDATE executemany
+            new_rows = []
+            update_rows = []
+            for row in rows:
+                if row['id'] in seen_ids:
+                    update_rows.append(row)
+                else:
+                    seen_ids.add(row['id'])
+                    new_rows.append(row)
+            if new_rows:
+                db.session.execute(table.insert(), new_rows)
+            if update_rows:
+                update_keys = [key for key in keys if key not in ('index', 'id', 'created_at')]
+                stmt = (
+                    table.update()
+                    .where(table.c.id == bindparam('_match_id'))
+                    .values(dict({key: bindparam(key) for key in update_keys}, updated_at=datetime.utcnow()))
+                )
+                db.session.execute(
+                    stmt,
+                    [dict({key: row[key] for key in update_keys}, _match_id=row['id']) for row in update_rows]
+                )
     
     @staticmethod
-    def process_json_file(file_path: str) -> int:
+    def _sqlite_upsert(rows: List[Dict[str, Any]], keys: frozenset) -> None:
+        """
+        Upsert rows with a single DBAPI executemany.
+        
+        Bypasses per-row SQLAlchemy parameter processing, which otherwise
+        dominates the cost of a batch; column defaults are applied here.
+        """
+        table = Song.__table__
+        connection = db.session.connection()
+        dialect = connection.dialect
+        quote = dialect.identifier_preparer.quote
+        
+        # Insert-only defaults, converted once per batch
+        now = datetime.utcnow()
+        defaults = {'created_at': now, 'updated_at': now}
+        if 'star_rating' not in keys:
+            defaults['star_rating'] = 0
+        
+        # Caller-supplied columns first, then the defaults appended to each row
+        supplied = [column for column in table.columns if column.key in keys]
+        filled = [column for column in table.columns if column.key not in keys and column.key in defaults]
+        columns = supplied + filled
+        processors = DataProcessor._bind_processors(dialect)
+        for key, value in defaults.items():
+            if key not in keys and processors[key] is not None:
+                defaults[key] = processors[key](value)
+        
+        names = [quote(column.name) for column in columns]
+        assignments = [
+            f'{name} = excluded.{name}'
+            for column, name in zip(columns, names)
+            if column.key in keys and column.key not in ('index', 'id', 'created_at', 'updated_at')
+        ]
+        assignments.append(f'{quote("updated_at")} = excluded.{quote("updated_at")}')
+        sql = (
+            f'INSERT INTO {quote(table.name)} ({", ".join(names)}) '
+            f'VALUES ({", ".join("?" * len(names))}) '
+            f'ON CONFLICT ({quote("id")}) DO UPDATE SET {", ".join(assignments)}'
+        )
+        
+        # Only caller-supplied values that need conversion (e.g. datetimes) go through a processor
+        supplied_keys = [column.key for column in supplied]
+        fill = tuple(defaults[column.key] for column in filled)
+        get = itemgetter(*supplied_keys) if len(supplied_keys) > 1 else lambda row: (row[supplied_keys[0]],)
+        converters = [
+            (position, processors[key])
+            for position, key in enumerate(supplied_keys) if processors[key] is not None
+        ]
+        
+        params = []
+        for row in rows:
+            values = list(get(row))
+            for position, process in converters:
+                if values[position] is not None:
+                    values[position] = process(values[position])
+            params.append(tuple(values) + fill)
+        connection.exec_driver_sql(sql, params)
+    
+    @staticmethod
+    def _bind_processors(dialect) -> Dict[str, Optional[Callable[[Any], Any]]]:
+        """
+        Bind processor of every songs column for a dialect, looked up once.
+        
+        Goes through the dialect's implementation type, so e.g. SQLite's
+        DateTime keeps its processor that renders datetimes as strings.
+        """
+        processors = _BIND_PROCESSORS.get(dialect.name)
+        if processors is None:
+            processors = {
+                column.key: column.type.dialect_impl(dialect).bind_processor(dialect)
+                for column in Song.__table__.columns
+            }
+            _BIND_PROCESSORS[dialect.name] = processors
+        return processors
+    
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a normalized record onto songs table column keys, dropping unknown fields"""
+        return {SONG_COLUMN_KEYS[name]: value for name, value in record.items() if name in SONG_COLUMN_KEYS}
+    
+    @staticmethod
+    def _notify_upserted(ids: List[str]) -> None:
+        """Tell in-process indexes which songs were just committed"""
+        if ids and has_app_context():
+            songs_upserted.send(current_app._get_current_object(), ids=ids)
+    
+    @staticmethod
+    def _config(name: str, default: Any) -> Any:
+        """Read an ingestion setting from the active app config, if any"""
+        if has_app_context():
+            return current_app.config.get(name, default)
+        return default
+    
+    @staticmethod
+    def iter_json_file_records(file_path: str, batch_size: Optional[int] = None,
+                               spill_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream normalized records out of a column-oriented JSON file.
+        
+        The file is parsed incrementally and every column is spilled to
+        temporary on-disk arrays, then the columns are zipped back together
+        one batch at a time. Peak memory is bounded by
+        
+            parser buffer (64 KiB) + batch_size x num_columns x cell size
+        
+        and does not depend on the file size. Disk usage is roughly the size
+        of the file plus 8 bytes per cell for the offset arrays.
+        
+        Args:
+            file_path: Path to the JSON file
+            batch_size: Rows zipped per block (default: INGEST_BATCH_SIZE)
+            spill_dir: Directory for spill files (default: INGEST_SPILL_DIR or system temp)
+            
+        Yields:
+            Normalized song records, in row order
+        """
+        batch_size = batch_size or DataProcessor._config('INGEST_BATCH_SIZE', 1000)
+        spill_dir = spill_dir or DataProcessor._config('INGEST_SPILL_DIR', None)
+        
+        with spill_json_file(file_path, spill_dir) as spill:
+            if not spill.columns:
+                raise ValueError("No columns found in JSON data")
+            
+            # Like normalize_json, the first column decides the record count
+            num_records = spill.row_counts[spill.columns[0]]
+            logger.info(f"Streaming {num_records} records with {len(spill.columns)} columns")
+            
+            for block_number, block in enumerate(spill.iter_batches(num_records, batch_size)):
+                batch = ColumnarNormalizer.normalize_block(block, start_index=block_number * batch_size)
+                yield from batch.iter_rows()
+    
+    @staticmethod
+    def run_pipeline(file_path: str, workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ingest a JSON file with the multi-process pipeline.
+        
+        Parsing spills the file once, normalization of row ranges runs in a
+        process pool, and a single ordered writer upserts the batches.
+        
+        Args:
+            file_path: Path to the JSON file
+            workers: Worker processes (default: INGEST_WORKERS, 0 = all cores)
+            
+        Returns:
+            Dictionary with inserted/updated counts and per-stage throughput
+        """
+        if workers is None:
+            workers = DataProcessor._config('INGEST_WORKERS', 1)
+        
+        pipeline = IngestPipeline(
+            workers=workers or None,
+            batch_size=DataProcessor._config('INGEST_BATCH_SIZE', 1000),
+            queue_depth=DataProcessor._config('INGEST_QUEUE_DEPTH', None),
+            commit_every=DataProcessor._config('INGEST_COMMIT_EVERY', 1),
+            spill_dir=DataProcessor._config('INGEST_SPILL_DIR', None)
+        )
+        return pipeline.run(file_path)
+    
+    @staticmethod
+    def export_snapshot(file_path: str) -> Dict[str, Any]:
+        """
+        Write the songs table to a binary columnar snapshot.
+        
+        Numeric and datetime columns are stored as fixed-width arrays, ids and
+        titles as offsets into a UTF-8 blob, so the file can be memory-mapped
+        (see snapshot.SongSnapshot).
+        
+        Args:
+            file_path: Destination path (written atomically)
+            
+        Returns:
+            Dictionary with rows, bytes and elapsed_seconds
+        """
+        return SnapshotWriter.write(file_path)
+    
+    @staticmethod
+    def import_snapshot(file_path: str) -> Dict[str, Any]:
+        """
+        Load a snapshot written by export_snapshot into the database.
+        
+        An empty songs table is bulk-inserted straight from the mapped arrays;
+        a populated one is upserted by id.
+        
+        Args:
+            file_path: Path to the snapshot file
+            
+        Returns:
+            Dictionary with inserted/updated counts and timings
+        """
+        return load_snapshot(file_path, DataProcessor._config('SNAPSHOT_BATCH_SIZE', 50000))
+    
+    @staticmethod
+    def process_json_file(file_path: str, streaming: Optional[bool] = None,
+                          workers: Optional[int] = None) -> int:
         """
         Process a JSON file and load it into the database.
         
         Args:
             file_path: Path to the JSON file
+            streaming: Use bounded-memory streaming ingestion. By default files
+                larger than INGEST_STREAM_THRESHOLD_BYTES are streamed.
+            workers: Worker processes for streamed files (default: INGEST_WORKERS);
+                more than one runs the parallel pipeline
             
         Returns:
             Number of records inserted
         """
         try:
+            if streaming is None:
+                threshold = DataProcessor._config('INGEST_STREAM_THRESHOLD_BYTES', 64 * 1024 * 1024)
+                streaming = os.path.getsize(file_path) > threshold
+            
+            if workers is None:
+                workers = DataProcessor._config('INGEST_WORKERS', 1)
+            
+            if streaming and workers != 1:
+                logger.info(f"Ingesting JSON file with pipeline: {file_path}")
+                return DataProcessor.run_pipeline(file_path, workers)['inserted']
+            
+            if streaming:
+                logger.info(f"Streaming JSON file: {file_path}")
+                return DataProcessor.load_data_to_db(DataProcessor.iter_json_file_records(file_path))
+            
             # Read JSON file
             with open(file_path, 'r', encoding='utf-8') as f:
                 json_data = json.load(f)
@@ -0,0 +1,217 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from models import db
+from signals import songs_upserted
+from query_budget import exempt_statements
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Dataset version shared by every process and connection using the database.
+# The song write paths (DataProcessor.bulk_upsert per batch,
+# RatingUpdates.apply, snapshot loads) bump it once per write and record the
+# ids they wrote at the new version (DataVersion.log_writes), so a process
+# can tell which songs changed since the version its in-memory state was
+# built at. Writes that bypass them (e.g. a sqlite3 shell) go unseen.
+VERSION_DDL = [
+    """CREATE TABLE IF NOT EXISTS song_data_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    )""",
+    "INSERT INTO song_data_version (id) SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM song_data_version)",
+    """CREATE TABLE IF NOT EXISTS song_changes (
+        id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_song_changes_version ON song_changes (version)",
+    # Per-row triggers of earlier releases
+    "DROP TRIGGER IF EXISTS song_version_ai",
+    "DROP TRIGGER IF EXISTS song_version_au",
+    "DROP TRIGGER IF EXISTS song_version_ad",
+]
+
+# Statements DataVersion.log_writes adds to a write: the bump and the change log executemany
+LOG_WRITES_STATEMENTS = 2
+
+
+class DataVersion:
+    """
+    Picks up song writes made by other processes (other server workers, CLI
+    commands, scripts) so this process's caches and in-memory indexes do not
+    serve stale data.
+
+    Every request reads the shared version (one single-row SELECT). The
+    version bumps this process's own writes account for are counted as its
+    connections commit them, so the difference is the other processes'
+    writes. Their song ids are read from the change log and sent as
+    songs_upserted, which the response cache, the trigram, feature and
+    column-store indexes already apply; more than max_ids changed songs are
+    sent as ids=None (rebuild everything).
+    """
+
+    def __init__(self, app, max_ids: int = 10000):
+        self.app = app
+        self.max_ids = max_ids
+        self._lock = threading.Lock()
+        self.version = 0
+        self.own_writes = 0
+        self._own_base = 0
+        self.checks = 0
+        self.foreign_writes = 0
+        self.catch_ups = 0
+
+    @staticmethod
+    def install() -> bool:
+        """
+        Create the version table, change log and triggers if missing.
+
+        Returns:
+            True if the shared version is available
+        """
+        if db.engine.dialect.name != 'sqlite':
+            logger.warning("The shared data version requires SQLite; other processes' writes go unseen")
+            return False
+
+        try:
+            with db.engine.begin() as connection:
+                for statement in VERSION_DDL:
+                    connection.execute(text(statement))
+        except OperationalError as e:
+            logger.warning(f"Could not install data version triggers ({str(e)}); other processes' writes go unseen")
+            return False
+        return True
+
+    @staticmethod
+    def read() -> int:
+        return db.session.scalar(text("SELECT version FROM song_data_version WHERE id = 1")) or 0
+
+    @staticmethod
+    def changed_since(version: int, limit: Optional[int] = None) -> List[str]:
+        """Ids of the songs written after a version (at most limit of them)"""
+        statement = "SELECT id FROM song_changes WHERE version > :version"
+        if limit is not None:
+            statement += f" LIMIT {int(limit)}"
+        return db.session.scalars(text(statement), {'version': version}).all()
+
+    @staticmethod
+    def log_writes(connection, ids: Optional[List[str]] = None) -> None:
+        """
+        Record a write to songs at a new version, in the writing transaction.
+
+        One UPDATE bumps the version and one executemany logs the ids at it
+        (ids=None logs every song, after a bulk load). Does nothing unless
+        the current app installed the data version.
+        """
+        if not (has_app_context() and 'data_version' in current_app.extensions):
+            return
+        connection.exec_driver_sql("UPDATE song_data_version SET version = version + 1 WHERE id = 1")
+        # (A WHERE clause keeps ON CONFLICT from parsing as a join constraint)
+        upsert = " ON CONFLICT (id) DO UPDATE SET version = excluded.version"
+        if ids is None:
+            connection.exec_driver_sql(
+                "INSERT INTO song_changes (id, version) "
+                "SELECT songs.id, v.version FROM songs, song_data_version AS v WHERE v.id = 1" + upsert
+            )
+        elif ids:
+            connection.exec_driver_sql(
+                "INSERT INTO song_changes (id, version) "
+                "SELECT ?, version FROM song_data_version WHERE id = 1" + upsert,
+                [(song_id,) for song_id in ids]
+            )
+        connection.info['version_bumps'] = connection.info.get('version_bumps', 0) + 1
+
+    def track_own_writes(self, engine) -> None:
+        """Count the version bumps committed through an engine's connections (the writer)"""
+
+        @event.listens_for(engine, 'commit')
+        def count_own_writes(connection) -> None:
+            # Counted just before the commit; a rollback that follows without
+            # a new transaction in between means the commit failed
+            bumps = connection.info.pop('version_bumps', 0)
+            if bumps:
+                connection.info['version_committing'] = bumps
+                with self._lock:
+                    self.own_writes += bumps
+
+        @event.listens_for(engine, 'begin')
+        def commit_succeeded(connection) -> None:
+            connection.info.pop('version_committing', None)
+
+        @event.listens_for(engine, 'rollback')
+        def discard_own_writes(connection) -> None:
+            connection.info.pop('version_bumps', None)
+            failed = connection.info.pop('version_committing', 0)
+            if failed:
+                with self._lock:
+                    self.own_writes -= failed
+
+    def check(self) -> None:
+        """Apply other processes' song writes since the last check; run per request"""
+        with exempt_statements():
+            try:
+                self._catch_up()
+            finally:
+                # Hand the connection back: on the single writer connection a
+                # request that then waits on another writer (the rating
+                # write-behind) would otherwise block it
+                db.session.commit()
+
+    def _catch_up(self) -> None:
+        version = DataVersion.read()
+        with self._lock:
+            self.checks += 1
+            own = self.own_writes
+            foreign = (version - self.version) - (own - self._own_base)
+            if foreign < 0 or version < self.version:
+                # An own commit counted but not visible yet, or an older read
+                return
+            since = self.version
+            self.version, self._own_base = version, own
+            if not foreign:
+                return
+            self.foreign_writes += foreign
+            self.catch_ups += 1
+
+        ids: Optional[List[str]] = DataVersion.changed_since(since, self.max_ids + 1)
+        if len(ids) > self.max_ids:
+            ids = None
+        logger.info(f"Songs written by another process (version {since} -> {version}); "
+                    f"refreshing {'everything' if ids is None else f'{len(ids)} songs'}")
+        songs_upserted.send(self.app, ids=ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'version': self.version,
+                'own_writes': self.own_writes,
+                'foreign_writes': self.foreign_writes,
+                'checks': self.checks,
+                'catch_ups': self.catch_ups
+            }
+
+
+def init_data_version(app) -> Optional[DataVersion]:
+    """
+    Install the shared data version and check it before every request.
+
+    Must be called inside an application context.
+    """
+    if not DataVersion.install():
+        return None
+
+    watcher = DataVersion(app, app.config['DATA_VERSION_MAX_IDS'])
+    watcher.track_own_writes(db.engine)
+    watcher.version = DataVersion.read()
+    app.extensions['data_version'] = watcher
+
+    @app.before_request
+    def check_data_version() -> None:
+        watcher.check()
+
+    return watcher
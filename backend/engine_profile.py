@@ -0,0 +1,123 @@
+import logging
+from typing import Any, Dict, Optional
+
+from flask import current_app, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Requests whose database reads go to the read-only engine
+READ_METHODS = ('GET', 'HEAD')
+
+
+def is_file_sqlite(uri: str) -> bool:
+    """Whether a database URI points at an on-disk SQLite file"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def sqlite_pragmas(config) -> Dict[str, Any]:
+    """Per-connection PRAGMA settings from the app config"""
+    return {
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+        'cache_size': config['SQLITE_CACHE_SIZE'],
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT_MS'],
+    }
+
+
+def _apply_pragmas(engine, pragmas: Dict[str, Any], query_only: bool = False) -> None:
+    """Run the PRAGMAs on every new DBAPI connection of an engine"""
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if query_only:
+            cursor.execute('PRAGMA query_only = ON')
+        cursor.close()
+
+
+def configure_engine_options(app) -> bool:
+    """
+    Set SQLALCHEMY_ENGINE_OPTIONS for the writer engine; call before db.init_app.
+
+    SQLite allows one writer at a time, so the writer engine gets a single
+    pooled connection: uploads, rating writes and background jobs queue for
+    it in the pool instead of spinning on SQLITE_BUSY.
+
+    Returns:
+        Whether the profile applies (enabled and an on-disk SQLite database)
+    """
+    if not app.config['SQLITE_ENGINE_PROFILE'] or not is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return False
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('pool_size', 1)
+    options.setdefault('max_overflow', 0)
+    options.setdefault('pool_timeout', app.config['SQLITE_POOL_TIMEOUT'])
+    options['connect_args'] = dict(options.get('connect_args') or {}, check_same_thread=False)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    return True
+
+
+def init_engine_profile(app, db) -> Optional[Any]:
+    """
+    Apply the SQLite profile to the app's engine and create the read engine.
+
+    Switches the database to WAL (readers no longer block behind the writer
+    and vice versa), sets the per-connection PRAGMAs on the writer and adds
+    a pooled read-only engine (PRAGMA query_only) that RoutingSession uses
+    for GET and HEAD requests. Must run in an app context, after
+    configure_engine_options and db.init_app.
+
+    Returns:
+        The read-only engine, or None when the profile does not apply
+    """
+    pragmas = sqlite_pragmas(app.config)
+    writer = db.engine
+    _apply_pragmas(writer, pragmas)
+
+    with writer.connect() as connection:
+        if app.config['SQLITE_WAL_ENABLED']:
+            mode = connection.exec_driver_sql('PRAGMA journal_mode = WAL').scalar()
+        else:
+            mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+    logger.info(f"SQLite engine profile: journal_mode={mode}, {pragmas}")
+
+    if not app.config['SQLITE_READ_ENGINE_ENABLED']:
+        return None
+
+    reader = create_engine(
+        writer.url,
+        pool_size=app.config['SQLITE_READ_POOL_SIZE'],
+        max_overflow=0,
+        pool_timeout=app.config['SQLITE_POOL_TIMEOUT'],
+        connect_args={'check_same_thread': False}
+    )
+    _apply_pragmas(reader, pragmas, query_only=True)
+    app.extensions['sqlite_read_engine'] = reader
+    return reader
+
+
+def _is_write(clause: Any) -> bool:
+    return clause is not None and getattr(clause, 'is_dml', False)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads made while serving GET/HEAD requests to the
+    app's read-only engine, when there is one. Flushes and DML statements
+    always use the writer.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not _is_write(clause) and has_request_context():
+            reader = current_app.extensions.get('sqlite_read_engine') if has_app_context() else None
+            if reader is not None and request.method in READ_METHODS:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
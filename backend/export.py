@@ -0,0 +1,119 @@
+import csv
+import io
+import logging
+from typing import Any, Iterable, Iterator, List, Sequence, Union
+
+from flask import current_app, stream_with_context
+from models import db
+from serialization import SONG_FIELDS, encode_song_objects, isoformat, song_column_lists
+from response_formats import MEDIA_TYPES, format_available, iter_arrow_stream, pack
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# format -> (mimetype, file extension); 'msgpack' and 'arrow' need their
+# optional libraries (see available_export_formats)
+EXPORT_FORMATS = {
+    'ndjson': (MEDIA_TYPES['ndjson'][0], 'ndjson'),
+    'csv': (MEDIA_TYPES['csv'][0], 'csv'),
+    'msgpack': (MEDIA_TYPES['msgpack'][0], 'msgpack'),
+    'arrow': (MEDIA_TYPES['arrow'][0], 'arrows'),
+}
+
+_DATETIME_FIELDS = {'created_at', 'updated_at'}
+
+
+def available_export_formats() -> List[str]:
+    """EXPORT_FORMATS whose libraries are installed, the default (ndjson) first"""
+    return [name for name in EXPORT_FORMATS if format_available(name)]
+
+
+def _csv_rows(rows: Sequence[Sequence[Any]]) -> Iterator[list]:
+    """Rows as CSV cells: NULL -> empty, datetimes in isoformat"""
+    datetime_positions = [position for position, field in enumerate(SONG_FIELDS) if field in _DATETIME_FIELDS]
+    for row in rows:
+        cells = ['' if value is None else value for value in row]
+        for position in datetime_positions:
+            if cells[position] != '':
+                cells[position] = isoformat(cells[position])
+        yield cells
+
+
+def statement_partitions(statement, chunk_size: int = 1000) -> Iterator[Sequence[Any]]:
+    """
+    Rows of a select, chunk_size at a time, from a server-side cursor.
+
+    Each chunk is handed on before the next is fetched, so memory stays
+    constant regardless of the table size.
+    """
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def iter_export(partitions: Iterable[Sequence[Any]], export_format: str) -> Iterator[Union[str, bytes]]:
+    """
+    Stream chunks of song rows as NDJSON lines, CSV, MessagePack or Arrow.
+
+    Each chunk is encoded and yielded before the next is read. MessagePack
+    output is a sequence of column-major maps ({field: [values]}), one per
+    chunk; Arrow output is an IPC stream with one record batch per chunk.
+
+    Args:
+        partitions: Chunks of song rows in SONG_FIELDS order, e.g. from
+            statement_partitions
+        export_format: 'ndjson', 'csv', 'msgpack' or 'arrow'
+    """
+    if export_format not in available_export_formats():
+        raise ValueError(f"Invalid format. Valid formats: {available_export_formats()}")
+
+    exported = 0
+    try:
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            writer.writerow(SONG_FIELDS)
+            for rows in partitions:
+                writer.writerows(_csv_rows(rows))
+                exported += len(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            # Header only, when there were no rows
+            if buffer.tell():
+                yield buffer.getvalue()
+        elif export_format == 'msgpack':
+            for rows in partitions:
+                if rows:
+                    exported += len(rows)
+                    yield pack(song_column_lists(rows))
+        elif export_format == 'arrow':
+            def counted():
+                nonlocal exported
+                for rows in partitions:
+                    exported += len(rows)
+                    yield rows
+            yield from iter_arrow_stream(counted())
+        else:
+            for rows in partitions:
+                if rows:
+                    exported += len(rows)
+                    yield '\n'.join(encode_song_objects(rows)) + '\n'
+    finally:
+        close = getattr(partitions, 'close', None)
+        if close is not None:
+            close()
+        logger.info(f"Exported {exported} songs as {export_format}")
+
+
+def export_response(partitions: Iterable[Sequence[Any]], export_format: str):
+    """Streaming download response for iter_export"""
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    response = current_app.response_class(
+        stream_with_context(iter_export(partitions, export_format)),
+        mimetype=mimetype
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="songs.{extension}"'
+    return response
@@ -0,0 +1,155 @@
+import re
+from collections import namedtuple
+from typing import Any, List
+
+from models import Song
+
+# Fields that accept comparisons and ranges, by column name
+RANGE_FIELDS = ['danceability', 'energy', 'loudness', 'acousticness', 'instrumentalness',
+                'liveness', 'valence', 'tempo', 'duration_ms', 'num_bars', 'num_sections',
+                'num_segments', 'star_rating']
+
+# Categorical fields: equality (optionally a '|' list) and inequality only
+EQUALITY_FIELDS = ['key', 'mode', 'time_signature', 'class']
+
+FILTER_FIELDS = RANGE_FIELDS + EQUALITY_FIELDS
+
+OPERATORS = ('=', '!=', '>', '>=', '<', '<=', 'between')
+
+# One condition of a filter. value is a number, a list of numbers for '='
+# with alternatives, or (low, high) for 'between' (either side may be None).
+Condition = namedtuple('Condition', ['field', 'op', 'value'])
+
+_CLAUSE_RE = re.compile(r'^\s*(?P<field>[a-z_]+)\s*(?P<op>!=|>=|<=|=|>|<|:)\s*(?P<value>.*?)\s*$')
+
+
+def _number(text: str, field: str) -> float:
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"Invalid number '{text}' for {field}")
+    if value != value or value in (float('inf'), float('-inf')):
+        raise ValueError(f"Invalid number '{text}' for {field}")
+    return int(value) if field in EQUALITY_FIELDS and value.is_integer() else value
+
+
+def parse_filter(text: str) -> List[Condition]:
+    """
+    Parse a filter expression into conditions, all of which must hold.
+
+    Grammar (clauses separated by commas):
+
+        field=value          equality; '|' separates alternatives (key=1|5)
+        field!=value         inequality
+        field>value          also >=, <, <=
+        field:low..high      inclusive range; either bound may be omitted
+
+    Example: tempo:120..130,energy>0.8,mode=1,star_rating>=4
+
+    Raises:
+        ValueError: If the expression is malformed or uses an unknown field
+    """
+    conditions = []
+    for clause in filter(None, (part.strip() for part in text.split(','))):
+        match = _CLAUSE_RE.match(clause)
+        if not match:
+            raise ValueError(f"Invalid filter clause '{clause}'")
+        field, op, value = match.group('field'), match.group('op'), match.group('value')
+
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Invalid filter field '{field}'. Valid fields: {FILTER_FIELDS}")
+        if not value:
+            raise ValueError(f"Missing value in filter clause '{clause}'")
+
+        if field in EQUALITY_FIELDS and op not in ('=', '!='):
+            raise ValueError(f"{field} only supports = and !=")
+
+        if op == ':':
+            low, separator, high = value.partition('..')
+            if not separator or not (low or high):
+                raise ValueError(f"Invalid range '{value}' for {field}; use low..high")
+            bounds = (_number(low, field) if low else None, _number(high, field) if high else None)
+            if None not in bounds and bounds[0] > bounds[1]:
+                raise ValueError(f"Empty range '{value}' for {field}")
+            conditions.append(Condition(field, 'between', bounds))
+        elif op == '=' and '|' in value:
+            conditions.append(Condition(field, '=', [_number(part, field) for part in value.split('|')]))
+        else:
+            conditions.append(Condition(field, op, _number(value, field)))
+    return conditions
+
+
+def column_for(field: str):
+    return Song.__table__.c[field]
+
+
+def condition_clause(condition: Condition):
+    """SQL expression for a condition"""
+    column = column_for(condition.field)
+    op, value = condition.op, condition.value
+    if op == 'between':
+        low, high = value
+        if low is None:
+            return column <= high
+        if high is None:
+            return column >= low
+        return column.between(low, high)
+    if op == '=':
+        return column.in_(value) if isinstance(value, list) else column == value
+    if op == '!=':
+        return column != value
+    if op == '>':
+        return column > value
+    if op == '>=':
+        return column >= value
+    if op == '<':
+        return column < value
+    return column <= value
+
+
+def apply_filters(statement, conditions: List[Condition]):
+    """Add the conditions to a select or query as WHERE clauses"""
+    for condition in conditions:
+        statement = statement.where(condition_clause(condition))
+    return statement
+
+
+def condition_mask(condition: Condition, values: Any):
+    """
+    NumPy boolean mask of a condition over a column array (NaN = NULL).
+
+    NULL never matches, as in SQL.
+    """
+    import numpy as np
+
+    op, value = condition.op, condition.value
+    with np.errstate(invalid='ignore'):
+        if op == 'between':
+            low, high = value
+            mask = ~np.isnan(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            return mask
+        if op == '=':
+            return np.isin(values, value) if isinstance(value, list) else values == value
+        if op == '!=':
+            return ~np.isnan(values) & (values != value)
+        if op == '>':
+            return values > value
+        if op == '>=':
+            return values >= value
+        if op == '<':
+            return values < value
+        return values <= value
+
+
+def is_equality(condition: Condition) -> bool:
+    """Whether an index column can be matched exactly by this condition"""
+    return condition.op == '=' and not isinstance(condition.value, list)
+
+
+def is_range(condition: Condition) -> bool:
+    """Whether an index can seek on this condition as a range (or IN list)"""
+    return condition.op in ('=', '>', '>=', '<', '<=', 'between')
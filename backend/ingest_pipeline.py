@@ -0,0 +1,166 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from columnar import ColumnarNormalizer
+from json_stream import ColumnSpill, SpillReader, spill_json_file
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# The worker process's open spill, set by _open_spill
+_reader: Optional[SpillReader] = None
+
+
+def _open_spill(layout: Dict[str, Any]) -> None:
+    """Worker initializer: open the spill files once for every task"""
+    global _reader
+    _reader = SpillReader(layout)
+
+
+def _normalize_range(start: int, stop: int,
+                     ranges: Dict[str, Tuple[int, int, int]]) -> Tuple[List[str], List[tuple], float]:
+    """
+    Worker task: decode and normalize rows start..stop-1 of the spill.
+
+    ranges are the rows' byte ranges in the spill's values files, so each
+    column is one read and one json.loads. Rows travel back as tuples,
+    which pickle far smaller than dicts.
+
+    Returns:
+        (names, rows, cpu_seconds)
+    """
+    started = time.process_time()
+    block = _reader.read_block(start, stop, ranges)
+    batch = ColumnarNormalizer.normalize_block(block, start_index=start)
+
+    names = list(batch.columns)
+    columns = [batch.column_values(name) for name in names]
+    names.append('index')
+    columns.append(range(start, stop))
+    return names, list(zip(*columns)), time.process_time() - started
+
+
+def _stage(rows: int, seconds: float, **extra: Any) -> Dict[str, Any]:
+    stage = {
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_second': round(rows / seconds, 1) if seconds > 0 else 0.0
+    }
+    stage.update(extra)
+    return stage
+
+
+class IngestPipeline:
+    """
+    Multi-process ingestion of a column-oriented JSON file.
+
+    Stages:
+        parse      - incremental parse + column spill (sequential, one pass)
+        normalize  - byte ranges of the spill decoded and normalized in a
+                     process pool (spawned, so no parent state is forked)
+        write      - a single writer upserting batches in row order
+
+    At most queue_depth normalized batches are in flight, so memory stays
+    bounded no matter how far the workers get ahead of the writer. The
+    parse and write stages stay sequential, which bounds the speedup of
+    adding workers; bench_suite's ingest_pipeline benchmark measures it.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 1000,
+                 queue_depth: Optional[int] = None, commit_every: int = 1,
+                 spill_dir: Optional[str] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth or 2 * self.workers
+        self.commit_every = commit_every
+        self.spill_dir = spill_dir
+
+    def run(self, file_path: str) -> Dict[str, Any]:
+        """
+        Ingest a JSON file into the database.
+
+        Must be called inside an application context; only the calling
+        thread touches the database.
+
+        Returns:
+            Dictionary with inserted, updated and per-stage throughput
+        """
+        # Imported here to avoid a circular import with data_processor
+        from data_processor import DataProcessor
+
+        started = time.perf_counter()
+        spill = spill_json_file(file_path, self.spill_dir)
+        parse_seconds = time.perf_counter() - started
+
+        try:
+            if not spill.columns:
+                raise ValueError("No columns found in JSON data")
+
+            num_records = spill.row_counts[spill.columns[0]]
+            layout = spill.layout()
+            logger.info(f"Pipeline ingesting {num_records} records with {self.workers} workers")
+
+            timings = {'wait': 0.0, 'cpu': 0.0}
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_open_spill, initargs=(layout,)) as executor:
+                records = self._ordered_records(executor, spill, num_records, timings)
+                result = DataProcessor.bulk_upsert(records, batch_size=self.batch_size,
+                                                   commit_every=self.commit_every)
+        finally:
+            spill.close()
+
+        # Time the writer spent blocked on workers does not count as write time
+        write_seconds = max(result['elapsed_seconds'] - timings['wait'], 0.0)
+        stages = {
+            'parse': _stage(num_records, parse_seconds),
+            'normalize': _stage(num_records, timings['cpu'] / self.workers,
+                                workers=self.workers, cpu_seconds=round(timings['cpu'], 4)),
+            'write': _stage(num_records, write_seconds)
+        }
+        total_seconds = time.perf_counter() - started
+
+        for name, stage in stages.items():
+            logger.info(f"Pipeline stage {name}: {stage['rows_per_second']:.0f} rows/s")
+
+        return {
+            'inserted': result['inserted'],
+            'updated': result['updated'],
+            'batches': result['batches'],
+            'elapsed_seconds': total_seconds,
+            'rows_per_second': num_records / total_seconds if total_seconds > 0 else 0.0,
+            'stages': stages
+        }
+
+    def _ordered_records(self, executor: ProcessPoolExecutor, spill: ColumnSpill,
+                         num_records: int, timings: Dict[str, float]) -> Iterator[Dict[str, Any]]:
+        """Yield normalized records in row order from a bounded window of worker tasks"""
+        ranges = iter(range(0, num_records, self.batch_size))
+        in_flight = deque()
+
+        def submit_next() -> bool:
+            start = next(ranges, None)
+            if start is None:
+                return False
+            stop = min(start + self.batch_size, num_records)
+            in_flight.append(executor.submit(_normalize_range, start, stop, spill.byte_ranges(start, stop)))
+            return True
+
+        for _ in range(self.queue_depth):
+            if not submit_next():
+                break
+
+        while in_flight:
+            future = in_flight.popleft()
+            waited = time.perf_counter()
+            names, rows, cpu_seconds = future.result()
+            timings['wait'] += time.perf_counter() - waited
+            timings['cpu'] += cpu_seconds
+
+            submit_next()
+            for row in rows:
+                yield dict(zip(names, row))
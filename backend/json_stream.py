@@ -0,0 +1,442 @@
+import json
+import logging
+import os
+import tempfile
+from array import array
+from typing import Any, BinaryIO, Callable, Dict, IO, Iterator, List, Optional, TextIO, Tuple
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bytes read from the source file per refill
+READ_CHUNK_SIZE = 1 << 16
+
+# Compact JSON encoder for spilled cells
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+# Characters that may legally follow a value in the column layout
+DELIMITERS = ' \t\r\n,:}]'
+
+# Marker for a missing cell in a column's offset array
+MISSING = -1
+
+# Offsets buffered / padded per write to an offsets array
+PAD_BLOCK = 1 << 14
+
+
+def iter_column_cells(file_obj: TextIO) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Incrementally parse a column-oriented JSON document.
+
+    Input format:
+    {
+        "id": {"0": "abc", "1": "def"},
+        "title": {"0": "Song1", "1": "Song2"}
+    }
+
+    Yields (column, row_key, value) for every cell without materializing the
+    document. Uses ijson when it is installed, otherwise a built-in scanner.
+    """
+    if ijson is not None:
+        return _iter_cells_ijson(file_obj)
+    return _iter_cells_builtin(file_obj)
+
+
+def _iter_cells_ijson(file_obj: TextIO) -> Iterator[Tuple[str, str, Any]]:
+    """ijson event-stream implementation of iter_column_cells"""
+    depth = 0
+    column = None
+    row_key = None
+
+    for _, event, value in ijson.parse(file_obj, use_float=True):
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+        elif event == 'map_key':
+            if depth == 1:
+                column = value
+            elif depth == 2:
+                row_key = value
+        elif depth == 2:
+            yield column, row_key, value
+
+
+def _iter_cells_builtin(file_obj: TextIO) -> Iterator[Tuple[str, str, Any]]:
+    """Pure-Python scanner for the two-level column layout"""
+    scanner = _Scanner(file_obj)
+
+    scanner.expect('{')
+    if scanner.peek() == '}':
+        return
+
+    while True:
+        column = scanner.value()
+        scanner.expect(':')
+        scanner.expect('{')
+
+        if scanner.peek() == '}':
+            scanner.expect('}')
+        else:
+            while True:
+                row_key = scanner.value()
+                scanner.expect(':')
+                yield column, row_key, scanner.value()
+
+                if scanner.expect(',', '}') == '}':
+                    break
+
+        if scanner.expect(',', '}') == '}':
+            return
+
+
+class _Scanner:
+    """Buffered JSON token reader holding at most one chunk plus one token"""
+
+    def __init__(self, file_obj: TextIO):
+        self.file_obj = file_obj
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer; returns False at end of file"""
+        if self.eof:
+            return False
+        chunk = self.file_obj.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON data")
+
+    def expect(self, *tokens: str) -> str:
+        """Consume one of the given punctuation characters"""
+        char = self.peek()
+        if char not in tokens:
+            raise ValueError(f"Invalid JSON: expected {' or '.join(tokens)}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode one JSON value, refilling when it straddles a chunk boundary"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A token not followed by a delimiter (e.g. "0." at the buffer edge)
+            # may continue in the next chunk
+            if (end == len(self.buffer) or self.buffer[end] not in DELIMITERS) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+class ColumnSpill:
+    """
+    On-disk spill of a column-major document.
+
+    Every column gets a values file (one JSON value per line) and a
+    fixed-width offsets array indexed by row number, so the columns can be
+    zipped back into rows in any order while only one batch is held in memory.
+
+    A column whose rows arrive in order with no gaps (the usual case) is
+    sequential: any run of its rows is one contiguous byte range of its
+    values file, read and decoded in a single call.
+    """
+
+    def __init__(self, spill_dir: Optional[str] = None):
+        self._tmp = tempfile.TemporaryDirectory(prefix='song_spill_', dir=spill_dir)
+        self.columns: List[str] = []
+        self.row_counts: Dict[str, int] = {}
+        self._values: Dict[str, BinaryIO] = {}
+        self._offsets: Dict[str, BinaryIO] = {}
+        self._values_pos: Dict[str, int] = {}
+        self._offset_len: Dict[str, int] = {}
+        self._sequential: Dict[str, bool] = {}
+        # In-order offsets buffered in memory until a block is full
+        self._pending: Dict[str, array] = {}
+
+    def __enter__(self) -> 'ColumnSpill':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close and delete all spill files"""
+        for handle in list(self._values.values()) + list(self._offsets.values()):
+            handle.close()
+        self._tmp.cleanup()
+
+    def _open_column(self, column: str) -> None:
+        slot = len(self.columns)
+        self.columns.append(column)
+        self.row_counts[column] = 0
+        self._values[column] = open(os.path.join(self._tmp.name, f'{slot}.values'), 'w+b')
+        self._offsets[column] = open(os.path.join(self._tmp.name, f'{slot}.offsets'), 'w+b')
+        self._values_pos[column] = 0
+        self._offset_len[column] = 0
+        self._sequential[column] = True
+        self._pending[column] = array('q')
+
+    def _flush_pending(self, column: str) -> None:
+        pending = self._pending[column]
+        if pending:
+            pending.tofile(self._offsets[column])
+            self._pending[column] = array('q')
+
+    def write(self, column: str, row_key: str, value: Any) -> None:
+        """Spill one cell"""
+        if column not in self._values:
+            self._open_column(column)
+
+        try:
+            row = int(row_key)
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping non-numeric row key {row_key!r} in column {column}")
+            return
+        if row < 0:
+            return
+
+        # Numbers are the bulk of the cells; repr() is their JSON form and much
+        # cheaper (except for NaN / infinities: x - x == 0 rules them out)
+        if type(value) is int or (type(value) is float and value - value == 0):
+            encoded = repr(value).encode('ascii') + b'\n'
+        else:
+            encoded = _encode(value).encode('utf-8') + b'\n'
+        offset = self._values_pos[column]
+        self._values[column].write(encoded)
+        self._values_pos[column] = offset + len(encoded)
+        self.row_counts[column] += 1
+
+        if row == self._offset_len[column]:
+            # Common case: rows arrive in order, buffer and append in blocks
+            pending = self._pending[column]
+            pending.append(offset)
+            self._offset_len[column] = row + 1
+            if len(pending) >= PAD_BLOCK:
+                self._flush_pending(column)
+            return
+
+        self._sequential[column] = False
+        self._flush_pending(column)
+        offsets = self._offsets[column]
+        if row > self._offset_len[column]:
+            # Pad the gap with missing markers, a bounded block at a time
+            gap = row - self._offset_len[column]
+            while gap > 0:
+                step = min(gap, PAD_BLOCK)
+                array('q', [MISSING] * step).tofile(offsets)
+                gap -= step
+            self._offset_len[column] = row + 1
+        offsets.seek(row * 8)
+        array('q', [offset]).tofile(offsets)
+        offsets.seek(self._offset_len[column] * 8)
+
+    def flush(self) -> None:
+        """Flush buffered writes so the spill files can be read (also by other processes)"""
+        for column in self.columns:
+            self._flush_pending(column)
+        for handle in self._values.values():
+            handle.flush()
+        for handle in self._offsets.values():
+            handle.flush()
+
+    def layout(self) -> Dict[str, Any]:
+        """
+        Describe the spill files as plain data.
+
+        The layout can be pickled to worker processes and opened there with
+        SpillReader to read row ranges independently.
+        """
+        self.flush()
+        return {
+            'columns': [
+                {
+                    'name': column,
+                    'values_path': self._values[column].name,
+                    'offsets_path': self._offsets[column].name,
+                    'offset_len': self._offset_len[column],
+                    'sequential': self._sequential[column]
+                }
+                for column in self.columns
+            ]
+        }
+
+    def byte_ranges(self, start: int, stop: int) -> Dict[str, Tuple[int, int, int]]:
+        """
+        Where rows start..stop-1 of each sequential column are in its values
+        file. The spill must be flushed; columns written out of order are left
+        out (they are read cell by cell).
+
+        Returns:
+            {column: (begin, end, rows)} - the byte range and the number of
+            rows it holds (fewer than stop - start past the column's end)
+        """
+        ranges = {}
+        for column in self.columns:
+            if not self._sequential[column]:
+                continue
+            length = self._offset_len[column]
+            rows = max(0, min(stop, length) - start)
+            if not rows:
+                ranges[column] = (0, 0, 0)
+                continue
+            begin = self._offset_at(column, start)
+            end = self._offset_at(column, start + rows) if start + rows < length else self._values_pos[column]
+            ranges[column] = (begin, end, rows)
+        return ranges
+
+    def _offset_at(self, column: str, row: int) -> int:
+        offsets = array('q')
+        offsets.frombytes(os.pread(self._offsets[column].fileno(), 8, row * 8))
+        return offsets[0]
+
+    def iter_batches(self, num_records: int, batch_size: int,
+                     first_row: int = 0) -> Iterator[Dict[str, List[Any]]]:
+        """
+        Zip the spilled columns back together.
+
+        Yields {column: [values]} blocks of up to batch_size rows, covering rows
+        first_row..num_records-1; missing cells come back as None.
+        """
+        self.flush()
+
+        for start in range(first_row, num_records, batch_size):
+            stop = min(start + batch_size, num_records)
+            ranges = self.byte_ranges(start, stop)
+            block = {}
+
+            for column in self.columns:
+                if column in ranges:
+                    block[column] = _read_byte_range(self._values[column].fileno(), ranges[column], stop - start)
+                else:
+                    block[column] = _read_column_range(self._offsets[column], self._values[column],
+                                                       self._offset_len[column], start, stop)
+
+            yield block
+
+
+class SpillReader:
+    """
+    Reads row ranges of a spill described by ColumnSpill.layout(), e.g. in a
+    worker process. The spill files are opened once and kept open.
+    """
+
+    def __init__(self, layout: Dict[str, Any]):
+        self.columns = layout['columns']
+        self._values = {column['name']: open(column['values_path'], 'rb') for column in self.columns}
+        self._offsets = {column['name']: open(column['offsets_path'], 'rb')
+                         for column in self.columns if not column['sequential']}
+
+    def close(self) -> None:
+        for handle in list(self._values.values()) + list(self._offsets.values()):
+            handle.close()
+
+    def read_block(self, start: int, stop: int,
+                   ranges: Dict[str, Tuple[int, int, int]]) -> Dict[str, List[Any]]:
+        """
+        Rows start..stop-1 as {column: [values]}.
+
+        ranges are ColumnSpill.byte_ranges(start, stop): sequential columns
+        are decoded from them, the others read cell by cell.
+        """
+        block = {}
+        for column in self.columns:
+            name = column['name']
+            if name in ranges:
+                block[name] = _read_byte_range(self._values[name].fileno(), ranges[name], stop - start)
+            else:
+                block[name] = _read_column_range(self._offsets[name], self._values[name],
+                                                 column['offset_len'], start, stop)
+        return block
+
+
+def _read_byte_range(fd: int, byte_range: Tuple[int, int, int], count: int) -> List[Any]:
+    """Decode a byte range of values with one json.loads, padded with None to count values"""
+    begin, end, rows = byte_range
+    result = []
+    if rows:
+        data = os.pread(fd, end - begin, begin)
+        # One value per line; JSON text never holds a raw newline
+        result = json.loads(b'[' + data[:-1].replace(b'\n', b',') + b']')
+    result.extend([None] * (count - rows))
+    return result
+
+
+def _read_column_range(offsets_file: BinaryIO, values_file: BinaryIO, offset_len: int,
+                       start: int, stop: int) -> List[Any]:
+    """Read one column's values for rows start..stop-1, None where missing"""
+    available = max(0, min(stop, offset_len) - start)
+    offsets = array('q')
+    if available:
+        offsets_file.seek(start * 8)
+        offsets.fromfile(offsets_file, available)
+
+    result = []
+    for offset in offsets:
+        if offset == MISSING:
+            result.append(None)
+        else:
+            values_file.seek(offset)
+            result.append(json.loads(values_file.readline()))
+
+    result.extend([None] * (stop - start - available))
+    return result
+
+
+def spill_json_file(file_path: str, spill_dir: Optional[str] = None) -> ColumnSpill:
+    """
+    Stream a column-oriented JSON file into a ColumnSpill.
+
+    ijson rejects the NaN / Infinity literals that json.load accepts, so a
+    file ijson cannot parse is re-read with the built-in scanner, which
+    either reads them (normalization turns them into nulls) or reports the
+    actual syntax error.
+
+    The caller owns the returned spill and must close it.
+    """
+    if ijson is not None:
+        try:
+            # ijson reads bytes; the built-in scanner reads text
+            return _spill_file(open(file_path, 'rb'), _iter_cells_ijson, spill_dir)
+        except ijson.JSONError as e:
+            logger.info(f"ijson could not parse {file_path} ({str(e).splitlines()[0]}); "
+                        f"retrying with the built-in scanner")
+    return _spill_file(open(file_path, 'r', encoding='utf-8'), _iter_cells_builtin, spill_dir)
+
+
+def _spill_file(f: IO, iter_cells: Callable[[IO], Iterator[Tuple[str, str, Any]]],
+                spill_dir: Optional[str]) -> ColumnSpill:
+    """Spill every cell iter_cells reads from an open file, closing the file"""
+    spill = ColumnSpill(spill_dir)
+    try:
+        with f:
+            for column, row_key, value in iter_cells(f):
+                spill.write(column, row_key, value)
+    except Exception:
+        spill.close()
+        raise
+    return spill
@@ -0,0 +1,287 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from flask import Response, g, request
+from sqlalchemy import event
+from signals import songs_ingested
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# Characters of each statement kept for the slow-request log
+SLOW_STATEMENT_CHARS = 500
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: Tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(Counter):
+    """Last set value per label values"""
+
+    kind = 'gauge'
+
+    def set(self, label_values: Tuple = (), value: float = 0) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    """Bucketed observations per label values, with their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        # label values -> [count per bucket (last: above every bucket), sum]
+        self._series: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: Tuple, value: float) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[position] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(float(values[-1]))}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class _RequestSQL:
+    """SQL executed by the request running on this thread"""
+
+    __slots__ = ('statements', 'seconds', 'log')
+
+    def __init__(self, keep_statements: bool):
+        self.statements = 0
+        self.seconds = 0.0
+        self.log: Optional[List[Tuple[float, str]]] = [] if keep_statements else None
+
+
+class Metrics:
+    """
+    Request, SQL and ingestion metrics for one app, rendered in the
+    Prometheus text format by /metrics.
+
+    Requests are timed from before_request until the response is returned
+    (or, for streamed responses, until the stream is closed) and labelled by
+    route rule, not URL, so label cardinality stays bounded. SQL statements
+    are counted and timed by engine events into a thread-local collector
+    while a request runs on that thread, and into the process totals always.
+    Requests slower than slow_request_ms are logged with the SQL they ran.
+    """
+
+    def __init__(self, slow_request_ms: float = 0.0, slow_request_statements: int = 50):
+        self.slow_request_ms = slow_request_ms
+        self.slow_request_statements = slow_request_statements
+        self._local = threading.local()
+        self.started_at = time.time()
+
+        route = ('method', 'route', 'status')
+        self.request_duration = Histogram(
+            'songs_http_request_duration_seconds', 'Request latency by route', LATENCY_BUCKETS, route)
+        self.response_size = Histogram(
+            'songs_http_response_size_bytes', 'Response body size by route', SIZE_BUCKETS, route)
+        self.request_statements = Histogram(
+            'songs_http_request_sql_statements', 'SQL statements executed per request', STATEMENT_BUCKETS, route)
+        self.request_sql_duration = Histogram(
+            'songs_http_request_sql_duration_seconds', 'Time spent in SQL per request', LATENCY_BUCKETS, route)
+        self.slow_requests = Counter(
+            'songs_http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS', ('method', 'route'))
+        self.sql_statements = Counter(
+            'songs_sql_statements_total', 'SQL statements executed (requests and background work)')
+        self.sql_duration = Counter(
+            'songs_sql_duration_seconds_total', 'Time spent executing SQL statements')
+        self.ingested_rows = Counter(
+            'songs_ingested_rows_total', 'Song rows written by bulk upserts', ('kind',))
+        self.ingest_duration = Counter(
+            'songs_ingest_duration_seconds_total', 'Time spent in bulk upserts')
+        self.ingest_rate = Gauge(
+            'songs_ingest_last_rows_per_second', 'Rows per second of the most recent bulk upsert')
+        self.families = [
+            self.request_duration, self.response_size, self.request_statements, self.request_sql_duration,
+            self.slow_requests, self.sql_statements, self.sql_duration,
+            self.ingested_rows, self.ingest_duration, self.ingest_rate,
+        ]
+
+    # ----- SQL (engine events) ----------------------------------------------
+
+    def instrument_engine(self, engine) -> None:
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        # On the statement's execution context, which is dropped with it when
+        # the statement fails (after_cursor_execute is not called then)
+        context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - context._metrics_started
+        self.sql_statements.inc()
+        self.sql_duration.inc(amount=elapsed)
+        current = getattr(self._local, 'sql', None)
+        if current is not None:
+            current.statements += 1
+            current.seconds += elapsed
+            if current.log is not None and len(current.log) < self.slow_request_statements:
+                current.log.append((elapsed, statement[:SLOW_STATEMENT_CHARS]))
+
+    # ----- Requests ---------------------------------------------------------
+
+    def before_request(self) -> None:
+        g.metrics_started = time.perf_counter()
+        self._local.sql = _RequestSQL(keep_statements=self.slow_request_ms > 0)
+
+    def after_request(self, response: Response) -> Response:
+        started = g.pop('metrics_started', None)
+        sql = getattr(self._local, 'sql', None)
+        if started is None or sql is None:
+            return response
+
+        method = request.method
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        path = request.full_path.rstrip('?') if self.slow_request_ms else request.path
+        if response.is_streamed:
+            # Count the body as it is sent; finish when the server closes it
+            sent = [0]
+            body = response.response
+
+            def counted():
+                for chunk in body:
+                    sent[0] += len(chunk)
+                    yield chunk
+
+            response.response = counted()
+            response.call_on_close(lambda: self._finish(method, route, path, response.status_code,
+                                                        started, sent[0], sql))
+        else:
+            self._finish(method, route, path, response.status_code, started,
+                         response.calculate_content_length() or 0, sql)
+        return response
+
+    def _finish(self, method: str, route: str, path: str, status: int, started: float,
+                size: int, sql: _RequestSQL) -> None:
+        elapsed = time.perf_counter() - started
+        if getattr(self._local, 'sql', None) is sql:
+            self._local.sql = None
+        labels = (method, route, str(status))
+        self.request_duration.observe(labels, elapsed)
+        self.response_size.observe(labels, size)
+        self.request_statements.observe(labels, sql.statements)
+        self.request_sql_duration.observe(labels, sql.seconds)
+
+        if self.slow_request_ms and elapsed * 1000.0 >= self.slow_request_ms:
+            self.slow_requests.inc((method, route))
+            statements = '\n'.join(f"  {seconds * 1000.0:8.2f} ms  {' '.join(statement.split())}"
+                                   for seconds, statement in sql.log or [])
+            logger.warning(f"Slow request: {method} {path} -> {status} in {elapsed * 1000.0:.1f} ms, "
+                           f"{sql.statements} SQL statements in {sql.seconds * 1000.0:.1f} ms"
+                           + (f"\n{statements}" if statements else ''))
+
+    # ----- Ingestion --------------------------------------------------------
+
+    def record_ingest(self, sender, inserted: int = 0, updated: int = 0, elapsed_seconds: float = 0.0,
+                      **extra: Any) -> None:
+        self.ingested_rows.inc(('inserted',), inserted)
+        self.ingested_rows.inc(('updated',), updated)
+        self.ingest_duration.inc(amount=elapsed_seconds)
+        if elapsed_seconds > 0:
+            self.ingest_rate.set(value=(inserted + updated) / elapsed_seconds)
+
+    # ----- Exposition -------------------------------------------------------
+
+    def render(self) -> str:
+        """All metric families in the Prometheus text exposition format"""
+        lines = []
+        for family in self.families:
+            lines.append(f'# HELP {family.name} {family.help_text}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            lines.extend(family.samples())
+        lines.append('# HELP songs_process_start_time_seconds Start time of the process since the Unix epoch')
+        lines.append('# TYPE songs_process_start_time_seconds gauge')
+        lines.append(f'songs_process_start_time_seconds {self.started_at}')
+        return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app, db) -> Metrics:
+    """
+    Instrument the app's requests, its engines (including the read-only
+    engine) and its bulk upserts; must run in an app context after the
+    engine profile is set up.
+    """
+    metrics = Metrics(app.config['SLOW_REQUEST_MS'], app.config['SLOW_REQUEST_MAX_STATEMENTS'])
+    app.extensions['metrics'] = metrics
+
+    engines = list(db.engines.values())
+    read_engine = app.extensions.get('sqlite_read_engine')
+    if read_engine is not None:
+        engines.append(read_engine)
+    for engine in engines:
+        metrics.instrument_engine(engine)
+
+    app.before_request(metrics.before_request)
+    app.after_request(metrics.after_request)
+    songs_ingested.connect(metrics.record_ingest, sender=app, weak=False)
+    return metrics
@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from engine_profile import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 class Song(db.Model):
@@ -9,6 +10,15 @@ class Song(db.Model):
     
     __tablename__ = 'songs'
     
+    # Composite indexes for multi-attribute filters: equality columns first,
+    # then the range column the filter usually bounds
+    __table_args__ = (
+        db.Index('ix_songs_mode_key_tempo', 'mode', 'key', 'tempo'),
+        db.Index('ix_songs_time_signature_tempo', 'time_signature', 'tempo'),
+        db.Index('ix_songs_class_energy', 'class', 'energy'),
+        db.Index('ix_songs_star_rating_danceability', 'star_rating', 'danceability'),
+    )
+    
     # Primary key
     index = db.Column(db.Integer, primary_key=True)
     
@@ -16,9 +26,9 @@ class Song(db.Model):
     id = db.Column(db.String(50), unique=True, nullable=False, index=True)
     title = db.Column(db.String(255), nullable=False, index=True)
     
-    # Audio features
-    danceability = db.Column(db.Float)
-    energy = db.Column(db.Float)
+    # Audio features (indexed columns back keyset pagination on the listing's sort keys)
+    danceability = db.Column(db.Float, index=True)
+    energy = db.Column(db.Float, index=True)
     loudness = db.Column(db.Float)
     acousticness = db.Column(db.Float)
     instrumentalness = db.Column(db.Float)
@@ -26,13 +36,13 @@ class Song(db.Model):
     valence = db.Column(db.Float)
     
     # Musical attributes
-    tempo = db.Column(db.Float)
+    tempo = db.Column(db.Float, index=True)
     key = db.Column(db.Integer)
     mode = db.Column(db.Integer)
     time_signature = db.Column(db.Integer)
     
     # Structural information
-    duration_ms = db.Column(db.Integer)
+    duration_ms = db.Column(db.Integer, index=True)
     num_bars = db.Column(db.Integer)
     num_sections = db.Column(db.Integer)
     num_segments = db.Column(db.Integer)
@@ -41,10 +51,10 @@ class Song(db.Model):
     class_field = db.Column('class', db.Integer)  # 'class' is a Python keyword, so we use 'class_field'
     
     # User rating
-    star_rating = db.Column(db.Integer, default=0)
+    star_rating = db.Column(db.Integer, default=0, index=True)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
@@ -84,4 +94,62 @@ class Song(db.Model):
             raise ValueError("Rating must be an integer")
         if rating < 0 or rating > 5:
             raise ValueError("Rating must be between 0 and 5")
-        return True
\ No newline at end of file
+        return True
+
+
+class SeedFile(db.Model):
+    """Seed files already loaded into songs, so restarts can skip them"""
+    
+    __tablename__ = 'seed_files'
+    
+    name = db.Column(db.String(255), primary_key=True)
+    checksum = db.Column(db.String(64), nullable=False)  # SHA-256 hex
+    size = db.Column(db.BigInteger)
+    mtime_ns = db.Column(db.BigInteger)
+    rows = db.Column(db.Integer)
+    loaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class UploadJob(db.Model):
+    """Asynchronous upload: spooled transfer, then background ingestion"""
+    
+    __tablename__ = 'upload_jobs'
+    
+    STATES = ('receiving', 'queued', 'running', 'done', 'failed')
+    
+    id = db.Column(db.String(32), primary_key=True)  # UUID4 hex
+    state = db.Column(db.String(16), nullable=False, default='receiving', index=True)
+    spool_path = db.Column(db.String(1024), nullable=False)
+    bytes_expected = db.Column(db.BigInteger)  # None until the client states the total
+    bytes_received = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_total = db.Column(db.Integer)  # known once the worker has parsed the spool
+    rows_committed = db.Column(db.Integer, nullable=False, default=0)  # resume point
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    processing_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Convert upload job to dictionary (the GET /api/jobs/<id> shape)"""
+        return {
+            'id': self.id,
+            'state': self.state,
+            'bytes_expected': self.bytes_expected,
+            'bytes_received': self.bytes_received,
+            'rows_total': self.rows_total,
+            'rows_processed': self.rows_committed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'rows_per_second': (round(self.rows_committed / self.processing_seconds, 1)
+                                if self.processing_seconds else None),
+            'processing_seconds': round(self.processing_seconds, 3),
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,162 @@
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from models import db, Song
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(sort_by: str, order: str, value: Any, index: int) -> str:
+    """
+    Encode the position after a row as an opaque, URL-safe cursor.
+
+    The cursor carries the sort column and order it was issued for, the
+    row's sort-key value and its index (the unique tiebreaker).
+    """
+    if isinstance(value, str) and sort_by in ('created_at', 'updated_at'):
+        # Raw SQLite text from the fast serialization path
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({'s': sort_by, 'o': order, 'v': value, 'i': index}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> Tuple[Any, int]:
+    """
+    Decode a cursor issued by encode_cursor.
+
+    Returns:
+        (sort value, index)
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value, index = payload['v'], int(payload['i'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if payload.get('s') != sort_by or payload.get('o') != order:
+        raise ValueError("Cursor does not match sort_by/order")
+
+    if value is not None and sort_by in ('created_at', 'updated_at'):
+        value = datetime.fromisoformat(value)
+    return value, index
+
+
+def keyset_page(query, sort_by: str, order: str, per_page: int,
+                cursor: Optional[str] = None) -> Tuple[List[Song], Optional[str]]:
+    """
+    Fetch one page of songs after a cursor using keyset (seek) pagination.
+
+    Rows are ordered by (sort column, index) in the requested direction. The
+    page is located with a WHERE clause on that key instead of OFFSET, so
+    with an index on the sort column every page costs the same no matter how
+    deep it is. SQLite's NULL ordering is preserved: NULLs sort first
+    ascending and last descending.
+
+    Args:
+        query: Base Song query, or a Core select of song columns labelled by
+            column name (filters may already be applied)
+        sort_by: Column name from the listing's valid sort columns
+        order: 'asc' or 'desc'
+        per_page: Page size
+        cursor: Cursor from the previous page, or None for the first page
+
+    Returns:
+        (songs or rows, next_cursor) - next_cursor is None on the last page
+    """
+    column = Song.class_field if sort_by == 'class' else getattr(Song, sort_by)
+    descending = order == 'desc'
+    nullable = column.expression.nullable and not column.expression.primary_key
+
+    value = index = None
+    if cursor:
+        value, index = decode_cursor(cursor, sort_by, order)
+
+    # The NULL and non-NULL runs are fetched as separate segments: each is a
+    # single index seek, where one OR-ed predicate would scan from the top.
+    segments = []
+    if descending:
+        if not cursor or value is not None:
+            segments.append(_values_segment(query, column, value, index, descending))
+        if nullable:
+            segments.append(_nulls_segment(query, column, index if value is None else None, descending))
+    else:
+        if nullable and (not cursor or value is None):
+            segments.append(_nulls_segment(query, column, index, descending))
+        if not cursor or value is None:
+            segments.append(_values_segment(query, column, None, None, descending))
+        else:
+            segments.append(_values_segment(query, column, value, index, descending))
+
+    # One extra row tells whether another page exists
+    songs = []
+    for segment in segments:
+        songs.extend(_fetch(segment.limit(per_page + 1 - len(songs))))
+        if len(songs) > per_page:
+            break
+
+    if len(songs) <= per_page:
+        return songs, None
+
+    songs = songs[:per_page]
+    last = songs[-1]
+    mapping = getattr(last, '_mapping', None)
+    if mapping is not None:
+        last_value, last_index = mapping[sort_by], mapping['index']
+    else:
+        last_value = last.class_field if sort_by == 'class' else getattr(last, sort_by)
+        last_index = last.index
+    return songs, encode_cursor(sort_by, order, last_value, last_index)
+
+
+def _fetch(statement) -> list:
+    """Run an ORM query or a Core select"""
+    if hasattr(statement, 'all'):
+        return statement.all()
+    return db.session.execute(statement).all()
+
+
+def _values_segment(query, column, value: Any, index: Optional[int], descending: bool):
+    """Non-NULL rows strictly after (value, index), or all of them without a position"""
+    if value is None:
+        query = query.filter(column.isnot(None))
+    elif descending:
+        query = query.filter(tuple_(column, Song.index) < tuple_(value, index))
+    else:
+        query = query.filter(tuple_(column, Song.index) > tuple_(value, index))
+
+    if descending:
+        return query.order_by(column.desc(), Song.index.desc())
+    return query.order_by(column.asc(), Song.index.asc())
+
+
+def _nulls_segment(query, column, index: Optional[int], descending: bool):
+    """NULL rows strictly after index, or all of them without a position"""
+    query = query.filter(column.is_(None))
+    if index is not None:
+        query = query.filter(Song.index < index if descending else Song.index > index)
+    return query.order_by(Song.index.desc() if descending else Song.index.asc())
+
+
+def cursor_pagination(per_page: int, next_cursor: Optional[str],
+                      total_items: Optional[int] = None) -> Dict[str, Any]:
+    """Build the pagination block for a cursor-mode listing"""
+    pagination = {
+        'mode': 'cursor',
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None
+    }
+    if total_items is not None:
+        pagination['total_items'] = total_items
+    return pagination
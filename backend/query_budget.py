@@ -0,0 +1,209 @@
+import logging
+import math
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Union
+
+from flask import current_app, has_app_context, request
+from sqlalchemy import event
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODES = ('off', 'log', 'raise')
+
+# Statements listed in a budget failure message
+REPORTED_STATEMENTS = 30
+
+Budget = Union[int, Callable[[Any], int]]
+
+# Statement counter of the request running on this thread (init_query_budgets)
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More SQL statements ran than the declared budget allows"""
+
+    def __init__(self, label: str, budget: int, statements: List[str]):
+        self.label = label
+        self.budget = budget
+        self.statements = statements
+        listed = '\n'.join(f'  {i + 1}. {" ".join(statement.split())[:300]}'
+                           for i, statement in enumerate(statements[:REPORTED_STATEMENTS]))
+        super().__init__(f"{label} issued {len(statements)} SQL statements, budget is {budget}:\n{listed}")
+
+
+def app_engines(app) -> List[Any]:
+    """Every engine the app's sessions can use, including the read-only engine"""
+    from models import db
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    read_engine = app.extensions.get('sqlite_read_engine')
+    if read_engine is not None:
+        engines.append(read_engine)
+    return engines
+
+
+class query_budget:
+    """
+    Context manager failing when the block issues more SQL statements than
+    max_statements (an N+1 check for tests and scripts).
+
+    Only statements executed on the calling thread are counted, so
+    background work (seeding, write-behind flushes) does not leak in:
+
+        with query_budget(2, label='bulk_upsert of 5 batches x2'):
+            DataProcessor.bulk_upsert(records, batch_size=1000)
+
+    Args:
+        max_statements: Statements the block may issue
+        engines: Engines to watch (default: those of the current Flask app)
+        label: Name used in the failure message
+
+    Raises:
+        QueryBudgetExceeded: On exit, when the budget was exceeded (and the
+            block itself did not raise)
+    """
+
+    def __init__(self, max_statements: int, engines: Optional[List[Any]] = None, label: str = 'block'):
+        self.max_statements = max_statements
+        self.engines = engines
+        self.label = label
+        self.statements: List[str] = []
+        self._thread_id: Optional[int] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if threading.get_ident() == self._thread_id:
+            self.statements.append(statement)
+
+    def __enter__(self) -> 'query_budget':
+        if self.engines is None:
+            if not has_app_context():
+                raise RuntimeError('query_budget needs engines or an app context')
+            self.engines = app_engines(current_app._get_current_object())
+        self._thread_id = threading.get_ident()
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._record)
+        if exc_type is None and self.count > self.max_statements:
+            raise QueryBudgetExceeded(self.label, self.max_statements, self.statements)
+
+
+def statement_budget(budget: Budget) -> Callable:
+    """
+    Declare the SQL statements a route may issue per request.
+
+    budget is an int, or a callable taking the request and returning one for
+    routes whose work is chunked by request size (bulk writes are allowed a
+    fixed number of statements per chunk or batch, never per row). Enforced
+    by init_query_budgets according to QUERY_BUDGET_MODE.
+    """
+    def decorator(view: Callable) -> Callable:
+        view.statement_budget = budget
+        return view
+    return decorator
+
+
+def allow_statements(count: int) -> None:
+    """
+    Add count statements to the running request's budget, for shared work
+    whose cost no route can know up front (a column-store refresh after a
+    write). A no-op outside a counted request.
+    """
+    counter = getattr(_local, 'counter', None)
+    if counter is not None:
+        counter.allowance += count
+
+
+@contextmanager
+def exempt_statements():
+    """
+    Add the statements run in the block to the running request's budget, for
+    shared work that happens to run in whichever request comes first
+    (catching up with other processes' writes). A no-op outside a counted
+    request.
+    """
+    counter = getattr(_local, 'counter', None)
+    issued = len(counter.statements) if counter is not None else 0
+    try:
+        yield
+    finally:
+        if counter is not None:
+            counter.allowance += len(counter.statements) - issued
+
+
+def chunk_count(items: Optional[Any], size: int) -> int:
+    """Number of size-item chunks a sized request payload is split into"""
+    return math.ceil(len(items) / size) if items else 0
+
+
+class _RouteCounter:
+    __slots__ = ('endpoint', 'statements', 'allowance')
+
+    def __init__(self, endpoint: Optional[str]):
+        self.endpoint = endpoint
+        self.statements: List[str] = []
+        self.allowance = 0
+
+
+def init_query_budgets(app) -> None:
+    """
+    Count each request's SQL statements (on the request's thread, up to the
+    point its response is returned) and check them against the route's
+    statement_budget: 'log' logs a warning, 'raise' raises
+    QueryBudgetExceeded, which test clients see as an error. Statements
+    declared through allow_statements are added to the budget. Routes
+    without a declared budget are reported at startup.
+    """
+    mode = app.config['QUERY_BUDGET_MODE']
+    if mode not in QUERY_BUDGET_MODES:
+        raise ValueError(f"QUERY_BUDGET_MODE must be one of {QUERY_BUDGET_MODES}")
+    if mode == 'off':
+        return
+
+    missing = [rule.endpoint for rule in app.url_map.iter_rules()
+               if rule.endpoint != 'static'
+               and not hasattr(app.view_functions[rule.endpoint], 'statement_budget')]
+    if missing:
+        message = f"Routes without a statement_budget: {', '.join(sorted(set(missing)))}"
+        if mode == 'raise':
+            raise RuntimeError(message)
+        logger.warning(message)
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        counter = getattr(_local, 'counter', None)
+        if counter is not None:
+            counter.statements.append(statement)
+
+    for engine in app_engines(app):
+        event.listen(engine, 'before_cursor_execute', record)
+
+    @app.before_request
+    def start_counting() -> None:
+        _local.counter = _RouteCounter(request.endpoint)
+
+    @app.after_request
+    def check_budget(response):
+        counter, _local.counter = getattr(_local, 'counter', None), None
+        if counter is None or counter.endpoint is None:
+            return response
+        budget = getattr(app.view_functions[counter.endpoint], 'statement_budget', None)
+        if budget is None:
+            return response
+        limit = (budget(request) if callable(budget) else budget) + counter.allowance
+        if len(counter.statements) > limit:
+            error = QueryBudgetExceeded(f'{request.method} {request.path} ({counter.endpoint})',
+                                        limit, counter.statements)
+            if mode == 'raise':
+                raise error
+            logger.warning(str(error))
+        return response
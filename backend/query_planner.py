@@ -0,0 +1,262 @@
+import logging
+from typing import Any, Dict, Iterator, List, Sequence
+
+from sqlalchemy import Table, func, select
+from sqlalchemy.ext.compiler import compiles
+from models import db, Song
+from serialization import select_songs
+from filters import Condition, apply_filters, condition_mask, is_equality, is_range
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Selectivity guesses used when there is no column store to measure with
+EQUALITY_SELECTIVITY = 0.1
+RANGE_SELECTIVITY = 0.3
+
+
+@compiles(Table, 'sqlite')
+def _table_with_from_hint(element, compiler, **kw):
+    """
+    Render select().with_hint(table, 'INDEXED BY ...', 'sqlite').
+
+    SQLite's compiler drops FROM hints; this appends the hint after the
+    table name when the table is rendered in a FROM clause.
+    """
+    rendered = compiler.visit_table(element, **kw)
+    hints = kw.get('fromhints')
+    if kw.get('asfrom') and hints and element in hints:
+        rendered = f'{rendered} {hints[element]}'
+    return rendered
+
+
+class QueryPlanner:
+    """
+    Chooses how to answer a filtered song listing.
+
+    Plans:
+        index: seek one of the songs table's indexes (forced with INDEXED BY).
+            An index is usable for the longest prefix of its columns that has
+            equality conditions, optionally followed by one range condition.
+        scan: evaluate the conditions over the in-memory column store and
+            fetch only the matching page of rows by index. Chosen when no
+            index narrows the search to below scan_fraction of the table.
+        table: plain SQL with no hint, left to SQLite's own planner, when
+            neither of the above applies (e.g. sorting by a text column).
+    """
+
+    def __init__(self, store=None, scan_fraction: float = 0.25):
+        self.store = store
+        self.scan_fraction = scan_fraction
+
+    @staticmethod
+    def usable_prefix(index, conditions: Sequence[Condition]) -> List[Condition]:
+        """Conditions an index can seek on, in index column order"""
+        by_field: Dict[str, List[Condition]] = {}
+        for condition in conditions:
+            by_field.setdefault(condition.field, []).append(condition)
+
+        used = []
+        for column in index.columns:
+            candidates = by_field.get(column.name, [])
+            equality = next((c for c in candidates if is_equality(c)), None)
+            if equality is not None:
+                used.append(equality)
+                continue
+            ranged = [c for c in candidates if is_range(c)]
+            used.extend(ranged)
+            break
+        return used
+
+    @staticmethod
+    def _estimate(conditions: Sequence[Condition], size: int, snapshot=None) -> int:
+        """
+        Rows matching all the conditions.
+
+        With a snapshot, the matches of each column's conditions are counted
+        exactly by binary search over its cached sorted values, and columns
+        are assumed independent; without one, fixed selectivities are used.
+        """
+        if snapshot is not None:
+            if not size:
+                return 0
+            by_field: Dict[str, List[Condition]] = {}
+            for condition in conditions:
+                by_field.setdefault(condition.field, []).append(condition)
+            selectivity = 1.0
+            for field, field_conditions in by_field.items():
+                selectivity *= QueryPlanner._count_sorted(snapshot.sorted_values(field), field_conditions) / size
+            return int(round(size * selectivity))
+
+        selectivity = 1.0
+        for condition in conditions:
+            if is_equality(condition):
+                selectivity *= EQUALITY_SELECTIVITY
+            elif condition.op == '=':
+                selectivity *= min(1.0, EQUALITY_SELECTIVITY * len(condition.value))
+            else:
+                selectivity *= RANGE_SELECTIVITY
+        return int(size * selectivity)
+
+    @staticmethod
+    def _count_sorted(values, conditions: Sequence[Condition]) -> int:
+        """Values of an ascending array (no NULLs) matching all the conditions on its column"""
+        import numpy as np
+
+        def left(value) -> int:
+            return int(np.searchsorted(values, value, side='left'))
+
+        def right(value) -> int:
+            return int(np.searchsorted(values, value, side='right'))
+
+        # Ranges narrow [start, stop); '=' lists and '!=' are counted inside it
+        start, stop = 0, len(values)
+        wanted, excluded = None, set()
+        for condition in conditions:
+            op, value = condition.op, condition.value
+            if op == 'between':
+                low, high = value
+                if low is not None:
+                    start = max(start, left(low))
+                if high is not None:
+                    stop = min(stop, right(high))
+            elif op == '=' and isinstance(value, list):
+                wanted = set(value) if wanted is None else wanted & set(value)
+            elif op == '=':
+                start, stop = max(start, left(value)), min(stop, right(value))
+            elif op == '!=':
+                excluded.add(value)
+            elif op == '>':
+                start = max(start, right(value))
+            elif op == '>=':
+                start = max(start, left(value))
+            elif op == '<':
+                stop = min(stop, left(value))
+            else:
+                stop = min(stop, right(value))
+
+        def within(value) -> int:
+            return max(0, min(stop, right(value)) - max(start, left(value)))
+
+        if wanted is not None:
+            return sum(within(value) for value in wanted - excluded)
+        return max(0, stop - start - sum(within(value) for value in excluded))
+
+    @staticmethod
+    def _mask(snapshot, conditions: Sequence[Condition]):
+        import numpy as np
+
+        mask = np.ones(snapshot.size, dtype=bool)
+        for condition in conditions:
+            mask &= condition_mask(condition, snapshot.column(condition.field))
+        return mask
+
+    def plan(self, conditions: Sequence[Condition], sort_by: str) -> Dict[str, Any]:
+        """
+        Pick a plan for the conditions and sort column.
+
+        Returns:
+            Dictionary with kind ('index', 'scan' or 'table'), the index name
+            and the columns it seeks on (index plans), the table size and
+            estimated rows per candidate index
+        """
+        snapshot = self.store.ensure_fresh() if self.store is not None else None
+        if snapshot is not None:
+            size = snapshot.size
+        else:
+            size = db.session.scalar(select(func.count()).select_from(Song))
+
+        candidates = []
+        for index in Song.__table__.indexes:
+            used = self.usable_prefix(index, conditions)
+            if used:
+                candidates.append({
+                    'index': index.name,
+                    'columns': [condition.field for condition in used],
+                    'estimated_rows': self._estimate(used, size, snapshot)
+                })
+        # Fewest rows to visit first; on ties, the index that seeks on more columns
+        candidates.sort(key=lambda c: (c['estimated_rows'], -len(c['columns'])))
+
+        plan = {'table_rows': size, 'candidates': candidates}
+        scannable = snapshot is not None and snapshot.can_sort(sort_by)
+        best = candidates[0] if candidates else None
+
+        if best is not None and best['estimated_rows'] <= self.scan_fraction * size:
+            plan.update(kind='index', index=best['index'], columns=best['columns'],
+                        estimated_rows=best['estimated_rows'])
+        elif scannable and conditions:
+            plan.update(kind='scan', estimated_rows=self._estimate(conditions, size, snapshot))
+        else:
+            plan.update(kind='table', estimated_rows=self._estimate(conditions, size, snapshot))
+        return plan
+
+    # ----- SQL plans -------------------------------------------------------
+
+    @staticmethod
+    def hinted(statement, plan: Dict[str, Any]):
+        """Force the plan's index on a select of the songs table"""
+        if plan['kind'] == 'index':
+            return statement.with_hint(Song.__table__, f"INDEXED BY {plan['index']}", 'sqlite')
+        return statement
+
+    @classmethod
+    def sql_statement(cls, conditions: Sequence[Condition], plan: Dict[str, Any], order_by: Sequence[Any]):
+        """Filtered select of the song columns for an index or table plan"""
+        statement = apply_filters(select_songs(), conditions).order_by(*order_by)
+        return cls.hinted(statement, plan)
+
+    @classmethod
+    def sql_count(cls, conditions: Sequence[Condition], plan: Dict[str, Any]) -> int:
+        statement = apply_filters(select(func.count()).select_from(Song.__table__), conditions)
+        return db.session.scalar(cls.hinted(statement, plan))
+
+    # ----- Column store scans ----------------------------------------------
+
+    def matching_indexes(self, conditions: Sequence[Condition], sort_by: str, order: str):
+        """
+        Song indexes matching the conditions, in (sort column, index) order.
+
+        The store's precomputed sort permutation is filtered by the condition
+        mask, so no sort runs per request. NULL sort values come first
+        ascending and last descending, as in SQLite.
+        """
+        snapshot = self.store.ensure_fresh()
+        positions = snapshot.ordered_positions(sort_by, order, self._mask(snapshot, conditions))
+        return snapshot.column('index')[positions]
+
+    @staticmethod
+    def fetch_statement(indexes: Sequence[int]):
+        """Select of the song rows with the given indexes (primary key lookups)"""
+        return select_songs().where(Song.index.in_([int(index) for index in indexes]))
+
+    @classmethod
+    def fetch_by_index(cls, indexes: Sequence[int]) -> List[Any]:
+        """Song rows for the given indexes, in the given order"""
+        if len(indexes) == 0:
+            return []
+        wanted = [int(index) for index in indexes]
+        rows = db.session.execute(cls.fetch_statement(wanted)).all()
+        by_index = {row[0]: row for row in rows}
+        return [by_index[index] for index in wanted if index in by_index]
+
+    def scan_partitions(self, conditions: Sequence[Condition], sort_by: str, order: str,
+                        chunk_size: int) -> Iterator[List[Any]]:
+        """Every matching song row, chunk_size rows at a time"""
+        indexes = self.matching_indexes(conditions, sort_by, order)
+        for start in range(0, len(indexes), chunk_size):
+            yield self.fetch_by_index(indexes[start:start + chunk_size])
+
+    # ----- Explain ---------------------------------------------------------
+
+    @staticmethod
+    def explain(statement) -> List[str]:
+        """SQLite's EXPLAIN QUERY PLAN details for a statement"""
+        compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+        rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}').all()
+        return [row[-1] for row in rows]
+
+
+def query_planner(app) -> QueryPlanner:
+    """Planner over the app's column store, if there is one"""
+    return QueryPlanner(app.extensions.get('column_store'), app.config['FILTER_SCAN_FRACTION'])
@@ -0,0 +1,218 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import case, select, update
+from models import db, Song
+from data_version import DataVersion
+from signals import songs_upserted
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ids per UPDATE: each id binds three parameters (CASE WHEN/THEN and IN),
+# which keeps a statement below SQLite's historical 999-parameter limit
+RATING_CHUNK = 300
+
+# Write-behind durability modes
+DURABILITY_MODES = ('group', 'async')
+
+
+class RatingUpdates:
+    """Star rating writes applied as one UPDATE per batch of songs"""
+
+    @staticmethod
+    def parse(payload: Any) -> Dict[str, int]:
+        """
+        Validate a bulk rating payload.
+
+        Accepts {"ratings": [{"id": ..., "rating": ...}, ...]} or the bare
+        list. When an id appears more than once, its last rating wins.
+
+        Returns:
+            Dictionary of song id -> rating, in first-seen order
+
+        Raises:
+            ValueError: If the payload or any rating is invalid
+        """
+        items = payload.get('ratings') if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not items:
+            raise ValueError('ratings must be a non-empty list of {"id", "rating"} objects')
+
+        ratings = {}
+        for position, item in enumerate(items):
+            if not isinstance(item, dict) or 'id' not in item or 'rating' not in item:
+                raise ValueError(f'ratings[{position}] must be an object with id and rating')
+            try:
+                Song.validate_rating(item['rating'])
+            except ValueError as e:
+                raise ValueError(f'ratings[{position}]: {str(e)}')
+            ratings[str(item['id'])] = item['rating']
+        return ratings
+
+    @staticmethod
+    def apply(ratings: Mapping[str, int]) -> Tuple[List[str], List[str]]:
+        """
+        Set many star ratings and commit once.
+
+        Each chunk of ids is written with a single
+        UPDATE ... SET star_rating = CASE id WHEN ... END WHERE id IN (...),
+        and the updated ids are logged in the shared data version once.
+
+        Args:
+            ratings: Song id -> rating (already validated)
+
+        Returns:
+            (updated ids, ids with no matching song)
+        """
+        ids = list(ratings)
+        table = Song.__table__
+        returning = db.engine.dialect.update_returning
+        updated = []
+
+        for start in range(0, len(ids), RATING_CHUNK):
+            chunk = ids[start:start + RATING_CHUNK]
+            statement = (
+                update(table)
+                .where(table.c.id.in_(chunk))
+                .values(star_rating=case({song_id: ratings[song_id] for song_id in chunk}, value=table.c.id))
+            )
+            if returning:
+                updated.extend(db.session.execute(statement.returning(table.c.id)).scalars())
+            else:
+                updated.extend(db.session.scalars(select(table.c.id).where(table.c.id.in_(chunk))))
+                db.session.execute(statement)
+        if updated:
+            DataVersion.log_writes(db.session.connection(), updated)
+        db.session.commit()
+
+        found = set(updated)
+        return [song_id for song_id in ids if song_id in found], [song_id for song_id in ids if song_id not in found]
+
+
+class RatingWriteBehind:
+    """
+    Coalesces rating updates into group commits.
+
+    Updates are queued (the latest rating per song wins) and a background
+    thread writes everything pending with RatingUpdates.apply every
+    `interval` seconds, or sooner once `max_pending` songs are waiting.
+
+    Durability:
+        group: submit() callers wait on the returned future, which resolves
+            after the commit that contains their update.
+        async: the update is acknowledged once queued; a crash can lose up
+            to `interval` seconds of ratings. close() (also run at exit)
+            flushes what is pending.
+    """
+
+    def __init__(self, app, interval: float = 0.05, max_pending: int = 1000, durability: str = 'group'):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Invalid durability '{durability}'. Valid modes: {list(DURABILITY_MODES)}")
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self.durability = durability
+        self._cond = threading.Condition()
+        self._pending: Dict[str, int] = {}
+        self._waiters: List[Tuple[List[str], Future]] = []
+        self._closed = False
+        self._flushes = 0
+        self._written = 0
+        self._thread = threading.Thread(target=self._run, name='rating-write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, ratings: Mapping[str, int]) -> Future:
+        """
+        Queue rating updates.
+
+        Returns:
+            Future resolving to (updated ids, missing ids) for these songs
+            once their group commit has run
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Rating writer is closed')
+            self._pending.update(ratings)
+            self._waiters.append((list(ratings), future))
+            if len(self._pending) >= self.max_pending:
+                self._cond.notify()
+        return future
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of songs written"""
+        with self._cond:
+            pending, waiters = self._pending, self._waiters
+            self._pending, self._waiters = {}, []
+        if not pending:
+            return 0
+
+        try:
+            with self.app.app_context():
+                updated, missing = RatingUpdates.apply(pending)
+                if updated:
+                    songs_upserted.send(self.app, ids=updated)
+        except Exception as e:
+            logger.error(f"Rating flush of {len(pending)} songs failed: {str(e)}")
+            for _, future in waiters:
+                future.set_exception(e)
+            return 0
+
+        self._flushes += 1
+        self._written += len(updated)
+        if missing:
+            logger.warning(f"Rating flush skipped {len(missing)} unknown songs")
+        missing_set = set(missing)
+        for ids, future in waiters:
+            future.set_result((
+                [song_id for song_id in ids if song_id not in missing_set],
+                [song_id for song_id in ids if song_id in missing_set]
+            ))
+        return len(updated)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.max_pending:
+                    self._cond.wait(self.interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Stop the writer after a final flush of everything pending"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            'durability': self.durability,
+            'interval': self.interval,
+            'pending': pending,
+            'flushes': self._flushes,
+            'written': self._written
+        }
+
+
+def init_rating_writer(app) -> RatingWriteBehind:
+    """Start the app's write-behind rating queue and flush it at interpreter exit"""
+    writer = RatingWriteBehind(
+        app,
+        interval=app.config['RATING_FLUSH_INTERVAL'],
+        max_pending=app.config['RATING_MAX_PENDING'],
+        durability=app.config['RATING_DURABILITY']
+    )
+    app.extensions['rating_writer'] = writer
+    atexit.register(writer.close)
+    return writer
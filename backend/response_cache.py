@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+
+from flask import current_app, request
+from signals import songs_upserted
+from response_formats import LISTING_FORMATS, negotiate_format
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Bounded LRU of serialized GET responses, keyed on a dataset version.
+
+    Every committed write bumps the version (through the songs_upserted
+    signal), which drops all cached bodies at once. ETags are derived from
+    the version and the request, so a conditional GET can be answered with
+    304 before the view touches the database.
+
+    The version lives in the process: with several server processes each
+    keeps its own cache, and ETags carry a per-process epoch so they never
+    match across processes or restarts. Other processes' writes reach it
+    through the same signal, sent by the shared data version check
+    (data_version.py) at the start of the next request.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._entries: 'OrderedDict[Tuple, Tuple[int, bytes, int, str]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def bump(self) -> int:
+        """Start a new dataset version, dropping every cached body"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._bytes = 0
+            return self.version
+
+    def etag(self, key: Tuple, version: int) -> str:
+        """ETag of the response for a request key at a dataset version"""
+        digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=8).hexdigest()
+        return f'{self.epoch}-{version}-{digest}'
+
+    def get(self, key: Tuple, version: int) -> Optional[Tuple[bytes, int, str]]:
+        """Cached (body, status, mimetype) for a key, if stored at this version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def put(self, key: Tuple, version: int, body: bytes, status: int, mimetype: str) -> None:
+        """Store a body; ignored if a write has moved the version on meanwhile"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (version, body, status, mimetype)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[1])
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def request_key() -> Tuple:
+    """Cache key of the current request: path, sorted query arguments and the negotiated format"""
+    return request.path, tuple(sorted(request.args.items(multi=True))), negotiate_format(LISTING_FORMATS)
+
+
+def cached_response(view):
+    """
+    Serve a GET view through the app's response cache.
+
+    Only 200 responses are stored. Views run uncached when the cache is
+    disabled.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions.get('response_cache')
+        if cache is None:
+            return view(*args, **kwargs)
+
+        version = cache.version
+        key = request_key()
+        etag = cache.etag(key, version)
+
+        if request.if_none_match.contains_weak(etag):
+            cache.not_modified += 1
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        entry = cache.get(key, version)
+        if entry is not None:
+            body, status, mimetype = entry
+            response = current_app.response_class(body, status=status, mimetype=mimetype)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.put(key, version, response.get_data(), response.status_code, response.mimetype)
+
+        if response.status_code == 200:
+            response.set_etag(etag)
+            response.vary.add('Accept')
+        return response
+
+    return wrapper
+
+
+def init_response_cache(app) -> ResponseCache:
+    """Create the app's response cache and invalidate it on every song write"""
+    cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_MAX_BYTES'])
+    app.extensions['response_cache'] = cache
+
+    def on_songs_upserted(sender, **extra: Any) -> None:
+        cache.bump()
+
+    songs_upserted.connect(on_songs_upserted, sender=app, weak=False)
+    return cache
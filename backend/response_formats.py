@@ -0,0 +1,277 @@
+import io
+import json
+import logging
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+from flask import current_app, request
+from serialization import (SONG_FIELDS, SONG_KINDS, encode_envelope, encode_song_columns, isoformat,
+                           song_column_lists, songs_response as json_songs_response)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# format -> media types it is served for; the first is its Content-Type
+MEDIA_TYPES = {
+    'json': ('application/json',),
+    'columns': ('application/vnd.songs.columns+json',),
+    'msgpack': ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack'),
+    'arrow': ('application/vnd.apache.arrow.stream',),
+    'ndjson': ('application/x-ndjson',),
+    'csv': ('text/csv',),
+}
+
+# Formats each kind of endpoint can produce, in order of preference for
+# 'Accept: */*' (the first is also the default)
+LISTING_FORMATS = ('json', 'columns', 'msgpack', 'arrow')
+AGGREGATE_FORMATS = ('json', 'columns', 'msgpack')
+
+# Content types worth compressing (every format above is)
+COMPRESSIBLE_TYPES = frozenset(media_type for types in MEDIA_TYPES.values() for media_type in types) | {
+    'text/plain', 'text/html',
+}
+
+_ARROW_TYPES = {'int': 'int64', 'float': 'float64', 'str': 'string', 'datetime': 'timestamp[us]', 'any': 'string'}
+
+_encode_compact = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def format_available(name: str) -> bool:
+    """Whether the library a format needs is installed"""
+    if name == 'msgpack':
+        return msgpack is not None
+    if name == 'arrow':
+        return pa is not None
+    return True
+
+
+def negotiate_format(formats: Sequence[str]) -> str:
+    """
+    The format of `formats` the request's Accept header prefers.
+
+    Negotiation is lenient: without an Accept header, or when it accepts
+    none of the formats, the first (default) format is used rather than
+    answering 406. Formats whose library is not installed are not offered.
+    """
+    offered = {media_type: name for name in formats if format_available(name) for media_type in MEDIA_TYPES[name]}
+    match = request.accept_mimetypes.best_match(list(offered))
+    return offered[match] if match is not None else formats[0]
+
+
+def _response(body: Any, name: str, status: int = 200):
+    response = current_app.response_class(body, status=status, mimetype=MEDIA_TYPES[name][0])
+    response.vary.add('Accept')
+    return response
+
+
+# ----- MessagePack / Arrow encoders -------------------------------------------
+
+def pack(value: Any) -> bytes:
+    """MessagePack of a JSON-like value; datetimes as isoformat strings"""
+    return msgpack.packb(value, default=isoformat, use_bin_type=True)
+
+
+def arrow_schema(metadata: Optional[Dict[str, str]] = None):
+    """Arrow schema of song rows: SONG_FIELDS typed by their column kind"""
+    return pa.schema([pa.field(field, pa.type_for_alias(_ARROW_TYPES[kind]))
+                      for field, kind in zip(SONG_FIELDS, SONG_KINDS)], metadata=metadata)
+
+
+def arrow_batch(rows: Sequence[Sequence[Any]], schema) -> Any:
+    """Record batch of song rows (datetimes are parsed from their isoformat text)"""
+    columns = song_column_lists(rows)
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if pa.types.is_timestamp(field.type):
+            arrays.append(pa.array(values, pa.string()).cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_arrow_stream(partitions: Iterable[Sequence[Any]], metadata: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    """
+    Arrow IPC stream of chunks of song rows, one record batch per chunk.
+
+    Each batch is yielded as soon as it is written; the schema goes out with
+    the first batch and the end-of-stream marker last.
+    """
+    schema = arrow_schema(metadata)
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pa.ipc.new_stream(sink, schema)
+    for rows in partitions:
+        if rows:
+            writer.write_batch(arrow_batch(rows, schema))
+            yield drain()
+    writer.close()
+    yield drain()
+
+
+# ----- Responses --------------------------------------------------------------
+
+def songs_response(envelope: Dict[str, Any], rows: Iterable[Sequence[Any]], status: int = 200):
+    """
+    Response for an envelope plus song rows, in the format the Accept header
+    asks for:
+
+        application/json                      {..., "data": [{row}, ...]} (default)
+        application/vnd.songs.columns+json    {..., "data": {"field": [values], ...}}
+        application/msgpack                   the column-major layout as MessagePack
+        application/vnd.apache.arrow.stream   one typed record batch; the rest of
+                                              the envelope as JSON in the schema
+                                              metadata under b'envelope'
+    """
+    name = negotiate_format(LISTING_FORMATS)
+    if name == 'json':
+        response = json_songs_response(envelope, rows, status)
+        response.vary.add('Accept')
+        return response
+
+    rows = list(rows)
+    if name == 'columns':
+        body = encode_envelope(envelope, rows, encode_rows=encode_song_columns) + '\n'
+    elif name == 'msgpack':
+        body = pack(dict(envelope, data=song_column_lists(rows)))
+    else:
+        metadata = {'envelope': json.dumps(envelope, default=isoformat, separators=(',', ':'))}
+        body = b''.join(iter_arrow_stream([rows], metadata))
+    return _response(body, name, status)
+
+
+def columnar_aggregates(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aggregates (histograms, scatter, series) with their row lists pivoted to
+    columns: scatter points become {"x": [...], "y": [...]} and each series
+    {"index": [...], "title": [...], "value": [...]}. Histograms are
+    columnar already.
+    """
+    columnar = dict(data)
+    if 'scatter' in data:
+        columnar['scatter'] = {name: dict(plot, points={'x': [point[0] for point in plot['points']],
+                                                        'y': [point[1] for point in plot['points']]})
+                               for name, plot in data['scatter'].items()}
+    if 'series' in data:
+        columnar['series'] = {name: {key: [entry[key] for entry in entries] for key in ('index', 'title', 'value')}
+                              for name, entries in data['series'].items()}
+    return columnar
+
+
+def aggregates_response(envelope: Dict[str, Any]):
+    """
+    Aggregates envelope ({"status", "data"}) as JSON (default), or with
+    columnar_aggregates data as column-major JSON or MessagePack, per the
+    Accept header.
+    """
+    name = negotiate_format(AGGREGATE_FORMATS)
+    if name == 'json':
+        response = current_app.json.response(envelope)
+        response.vary.add('Accept')
+        return response
+
+    envelope = dict(envelope, data=columnar_aggregates(envelope['data']))
+    if name == 'columns':
+        body = _encode_compact(envelope) + '\n'
+    else:
+        body = pack(envelope)
+    return _response(body, name)
+
+
+# ----- Compression ------------------------------------------------------------
+
+def _compressor(encoding: str, gzip_level: int, brotli_quality: int):
+    """(compress, flush, finish) callables of a streaming compressor"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress_chunks(chunks: Iterable[Any], encoding: str, gzip_level: int = 6,
+                    brotli_quality: int = 4) -> Iterator[bytes]:
+    """
+    Compress a streamed body chunk by chunk.
+
+    Every chunk is flushed, so a client can decode each one as it arrives
+    rather than waiting for the compressor's window to fill.
+    """
+    compress, flush, finish = _compressor(encoding, gzip_level, brotli_quality)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """Compress a whole response body"""
+    compress, _, finish = _compressor(encoding, gzip_level, brotli_quality)
+    return compress(body) + finish()
+
+
+def init_compression(app) -> None:
+    """
+    Compress responses with br or gzip (br preferred) when the client's
+    Accept-Encoding allows. Streamed responses are compressed chunk by
+    chunk; other 200 responses when at least COMPRESSION_MIN_BYTES long.
+    Bodies are stored uncompressed in the response cache, and ETags of
+    compressed responses are weak.
+    """
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    min_bytes = app.config['COMPRESSION_MIN_BYTES']
+    gzip_level = app.config['GZIP_LEVEL']
+    brotli_quality = app.config['BROTLI_QUALITY']
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or request.method == 'HEAD'
+                or response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_chunks(response.response, encoding, gzip_level, brotli_quality)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < min_bytes:
+                return response
+            response.set_data(compress_body(body, encoding, gzip_level, brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
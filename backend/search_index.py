@@ -0,0 +1,155 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, column, literal_column, table, text
+from sqlalchemy.exc import OperationalError
+from models import db, Song
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'songs_fts'
+
+# External-content FTS5 index over songs.title, keyed by songs.rowid (= songs.index).
+# Triggers keep it in sync with single-row and small writes; large bulk upsert
+# batches run without them and update the index per batch (unindex_titles /
+# index_titles).
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content='songs', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS songs_fts_ai AFTER INSERT ON songs BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.rowid, new.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS songs_fts_ad AFTER DELETE ON songs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.rowid, old.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS songs_fts_au AFTER UPDATE OF title ON songs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.rowid, old.title);
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.rowid, new.title);
+    END""",
+]
+
+SEARCH_MODES = ('tokens', 'prefix', 'phrase')
+
+_fts = table(FTS_TABLE, column('rowid'), column('rank'))
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class TitleSearch:
+    """BM25-ranked full-text search over song titles (SQLite FTS5)"""
+
+    @staticmethod
+    def install() -> bool:
+        """
+        Create the FTS table and sync triggers if missing.
+
+        The index is rebuilt from songs when the table is created against a
+        database that already holds data.
+
+        Returns:
+            True if full-text search is available
+        """
+        if db.engine.dialect.name != 'sqlite':
+            logger.warning("Full-text search requires SQLite; falling back to LIKE search")
+            return False
+
+        try:
+            with db.engine.begin() as connection:
+                existed = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': FTS_TABLE}
+                ).first() is not None
+                for statement in FTS_DDL:
+                    connection.execute(text(statement))
+        except OperationalError as e:
+            logger.warning(f"SQLite FTS5 unavailable ({str(e)}); falling back to LIKE search")
+            return False
+
+        if not existed:
+            TitleSearch.rebuild()
+        return True
+
+    @staticmethod
+    def rebuild() -> None:
+        """Rebuild the FTS index from the songs table"""
+        with db.engine.begin() as connection:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+        logger.info("Full-text search index rebuilt")
+
+    @staticmethod
+    def unindex_titles(connection, ids: List[str]) -> None:
+        """Remove songs' current titles from the index (one statement for the ids)"""
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) "
+                 "SELECT 'delete', rowid, title FROM songs WHERE id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': ids}
+        )
+
+    @staticmethod
+    def index_titles(connection, ids: List[str]) -> None:
+        """Add songs' titles to the index (one statement for the ids)"""
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, title) SELECT rowid, title FROM songs WHERE id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': ids}
+        )
+
+    @staticmethod
+    def build_match_query(query: str, mode: str = 'prefix') -> Optional[str]:
+        """
+        Translate user input into an FTS5 MATCH expression.
+
+        Every token is quoted, so FTS5 operators in user input are treated as
+        plain text.
+
+        Modes:
+            tokens - all tokens must appear, in any order
+            prefix - like tokens, with the last token matched as a prefix
+            phrase - the tokens must appear next to each other, in order
+
+        Returns:
+            MATCH expression, or None if the input has no searchable tokens
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Invalid search mode. Valid modes: {list(SEARCH_MODES)}")
+
+        tokens = _TOKEN_RE.findall(query)
+        if not tokens:
+            return None
+
+        if mode == 'phrase':
+            return '"' + ' '.join(tokens) + '"'
+
+        terms = [f'"{token}"' for token in tokens]
+        if mode == 'prefix':
+            terms[-1] += '*'
+        return ' AND '.join(terms)
+
+    @staticmethod
+    def search(query: str, mode: str = 'prefix', page: int = 1,
+               per_page: int = 10) -> Tuple[List[Song], bool]:
+        """
+        Search titles, best BM25 match first.
+
+        Returns:
+            (songs on the requested page, whether another page exists)
+        """
+        match = TitleSearch.build_match_query(query, mode)
+        if match is None:
+            return [], False
+
+        songs = (
+            Song.query
+            .join(_fts, _fts.c.rowid == Song.index)
+            .filter(literal_column(FTS_TABLE).op('MATCH')(match))
+            .order_by(_fts.c.rank, Song.index)
+            .limit(per_page + 1)
+            .offset((page - 1) * per_page)
+            .all()
+        )
+        return songs[:per_page], len(songs) > per_page
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from models import db, Song, SeedFile
+from data_processor import DataProcessor
+from signals import songs_upserted
+from snapshot import is_snapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_checksum(file_path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SeedLoader:
+    """
+    Loads the seed file (raw_songs.json, or a binary snapshot written by
+    DataProcessor.export_snapshot) into the songs table, usually in a
+    background thread so startup does not wait for it.
+
+    Each loaded file is recorded in seed_files with its checksum, size and
+    modification time. A restart whose file still has the recorded size and
+    mtime skips it with one primary key lookup; otherwise the file is hashed
+    and only loaded if its checksum differs from the record.
+
+    States: pending -> loading -> ready, or skipped (nothing to load) or
+    failed. /readyz reports ready for 'ready' and 'skipped'.
+    """
+
+    READY_STATES = ('ready', 'skipped')
+
+    def __init__(self, app, file_path: str):
+        self.app = app
+        self.file_path = file_path
+        self.state = 'pending'
+        self.reason: Optional[str] = None
+        self.error: Optional[str] = None
+        self.rows_loaded = 0
+        self.checksum: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id: Optional[int] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in self.READY_STATES
+
+    def start(self) -> threading.Thread:
+        """Seed in a daemon thread and return immediately"""
+        self._thread = threading.Thread(target=self.run, name='seed-loader', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self) -> None:
+        """Load the seed file unless it has been loaded before (blocking)"""
+        self.started_at = time.time()
+        self._thread_id = threading.get_ident()
+        try:
+            with self.app.app_context():
+                self._run()
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            logger.error(f"Seeding from {self.file_path} failed: {str(e)}")
+        finally:
+            self.finished_at = time.time()
+
+    def _run(self) -> None:
+        if not os.path.exists(self.file_path):
+            logger.warning(f"{os.path.basename(self.file_path)} not found.")
+            self._skip('seed file not found')
+            return
+
+        name = os.path.basename(self.file_path)
+        stat = os.stat(self.file_path)
+        record = db.session.get(SeedFile, name)
+
+        # Constant-time restart: same size and mtime as the recorded load
+        if record is not None and (record.size, record.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            self.checksum = record.checksum
+            self._skip('unchanged since last load')
+            return
+
+        self.checksum = file_checksum(self.file_path)
+        if record is not None and record.checksum == self.checksum:
+            self._record(name, stat, record.rows)
+            self._skip('checksum matches last load')
+            return
+
+        if record is None and db.session.query(Song.index).first() is not None:
+            # Loaded before checksums were recorded (or data came from uploads)
+            self._record(name, stat, None)
+            self._skip('database already contains data')
+            return
+
+        self.state = 'loading'
+        songs_upserted.connect(self._count_rows, sender=self.app)
+        try:
+            if is_snapshot(self.file_path):
+                inserted_count = DataProcessor.import_snapshot(self.file_path)['inserted']
+            else:
+                inserted_count = DataProcessor.process_json_file(self.file_path)
+        finally:
+            songs_upserted.disconnect(self._count_rows, sender=self.app)
+        self._record(name, stat, self.rows_loaded)
+        self.state = 'ready'
+        logger.info(f"Seed songs loaded successfully ({inserted_count} inserted) "
+                    f"in {time.time() - self.started_at:.1f}s")
+
+    def _count_rows(self, sender, ids=(), **extra: Any) -> None:
+        # Only commits made by the seeding thread count towards progress
+        if threading.get_ident() == self._thread_id:
+            self.rows_loaded += len(ids)
+
+    def _skip(self, reason: str) -> None:
+        self.state = 'skipped'
+        self.reason = reason
+        logger.info(f"Skipping seed load: {reason}")
+
+    def _record(self, name: str, stat: os.stat_result, rows: Optional[int]) -> None:
+        db.session.merge(SeedFile(
+            name=name,
+            checksum=self.checksum,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            rows=rows,
+            loaded_at=datetime.utcnow()
+        ))
+        db.session.commit()
+
+    def progress(self) -> Dict[str, Any]:
+        """State and progress in the /readyz response shape"""
+        end = self.finished_at or time.time()
+        return {
+            'state': self.state,
+            'reason': self.reason,
+            'error': self.error,
+            'file': os.path.basename(self.file_path),
+            'rows_loaded': self.rows_loaded,
+            'checksum': self.checksum,
+            'elapsed_seconds': round(end - self.started_at, 3) if self.started_at else None
+        }
+
+
+def init_seed_loader(app, file_path: str, background: bool = True) -> SeedLoader:
+    """Create the app's seed loader and start it (in a thread unless background is False)"""
+    loader = SeedLoader(app, file_path)
+    app.extensions['seed_loader'] = loader
+    if background:
+        loader.start()
+    else:
+        loader.run()
+    return loader
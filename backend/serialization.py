@@ -0,0 +1,228 @@
+import json
+from datetime import datetime
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+from flask import current_app
+from sqlalchemy import String, select, type_coerce
+from models import db, Song
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Fields in Song.to_dict() order, one per songs table column
+SONG_FIELDS = [column.name for column in Song.__table__.columns]
+
+# Matches Flask's compact jsonify output (sorted keys, ASCII-only)
+_encode_value = json.JSONEncoder(sort_keys=True, separators=(',', ':')).encode
+
+
+def _kind(column) -> str:
+    python_type = column.type.python_type
+    if python_type is str:
+        return 'str'
+    if python_type is int:
+        return 'int'
+    if python_type is float:
+        return 'float'
+    if python_type is datetime:
+        return 'datetime'
+    return 'any'
+
+
+def isoformat(value: Any) -> str:
+    """A datetime, or SQLite's stored text for one, as Song.to_dict() renders it"""
+    if value.__class__ is str:
+        # Raw SQLite storage format: 'YYYY-MM-DD HH:MM:SS.ffffff'
+        if len(value) == 26 and value[10] == ' ':
+            if value.endswith('.000000'):
+                value = value[:19]
+            return f'{value[:10]}T{value[11:]}'
+        value = datetime.fromisoformat(value)
+    return value.isoformat()
+
+
+def _datetime_json(value: Any) -> str:
+    """JSON for a datetime as Song.to_dict() renders it (isoformat)"""
+    if value is None:
+        return 'null'
+    return f'"{isoformat(value)}"'
+
+
+# Inline expression per column kind; None falls through to A() -> 'null'
+_FIELD_TEMPLATES = {
+    'str': 'E({v}) if {v}.__class__ is str else A({v})',
+    'int': '{v} if {v}.__class__ is int else A({v})',
+    # x - x == 0 rules out inf/nan, which json renders as Infinity/NaN
+    'float': 'R({v}) if {v}.__class__ is float and {v} - {v} == 0 else A({v})',
+    'datetime': 'D({v})',
+    'any': 'A({v})',
+}
+
+
+def _compile(name: str, fields: Sequence[str], expressions: Sequence[str]) -> Callable[..., str]:
+    """Compile `name(row)` returning a JSON object with the fields in sorted key order"""
+    names = [f'v{position}' for position in range(len(fields))]
+    parts = []
+    for field, position in sorted(zip(fields, range(len(fields)))):
+        key = encode_basestring_ascii(field).replace('{', '{{').replace('}', '}}')
+        parts.append(f'{key}:{{{expressions[position].format(v=names[position])}}}')
+
+    source = (
+        f"def {name}(row):\n"
+        f"    {', '.join(names)}, = row\n"
+        f"    return f'{{{{{','.join(parts)}}}}}'\n"
+    )
+    namespace = {
+        'E': encode_basestring_ascii,
+        'R': float.__repr__,
+        'A': _encode_value,
+        'D': _datetime_json,
+    }
+    exec(compile(source, f'<{name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+def compile_row_encoder(fields: Sequence[str], kinds: Sequence[str]) -> Callable[[Sequence[Any]], str]:
+    """
+    Build a function turning a row tuple into a compact JSON object.
+
+    The object's keys are emitted sorted, and every value is encoded exactly
+    as json.dumps would, so the result is byte-for-byte what jsonify produces
+    for the equivalent dict in compact mode. The key layout is fixed when the
+    encoder is compiled, leaving only the per-value work for each row.
+
+    Args:
+        fields: Field name of each row position
+        kinds: 'str', 'int', 'float', 'datetime' or 'any' per position
+    """
+    return _compile('encode_row', fields, [_FIELD_TEMPLATES[kind] for kind in kinds])
+
+
+def _encode_column(kind: str, values: Sequence[Any]) -> List[str]:
+    """JSON text of every value in a column, as json.dumps renders it"""
+    if kind in ('float', 'int') and orjson is not None:
+        try:
+            text = orjson.dumps(values).decode('ascii')[1:-1]
+        except TypeError:
+            text = None
+        if text is None:
+            pass
+        elif kind == 'int':
+            # Anything but plain integers and nulls takes the exact path below
+            if '.' not in text and 'e' not in text:
+                return text.split(',')
+        else:
+            encoded = text.split(',')
+            # orjson agrees with repr() except where repr switches to an
+            # exponent (below 1e-4, from 1e16) and for inf/nan (null)
+            if 'e' in text or '0.0000' in text or 'null' in text:
+                for position, item in enumerate(encoded):
+                    if ('e' in item or item.startswith(('0.0000', '-0.0000'))
+                            or (item == 'null' and values[position] is not None)):
+                        encoded[position] = _encode_value(values[position])
+            return encoded
+
+    if kind == 'datetime':
+        return list(map(_datetime_json, values))
+    if kind == 'str':
+        return [encode_basestring_ascii(v) if v.__class__ is str else _encode_value(v) for v in values]
+    if kind == 'int':
+        return [str(v) if v.__class__ is int else _encode_value(v) for v in values]
+    if kind == 'float':
+        return [float.__repr__(v) if v.__class__ is float and v - v == 0 else _encode_value(v)
+                for v in values]
+    return list(map(_encode_value, values))
+
+
+# Value kind of each SONG_FIELDS column ('str', 'int', 'float', 'datetime' or 'any')
+SONG_KINDS = [_kind(column) for column in Song.__table__.columns]
+encode_song_row = compile_row_encoder(SONG_FIELDS, SONG_KINDS)
+
+# Lays out pre-encoded values; used by encode_song_rows
+_assemble_song = _compile('assemble_row', SONG_FIELDS, ['{v}'] * len(SONG_FIELDS))
+
+
+def song_columns() -> List[Any]:
+    """
+    Columns to select for encode_song_row, in SONG_FIELDS order.
+
+    On SQLite, datetimes are fetched as their stored text and rewritten to
+    isoformat by the encoder, skipping the DateTime result processor.
+    """
+    raw_datetimes = db.session.get_bind().dialect.name == 'sqlite'
+    columns = []
+    for column in Song.__table__.columns:
+        if raw_datetimes and _kind(column) == 'datetime':
+            columns.append(type_coerce(column, String).label(column.name))
+        else:
+            columns.append(column.label(column.name))
+    return columns
+
+
+def select_songs():
+    """Core SELECT of song rows for the fast serialization path"""
+    return select(*song_columns())
+
+
+def encode_song_objects(rows: Sequence[Sequence[Any]]) -> List[str]:
+    """
+    JSON object per song row, byte-for-byte the same as encode_song_row.
+
+    Values are encoded a column at a time (whole numeric columns in one
+    orjson call when it is installed) and then laid out row by row.
+    """
+    if not rows:
+        return []
+    columns = [_encode_column(kind, values) for kind, values in zip(SONG_KINDS, zip(*rows))]
+    return list(map(_assemble_song, zip(*columns)))
+
+
+def encode_song_rows(rows: Iterable[Sequence[Any]]) -> str:
+    """JSON array of song rows"""
+    return '[' + ','.join(encode_song_objects(list(rows))) + ']'
+
+
+def song_column_lists(rows: Sequence[Sequence[Any]]) -> Dict[str, List[Any]]:
+    """Song rows pivoted to {field: values} in SONG_FIELDS order, datetimes in isoformat"""
+    columns = zip(*rows) if rows else [()] * len(SONG_FIELDS)
+    result = {}
+    for field, kind, values in zip(SONG_FIELDS, SONG_KINDS, columns):
+        if kind == 'datetime':
+            result[field] = [None if value is None else isoformat(value) for value in values]
+        else:
+            result[field] = list(values)
+    return result
+
+
+def encode_song_columns(rows: Iterable[Sequence[Any]]) -> str:
+    """
+    Column-major JSON of song rows: {"index": [...], "id": [...], ...} in
+    SONG_FIELDS order, each value encoded as encode_song_row encodes it.
+    Field names appear once rather than once per row.
+    """
+    rows = list(rows)
+    columns = zip(*rows) if rows else [()] * len(SONG_FIELDS)
+    members = []
+    for field, kind, values in zip(SONG_FIELDS, SONG_KINDS, columns):
+        encoded = ','.join(_encode_column(kind, values)) if values else ''
+        members.append(f'{encode_basestring_ascii(field)}:[{encoded}]')
+    return '{' + ','.join(members) + '}'
+
+
+def encode_envelope(envelope: Dict[str, Any], rows: Iterable[Sequence[Any]], key: str = 'data',
+                    encode_rows: Callable[[Iterable[Sequence[Any]]], str] = encode_song_rows) -> str:
+    """Compact JSON of a response envelope whose `key` holds song rows (encoded by encode_rows)"""
+    members = []
+    for name in sorted(set(envelope) | {key}):
+        value = encode_rows(rows) if name == key else _encode_value(envelope[name])
+        members.append(f'{encode_basestring_ascii(name)}:{value}')
+    return '{' + ','.join(members) + '}'
+
+
+def songs_response(envelope: Dict[str, Any], rows: Iterable[Sequence[Any]], status: int = 200):
+    """JSON response for an envelope plus song rows, like jsonify in compact mode"""
+    body = encode_envelope(envelope, rows) + '\n'
+    return current_app.response_class(body, status=status, mimetype='application/json')
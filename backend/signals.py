@@ -0,0 +1,13 @@
+from blinker import Namespace
+
+# Signals sent after song data is committed. The sender is the Flask app,
+# so receivers should connect with sender=app.
+_signals = Namespace()
+
+# Sent after each commit that writes songs (bulk upsert batches, rating
+# updates); ids: list of song ids written
+songs_upserted = _signals.signal('songs-upserted')
+
+# Sent after each DataProcessor.bulk_upsert call commits; inserted, updated,
+# elapsed_seconds: its row counts and duration
+songs_ingested = _signals.signal('songs-ingested')
@@ -0,0 +1,449 @@
+import heapq
+import logging
+import math
+import threading
+import warnings
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from models import db, Song
+from signals import songs_upserted
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Audio features making up a song's vector
+FEATURES = ['danceability', 'energy', 'loudness', 'acousticness',
+            'instrumentalness', 'liveness', 'valence', 'tempo']
+
+# Ids looked up per query when applying upserts
+LOOKUP_CHUNK = 900
+
+# Rows sampled to train the partition centroids, and k-means iterations
+TRAIN_SAMPLE = 50000
+TRAIN_ITERATIONS = 8
+
+# Rows per block when assigning every song to its nearest centroid
+ASSIGN_BLOCK = 65536
+
+
+def _feature_columns() -> List[Any]:
+    return [getattr(Song, name) for name in FEATURES]
+
+
+class FeatureIndex:
+    """
+    k-nearest-neighbour index over song audio feature vectors.
+
+    Vectors are z-score normalized per feature (missing values become the
+    feature mean) and stored in array rows keyed by Song.index. Queries use
+    Euclidean distance in the normalized space.
+
+    Two query paths:
+
+        exact        vectorized brute force over every vector
+        partitioned  vectors are clustered into ~sqrt(n) cells (k-means on a
+                     sample); a query scans only the nprobe cells whose
+                     centroids are nearest (approximate, much faster)
+
+    The partitioned path is used once the catalog reaches
+    partition_threshold songs. Upserts update vectors and cell assignments
+    in place; normalization and centroids are refreshed by a background
+    rebuild once rebuild_ratio of the catalog has changed since the last one.
+
+    Without NumPy only the exact path is available, in pure Python.
+    """
+
+    def __init__(self, partition_threshold: int = 50000, nprobe: int = 8,
+                 rebuild_ratio: float = 0.2):
+        self.partition_threshold = partition_threshold
+        self.nprobe = nprobe
+        self.rebuild_ratio = rebuild_ratio
+        self._lock = threading.RLock()
+        self._rebuilding = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self.size = 0
+        self._changed = 0
+        self._touched = None
+        if np is None:
+            self._rows: Dict[int, Tuple[Optional[float], ...]] = {}
+            self._normalized: Dict[int, Tuple[float, ...]] = {}
+            self._mean = [0.0] * len(FEATURES)
+            self._std = [1.0] * len(FEATURES)
+            return
+        self._raw = np.full((0, len(FEATURES)), np.nan)
+        self._present = np.zeros(0, dtype=bool)
+        self._mean = np.zeros(len(FEATURES))
+        self._std = np.ones(len(FEATURES))
+        self._vectors = np.zeros((0, len(FEATURES)), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._clear_partitions()
+
+    def _clear_partitions(self) -> None:
+        self._centroids = None
+        self._cell_of = np.full(len(self._present), -1, dtype=np.int32)
+        self._order = np.zeros(0, dtype=np.int32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._extra: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def partitioned(self) -> bool:
+        return np is not None and self._centroids is not None
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def build(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Replace the index contents with (song index, *FEATURES) rows"""
+        with self._lock:
+            self._reset()
+            self._store(rows)
+            self._refit()
+
+    def build_from_db(self, chunk_size: int = 10000) -> None:
+        """Build from the songs table, streaming rows in index order"""
+        rows = db.session.execute(
+            select(Song.index, *_feature_columns())
+            .order_by(Song.index)
+            .execution_options(yield_per=chunk_size)
+        )
+        self.build(rows)
+        logger.info(f"Feature index built: {self.size} songs"
+                    f"{' (partitioned)' if self.partitioned else ''}")
+
+    def rebuild(self) -> None:
+        """Refit normalization and partitions from the stored vectors"""
+        if np is None:
+            with self._lock:
+                self._refit()
+            return
+
+        with self._lock:
+            raw = self._raw.copy()
+            present = self._present.copy()
+            self._touched = set()
+
+        fitted = _fit(raw, present, self.partition_threshold)
+
+        with self._lock:
+            self._mean, self._std, vectors, norms = fitted[:4]
+            self._centroids, cell_of, self._order, self._offsets = fitted[4:]
+            # Songs beyond the snapshot's capacity may have arrived meanwhile
+            grow = len(self._present) - len(vectors)
+            self._vectors = np.vstack([vectors, np.zeros((grow, len(FEATURES)), dtype=np.float32)])
+            self._norms = np.concatenate([norms, np.zeros(grow, dtype=np.float32)])
+            self._cell_of = np.concatenate([cell_of, np.full(grow, -1, dtype=np.int32)])
+            self._extra = {}
+            self._changed = 0
+            # Re-apply rows upserted while the rebuild was running
+            touched, self._touched = self._touched, None
+            if touched:
+                self._normalize_rows(np.fromiter(touched, dtype=np.int64))
+        logger.info(f"Feature index rebuilt: {self.size} songs")
+
+    def _refit(self) -> None:
+        """Fit normalization and partitions in place (lock held)"""
+        self._changed = 0
+        if np is None:
+            self._mean, self._std = _python_stats(self._rows.values())
+            self._normalized = {doc: self._normalize(row) for doc, row in self._rows.items()}
+            return
+        fitted = _fit(self._raw, self._present, self.partition_threshold)
+        self._mean, self._std, self._vectors, self._norms = fitted[:4]
+        self._centroids, self._cell_of, self._order, self._offsets = fitted[4:]
+        self._extra = {}
+
+    def update(self, rows: Iterable[Sequence[Any]]) -> None:
+        """
+        Apply upserted (song index, *FEATURES) rows.
+
+        Vectors and cell assignments change in place with the current
+        normalization; a background rebuild is started once enough of the
+        catalog has changed.
+        """
+        with self._lock:
+            docs = self._store(rows)
+            if not docs:
+                return
+            self._changed += len(docs)
+            if np is None:
+                for doc in docs:
+                    self._normalized[doc] = self._normalize(self._rows[doc])
+            else:
+                if self._touched is not None:
+                    self._touched.update(docs)
+                self._normalize_rows(np.asarray(docs, dtype=np.int64))
+
+            stale = self._changed > self.rebuild_ratio * max(self.size, 1)
+            crossed = np is not None and not self.partitioned and self.size >= self.partition_threshold
+            if (stale or crossed) and not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._background_rebuild, name='feature-index-rebuild',
+                                 daemon=True).start()
+
+    def _background_rebuild(self) -> None:
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.error(f"Feature index rebuild failed: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def _store(self, rows: Iterable[Sequence[Any]]) -> List[int]:
+        """Store raw rows (lock held); returns the song indexes written"""
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return []
+        docs = [row[0] for row in rows]
+
+        if np is None:
+            for row in rows:
+                if row[0] not in self._rows:
+                    self.size += 1
+                self._rows[row[0]] = row[1:]
+            return docs
+
+        doc_array = np.asarray(docs, dtype=np.int64)
+        self._grow(int(doc_array.max()) + 1)
+        values = np.array([row[1:] for row in rows], dtype=np.float64)
+        self.size += int(np.count_nonzero(~self._present[doc_array]))
+        self._raw[doc_array] = values
+        self._present[doc_array] = True
+        return docs
+
+    def _grow(self, capacity: int) -> None:
+        current = len(self._present)
+        if capacity <= current:
+            return
+        capacity = max(capacity, current * 2)
+        grow = capacity - current
+        self._raw = np.vstack([self._raw, np.full((grow, len(FEATURES)), np.nan)])
+        self._present = np.concatenate([self._present, np.zeros(grow, dtype=bool)])
+        self._vectors = np.vstack([self._vectors, np.zeros((grow, len(FEATURES)), dtype=np.float32)])
+        self._norms = np.concatenate([self._norms, np.zeros(grow, dtype=np.float32)])
+        self._cell_of = np.concatenate([self._cell_of, np.full(grow, -1, dtype=np.int32)])
+
+    def _normalize_rows(self, docs) -> None:
+        """Normalize stored rows and reassign their cells (lock held)"""
+        vectors = _normalize(self._raw[docs], self._mean, self._std)
+        self._vectors[docs] = vectors
+        self._norms[docs] = np.einsum('ij,ij->i', vectors, vectors)
+        if self._centroids is None:
+            return
+        cells = _nearest(vectors, self._centroids)
+        for doc, cell in zip(docs.tolist(), cells.tolist()):
+            if self._cell_of[doc] != cell:
+                self._cell_of[doc] = cell
+                self._extra.setdefault(cell, []).append(doc)
+
+    def _normalize(self, row: Sequence[Optional[float]]) -> Tuple[float, ...]:
+        return tuple(
+            0.0 if value is None else (value - mean) / std
+            for value, mean, std in zip(row, self._mean, self._std)
+        )
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def neighbours(self, doc: int, k: int = 10, exact: bool = False) -> List[Tuple[int, float]]:
+        """
+        The k songs nearest to a song, excluding itself.
+
+        Args:
+            doc: Song index
+            k: Number of neighbours
+            exact: Force the brute-force path on a partitioned index
+
+        Returns:
+            [(song index, distance)] nearest first; [] if the song is unknown
+        """
+        with self._lock:
+            if np is None:
+                query = self._normalized.get(doc)
+                if query is None:
+                    return []
+                nearest = heapq.nsmallest(k, (
+                    (math.dist(query, vector), other)
+                    for other, vector in self._normalized.items() if other != doc
+                ))
+                return [(other, distance) for distance, other in nearest]
+
+            if doc >= len(self._present) or not self._present[doc]:
+                return []
+            query = self._vectors[doc]
+
+            candidates = None
+            if self.partitioned and not exact:
+                candidates = self._candidates(query)
+                # Too few songs near the query: scan everything instead
+                if len(candidates) <= k:
+                    candidates = None
+
+            if candidates is None:
+                distances = self._norms - 2.0 * (self._vectors @ query) + self._norms[doc]
+                distances[~self._present] = np.inf
+                distances[doc] = np.inf
+                docs = None
+            else:
+                candidates = candidates[candidates != doc]
+                vectors = self._vectors[candidates]
+                distances = self._norms[candidates] - 2.0 * (vectors @ query) + self._norms[doc]
+                docs = candidates
+
+        k = min(k, len(distances) - (1 if docs is None else 0))
+        if k <= 0:
+            return []
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind='stable')]
+        found = top if docs is None else docs[top]
+        result = np.sqrt(np.maximum(distances[top], 0.0))
+        return [(int(other), float(distance)) for other, distance in zip(found, result)
+                if math.isfinite(distance)]
+
+    def _candidates(self, query):
+        """Songs in the nprobe cells nearest to the query (lock held)"""
+        centroid_distances = ((self._centroids - query) ** 2).sum(axis=1)
+        probe = min(self.nprobe, len(self._centroids))
+        cells = np.argpartition(centroid_distances, probe - 1)[:probe]
+
+        parts = [self._order[self._offsets[cell]:self._offsets[cell + 1]] for cell in cells.tolist()]
+        parts.extend(np.asarray(self._extra[cell], dtype=np.int32)
+                     for cell in cells.tolist() if cell in self._extra)
+        candidates = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int32)
+        # Drop songs that have since moved to another cell
+        return candidates[np.isin(self._cell_of[candidates], cells)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, mode and memory of the index"""
+        with self._lock:
+            stats = {
+                'songs': self.size,
+                'mode': 'partitioned' if self.partitioned else 'exact',
+                'changed_since_build': self._changed
+            }
+            if np is not None:
+                stats['cells'] = 0 if self._centroids is None else len(self._centroids)
+                stats['nprobe'] = self.nprobe
+                stats['memory_bytes'] = int(sum(
+                    part.nbytes for part in (self._raw, self._present, self._vectors, self._norms,
+                                             self._cell_of, self._order, self._offsets)
+                ))
+            return stats
+
+
+def _normalize(raw, mean, std):
+    vectors = (raw - mean) / std
+    return np.nan_to_num(vectors, nan=0.0).astype(np.float32)
+
+
+def _nearest(vectors, centroids):
+    """Nearest centroid of each vector, in blocks to bound memory"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    cells = np.empty(len(vectors), dtype=np.int32)
+    block = max(1, ASSIGN_BLOCK * 64 // max(len(centroids), 1))
+    for start in range(0, len(vectors), block):
+        part = vectors[start:start + block]
+        cells[start:start + block] = np.argmin(centroid_norms - 2.0 * (part @ centroids.T), axis=1)
+    return cells
+
+
+def _fit(raw, present, partition_threshold: int):
+    """
+    Normalization stats, normalized vectors and (above the threshold) partitions.
+
+    Returns:
+        (mean, std, vectors, norms, centroids, cell_of, order, offsets)
+    """
+    rows = raw[present]
+    if len(rows):
+        # A feature missing on every song warns "Mean of empty slice"; it
+        # falls back to mean 0 / std 1 below
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(rows, axis=0)
+            std = np.nanstd(rows, axis=0)
+        mean = np.nan_to_num(mean, nan=0.0)
+        std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+    else:
+        mean, std = np.zeros(raw.shape[1]), np.ones(raw.shape[1])
+
+    vectors = _normalize(raw, mean, std)
+    vectors[~present] = 0.0
+    norms = np.einsum('ij,ij->i', vectors, vectors)
+
+    cell_of = np.full(len(present), -1, dtype=np.int32)
+    docs = np.flatnonzero(present).astype(np.int32)
+    if len(docs) < partition_threshold:
+        return mean, std, vectors, norms, None, cell_of, np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64)
+
+    # k-means over a sample, then every song goes to its nearest centroid
+    cells = max(1, int(math.sqrt(len(docs))))
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(docs, size=min(TRAIN_SAMPLE, len(docs)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=min(cells, len(sample)), replace=False)].copy()
+    for _ in range(TRAIN_ITERATIONS):
+        assignment = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=len(centroids))
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+
+    assignment = _nearest(vectors[docs], centroids)
+    cell_of[docs] = assignment
+    order = docs[np.argsort(assignment, kind='stable')]
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=offsets[1:])
+    return mean, std, vectors, norms, centroids, cell_of, order, offsets
+
+
+def _python_stats(rows: Iterable[Sequence[Optional[float]]]) -> Tuple[List[float], List[float]]:
+    columns = list(zip(*rows))
+    mean, std = [], []
+    for position in range(len(FEATURES)):
+        values = [value for value in columns[position] if value is not None] if columns else []
+        average = sum(values) / len(values) if values else 0.0
+        spread = math.sqrt(sum((value - average) ** 2 for value in values) / len(values)) if values else 0.0
+        mean.append(average)
+        std.append(spread or 1.0)
+    return mean, std
+
+
+def init_feature_index(app) -> FeatureIndex:
+    """
+    Build the similar-songs index for an app and keep it updated on upserts.
+
+    Must be called inside an application context.
+    """
+    index = FeatureIndex(
+        partition_threshold=app.config['SIMILAR_PARTITION_THRESHOLD'],
+        nprobe=app.config['SIMILAR_NPROBE'],
+        rebuild_ratio=app.config['SIMILAR_REBUILD_RATIO']
+    )
+    index.build_from_db()
+    app.extensions['feature_index'] = index
+
+    def on_songs_upserted(sender, ids: Optional[List[str]] = None, **extra: Any) -> None:
+        if ids is None:
+            index.build_from_db()
+            return
+        for i in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[i:i + LOOKUP_CHUNK]
+            index.update(
+                db.session.execute(select(Song.index, *_feature_columns()).where(Song.id.in_(chunk)))
+            )
+
+    songs_upserted.connect(on_songs_upserted, sender=app, weak=False)
+    return index
@@ -0,0 +1,365 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import func, select
+from models import db, Song
+from serialization import SONG_FIELDS, _kind, song_columns
+from search_index import FTS_TABLE, TitleSearch
+from stats_summary import StatsSummary
+from data_version import DataVersion
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# File layout:
+#   MAGIC | uint64 header length | JSON header | padding to ALIGN | sections
+# Each section starts on an ALIGN boundary; offsets in the header are
+# relative to the end of the padded header. Per column:
+#   float / int / datetime: little-endian float64 / int64 / int64 (µs since
+#       the Unix epoch), one value per row; NULLs hold 0 and are flagged in
+#       an optional packed bitmap (bit set = NULL)
+#   str: int64 byte offsets (rows + 1) into a UTF-8 blob
+MAGIC = b'SONGSNP1'
+ALIGN = 64
+SNAPSHOT_EXTENSION = '.songsnap'
+
+_DTYPES = {'float': '<f8', 'int': '<i8', 'datetime': '<i8'}
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("Song snapshots require NumPy")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def is_snapshot(path: str) -> bool:
+    """Whether a file starts with the snapshot magic bytes"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class SongSnapshot:
+    """
+    Read-only, memory-mapped view of a songs snapshot file.
+
+    Numeric columns are NumPy arrays over the mapped file (no copy); strings
+    are decoded on access. Suitable both for bulk-loading a database and for
+    serving reads directly.
+    """
+
+    def __init__(self, path: str):
+        _require_numpy()
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a song snapshot")
+
+        (header_length,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_length])
+        self.rows = self.header['rows']
+        self._base = _aligned(header_start + header_length)
+        self._columns = {column['name']: column for column in self.header['columns']}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Arrays handed out still view the mapping; it is unmapped when they are freed
+            pass
+
+    def __enter__(self) -> 'SongSnapshot':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def fields(self) -> List[str]:
+        return [column['name'] for column in self.header['columns']]
+
+    def _array(self, dtype: str, offset: int, count: int):
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._base + offset)
+
+    def values(self, name: str):
+        """Fixed-width array of a numeric or datetime column (NULLs read as 0)"""
+        column = self._columns[name]
+        if column['kind'] == 'str':
+            raise ValueError(f"{name} is a string column")
+        return self._array(_DTYPES[column['kind']], column['offset'], self.rows)
+
+    def nulls(self, name: str):
+        """Boolean NULL mask of a column"""
+        column = self._columns[name]
+        if column.get('nulls') is None:
+            return np.zeros(self.rows, dtype=bool)
+        packed = self._array('u1', column['nulls'], (self.rows + 7) // 8)
+        return np.unpackbits(packed, count=self.rows, bitorder='little').astype(bool)
+
+    def strings(self, name: str, start: int = 0, stop: Optional[int] = None) -> List[Optional[str]]:
+        """Decoded values of a string column for rows [start, stop)"""
+        column = self._columns[name]
+        stop = self.rows if stop is None else min(stop, self.rows)
+        offsets = self._array('<i8', column['offsets'], self.rows + 1)[start:stop + 1].tolist()
+        base = self._base + column['offset']
+        blob = self._mmap[base + offsets[0]:base + offsets[-1]]
+        text = blob.decode('utf-8')
+        first = offsets[0]
+        if len(text) == len(blob):
+            # ASCII: byte offsets are character offsets, slice the decoded text
+            values = [text[a - first:b - first] for a, b in zip(offsets, offsets[1:])]
+        else:
+            values = [blob[a - first:b - first].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+        if column.get('nulls') is not None:
+            mask = self.nulls(name)[start:stop]
+            values = [None if null else value for value, null in zip(values, mask.tolist())]
+        return values
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None,
+               stored: bool = False) -> List[Any]:
+        """
+        Python values of any column for rows [start, stop).
+
+        Datetimes come back as datetime objects, or with stored=True as the
+        text SQLAlchemy writes to SQLite ('YYYY-MM-DD HH:MM:SS.ffffff').
+        """
+        kind = self._columns[name]['kind']
+        if kind == 'str':
+            return self.strings(name, start, stop)
+
+        raw = self.values(name)[start:stop]
+        if kind == 'datetime' and stored:
+            text = np.char.replace(np.datetime_as_string(raw.astype('datetime64[us]'), unit='us'), 'T', ' ')
+            values = text.tolist()
+        elif kind == 'datetime':
+            values = raw.astype('datetime64[us]').tolist()
+        else:
+            values = raw.tolist()
+        mask = self.nulls(name)[start:stop]
+        if mask.any():
+            values = [None if null else value for value, null in zip(values, mask.tolist())]
+        return values
+
+    def iter_rows(self, batch_size: int = 50000) -> Iterator[List[tuple]]:
+        """Row tuples of stored values in field order, batch_size rows at a time"""
+        for start in range(0, self.rows, batch_size):
+            stop = min(start + batch_size, self.rows)
+            yield list(zip(*(self.column(name, start, stop, stored=True) for name in self.fields)))
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows [start, stop) as song records keyed by field name"""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        columns = {name: self.column(name, start, stop) for name in self.fields}
+        return [
+            {name: values[position] for name, values in columns.items()}
+            for position in range(stop - start)
+        ]
+
+
+class SnapshotWriter:
+    """Writes the songs table to a snapshot file"""
+
+    @staticmethod
+    def _encode_column(kind: str, values: List[Any]):
+        """(data bytes, offsets bytes or None, null bitmap bytes or None)"""
+        if kind in ('float', 'int'):
+            # None converts to NaN, which doubles as the NULL mask
+            array = np.array(values, dtype=np.float64)
+            mask = np.isnan(array)
+        else:
+            mask = np.array([value is None for value in values], dtype=bool)
+        has_nulls = bool(mask.any())
+
+        if kind == 'str':
+            encoded = [b'' if value is None else value.encode('utf-8') for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            data, offsets = b''.join(encoded), offsets.tobytes()
+        else:
+            offsets = None
+            if kind == 'datetime':
+                text = [
+                    '1970-01-01' if value is None else value.isoformat() if isinstance(value, datetime) else value
+                    for value in values
+                ]
+                array = np.array(text, dtype='datetime64[us]').astype('<i8')
+            elif kind == 'int':
+                array = np.array([0 if value is None else value for value in values], dtype='<i8')
+            array[mask] = 0
+            data = array.tobytes()
+
+        nulls = np.packbits(mask, bitorder='little').tobytes() if has_nulls else None
+        return data, offsets, nulls
+
+    @staticmethod
+    def write(path: str, chunk_size: int = 50000) -> Dict[str, Any]:
+        """
+        Write every song, ordered by index, to a snapshot file.
+
+        Returns:
+            Dictionary with rows, bytes and elapsed_seconds
+        """
+        _require_numpy()
+        started = time.perf_counter()
+        kinds = {column.name: _kind(column) for column in Song.__table__.columns}
+
+        values: Dict[str, List[Any]] = {name: [] for name in SONG_FIELDS}
+        # Core execution: plain row tuples without ORM result processing
+        result = db.session.connection().execution_options(yield_per=chunk_size).execute(
+            select(*song_columns()).order_by(Song.index)
+        )
+        for rows in result.partitions():
+            for name, column in zip(SONG_FIELDS, zip(*rows)):
+                values[name].extend(column)
+        rows = len(values[SONG_FIELDS[0]])
+
+        header_columns, sections, offset = [], [], 0
+        for name in SONG_FIELDS:
+            data, offsets, nulls = SnapshotWriter._encode_column(kinds[name], values.pop(name))
+            entry = {'name': name, 'kind': kinds[name], 'offset': offset, 'length': len(data), 'nulls': None}
+            sections.append((offset, data))
+            offset = _aligned(offset + len(data))
+            if offsets is not None:
+                entry['offsets'] = offset
+                sections.append((offset, offsets))
+                offset = _aligned(offset + len(offsets))
+            if nulls is not None:
+                entry['nulls'] = offset
+                sections.append((offset, nulls))
+                offset = _aligned(offset + len(nulls))
+            header_columns.append(entry)
+
+        header = json.dumps({
+            'format': 1,
+            'table': Song.__tablename__,
+            'rows': rows,
+            'created_at': datetime.utcnow().isoformat(),
+            'columns': header_columns
+        }, separators=(',', ':')).encode('utf-8')
+        base = _aligned(len(MAGIC) + 8 + len(header))
+
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for section_offset, data in sections:
+                f.seek(base + section_offset)
+                f.write(data)
+            f.truncate(base + offset)
+        os.replace(temporary, path)
+
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path)
+        logger.info(f"Wrote snapshot of {rows} songs to {path} ({size} bytes, {elapsed:.2f}s)")
+        return {'rows': rows, 'bytes': size, 'elapsed_seconds': elapsed}
+
+
+def _deferrable_schema(connection) -> List[tuple]:
+    """(name, type, sql) of the songs table's secondary indexes and triggers on SQLite"""
+    if connection.dialect.name != 'sqlite':
+        return []
+    return connection.exec_driver_sql(
+        "SELECT name, type, sql FROM sqlite_master "
+        "WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL "
+        "ORDER BY type = 'trigger'",
+        (Song.__tablename__,)
+    ).all()
+
+
+def _refresh_derived(triggers: List[str]) -> None:
+    """Rebuild what the dropped triggers would have maintained during a bulk load"""
+    if any(name.startswith(FTS_TABLE) for name in triggers):
+        TitleSearch.rebuild()
+    if any(name.startswith('song_stats') for name in triggers):
+        StatsSummary.rebuild()
+
+
+def insert_rows(fields: List[str], batches: Iterable[List[tuple]]) -> None:
+    """
+    INSERT row batches (tuples in fields order) into the empty songs table.
+
+    Plain executemany with no normalization or upsert. On SQLite the
+    secondary indexes and triggers are dropped for the load and recreated in
+    the same transaction (which also records the rows in the shared data
+    version, as one write), and the full-text index and stats summary are
+    rebuilt after the commit. Callers send songs_upserted themselves.
+    """
+    columns = ', '.join(f'"{name}"' for name in fields)
+    placeholders = ', '.join('?' for _ in fields)
+    statement = f'INSERT INTO {Song.__tablename__} ({columns}) VALUES ({placeholders})'
+    connection = db.session.connection()
+    if connection.dialect.paramstyle != 'qmark':
+        statement = statement.replace('?', '%s')
+    deferred = _deferrable_schema(connection)
+    try:
+        for name, kind, _ in deferred:
+            connection.exec_driver_sql(f'DROP {kind.upper()} "{name}"')
+        for rows in batches:
+            connection.exec_driver_sql(statement, rows)
+        for _, _, sql in deferred:
+            connection.exec_driver_sql(sql)
+        DataVersion.log_writes(connection)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    _refresh_derived([name for name, kind, _ in deferred if kind == 'trigger'])
+
+
+def load_snapshot(path: str, batch_size: int = 50000) -> Dict[str, Any]:
+    """
+    Load a snapshot into the songs table.
+
+    An empty table is filled with plain executemany INSERTs of the stored
+    values (no normalization or upsert). On SQLite its secondary indexes and
+    triggers are dropped for the load and recreated in the same transaction,
+    and the full-text index and stats summary are rebuilt after the commit.
+    A populated table is upserted by id through DataProcessor.bulk_upsert.
+
+    Returns:
+        Dictionary with inserted, updated, open_seconds and elapsed_seconds
+    """
+    from data_processor import DataProcessor  # imports this module
+
+    started = time.perf_counter()
+    with SongSnapshot(path) as snapshot:
+        opened = time.perf_counter() - started
+        fields = snapshot.fields
+        empty = db.session.scalar(select(func.count()).select_from(Song)) == 0
+
+        if empty:
+            insert_rows(fields, snapshot.iter_rows(batch_size))
+            DataProcessor._notify_upserted(snapshot.strings('id'))
+            result = {'inserted': snapshot.rows, 'updated': 0}
+        else:
+            records = (record for start in range(0, snapshot.rows, batch_size)
+                       for record in snapshot.records(start, start + batch_size))
+            upserted = DataProcessor.bulk_upsert(records)
+            result = {'inserted': upserted['inserted'], 'updated': upserted['updated']}
+
+    result['open_seconds'] = opened
+    result['elapsed_seconds'] = time.perf_counter() - started
+    logger.info(f"Loaded snapshot {path}: {result['inserted']} inserted, {result['updated']} updated "
+                f"({result['elapsed_seconds']:.2f}s)")
+    return result
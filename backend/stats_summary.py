@@ -0,0 +1,352 @@
+import logging
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, func, text
+from sqlalchemy.exc import OperationalError
+from models import db, Song
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns whose averages /api/stats reports
+AVERAGED_COLUMNS = ['danceability', 'energy', 'tempo', 'duration_ms']
+
+
+def _sum_terms(row: str, sign: str) -> str:
+    """SET clauses adding (sign '+') or removing (sign '-') a row's values, and whether it is unrated"""
+    terms = []
+    for column in AVERAGED_COLUMNS:
+        terms.append(f"sum_{column} = sum_{column} {sign} COALESCE({row}.{column}, 0)")
+        terms.append(f"count_{column} = count_{column} {sign} ({row}.{column} IS NOT NULL)")
+    terms.append(f"unrated = unrated {sign} ({row}.star_rating IS NULL)")
+    return ',\n            '.join(terms)
+
+
+_RECOMPUTE_EXTREMES = """
+            min_duration_ms = (SELECT MIN(duration_ms) FROM songs),
+            max_duration_ms = (SELECT MAX(duration_ms) FROM songs)"""
+
+# Summary row + rating histogram, maintained by triggers on single-row and
+# small writes (rating updates, deletes, small upserts); large bulk upsert
+# batches run without them and apply the batch's totals at once
+# (batch_totals / apply_batch). MIN/MAX are recomputed through the
+# duration_ms index only when an extreme value may have been removed. Songs
+# without a rating are counted in the summary row (the histogram is keyed on
+# the rating).
+STATS_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS song_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total INTEGER NOT NULL DEFAULT 0,
+        {', '.join(f'sum_{c} REAL NOT NULL DEFAULT 0, count_{c} INTEGER NOT NULL DEFAULT 0'
+                   for c in AVERAGED_COLUMNS)},
+        unrated INTEGER NOT NULL DEFAULT 0,
+        min_duration_ms INTEGER,
+        max_duration_ms INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS song_rating_counts (
+        rating INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS song_stats_ai AFTER INSERT ON songs BEGIN
+        UPDATE song_stats SET
+            total = total + 1,
+            {_sum_terms('new', '+')},
+            min_duration_ms = CASE
+                WHEN new.duration_ms IS NULL THEN min_duration_ms
+                WHEN min_duration_ms IS NULL OR new.duration_ms < min_duration_ms THEN new.duration_ms
+                ELSE min_duration_ms END,
+            max_duration_ms = CASE
+                WHEN new.duration_ms IS NULL THEN max_duration_ms
+                WHEN max_duration_ms IS NULL OR new.duration_ms > max_duration_ms THEN new.duration_ms
+                ELSE max_duration_ms END
+        WHERE id = 1;
+        INSERT INTO song_rating_counts (rating, count) SELECT new.star_rating, 1
+            WHERE new.star_rating IS NOT NULL
+            ON CONFLICT (rating) DO UPDATE SET count = count + 1;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS song_stats_ad AFTER DELETE ON songs BEGIN
+        UPDATE song_stats SET
+            total = total - 1,
+            {_sum_terms('old', '-')}
+        WHERE id = 1;
+        UPDATE song_stats SET{_RECOMPUTE_EXTREMES}
+        WHERE id = 1 AND old.duration_ms IN (min_duration_ms, max_duration_ms);
+        UPDATE song_rating_counts SET count = count - 1 WHERE rating = old.star_rating;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS song_stats_au
+        AFTER UPDATE OF {', '.join(AVERAGED_COLUMNS)}, star_rating ON songs BEGIN
+        UPDATE song_stats SET
+            {_sum_terms('old', '-')}
+        WHERE id = 1;
+        UPDATE song_stats SET
+            {_sum_terms('new', '+')}
+        WHERE id = 1;
+        UPDATE song_stats SET{_RECOMPUTE_EXTREMES}
+        WHERE id = 1 AND old.duration_ms IS NOT new.duration_ms;
+        UPDATE song_rating_counts SET count = count - 1
+            WHERE rating = old.star_rating AND old.star_rating IS NOT new.star_rating;
+        INSERT INTO song_rating_counts (rating, count) SELECT new.star_rating, 1
+            WHERE new.star_rating IS NOT NULL AND old.star_rating IS NOT new.star_rating
+            ON CONFLICT (rating) DO UPDATE SET count = count + 1;
+    END""",
+]
+
+
+class StatsSummary:
+    """Materialized /api/stats aggregates"""
+
+    @staticmethod
+    def install() -> bool:
+        """
+        Create the summary tables and triggers if missing.
+
+        The summary is seeded from the songs table on first install.
+
+        Returns:
+            True if the materialized summary is available
+        """
+        if db.engine.dialect.name != 'sqlite':
+            logger.warning("Materialized stats require SQLite; /api/stats will aggregate live")
+            return False
+
+        try:
+            with db.engine.begin() as connection:
+                for statement in STATS_DDL:
+                    connection.execute(text(statement))
+                seeded = connection.execute(text("SELECT 1 FROM song_stats WHERE id = 1")).first()
+        except OperationalError as e:
+            logger.warning(f"Could not install stats triggers ({str(e)}); /api/stats will aggregate live")
+            return False
+
+        if seeded is None:
+            StatsSummary.reconcile()
+        return True
+
+    @staticmethod
+    def read() -> Dict[str, Any]:
+        """Read the summary in the /api/stats response shape (constant time)"""
+        row = db.session.execute(text("SELECT * FROM song_stats WHERE id = 1")).mappings().first()
+        ratings = db.session.execute(
+            text("SELECT rating, count FROM song_rating_counts WHERE count > 0 ORDER BY rating")
+        ).all()
+
+        # Unrated songs first, where a GROUP BY star_rating puts them
+        distribution = {'None': row['unrated']} if row['unrated'] else {}
+        distribution.update((str(rating), count) for rating, count in ratings)
+
+        def average(column: str) -> float:
+            count = row[f'count_{column}']
+            return float(row[f'sum_{column}'] / count) if count else 0
+
+        return {
+            'total_songs': row['total'],
+            'average_danceability': average('danceability'),
+            'average_energy': average('energy'),
+            'average_tempo': average('tempo'),
+            'average_duration_ms': average('duration_ms'),
+            'min_duration_ms': row['min_duration_ms'],
+            'max_duration_ms': row['max_duration_ms'],
+            'rating_distribution': distribution
+        }
+
+    @staticmethod
+    def batch_totals(connection, ids: List[str]) -> List[Sequence[Any]]:
+        """
+        Totals of the given songs per rating, for apply_batch (one GROUP BY
+        statement for the ids).
+
+        Returns:
+            Rows of (star_rating, count, then sum and count of every
+            AVERAGED_COLUMNS column)
+        """
+        return connection.execute(
+            text(
+                "SELECT star_rating, COUNT(*), "
+                + ', '.join(f"TOTAL({c}), COUNT({c})" for c in AVERAGED_COLUMNS)
+                + " FROM songs WHERE id IN :ids GROUP BY star_rating"
+            ).bindparams(bindparam('ids', expanding=True)),
+            {'ids': ids}
+        ).all()
+
+    @staticmethod
+    def apply_batch(connection, before: List[Sequence[Any]], after: List[Sequence[Any]]) -> None:
+        """
+        Replace a batch's old totals with its new ones in the summary.
+
+        before and after are batch_totals of the batch's existing songs
+        before the write and of all its songs after it. One UPDATE of the
+        summary row (MIN/MAX re-read through the duration_ms index) and one
+        executemany of the changed rating counts.
+        """
+        delta = {'total': 0, 'unrated': 0}
+        for column in AVERAGED_COLUMNS:
+            delta[f'sum_{column}'] = 0.0
+            delta[f'count_{column}'] = 0
+        ratings: Dict[int, int] = {}
+
+        for sign, groups in ((-1, before), (1, after)):
+            for rating, count, *values in groups:
+                delta['total'] += sign * count
+                if rating is None:
+                    delta['unrated'] += sign * count
+                else:
+                    ratings[rating] = ratings.get(rating, 0) + sign * count
+                for position, column in enumerate(AVERAGED_COLUMNS):
+                    delta[f'sum_{column}'] += sign * values[2 * position]
+                    delta[f'count_{column}'] += sign * values[2 * position + 1]
+
+        connection.execute(
+            text(
+                "UPDATE song_stats SET "
+                + ', '.join(f"{key} = {key} + :{key}" for key in delta)
+                + f",{_RECOMPUTE_EXTREMES} WHERE id = 1"
+            ),
+            delta
+        )
+        changed = [{'rating': rating, 'count': count} for rating, count in ratings.items() if count]
+        if changed:
+            connection.execute(
+                text("INSERT INTO song_rating_counts (rating, count) VALUES (:rating, :count) "
+                     "ON CONFLICT (rating) DO UPDATE SET count = count + excluded.count"),
+                changed
+            )
+
+    @staticmethod
+    def read_live() -> Dict[str, Any]:
+        """Aggregate the statistics directly from the songs table (full scan)"""
+        stats = db.session.query(
+            func.count().label('total_songs'),
+            func.avg(Song.danceability).label('avg_danceability'),
+            func.avg(Song.energy).label('avg_energy'),
+            func.avg(Song.tempo).label('avg_tempo'),
+            func.avg(Song.duration_ms).label('avg_duration_ms'),
+            func.min(Song.duration_ms).label('min_duration_ms'),
+            func.max(Song.duration_ms).label('max_duration_ms')
+        ).first()
+
+        # COUNT(*): the None group counts the unrated songs
+        rating_dist = db.session.query(
+            Song.star_rating,
+            func.count()
+        ).group_by(Song.star_rating).all()
+
+        return {
+            'total_songs': stats.total_songs,
+            'average_danceability': float(stats.avg_danceability) if stats.avg_danceability else 0,
+            'average_energy': float(stats.avg_energy) if stats.avg_energy else 0,
+            'average_tempo': float(stats.avg_tempo) if stats.avg_tempo else 0,
+            'average_duration_ms': float(stats.avg_duration_ms) if stats.avg_duration_ms else 0,
+            'min_duration_ms': stats.min_duration_ms,
+            'max_duration_ms': stats.max_duration_ms,
+            'rating_distribution': {
+                str(rating): count for rating, count in rating_dist
+            }
+        }
+
+    @staticmethod
+    def reconcile() -> Dict[str, Any]:
+        """
+        Check the summary against a full aggregation and repair any drift.
+
+        Returns:
+            Dictionary with 'drift' (field -> (summary, actual)) and 'repaired'
+        """
+        # One transaction, so the comparison and the repair see the same snapshot
+        with db.engine.begin() as connection:
+            actual, actual_ratings = _aggregate(connection)
+
+            stored = connection.execute(text("SELECT * FROM song_stats WHERE id = 1")).mappings().first()
+            stored_ratings = dict(connection.execute(
+                text("SELECT rating, count FROM song_rating_counts WHERE count != 0")
+            ).all())
+
+            drift = {}
+            for key, value in actual.items():
+                current = stored[key] if stored is not None else None
+                if not _same(current, value):
+                    drift[key] = (current, value)
+            if stored_ratings != actual_ratings:
+                drift['rating_distribution'] = (stored_ratings, actual_ratings)
+
+            if drift:
+                _store(connection, actual, actual_ratings)
+
+        if drift and stored is not None:
+            logger.warning(f"Stats summary drift repaired: {sorted(drift)}")
+        return {'drift': drift, 'repaired': bool(drift)}
+
+    @staticmethod
+    def rebuild() -> None:
+        """
+        Recompute the summary from the songs table without checking it first.
+
+        For loads that ran with the triggers dropped, where the summary is
+        stale by design rather than by drift.
+        """
+        with db.engine.begin() as connection:
+            _store(connection, *_aggregate(connection))
+        logger.info("Stats summary rebuilt")
+
+
+def _aggregate(connection) -> Tuple[Dict[str, Any], Dict[int, int]]:
+    """(song_stats row, {rating: count}) of a full aggregation over songs"""
+    actual = connection.execute(
+        text(
+            "SELECT COUNT(*) AS total, "
+            + ', '.join(f"TOTAL({c}) AS sum_{c}, COUNT({c}) AS count_{c}" for c in AVERAGED_COLUMNS)
+            + ", COUNT(*) - COUNT(star_rating) AS unrated"
+            + ", MIN(duration_ms) AS min_duration_ms, MAX(duration_ms) AS max_duration_ms FROM songs"
+        )
+    ).mappings().one()
+    ratings = dict(connection.execute(
+        text("SELECT star_rating, COUNT(*) FROM songs WHERE star_rating IS NOT NULL GROUP BY star_rating")
+    ).all())
+    return dict(actual), ratings
+
+
+def _store(connection, actual: Dict[str, Any], ratings: Dict[int, int]) -> None:
+    """Overwrite the summary with aggregated values"""
+    columns = ', '.join(actual.keys())
+    placeholders = ', '.join(f':{key}' for key in actual.keys())
+    connection.execute(
+        text(f"INSERT OR REPLACE INTO song_stats (id, {columns}) VALUES (1, {placeholders})"),
+        actual
+    )
+    connection.execute(text("DELETE FROM song_rating_counts"))
+    if ratings:
+        connection.execute(
+            text("INSERT INTO song_rating_counts (rating, count) VALUES (:rating, :count)"),
+            [{'rating': rating, 'count': count} for rating, count in ratings.items()]
+        )
+
+
+def _same(stored: Any, actual: Any) -> bool:
+    """Compare summary values, tolerating float rounding from incremental sums"""
+    if stored is None or actual is None:
+        return stored is None and actual is None
+    if isinstance(stored, float) or isinstance(actual, float):
+        return math.isclose(stored, actual, rel_tol=1e-9, abs_tol=1e-6)
+    return stored == actual
+
+
+def start_reconciler(app, interval: float) -> Optional[threading.Thread]:
+    """Run StatsSummary.reconcile every `interval` seconds in a daemon thread"""
+    if interval <= 0:
+        return None
+
+    stop = threading.Event()
+
+    def run() -> None:
+        while not stop.wait(interval):
+            try:
+                with app.app_context():
+                    StatsSummary.reconcile()
+            except Exception as e:
+                logger.error(f"Stats reconciliation failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name='stats-reconciler', daemon=True)
+    thread.start()
+    app.extensions['stats_reconciler_stop'] = stop
+    return thread
@@ -1,428 +1,1688 @@
-# import pytest
-# import json
-# from app import create_app
-# from models import db, Song
-# from data_processor import DataProcessor
-
-
-# @pytest.fixture
-# def app():
-#     """Create application for testing"""
-#     app = create_app('testing')
-    
-#     with app.app_context():
-#         db.create_all()
-#         yield app
-#         db.session.remove()
-#         db.drop_all()
-
-
-# @pytest.fixture
-# def client(app):
-#     """Create test client"""
-#     return app.test_client()
-
-
-# @pytest.fixture
-# def sample_songs(app):
-#     """Create sample songs for testing"""
-#     with app.app_context():
-#         songs = [
-#             Song(
-#                 index=0,
-#                 id='test_id_1',
-#                 title='Test Song 1',
-#                 danceability=0.5,
-#                 energy=0.7,
-#                 tempo=120.0,
-#                 duration_ms=200000,
-#                 star_rating=0
-#             ),
-#             Song(
-#                 index=1,
-#                 id='test_id_2',
-#                 title='Test Song 2',
-#                 danceability=0.8,
-#                 energy=0.9,
-#                 tempo=140.0,
-#                 duration_ms=180000,
-#                 star_rating=3
-#             ),
-#             Song(
-#                 index=2,
-#                 id='test_id_3',
-#                 title='Another Song',
-#                 danceability=0.6,
-#                 energy=0.5,
-#                 tempo=100.0,
-#                 duration_ms=220000,
-#                 star_rating=5
-#             )
-#         ]
-        
-#         for song in songs:
-#             db.session.add(song)
-        
-#         db.session.commit()
-#         return songs
-
-
-# class TestHealthCheck:
-#     """Test health check endpoint"""
-    
-#     def test_index_endpoint(self, client):
-#         """Test GET / endpoint"""
-#         response = client.get('/')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert 'version' in data
-#         assert 'endpoints' in data
-
-
-# class TestGetAllSongs:
-#     """Test GET /api/songs endpoint"""
-    
-#     def test_get_all_songs_empty(self, client):
-#         """Test getting all songs when database is empty"""
-#         response = client.get('/api/songs')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert len(data['data']) == 0
-    
-#     def test_get_all_songs_with_data(self, client, sample_songs):
-#         """Test getting all songs with data"""
-#         response = client.get('/api/songs')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert len(data['data']) == 3
-#         assert 'pagination' in data
-    
-#     def test_pagination(self, client, sample_songs):
-#         """Test pagination parameters"""
-#         response = client.get('/api/songs?page=1&per_page=2')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert len(data['data']) == 2
-#         assert data['pagination']['page'] == 1
-#         assert data['pagination']['per_page'] == 2
-#         assert data['pagination']['total_items'] == 3
-#         assert data['pagination']['has_next'] == True
-    
-#     def test_sorting_asc(self, client, sample_songs):
-#         """Test sorting in ascending order"""
-#         response = client.get('/api/songs?sort_by=tempo&order=asc')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         tempos = [song['tempo'] for song in data['data']]
-#         assert tempos == sorted(tempos)
-    
-#     def test_sorting_desc(self, client, sample_songs):
-#         """Test sorting in descending order"""
-#         response = client.get('/api/songs?sort_by=energy&order=desc')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         energies = [song['energy'] for song in data['data']]
-#         assert energies == sorted(energies, reverse=True)
-    
-#     def test_invalid_page(self, client):
-#         """Test invalid page number"""
-#         response = client.get('/api/songs?page=0')
-#         assert response.status_code == 400
-    
-#     def test_invalid_per_page(self, client):
-#         """Test invalid per_page value"""
-#         response = client.get('/api/songs?per_page=1000')
-#         assert response.status_code == 400
-    
-#     def test_invalid_sort_column(self, client):
-#         """Test invalid sort column"""
-#         response = client.get('/api/songs?sort_by=invalid_column')
-#         assert response.status_code == 400
-
-
-# class TestSearchSongs:
-#     """Test GET /api/songs/search endpoint"""
-    
-#     def test_search_exact_match(self, client, sample_songs):
-#         """Test exact title match"""
-#         response = client.get('/api/songs/search?title=Test Song 1&exact=true')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert len(data['data']) == 1
-#         assert data['data'][0]['title'] == 'Test Song 1'
-    
-#     def test_search_partial_match(self, client, sample_songs):
-#         """Test partial title match"""
-#         response = client.get('/api/songs/search?title=Test')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert len(data['data']) == 2  # Should match "Test Song 1" and "Test Song 2"
-    
-#     def test_search_case_insensitive(self, client, sample_songs):
-#         """Test case-insensitive search"""
-#         response = client.get('/api/songs/search?title=test song')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert len(data['data']) >= 1
-    
-#     def test_search_no_results(self, client, sample_songs):
-#         """Test search with no results"""
-#         response = client.get('/api/songs/search?title=NonexistentSong')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert len(data['data']) == 0
-    
-#     def test_search_missing_title(self, client):
-#         """Test search without title parameter"""
-#         response = client.get('/api/songs/search')
-#         assert response.status_code == 400
-
-
-# class TestGetSongById:
-#     """Test GET /api/songs/<song_id> endpoint"""
-    
-#     def test_get_existing_song(self, client, sample_songs):
-#         """Test getting an existing song by ID"""
-#         response = client.get('/api/songs/test_id_1')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert data['data']['id'] == 'test_id_1'
-#         assert data['data']['title'] == 'Test Song 1'
-    
-#     def test_get_nonexistent_song(self, client):
-#         """Test getting a non-existent song"""
-#         response = client.get('/api/songs/nonexistent_id')
-#         assert response.status_code == 404
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'error'
-
-
-# class TestUpdateRating:
-#     """Test PUT /api/songs/<song_id>/rating endpoint"""
-    
-#     def test_update_rating_success(self, client, sample_songs):
-#         """Test successfully updating rating"""
-#         response = client.put(
-#             '/api/songs/test_id_1/rating',
-#             json={'rating': 4},
-#             content_type='application/json'
-#         )
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert data['data']['star_rating'] == 4
-    
-#     def test_update_rating_invalid_value(self, client, sample_songs):
-#         """Test updating rating with invalid value"""
-#         response = client.put(
-#             '/api/songs/test_id_1/rating',
-#             json={'rating': 10},
-#             content_type='application/json'
-#         )
-#         assert response.status_code == 400
-    
-#     def test_update_rating_missing_data(self, client, sample_songs):
-#         """Test updating rating without rating data"""
-#         response = client.put(
-#             '/api/songs/test_id_1/rating',
-#             json={},
-#             content_type='application/json'
-#         )
-#         assert response.status_code == 400
-    
-#     def test_update_rating_nonexistent_song(self, client):
-#         """Test updating rating for non-existent song"""
-#         response = client.put(
-#             '/api/songs/nonexistent_id/rating',
-#             json={'rating': 3},
-#             content_type='application/json'
-#         )
-#         assert response.status_code == 404
-
-
-# class TestUploadData:
-#     """Test POST /api/songs/upload endpoint"""
-    
-#     def test_upload_valid_data(self, client):
-#         """Test uploading valid JSON data"""
-#         json_data = {
-#             "id": {"0": "upload_test_1", "1": "upload_test_2"},
-#             "title": {"0": "Upload Song 1", "1": "Upload Song 2"},
-#             "danceability": {"0": "0.5", "1": "0.7"},
-#             "energy": {"0": "0.6", "1": "0.8"}
-#         }
-        
-#         response = client.post(
-#             '/api/songs/upload',
-#             json=json_data,
-#             content_type='application/json'
-#         )
-#         assert response.status_code == 201
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert data['inserted_count'] == 2
-    
-#     def test_upload_empty_data(self, client):
-#         """Test uploading empty data"""
-#         response = client.post(
-#             '/api/songs/upload',
-#             json={},
-#             content_type='application/json'
-#         )
-#         assert response.status_code == 400
-    
-#     def test_upload_no_data(self, client):
-#         """Test uploading without data"""
-#         response = client.post('/api/songs/upload')
-#         assert response.status_code == 400
-
-
-# class TestStats:
-#     """Test GET /api/stats endpoint"""
-    
-#     def test_get_stats_with_data(self, client, sample_songs):
-#         """Test getting statistics with data"""
-#         response = client.get('/api/stats')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'success'
-#         assert data['data']['total_songs'] == 3
-#         assert 'average_danceability' in data['data']
-#         assert 'rating_distribution' in data['data']
-    
-#     def test_get_stats_empty(self, client):
-#         """Test getting statistics with empty database"""
-#         response = client.get('/api/stats')
-#         assert response.status_code == 200
-        
-#         data = json.loads(response.data)
-#         assert data['data']['total_songs'] == 0
-
-
-# class TestDataProcessor:
-#     """Test DataProcessor class"""
-    
-#     def test_normalize_json(self):
-#         """Test JSON normalization"""
-#         json_data = {
-#             "id": {"0": "test1", "1": "test2"},
-#             "title": {"0": "Song1", "1": "Song2"},
-#             "danceability": {"0": "0.5", "1": "0.7"}
-#         }
-        
-#         result = DataProcessor.normalize_json(json_data)
-        
-#         assert len(result) == 2
-#         assert result[0]['id'] == 'test1'
-#         assert result[0]['title'] == 'Song1'
-#         assert result[0]['danceability'] == 0.5
-#         assert result[1]['index'] == 1
-    
-#     def test_normalize_empty_json(self):
-#         """Test normalizing empty JSON"""
-#         with pytest.raises(ValueError):
-#             DataProcessor.normalize_json({})
-    
-#     def test_convert_value_int(self):
-#         """Test integer conversion"""
-#         result = DataProcessor._convert_value('duration_ms', '200000')
-#         assert result == 200000
-#         assert isinstance(result, int)
-    
-#     def test_convert_value_float(self):
-#         """Test float conversion"""
-#         result = DataProcessor._convert_value('danceability', '0.75')
-#         assert result == 0.75
-#         assert isinstance(result, float)
-    
-#     def test_convert_value_string(self):
-#         """Test string conversion"""
-#         result = DataProcessor._convert_value('title', 'Test Song')
-#         assert result == 'Test Song'
-#         assert isinstance(result, str)
-
-
-# class TestSongModel:
-#     """Test Song model"""
-    
-#     def test_song_to_dict(self, app):
-#         """Test converting song to dictionary"""
-#         with app.app_context():
-#             song = Song(
-#                 index=0,
-#                 id='test_id',
-#                 title='Test Song',
-#                 danceability=0.5,
-#                 star_rating=3
-#             )
-            
-#             song_dict = song.to_dict()
-            
-#             assert song_dict['id'] == 'test_id'
-#             assert song_dict['title'] == 'Test Song'
-#             assert song_dict['danceability'] == 0.5
-#             assert song_dict['star_rating'] == 3
-    
-#     def test_validate_rating_valid(self):
-#         """Test valid rating validation"""
-#         assert Song.validate_rating(3) == True
-#         assert Song.validate_rating(0) == True
-#         assert Song.validate_rating(5) == True
-    
-#     def test_validate_rating_invalid(self):
-#         """Test invalid rating validation"""
-#         with pytest.raises(ValueError):
-#             Song.validate_rating(6)
-        
-#         with pytest.raises(ValueError):
-#             Song.validate_rating(-1)
-        
-#         with pytest.raises(ValueError):
-#             Song.validate_rating(3.5)
-
-
-# class TestErrorHandlers:
-#     """Test error handlers"""
-    
-#     def test_404_error(self, client):
-#         """Test 404 error handler"""
-#         response = client.get('/api/nonexistent')
-#         assert response.status_code == 404
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'error'
-    
-#     def test_405_error(self, client):
-#         """Test 405 error handler"""
-#         response = client.post('/')  # GET-only endpoint
-#         assert response.status_code == 405
-        
-#         data = json.loads(response.data)
-#         assert data['status'] == 'error'
-
-
-# if __name__ == '__main__':
-#     pytest.main(['-v', '--cov=.', '--cov-report=html'])
+import pytest
+import json
+import time
+from app import create_app
+from config import config, TestingConfig
+from models import db, Song
+from data_processor import DataProcessor
+from query_budget import query_budget
+from filters import parse_filter
+from query_planner import QueryPlanner
 
+
+def create_test_app(directory, name='pytest', **overrides):
+    """TestingConfig app on an empty on-disk database in directory"""
+    class PytestConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{directory / 'songs.db'}"
+        SEED_SNAPSHOT = str(directory / 'missing.snapshot')
+        UPLOAD_SPOOL_DIR = str(directory / 'uploads')
+    for setting, value in overrides.items():
+        setattr(PytestConfig, setting, value)
+    config[name] = PytestConfig
+    return create_app(name)
+
+
+def close_test_app(app):
+    """Stop an app's background workers and close its engines"""
+    app.extensions['upload_jobs'].close()
+    if 'rating_writer' in app.extensions:
+        app.extensions['rating_writer'].close()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    read_engine = app.extensions.get('sqlite_read_engine')
+    if read_engine is not None:
+        read_engine.dispose()
+
+
+@pytest.fixture
+def app(tmp_path, request):
+    """
+    Create application for testing
+
+    TestingConfig on an on-disk database in tmp_path (the engine profile,
+    read-only engine and background workers need a file), started empty.
+    QUERY_BUDGET_MODE is 'raise', so any request that issues more SQL
+    statements than its route's statement_budget fails the test. Tests can
+    override settings by parametrizing the fixture (indirect=True) with a
+    dict of config values.
+    """
+    app = create_test_app(tmp_path, **getattr(request, 'param', {}))
+
+    # No app context stays pushed: each request gets its own, as when serving
+    yield app
+
+    close_test_app(app)
+
+
+@pytest.fixture
+def client(app):
+    """Create test client"""
+    return app.test_client()
+
+
+@pytest.fixture
+def sample_songs(app):
+    """Create sample songs for testing"""
+    songs = [
+        {
+            'index': 0,
+            'id': 'test_id_1',
+            'title': 'Test Song 1',
+            'danceability': 0.5,
+            'energy': 0.7,
+            'tempo': 120.0,
+            'mode': 1,
+            'duration_ms': 200000,
+            'star_rating': 0
+        },
+        {
+            'index': 1,
+            'id': 'test_id_2',
+            'title': 'Test Song 2',
+            'danceability': 0.8,
+            'energy': 0.9,
+            'tempo': 140.0,
+            'mode': 0,
+            'duration_ms': 180000,
+            'star_rating': 3
+        },
+        {
+            'index': 2,
+            'id': 'test_id_3',
+            'title': 'Another Song',
+            'danceability': 0.6,
+            'energy': 0.5,
+            'tempo': 100.0,
+            'mode': 1,
+            'duration_ms': 220000,
+            'star_rating': 5
+        }
+    ]
+
+    with app.app_context():
+        DataProcessor.bulk_upsert(songs)
+    return songs
+
+
+def upload_payload(count):
+    """
+    Column-oriented upload body, as in raw_songs.json
+
+    Uploads index songs by position, so the first rows re-upload the sample
+    songs (same ids at indexes 0-2) and the rest are new.
+    """
+    rows = range(count)
+    return {
+        'id': {str(row): f'test_id_{row + 1}' for row in rows},
+        'title': {str(row): f'Upload Song {row}' for row in rows},
+        'danceability': {str(row): str((row % 10) / 10) for row in rows},
+        'energy': {str(row): str((row % 7) / 7) for row in rows},
+        'tempo': {str(row): str(80 + row % 90) for row in rows}
+    }
+
+
+class TestHealthCheck:
+    """Test health check endpoint"""
+
+    def test_index_endpoint(self, client):
+        """Test GET / endpoint"""
+        response = client.get('/')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert 'version' in data
+        assert 'endpoints' in data
+
+
+class TestReadiness:
+    """Test GET /readyz and the seed loader's skip checks"""
+
+    @staticmethod
+    def readyz(app):
+        """(status code, seed progress) of /readyz"""
+        response = app.test_client().get('/readyz')
+        data = json.loads(response.data)
+        assert data['status'] == ('ready' if response.status_code == 200 else 'not_ready')
+        return response.status_code, data['seed']
+
+    @staticmethod
+    def seed_file(tmp_path, count=30):
+        path = tmp_path / 'seed.json'
+        path.write_text(json.dumps(upload_payload(count)))
+        return str(path)
+
+    def start(self, tmp_path, seed, **overrides):
+        """An app on tmp_path's database, seeding from seed; returns (app, /readyz result)"""
+        app = create_test_app(tmp_path, SEED_SNAPSHOT=seed, **overrides)
+        return app, self.readyz(app)
+
+    def test_restart_skips_unchanged_file(self, tmp_path, monkeypatch):
+        """Test load, then skips by size/mtime (no hashing) and by checksum after a touch"""
+        import os
+        import seeding
+        seed = self.seed_file(tmp_path)
+
+        app, (status, progress) = self.start(tmp_path, seed)
+        close_test_app(app)
+        assert status == 200
+        assert (progress['state'], progress['rows_loaded']) == ('ready', 30)
+        assert progress['checksum'] == seeding.file_checksum(seed)
+
+        # Same size and mtime: the file is not even read
+        with monkeypatch.context() as patch:
+            patch.setattr(seeding, 'file_checksum', lambda path: pytest.fail('file was hashed'))
+            app, (status, progress) = self.start(tmp_path, seed)
+            close_test_app(app)
+        assert status == 200
+        assert (progress['state'], progress['reason']) == ('skipped', 'unchanged since last load')
+        assert progress['checksum'] == seeding.file_checksum(seed)
+
+        # New mtime, same bytes: hashed, matched and recorded again
+        stat = os.stat(seed)
+        os.utime(seed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        app, (status, progress) = self.start(tmp_path, seed)
+        close_test_app(app)
+        assert (progress['state'], progress['reason']) == ('skipped', 'checksum matches last load')
+        app, (status, progress) = self.start(tmp_path, seed)
+        close_test_app(app)
+        assert progress['reason'] == 'unchanged since last load'
+
+        # Changed contents: loaded again
+        self.seed_file(tmp_path, 40)
+        app, (status, progress) = self.start(tmp_path, seed)
+        close_test_app(app)
+        assert (status, progress['state'], progress['rows_loaded']) == (200, 'ready', 40)
+
+    def test_populated_database_is_not_seeded(self, tmp_path):
+        """Test that a database holding songs but no seed record skips the load"""
+        app = create_test_app(tmp_path)
+        with app.app_context():
+            DataProcessor.bulk_upsert([{'id': 'existing', 'title': 'Existing Song'}])
+        close_test_app(app)
+
+        app, (status, progress) = self.start(tmp_path, self.seed_file(tmp_path))
+        try:
+            assert status == 200
+            assert (progress['state'], progress['reason']) == ('skipped', 'database already contains data')
+            with app.app_context():
+                assert [song.id for song in Song.query.all()] == ['existing']
+        finally:
+            close_test_app(app)
+
+    def test_not_ready_while_loading(self, tmp_path, monkeypatch):
+        """Test 503 with the rows committed so far while the background load runs"""
+        import threading
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_load(file_path, *args, **kwargs):
+            DataProcessor.bulk_upsert(DataProcessor.normalize_json(upload_payload(10)))
+            loading.set()
+            release.wait(10)
+            return 10
+
+        monkeypatch.setattr(DataProcessor, 'process_json_file', staticmethod(slow_load))
+        app = create_test_app(tmp_path, SEED_SNAPSHOT=self.seed_file(tmp_path), SEED_IN_BACKGROUND=True)
+        try:
+            assert loading.wait(10)
+            status, progress = self.readyz(app)
+            assert status == 503
+            assert (progress['state'], progress['rows_loaded']) == ('loading', 10)
+            assert progress['elapsed_seconds'] >= 0
+
+            release.set()
+            app.extensions['seed_loader'].join(10)
+            status, progress = self.readyz(app)
+            assert (status, progress['state'], progress['rows_loaded']) == (200, 'ready', 10)
+        finally:
+            release.set()
+            close_test_app(app)
+
+    def test_failed_seed_is_not_ready(self, tmp_path):
+        """Test that a seed file that does not parse leaves the app unready, with the error"""
+        seed = tmp_path / 'seed.json'
+        seed.write_text('{"id": {"0": ')
+        app, (status, progress) = self.start(tmp_path, str(seed))
+        close_test_app(app)
+        assert status == 503
+        assert progress['state'] == 'failed'
+        assert progress['error']
+
+
+class TestGetAllSongs:
+    """Test GET /api/songs endpoint"""
+
+    def test_get_all_songs_empty(self, client):
+        """Test getting all songs when database is empty"""
+        response = client.get('/api/songs')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert len(data['data']) == 0
+
+    def test_get_all_songs_with_data(self, client, sample_songs):
+        """Test getting all songs with data"""
+        response = client.get('/api/songs')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert len(data['data']) == 3
+        assert 'pagination' in data
+
+    def test_pagination(self, client, sample_songs):
+        """Test pagination parameters"""
+        response = client.get('/api/songs?page=1&per_page=2')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert len(data['data']) == 2
+        assert data['pagination']['page'] == 1
+        assert data['pagination']['per_page'] == 2
+        assert data['pagination']['total_items'] == 3
+        assert data['pagination']['has_next'] == True
+
+    def test_sorting_asc(self, client, sample_songs):
+        """Test sorting in ascending order"""
+        response = client.get('/api/songs?sort_by=tempo&order=asc')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        tempos = [song['tempo'] for song in data['data']]
+        assert tempos == sorted(tempos)
+
+    def test_sorting_desc(self, client, sample_songs):
+        """Test sorting in descending order"""
+        response = client.get('/api/songs?sort_by=energy&order=desc')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        energies = [song['energy'] for song in data['data']]
+        assert energies == sorted(energies, reverse=True)
+
+    def test_invalid_page(self, client):
+        """Test invalid page number"""
+        response = client.get('/api/songs?page=0')
+        assert response.status_code == 400
+
+    def test_invalid_per_page(self, client):
+        """Test invalid per_page value"""
+        response = client.get('/api/songs?per_page=1000')
+        assert response.status_code == 400
+
+    def test_invalid_sort_column(self, client):
+        """Test invalid sort column"""
+        response = client.get('/api/songs?sort_by=invalid_column')
+        assert response.status_code == 400
+
+
+class TestKeysetPagination:
+    """Test cursor mode of GET /api/songs against an ORDER BY query"""
+
+    @pytest.fixture
+    def nullable_songs(self, app):
+        """Songs whose energy is NULL for every third row, with repeated values"""
+        songs = [{
+            'index': i,
+            'id': f'keyset_{i}',
+            'title': f'Keyset Song {i}',
+            'energy': None if i % 3 == 0 else (i % 5) / 5,
+            'tempo': 60.0 + (i * 7) % 100
+        } for i in range(40)]
+        with app.app_context():
+            DataProcessor.bulk_upsert(songs)
+        return songs
+
+    def page_to_end(self, client, query):
+        """Follow next_cursor from the first page to the last; the indexes seen"""
+        indexes = []
+        cursor = ''
+        while cursor is not None:
+            response = client.get(f'/api/songs?cursor={cursor}&per_page=4&{query}')
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            indexes.extend(song['index'] for song in data['data'])
+            cursor = data['pagination']['next_cursor']
+        return indexes
+
+    @pytest.mark.parametrize('order', ['asc', 'desc'])
+    @pytest.mark.parametrize('filter_expression', ['', 'tempo>100'])
+    def test_nullable_column_matches_order_by(self, app, client, nullable_songs, order, filter_expression):
+        """Test paging a column with NULLs to the end returns every row once, in ORDER BY order"""
+        query = f'sort_by=energy&order={order}&filter={filter_expression}'
+        indexes = self.page_to_end(client, query)
+
+        with app.app_context():
+            expected = Song.query
+            if filter_expression:
+                expected = expected.filter(Song.tempo > 100)
+            if order == 'desc':
+                expected = expected.order_by(Song.energy.desc(), Song.index.desc())
+            else:
+                expected = expected.order_by(Song.energy.asc(), Song.index.asc())
+            assert indexes == [song.index for song in expected]
+
+
+class TestSearchSongs:
+    """Test GET /api/songs/search endpoint"""
+
+    def test_search_exact_match(self, client, sample_songs):
+        """Test exact title match"""
+        response = client.get('/api/songs/search?title=Test Song 1&exact=true')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert len(data['data']) == 1
+        assert data['data'][0]['title'] == 'Test Song 1'
+
+    def test_search_partial_match(self, client, sample_songs):
+        """Test partial title match"""
+        response = client.get('/api/songs/search?title=Test')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert len(data['data']) == 2  # Should match "Test Song 1" and "Test Song 2"
+
+    def test_search_case_insensitive(self, client, sample_songs):
+        """Test case-insensitive search"""
+        response = client.get('/api/songs/search?title=test song')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert len(data['data']) >= 1
+
+    def test_search_no_results(self, client, sample_songs):
+        """Test search with no results"""
+        response = client.get('/api/songs/search?title=NonexistentSong')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert len(data['data']) == 0
+
+    def test_search_missing_title(self, client):
+        """Test search without title parameter"""
+        response = client.get('/api/songs/search')
+        assert response.status_code == 400
+
+    def test_bulk_upsert_keeps_index_in_sync(self, app, client, sample_songs):
+        """Test batches large enough to skip the per-row FTS triggers: renamed, kept and new titles"""
+        from sqlalchemy import text
+
+        records = DataProcessor.normalize_json(upload_payload(600))
+        with app.app_context():
+            DataProcessor.bulk_upsert(records, batch_size=600)
+            records[10]['title'] = 'Renamed Again'
+            DataProcessor.bulk_upsert(records, batch_size=600)
+            triggers = db.session.scalars(
+                text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'songs_fts%'")
+            ).all()
+            # Checks the index against the songs table
+            db.session.execute(text("INSERT INTO songs_fts(songs_fts, rank) VALUES ('integrity-check', 1)"))
+        assert sorted(triggers) == ['songs_fts_ad', 'songs_fts_ai', 'songs_fts_au']
+
+        data = json.loads(client.get('/api/songs/search?title=Test Song').data)
+        assert data['data'] == []
+        data = json.loads(client.get('/api/songs/search?title=Upload Song 599').data)
+        assert [song['id'] for song in data['data']] == ['test_id_600']
+        data = json.loads(client.get('/api/songs/search?title=Renamed Again').data)
+        assert [song['id'] for song in data['data']] == ['test_id_11']
+        assert json.loads(client.get('/api/songs/search?title=Upload Song 10&mode=tokens').data)['data'] == []
+
+    @staticmethod
+    def add_titles(app, titles):
+        with app.app_context():
+            DataProcessor.bulk_upsert([{'index': index, 'id': f'search_{index}', 'title': title}
+                                       for index, title in enumerate(titles)])
+
+    @staticmethod
+    def search_ids(client, query):
+        response = client.get(f'/api/songs/search?{query}')
+        assert response.status_code == 200
+        return [song['id'] for song in json.loads(response.data)['data']]
+
+    def test_search_modes(self, app, client):
+        """Test tokens, prefix, phrase and substring matching on the same titles"""
+        self.add_titles(app, ['Blue Moon Rising', 'Rising Blue Moon', 'Moonlight Sonata',
+                              'Blue Mood', 'Once In A Blue Moon'])
+
+        assert sorted(self.search_ids(client, 'title=moon blue&mode=tokens')) == [
+            'search_0', 'search_1', 'search_4']
+        assert sorted(self.search_ids(client, 'title=blue moo&mode=prefix')) == [
+            'search_0', 'search_1', 'search_3', 'search_4']
+        assert sorted(self.search_ids(client, 'title=blue moon&mode=phrase')) == [
+            'search_0', 'search_1', 'search_4']
+        assert self.search_ids(client, 'title=moon blue&mode=phrase') == []
+        assert self.search_ids(client, 'title=oonli&mode=substring') == ['search_2']
+        assert self.search_ids(client, 'title=oonli&mode=tokens') == []
+        # FTS5 operators in the input are plain tokens
+        assert self.search_ids(client, 'title=blue OR moon&mode=tokens') == []
+        assert client.get('/api/songs/search?title=blue&mode=regex').status_code == 400
+
+    def test_search_ranks_by_bm25(self, app, client):
+        """Test that more frequent matches in shorter titles rank first, not index order"""
+        self.add_titles(app, ['Echo In The Long Dark Valley Of Night', 'Echo', 'Echo Echo Echo'])
+
+        assert self.search_ids(client, 'title=echo&mode=tokens') == ['search_2', 'search_1', 'search_0']
+        assert self.search_ids(client, 'title=echo&mode=tokens&per_page=1&page=2') == ['search_1']
+
+    def test_index_follows_title_updates(self, app, client, sample_songs):
+        """Test that an ORM title update and an upsert rename are searchable at once"""
+        from sqlalchemy import text
+
+        assert self.search_ids(client, 'title=another&mode=tokens') == ['test_id_3']
+        with app.app_context():
+            db.session.get(Song, 2).title = 'Renamed Through The Session'
+            db.session.commit()
+            DataProcessor.bulk_upsert([{'id': 'test_id_1', 'title': 'Renamed By Upsert'},
+                                       {'index': 3, 'id': 'test_id_4', 'title': 'Brand New Upsert'}])
+            db.session.execute(text("INSERT INTO songs_fts(songs_fts, rank) VALUES ('integrity-check', 1)"))
+
+        assert self.search_ids(client, 'title=another&mode=tokens') == []
+        assert self.search_ids(client, 'title=session&mode=tokens') == ['test_id_3']
+        assert self.search_ids(client, 'title=test song&mode=tokens') == ['test_id_2']
+        assert sorted(self.search_ids(client, 'title=upsert&mode=tokens')) == ['test_id_1', 'test_id_4']
+
+    def test_rebuild_search_index_command(self, app, client, sample_songs):
+        """Test that flask rebuild-search-index restores an emptied index"""
+        from sqlalchemy import text
+        from search_index import TitleSearch
+
+        with app.app_context():
+            db.session.execute(text("INSERT INTO songs_fts(songs_fts) VALUES ('delete-all')"))
+            db.session.commit()
+            assert TitleSearch.search('another', 'tokens') == ([], False)
+
+        result = app.test_cli_runner().invoke(args=['rebuild-search-index'])
+        assert result.exit_code == 0
+        assert 'Search index rebuilt' in result.output
+        assert self.search_ids(client, 'title=another&mode=tokens') == ['test_id_3']
+
+
+class TestGetSongById:
+    """Test GET /api/songs/<song_id> endpoint"""
+
+    def test_get_existing_song(self, client, sample_songs):
+        """Test getting an existing song by ID"""
+        response = client.get('/api/songs/test_id_1')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert data['data']['id'] == 'test_id_1'
+        assert data['data']['title'] == 'Test Song 1'
+
+    def test_get_nonexistent_song(self, client):
+        """Test getting a non-existent song"""
+        response = client.get('/api/songs/nonexistent_id')
+        assert response.status_code == 404
+
+        data = json.loads(response.data)
+        assert data['status'] == 'error'
+
+
+class TestUpdateRating:
+    """Test PUT /api/songs/<song_id>/rating endpoint"""
+
+    def test_update_rating_success(self, client, sample_songs):
+        """Test successfully updating rating"""
+        response = client.put(
+            '/api/songs/test_id_1/rating',
+            json={'rating': 4},
+            content_type='application/json'
+        )
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert data['data']['star_rating'] == 4
+
+    def test_update_rating_invalid_value(self, client, sample_songs):
+        """Test updating rating with invalid value"""
+        response = client.put(
+            '/api/songs/test_id_1/rating',
+            json={'rating': 10},
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    def test_update_rating_missing_data(self, client, sample_songs):
+        """Test updating rating without rating data"""
+        response = client.put(
+            '/api/songs/test_id_1/rating',
+            json={},
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    def test_update_rating_nonexistent_song(self, client):
+        """Test updating rating for non-existent song"""
+        response = client.put(
+            '/api/songs/nonexistent_id/rating',
+            json={'rating': 3},
+            content_type='application/json'
+        )
+        assert response.status_code == 404
+
+
+@pytest.mark.parametrize('app', [{'RATING_WRITE_BEHIND_ENABLED': True, 'RATING_FLUSH_INTERVAL': 0.01}],
+                         indirect=True)
+class TestRatingWriteBehind:
+    """Test PUT /api/songs/<song_id>/rating through the write-behind queue"""
+
+    def test_update_rating_group_commit(self, app, client, sample_songs):
+        """Test that a single rating is written by the queue before the response"""
+        writer = app.extensions['rating_writer']
+        written = writer.stats()['written']
+
+        response = client.put('/api/songs/test_id_1/rating', json={'rating': 4})
+        assert response.status_code == 200
+        assert json.loads(response.data)['data']['star_rating'] == 4
+        assert writer.stats()['written'] == written + 1
+
+        data = json.loads(client.get('/api/songs/test_id_1').data)
+        assert data['data']['star_rating'] == 4
+
+    def test_update_rating_nonexistent_song(self, client):
+        """Test that an unknown song is reported once its group commit has run"""
+        response = client.put('/api/songs/nonexistent_id/rating', json={'rating': 3})
+        assert response.status_code == 404
+
+    def test_update_rating_async(self, app, client, sample_songs):
+        """Test that async durability acknowledges before the commit"""
+        writer = app.extensions['rating_writer']
+        writer.durability = 'async'
+
+        response = client.put('/api/songs/test_id_2/rating', json={'rating': 1})
+        assert response.status_code == 202
+        writer.flush()
+
+        data = json.loads(client.get('/api/songs/test_id_2').data)
+        assert data['data']['star_rating'] == 1
+
+
+class TestUploadData:
+    """Test POST /api/songs/upload endpoint"""
+
+    def test_upload_valid_data(self, client):
+        """Test uploading valid JSON data"""
+        json_data = {
+            "id": {"0": "upload_test_1", "1": "upload_test_2"},
+            "title": {"0": "Upload Song 1", "1": "Upload Song 2"},
+            "danceability": {"0": "0.5", "1": "0.7"},
+            "energy": {"0": "0.6", "1": "0.8"}
+        }
+
+        response = client.post(
+            '/api/songs/upload',
+            json=json_data,
+            content_type='application/json'
+        )
+        assert response.status_code == 201
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert data['inserted_count'] == 2
+
+    def test_upload_empty_data(self, client):
+        """Test uploading empty data"""
+        response = client.post(
+            '/api/songs/upload',
+            json={},
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    def test_upload_no_data(self, client):
+        """Test uploading without data"""
+        response = client.post('/api/songs/upload')
+        assert response.status_code == 400
+
+
+class TestUploadJobs:
+    """Test PUT /api/jobs/<job_id>/data chunk ordering"""
+
+    @staticmethod
+    def create_job(client, size):
+        response = client.post('/api/jobs', json={'size': size})
+        assert response.status_code == 201
+        return json.loads(response.data)['data']['id']
+
+    def test_resent_chunk_conflicts(self, client):
+        """Test that a chunk resent after it was committed is refused with the offset to resume from"""
+        body = json.dumps(upload_payload(10)).encode('utf-8')
+        job_id = self.create_job(client, len(body))
+        headers = {'Content-Range': f'bytes 0-99/{len(body)}'}
+
+        assert client.put(f'/api/jobs/{job_id}/data', data=body[:100], headers=headers).status_code == 200
+        response = client.put(f'/api/jobs/{job_id}/data', data=body[:100], headers=headers)
+        assert response.status_code == 409
+        assert json.loads(response.data)['data']['bytes_received'] == 100
+
+    def test_concurrent_chunk_conflicts(self, app, client):
+        """Test that a chunk arriving while another is being written is refused, leaving the spool intact"""
+        from models import UploadJob
+        from upload_jobs import spool_lock
+
+        body = json.dumps(upload_payload(10)).encode('utf-8')
+        job_id = self.create_job(client, len(body))
+        headers = {'Content-Range': f'bytes 0-99/{len(body)}'}
+
+        with app.app_context():
+            job = db.session.get(UploadJob, job_id)
+            with spool_lock(job):
+                response = client.put(f'/api/jobs/{job_id}/data', data=body[:100], headers=headers)
+        assert response.status_code == 409
+        assert json.loads(response.data)['data']['bytes_received'] == 0
+
+        assert client.put(f'/api/jobs/{job_id}/data', data=body[:100], headers=headers).status_code == 200
+
+
+class TestStats:
+    """Test GET /api/stats endpoint"""
+
+    def test_get_stats_with_data(self, client, sample_songs):
+        """Test getting statistics with data"""
+        response = client.get('/api/stats')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert data['data']['total_songs'] == 3
+        assert 'average_danceability' in data['data']
+        assert 'rating_distribution' in data['data']
+
+    def test_get_stats_empty(self, client):
+        """Test getting statistics with empty database"""
+        response = client.get('/api/stats')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['data']['total_songs'] == 0
+
+    @pytest.mark.parametrize('app', [{}, {'STATS_SUMMARY_ENABLED': False}], indirect=True)
+    def test_rating_distribution_counts_unrated(self, app, client, sample_songs):
+        """Test that songs without a rating are counted under 'None', summary and live alike"""
+        from stats_summary import StatsSummary
+
+        with app.app_context():
+            Song.query.filter(Song.id.in_(['test_id_1', 'test_id_2'])).update({'star_rating': None})
+            db.session.commit()
+            Song.query.filter_by(id='test_id_2').update({'star_rating': 4})
+            db.session.commit()
+
+        response = client.get('/api/stats')
+        assert response.status_code == 200
+        assert json.loads(response.data)['data']['rating_distribution'] == {'None': 1, '4': 1, '5': 1}
+        if app.config['STATS_SUMMARY_AVAILABLE']:
+            with app.app_context():
+                assert StatsSummary.reconcile()['drift'] == {}
+
+    def test_bulk_upsert_updates_summary_per_batch(self, app, client, sample_songs):
+        """Test batches large enough to skip the per-row stats triggers: the summary matches the table"""
+        from stats_summary import StatsSummary
+
+        records = DataProcessor.normalize_json(upload_payload(1200))
+        for position, record in enumerate(records):
+            record['star_rating'] = None if position % 5 == 0 else position % 6
+            record['duration_ms'] = None if position % 7 == 0 else 1000 + position
+        # The second upsert rewrites every row: old totals out, new ones in
+        reversed_durations = [record['duration_ms'] for record in reversed(records)]
+        with app.app_context():
+            DataProcessor.bulk_upsert(records, batch_size=600)
+            for record, duration in zip(records, reversed_durations):
+                record['duration_ms'] = duration
+                record['star_rating'] = 3 if record['star_rating'] is None else None
+            DataProcessor.bulk_upsert(records, batch_size=600)
+            assert StatsSummary.reconcile()['drift'] == {}
+            live = StatsSummary.read_live()
+
+        data = json.loads(client.get('/api/stats').data)['data']
+        assert data['total_songs'] == 1200
+        assert data['rating_distribution'] == live['rating_distribution']
+        assert (data['min_duration_ms'], data['max_duration_ms']) == (1001, 2199)
+
+
+class TestAggregates:
+    """Test GET /api/aggregates endpoint"""
+
+    def test_scatter_samples_evenly_over_index_gaps(self, app, client):
+        """Test that scatter keeps every stride-th song with both values, whatever the index values"""
+        songs = [
+            {'index': 3 * row, 'id': f'gap_{row}', 'title': f'Gap {row}', 'tempo': 80.0 + row,
+             'energy': None if row % 4 == 0 else row / 100, 'star_rating': 0}
+            for row in range(100)
+        ]
+        with app.app_context():
+            DataProcessor.bulk_upsert(songs)
+
+        response = client.get('/api/aggregates?scatter=tempo:energy&points=10')
+        assert response.status_code == 200
+        scatter = json.loads(response.data)['data']['scatter']['tempo:energy']
+
+        present = [[song['tempo'], song['energy']] for song in songs if song['energy'] is not None]
+        assert scatter['total'] == 75
+        assert scatter['stride'] == 8
+        assert scatter['points'] == present[::8]
+
+
+class TestDataProcessor:
+    """Test DataProcessor class"""
+
+    def test_normalize_json(self):
+        """Test JSON normalization"""
+        json_data = {
+            "id": {"0": "test1", "1": "test2"},
+            "title": {"0": "Song1", "1": "Song2"},
+            "danceability": {"0": "0.5", "1": "0.7"}
+        }
+
+        result = DataProcessor.normalize_json(json_data)
+
+        assert len(result) == 2
+        assert result[0]['id'] == 'test1'
+        assert result[0]['title'] == 'Song1'
+        assert result[0]['danceability'] == 0.5
+        assert result[1]['index'] == 1
+
+    def test_normalize_empty_json(self):
+        """Test normalizing empty JSON"""
+        with pytest.raises(ValueError):
+            DataProcessor.normalize_json({})
+
+    def test_partial_update_keeps_other_columns(self, app, sample_songs):
+        """Test that an upsert row missing a column leaves that column alone"""
+        with app.app_context():
+            DataProcessor.bulk_upsert([{'id': 'test_id_1', 'energy': 0.1}])
+
+            song = db.session.get(Song, 0)
+            assert song.energy == 0.1
+            assert song.title == 'Test Song 1'
+            assert song.tempo == 120.0
+
+
+class TestNonFiniteNumbers:
+    """Test that NaN / Infinity cells ingest as nulls on every ingestion path"""
+
+    DOCUMENT = (
+        '{"id": {"0": "nf_0", "1": "nf_1", "2": "nf_2", "3": "nf_3", "4": "nf_4", "5": "nf_5"},'
+        ' "title": {"0": "Plain", "1": "Not A Number", "2": "Infinite", "3": "Negative",'
+        ' "4": "Quoted", "5": "Overflow"},'
+        ' "danceability": {"0": 0.5, "1": NaN, "2": Infinity, "3": -Infinity, "4": "NaN", "5": 1e400},'
+        ' "energy": {"0": "0.25", "1": 0.5, "2": "Infinity", "3": "-inf", "4": 0.75, "5": 1.0},'
+        ' "tempo": {"0": 120, "1": 121, "2": 122, "3": NaN, "4": 124, "5": 125},'
+        ' "key": {"0": 1, "1": NaN, "2": Infinity, "3": 4, "4": "nan", "5": 6}}'
+    )
+
+    @pytest.mark.parametrize('mode', ['json.load', 'streaming', 'pipeline'])
+    def test_paths_store_identical_rows(self, tmp_path, mode):
+        """Test that json.load, streaming and pipeline ingestion store the same rows, NaN/Inf as NULL"""
+        path = tmp_path / 'songs.json'
+        path.write_text(self.DOCUMENT)
+        streaming, workers = {'json.load': (False, 1), 'streaming': (True, 1), 'pipeline': (True, 2)}[mode]
+
+        app = create_test_app(tmp_path)
+        try:
+            with app.app_context():
+                assert DataProcessor.process_json_file(str(path), streaming=streaming, workers=workers) == 6
+                rows = [(song.id, song.danceability, song.energy, song.tempo, song.key)
+                        for song in Song.query.order_by(Song.index).all()]
+            response = app.test_client().get('/api/songs?per_page=10')
+            assert response.status_code == 200
+            assert b'NaN' not in response.data and b'Infinity' not in response.data
+        finally:
+            close_test_app(app)
+
+        assert rows == [
+            ('nf_0', 0.5, 0.25, 120.0, 1),
+            ('nf_1', None, 0.5, 121.0, None),
+            ('nf_2', None, None, 122.0, None),
+            ('nf_3', None, None, None, 4),
+            ('nf_4', None, 0.75, 124.0, None),
+            ('nf_5', None, 1.0, 125.0, 6),
+        ]
+
+    def test_normalizer_without_numpy(self, monkeypatch):
+        """Test the pure-Python column conversion nulls non-finite floats too"""
+        import columnar
+        monkeypatch.setattr(columnar, 'np', None)
+        values, mask = columnar.ColumnarNormalizer.convert_column(
+            'float', [0.5, float('nan'), 'inf', '-Infinity', '', None, '2'])
+        assert values == [0.5, None, None, None, None, None, 2.0]
+        assert mask == [False, True, True, True, True, True, False]
+
+
+class TestSnapshot:
+    """Test export_snapshot / import_snapshot round trips between databases"""
+
+    SEARCHES = ('river', 'night river', 'song 1', 'zz')
+
+    @staticmethod
+    def catalog(count=60, title='{word} River Song {row}'):
+        """Songs with gaps in their features, spread over every rating"""
+        words = ['Night', 'Morning', 'Blue', 'Gold']
+        return [
+            {
+                'index': row,
+                'id': f'snap_{row}',
+                'title': title.format(word=words[row % len(words)], row=row),
+                'danceability': None if row % 5 == 0 else (row % 10) / 10,
+                'energy': (row % 7) / 7,
+                'tempo': 80.0 + row,
+                'duration_ms': 150000 + 1000 * row,
+                'class': row % 2,
+                'star_rating': None if row % 9 == 0 else row % 6,
+            }
+            for row in range(count)
+        ]
+
+    def observe(self, app):
+        """Rows, /api/stats and search results of an app's catalog"""
+        from sqlalchemy import text
+        client = app.test_client()
+        with app.app_context():
+            rows = [song.to_dict() for song in Song.query.order_by(Song.index).all()]
+            # Raises if the full-text index disagrees with the songs table
+            db.session.execute(text("INSERT INTO songs_fts(songs_fts, rank) VALUES ('integrity-check', 1)"))
+        stats = json.loads(client.get('/api/stats').data)['data']
+        searches = {
+            term: [song['id'] for song in json.loads(
+                client.get(f'/api/songs/search?title={term}&mode=tokens').data)['data']]
+            for term in self.SEARCHES
+        }
+        return rows, stats, searches
+
+    @staticmethod
+    def assert_same_stats(copy, source):
+        """Equal stats, averages up to float summation order"""
+        assert set(copy) == set(source)
+        for key, value in source.items():
+            if key.startswith('average_'):
+                assert copy[key] == pytest.approx(value)
+            else:
+                assert copy[key] == value
+
+    def round_trip(self, app, tmp_path, existing):
+        """Export app's catalog, import it into a fresh app holding existing songs, observe both"""
+        path = str(tmp_path / 'songs.songsnap')
+        with app.app_context():
+            assert DataProcessor.export_snapshot(path)['rows'] == 60
+
+        (tmp_path / 'copy').mkdir()
+        target = create_test_app(tmp_path / 'copy', 'pytest-copy')
+        try:
+            with target.app_context():
+                if existing:
+                    DataProcessor.bulk_upsert(existing)
+                result = DataProcessor.import_snapshot(path)
+            return result, self.observe(app), self.observe(target)
+        finally:
+            close_test_app(target)
+
+    def test_round_trip_into_empty_database(self, app, tmp_path, caplog):
+        """Test that a snapshot loaded into an empty database reproduces rows, stats and search"""
+        with app.app_context():
+            DataProcessor.bulk_upsert(self.catalog())
+
+        result, source, copy = self.round_trip(app, tmp_path, [])
+        # The summary is rebuilt after the trigger-less load, not reported as drift
+        assert not [record for record in caplog.records if 'drift' in record.getMessage()]
+        assert (result['inserted'], result['updated']) == (60, 0)
+        assert copy[0] == source[0]
+        self.assert_same_stats(copy[1], source[1])
+        assert copy[2] == source[2]
+        assert source[2]['night river'] and source[2]['zz'] == []
+
+    def test_round_trip_into_populated_database(self, app, tmp_path):
+        """Test that a snapshot upserted over stale copies of its songs reproduces the source"""
+        with app.app_context():
+            DataProcessor.bulk_upsert(self.catalog())
+        stale = [dict(song, energy=0.99, star_rating=1) for song in self.catalog(20, 'Zz Stale {row}')]
+
+        result, source, copy = self.round_trip(app, tmp_path, stale)
+        assert (result['inserted'], result['updated']) == (40, 20)
+        # Upserted songs keep their own created_at and get a fresh updated_at
+        ignored = ('created_at', 'updated_at')
+        assert ([{k: v for k, v in row.items() if k not in ignored} for row in copy[0]]
+                == [{k: v for k, v in row.items() if k not in ignored} for row in source[0]])
+        self.assert_same_stats(copy[1], source[1])
+        assert copy[2] == source[2]
+
+
+class TestTitleIndex:
+    """Test the in-memory trigram title index"""
+
+    def test_memory_stays_bounded_under_renames(self):
+        """Test 500 titles renamed 100 times: stale postings are compacted away"""
+        from trigram_index import TrigramIndex
+
+        index = TrigramIndex(compact_ratio=0.5)
+        index.build((doc, f'Song Title {doc}') for doc in range(500))
+        fresh = index.memory_usage()['total_bytes']
+
+        peak = 0
+        for rename in range(100):
+            index.add_many((doc, f'Renamed {rename} Title {doc}') for doc in range(500))
+            if rename % 10 == 9:
+                peak = max(peak, index.memory_usage()['total_bytes'])
+
+        usage = index.memory_usage()
+        assert usage['compactions'] > 0
+        assert peak < 3 * fresh
+        assert len(index) == 500
+        assert index.autocomplete('renamed 99 title 7', limit=1) == [7]
+        assert index.search('renamed 99 title 499', limit=1)[0][0] == 499
+
+
+@pytest.mark.parametrize('app', [
+    {'SIMILAR_REBUILD_RATIO': 1000.0},
+    {'SIMILAR_REBUILD_RATIO': 1000.0, 'SIMILAR_PARTITION_THRESHOLD': 50, 'SIMILAR_NPROBE': 64},
+], ids=['exact', 'partitioned'], indirect=True)
+class TestSimilarSongs:
+    """Test GET /api/songs/<song_id>/similar against a brute-force kNN"""
+
+    @staticmethod
+    def load_catalog(app, count=300):
+        """Random feature rows with gaps, liveness missing on every song"""
+        import random
+        import warnings
+        from similar_songs import FEATURES
+
+        rng = random.Random(0)
+        songs = []
+        for row in range(count):
+            song = {'index': row, 'id': f'similar_{row}', 'title': f'Similar {row}'}
+            for name in FEATURES:
+                if name != 'liveness' and rng.random() > 0.1:
+                    song[name] = rng.uniform(0, 1) if name != 'tempo' else rng.uniform(60, 200)
+            songs.append(song)
+
+        with app.app_context():
+            DataProcessor.bulk_upsert(songs)
+            # Refit on the full catalog; the all-missing feature must not warn
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', RuntimeWarning)
+                app.extensions['feature_index'].build_from_db()
+        return songs
+
+    @staticmethod
+    def brute_force(songs, song, k):
+        """z-score every feature over the songs that have it, then rank by distance"""
+        import math
+        import statistics
+        from similar_songs import FEATURES
+
+        scales = {}
+        for name in FEATURES:
+            values = [other[name] for other in songs if other.get(name) is not None]
+            mean = statistics.fmean(values) if values else 0.0
+            std = statistics.pstdev(values) if values else 0.0
+            scales[name] = (mean, std or 1.0)
+
+        def vector(other):
+            return [0.0 if other.get(name) is None else (other[name] - scales[name][0]) / scales[name][1]
+                    for name in FEATURES]
+
+        query = vector(song)
+        ranked = sorted((math.dist(query, vector(other)), other['id'])
+                        for other in songs if other is not song)
+        return ranked[:k]
+
+    def test_matches_brute_force(self, app, client):
+        """Test that every mode returns the brute-force nearest songs and distances"""
+        songs = self.load_catalog(app)
+        partitioned = app.config['SIMILAR_PARTITION_THRESHOLD'] <= len(songs)
+        assert app.extensions['feature_index'].partitioned == partitioned
+
+        for song in songs[::37]:
+            expected = self.brute_force(songs, song, 10)
+            for exact in ('false', 'true'):
+                response = client.get(f"/api/songs/{song['id']}/similar?k=10&exact={exact}")
+                assert response.status_code == 200
+                data = json.loads(response.data)
+                assert data['mode'] == ('partitioned' if partitioned and exact == 'false' else 'exact')
+                assert [found['id'] for found in data['data']] == [song_id for _, song_id in expected]
+                assert [found['distance'] for found in data['data']] == pytest.approx(
+                    [distance for distance, _ in expected], abs=1e-4)
+
+
+class TestSongModel:
+    """Test Song model"""
+
+    def test_song_to_dict(self, app):
+        """Test converting song to dictionary"""
+        with app.app_context():
+            song = Song(
+                index=0,
+                id='test_id',
+                title='Test Song',
+                danceability=0.5,
+                star_rating=3
+            )
+
+            song_dict = song.to_dict()
+
+            assert song_dict['id'] == 'test_id'
+            assert song_dict['title'] == 'Test Song'
+            assert song_dict['danceability'] == 0.5
+            assert song_dict['star_rating'] == 3
+
+    def test_validate_rating_valid(self):
+        """Test valid rating validation"""
+        assert Song.validate_rating(3) == True
+        assert Song.validate_rating(0) == True
+        assert Song.validate_rating(5) == True
+
+    def test_validate_rating_invalid(self):
+        """Test invalid rating validation"""
+        with pytest.raises(ValueError):
+            Song.validate_rating(6)
+
+        with pytest.raises(ValueError):
+            Song.validate_rating(-1)
+
+        with pytest.raises(ValueError):
+            Song.validate_rating(3.5)
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def encoder_backend(request, monkeypatch):
+    """Run a serialization test with orjson, then with the stdlib-only path"""
+    import serialization
+    if request.param == 'orjson':
+        if serialization.orjson is None:
+            pytest.skip('orjson is not installed')
+    else:
+        monkeypatch.setattr(serialization, 'orjson', None)
+    return request.param
+
+
+class TestSerialization:
+    """Test the compiled row encoders in serialization.py against Song.to_dict()"""
+
+    @staticmethod
+    def add_songs(app):
+        """Songs covering NULLs, float edge cases, class and both datetime forms"""
+        from datetime import datetime
+        songs = [
+            Song(index=0, id='enc_full', title='Caf\u00e9 "Quoted" \\ Song', danceability=0.5,
+                 energy=1e-05, loudness=-12.25, acousticness=0.00012, instrumentalness=1e16,
+                 liveness=0.0, valence=1.0, tempo=123.456789, key=5, mode=1, time_signature=4,
+                 duration_ms=512000, num_bars=80, num_sections=7, num_segments=600,
+                 class_field=1, star_rating=4,
+                 created_at=datetime(2024, 1, 2, 3, 4, 5, 678901),
+                 updated_at=datetime(2024, 1, 2, 3, 4, 5)),
+            Song(index=1, id='enc_nulls', title='Nulls', star_rating=0, class_field=0,
+                 created_at=datetime(2024, 6, 1)),
+            Song(index=2, id='enc_bare', title='Bare', star_rating=None),
+        ]
+        with app.app_context():
+            db.session.add_all(songs)
+            db.session.commit()
+            # Column defaults fill the timestamps on insert
+            db.session.execute(db.update(Song).where(Song.id == 'enc_bare')
+                               .values(created_at=None, updated_at=None))
+            db.session.commit()
+
+    @staticmethod
+    def expected(app):
+        """Song.to_dict() of every song, in index order"""
+        with app.app_context():
+            return [song.to_dict() for song in Song.query.order_by(Song.index).all()]
+
+    @staticmethod
+    def fetch(app, statement):
+        """Rows of statement() (built in the app context), in index order"""
+        with app.app_context():
+            return [tuple(row) for row in db.session.execute(statement().order_by(Song.index))]
+
+    def test_row_encoder_matches_to_dict(self, app, encoder_backend):
+        """Test that encoded rows are jsonify's compact output for to_dict(), key order included"""
+        from sqlalchemy import select
+        from serialization import encode_song_objects, encode_song_row, select_songs
+
+        self.add_songs(app)
+        expected = self.expected(app)
+        compact = [json.dumps(song, sort_keys=True, separators=(',', ':')) for song in expected]
+        assert expected[1]['energy'] is None and expected[2]['created_at'] is None
+        assert expected[0]['class'] == 1
+
+        # Raw SQLite datetime text and DateTime-processed values alike
+        for rows in (self.fetch(app, select_songs),
+                     self.fetch(app, lambda: select(*Song.__table__.columns))):
+            assert [encode_song_row(row) for row in rows] == compact
+            assert encode_song_objects(rows) == compact
+            for encoded, song in zip(encode_song_objects(rows), expected):
+                assert list(json.loads(encoded)) == sorted(song)
+
+    def test_column_encoder_matches_to_dict(self, app, encoder_backend):
+        """Test that column-major output holds each to_dict() field in to_dict() order"""
+        from serialization import encode_song_columns, select_songs
+
+        self.add_songs(app)
+        expected = self.expected(app)
+        columns = json.loads(encode_song_columns(self.fetch(app, select_songs)))
+
+        assert list(columns) == list(expected[0])
+        assert columns == {field: [song[field] for song in expected] for field in expected[0]}
+        assert json.loads(encode_song_columns([])) == {field: [] for field in expected[0]}
+
+
+class TestErrorHandlers:
+    """Test error handlers"""
+
+    def test_404_error(self, client):
+        """Test 404 error handler"""
+        response = client.get('/api/nonexistent')
+        assert response.status_code == 404
+
+        data = json.loads(response.data)
+        assert data['status'] == 'error'
+
+    def test_405_error(self, client):
+        """Test 405 error handler"""
+        response = client.post('/')  # GET-only endpoint
+        assert response.status_code == 405
+
+        data = json.loads(response.data)
+        assert data['status'] == 'error'
+
+
+# (method, url, JSON body, expected status): at least one request per route,
+# with the variants whose statement counts differ
+class TestQueryPlanner:
+    """Test the filtered listing's plans and the estimates they are chosen by"""
+
+    @pytest.fixture
+    def catalog(self, app):
+        """400 songs with spread tempos, NULL energy every tenth row, 12 keys and 2 modes"""
+        songs = [{
+            'index': i,
+            'id': f'plan_{i}',
+            'title': f'Plan Song {i}',
+            'energy': None if i % 10 == 0 else (i % 20) / 20,
+            'tempo': 60.0 + (i * 7) % 140,
+            'key': i % 12,
+            'mode': i % 2,
+            'star_rating': i % 6
+        } for i in range(400)]
+        with app.app_context():
+            DataProcessor.bulk_upsert(songs)
+        return songs
+
+    def listing_plan(self, client, filter_expression):
+        response = client.get(f'/api/songs?filter={filter_expression}&explain=true')
+        assert response.status_code == 200
+        return json.loads(response.data)['plan']
+
+    @pytest.mark.parametrize('filter_expression', [
+        'tempo>150', 'tempo:100..120', 'tempo<=60', 'energy>=0.5,energy<0.8', 'energy!=0.5',
+        'key=1|5|7', 'key!=3', 'key=1|5,key!=5', 'mode=1', 'star_rating:2..'
+    ])
+    def test_estimate_counts_one_column_exactly(self, app, catalog, filter_expression):
+        """Test that the sorted-array estimate of one column's conditions is the exact count"""
+        conditions = parse_filter(filter_expression)
+        with app.app_context():
+            snapshot = app.extensions['column_store'].ensure_fresh()
+            exact = int(QueryPlanner._mask(snapshot, conditions).sum())
+            assert QueryPlanner._estimate(conditions, snapshot.size, snapshot) == exact
+
+    @pytest.mark.parametrize('filter_expression, index, columns', [
+        ('tempo>190', 'ix_songs_tempo', ['tempo']),
+        ('mode=1,key=5', 'ix_songs_mode_key_tempo', ['mode', 'key']),
+        ('star_rating=5,danceability>0.9', 'ix_songs_star_rating_danceability', ['star_rating', 'danceability'])
+    ])
+    def test_index_plan(self, app, client, catalog, filter_expression, index, columns):
+        """Test that a selective filter is answered by seeking its index, forced with INDEXED BY"""
+        plan = self.listing_plan(client, filter_expression)
+        assert plan['kind'] == 'index'
+        assert plan['index'] == index
+        assert plan['columns'] == columns
+        assert any(f'USING INDEX {index}' in detail for detail in plan['query_plan'])
+
+        with app.app_context():
+            statement = QueryPlanner.sql_statement(parse_filter(filter_expression), plan, [Song.index])
+            assert f'INDEXED BY {index}' in str(statement.compile(db.engine))
+
+    def test_scan_plan(self, client, catalog):
+        """Test that a filter no index narrows is scanned in the column store, then read by primary key"""
+        plan = self.listing_plan(client, 'energy>0.1')
+        assert plan['kind'] == 'scan'
+        assert plan['candidates'][0]['index'] == 'ix_songs_energy'
+        assert plan['query_plan'][0].startswith('SEARCH songs USING INTEGER PRIMARY KEY')
+
+    def test_table_plan(self, app, catalog):
+        """Test that without a column store a broad filter is left to SQLite, with no index hint"""
+        conditions = parse_filter('energy>0.1')
+        with app.app_context():
+            plan = QueryPlanner(None).plan(conditions, 'index')
+            assert plan['kind'] == 'table'
+
+            statement = QueryPlanner.sql_statement(conditions, plan, [Song.index])
+            assert 'INDEXED BY' not in str(statement.compile(db.engine))
+            assert QueryPlanner.explain(statement)
+
+
+ROUTE_REQUESTS = [
+    ('GET', '/healthz', None, 200),
+    ('GET', '/readyz', None, 200),
+    ('GET', '/', None, 200),
+    ('GET', '/api/songs?page=2&per_page=2&sort_by=energy&order=desc', None, 200),
+    ('GET', '/api/songs?cursor=&sort_by=energy&order=desc&per_page=2', None, 200),
+    ('GET', '/api/songs?cursor=&sort_by=energy&filter=tempo>100&include_total=true', None, 200),
+    ('GET', '/api/songs?filter=mode=1&explain=true', None, 200),
+    ('GET', '/api/songs?cursor=&filter=tempo>100,mode=1&include_total=true&explain=true', None, 200),
+    ('GET', '/api/songs/export', None, 200),
+    ('GET', '/api/songs/export?format=csv&filter=tempo>100&sort_by=tempo', None, 200),
+    ('GET', '/api/songs/export?filter=mode=1&explain=true', None, 200),
+    ('GET', '/api/songs/search?title=Test', None, 200),
+    ('GET', '/api/songs/search?title=Tset Song&mode=fuzzy', None, 200),
+    ('GET', '/api/songs/autocomplete?prefix=Te', None, 200),
+    ('GET', '/api/songs/test_id_1', None, 200),
+    ('GET', '/api/songs/test_id_1/similar', None, 200),
+    ('PUT', '/api/songs/test_id_1/rating', {'rating': 4}, 200),
+    ('PUT', '/api/songs/ratings', {'ratings': [{'id': 'test_id_1', 'rating': 2},
+                                               {'id': 'test_id_2', 'rating': 5}]}, 200),
+    ('POST', '/api/songs/upload', upload_payload(1500), 201),
+    ('POST', '/api/songs/upload?async=true', upload_payload(20), 202),
+    ('POST', '/api/jobs', {'size': 10}, 201),
+    ('GET', '/api/stats', None, 200),
+    ('GET', '/api/aggregates?histogram=energy,tempo&scatter=tempo:energy&series=danceability', None, 200),
+    ('GET', '/api/cache/stats', None, 200),
+    ('GET', '/api/column-store/stats', None, 200),
+    ('GET', '/metrics', None, 200),
+]
+
+
+class TestResponseFormats:
+    """Test Accept negotiation of listing formats, and response compression"""
+
+    LISTING = '/api/songs?per_page=10&sort_by=index'
+
+    @staticmethod
+    def json_listing(client, url):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        return json.loads(response.data)
+
+    @staticmethod
+    def rows_of(columns):
+        """Column-major {field: [values]} back to row dicts"""
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def get_format(self, client, accept, mimetype):
+        response = client.get(self.LISTING, headers={'Accept': accept})
+        assert response.status_code == 200
+        assert response.mimetype == mimetype
+        assert 'Accept' in response.headers['Vary']
+        return response
+
+    def test_columns_json_round_trip(self, client, sample_songs):
+        """Test that the column-major JSON layout decodes to the row-major listing"""
+        expected = self.json_listing(client, self.LISTING)
+        response = self.get_format(client, 'application/vnd.songs.columns+json',
+                                   'application/vnd.songs.columns+json')
+        columns = json.loads(response.data)
+
+        assert self.rows_of(columns.pop('data')) == expected.pop('data')
+        assert columns == expected
+
+    def test_msgpack_round_trip(self, client, sample_songs):
+        """Test that MessagePack decodes to the column-major listing"""
+        msgpack = pytest.importorskip('msgpack')
+        expected = self.json_listing(client, self.LISTING)
+        response = self.get_format(client, 'application/x-msgpack', 'application/msgpack')
+        decoded = msgpack.unpackb(response.data)
+
+        assert self.rows_of(decoded.pop('data')) == expected.pop('data')
+        assert decoded == expected
+
+    def test_arrow_round_trip(self, client, sample_songs):
+        """Test that the Arrow stream holds typed rows, the envelope in its schema metadata"""
+        pa = pytest.importorskip('pyarrow')
+        expected = self.json_listing(client, self.LISTING)
+        response = self.get_format(client, 'application/vnd.apache.arrow.stream',
+                                   'application/vnd.apache.arrow.stream')
+        table = pa.ipc.open_stream(response.data).read_all()
+
+        assert table.schema.field('danceability').type == pa.float64()
+        assert table.schema.field('star_rating').type == pa.int64()
+        rows = [{field: value.isoformat() if hasattr(value, 'isoformat') else value
+                 for field, value in row.items()} for row in table.to_pylist()]
+        assert rows == expected.pop('data')
+        assert json.loads(table.schema.metadata[b'envelope']) == expected
+
+    def test_negotiation_preferences(self, client, sample_songs):
+        """Test q-values, wildcards and unsupported types: unknown types fall back to JSON"""
+        pytest.importorskip('msgpack')
+        assert client.get(self.LISTING, headers={'Accept': 'text/html'}).mimetype == 'application/json'
+        assert client.get(self.LISTING, headers={'Accept': '*/*'}).mimetype == 'application/json'
+        response = client.get(self.LISTING, headers={
+            'Accept': 'application/json;q=0.5, application/msgpack'})
+        assert response.mimetype == 'application/msgpack'
+        response = client.get(self.LISTING, headers={
+            'Accept': 'application/json, application/msgpack;q=0.2'})
+        assert response.mimetype == 'application/json'
+
+    @pytest.mark.parametrize('encoding', ['gzip', 'br'])
+    def test_streamed_export_is_compressed(self, client, sample_songs, encoding):
+        """Test that a streamed export is compressed chunk by chunk and decodes to the plain body"""
+        import zlib
+        from functools import partial
+        if encoding == 'br':
+            decompress = pytest.importorskip('brotli').decompress
+        else:
+            decompress = partial(zlib.decompress, wbits=31)
+
+        plain = client.get('/api/songs/export?format=ndjson')
+        assert 'Content-Encoding' not in plain.headers
+        assert 'Accept-Encoding' in plain.headers['Vary']
+
+        response = client.get('/api/songs/export?format=ndjson',
+                              headers={'Accept-Encoding': f'{encoding}, identity;q=0.1'})
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers['Content-Encoding'] == encoding
+        assert 'Content-Length' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert decompress(response.data) == plain.data
+        assert len(plain.data.splitlines()) == 3
+
+    def test_cached_listing_is_compressed_per_request(self, client):
+        """Test that compression follows each request's Accept-Encoding, with a weak ETag"""
+        import zlib
+        records = DataProcessor.normalize_json(upload_payload(20))
+        with client.application.app_context():
+            DataProcessor.bulk_upsert(records)
+
+        url = '/api/songs?per_page=20'
+        compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        plain = client.get(url)
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert compressed.headers['ETag'].startswith('W/')
+        assert 'Content-Encoding' not in plain.headers
+        assert set(plain.headers['Vary'].replace(' ', '').split(',')) >= {'Accept', 'Accept-Encoding'}
+        assert zlib.decompress(compressed.data, 31) == plain.data
+
+        # Bodies under COMPRESSION_MIN_BYTES are sent as is
+        small = client.get('/api/songs?per_page=1', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in small.headers
+
+
+class TestResponseCache:
+    """Test the response cache: conditional GETs, invalidation on writes and its counters"""
+
+    def test_if_none_match_returns_304(self, client, sample_songs):
+        """Test that a matching ETag is answered with an empty 304, per request"""
+        response = client.get('/api/songs?per_page=2')
+        etag = response.headers['ETag']
+        assert response.status_code == 200
+        assert 'Accept' in response.headers['Vary']
+
+        revalidated = client.get('/api/songs?per_page=2', headers={'If-None-Match': etag})
+        assert revalidated.status_code == 304
+        assert revalidated.data == b''
+        assert revalidated.headers['ETag'] == etag
+
+        other = client.get('/api/songs?per_page=3', headers={'If-None-Match': etag})
+        assert other.status_code == 200
+        assert other.headers['ETag'] != etag
+
+    def test_rating_update_invalidates(self, client, sample_songs):
+        """Test that a rating PUT drops cached bodies and changes the ETag"""
+        response = client.get('/api/songs/test_id_1')
+        etag = response.headers['ETag']
+        assert json.loads(response.data)['data']['star_rating'] == 0
+
+        assert client.put('/api/songs/test_id_1/rating', json={'rating': 5}).status_code == 200
+
+        response = client.get('/api/songs/test_id_1', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert json.loads(response.data)['data']['star_rating'] == 5
+
+    def test_upload_invalidates(self, client, sample_songs):
+        """Test that an upload drops cached listings and stats"""
+        listing = json.loads(client.get('/api/songs?per_page=1').data)
+        stats = json.loads(client.get('/api/stats').data)
+        assert listing['pagination']['total_items'] == 3
+        assert stats['data']['total_songs'] == 3
+
+        assert client.post('/api/songs/upload', json=upload_payload(5)).status_code == 201
+
+        listing = json.loads(client.get('/api/songs?per_page=1').data)
+        stats = json.loads(client.get('/api/stats').data)
+        assert listing['pagination']['total_items'] == 5
+        assert stats['data']['total_songs'] == 5
+
+    def test_stats_count_hits_and_misses(self, app, client, sample_songs):
+        """Test /api/cache/stats: a miss, then hits, a 304 and a write emptying the cache"""
+        def cache_stats():
+            return json.loads(client.get('/api/cache/stats').data)['data']
+
+        before = cache_stats()
+        etag = client.get('/api/songs').headers['ETag']
+        client.get('/api/songs')
+        client.get('/api/songs')
+        client.get('/api/songs', headers={'If-None-Match': etag})
+
+        stats = cache_stats()
+        assert stats['misses'] - before['misses'] == 1
+        assert stats['hits'] - before['hits'] == 2
+        assert stats['not_modified'] - before['not_modified'] == 1
+        assert stats['entries'] == 1
+        assert stats['bytes'] > 0
+
+        client.put('/api/songs/test_id_2/rating', json={'rating': 1})
+        stats = cache_stats()
+        assert stats['entries'] == 0
+        assert stats['version'] > before['version']
+
+
+class TestDataVersion:
+    """Test that song writes by another process reach the caches and indexes"""
+
+    @staticmethod
+    def write_elsewhere(app, ids, *statements):
+        """
+        Run statements and log the ids they wrote on a separate engine, as
+        another process's write path would
+        """
+        from sqlalchemy import create_engine
+        from data_version import DataVersion
+
+        engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+        with app.app_context(), engine.begin() as connection:
+            for statement, params in statements:
+                connection.exec_driver_sql(statement, params)
+            DataVersion.log_writes(connection, ids)
+        engine.dispose()
+
+    def test_other_process_update_is_served(self, app, client, sample_songs):
+        """Test cached listing, column-store order and autocomplete after an outside UPDATE"""
+        listing = '/api/songs?sort_by=star_rating&order=desc&per_page=3'
+        ids = [song['id'] for song in json.loads(client.get(listing).data)['data']]
+        assert ids == ['test_id_3', 'test_id_2', 'test_id_1']
+        assert json.loads(client.get('/api/songs/autocomplete?prefix=zebra').data)['data'] == []
+
+        self.write_elsewhere(app, ['test_id_1'], ("UPDATE songs SET title = ?, star_rating = ? WHERE id = ?",
+                                                  ('Zebra Crossing', 4, 'test_id_1')))
+
+        data = json.loads(client.get(listing).data)['data']
+        assert [song['id'] for song in data] == ['test_id_3', 'test_id_1', 'test_id_2']
+        assert data[1]['star_rating'] == 4
+        suggestions = json.loads(client.get('/api/songs/autocomplete?prefix=zebra').data)['data']
+        assert [suggestion['id'] for suggestion in suggestions] == ['test_id_1']
+        stats = app.extensions['data_version'].stats()
+        assert stats['foreign_writes'] == 1
+        assert stats['catch_ups'] == 1
+
+    def test_own_writes_are_not_reapplied(self, app, client, sample_songs):
+        """Test that this process's writes never count as another process's"""
+        own_writes = app.extensions['data_version'].stats()['own_writes']
+        for rating in (1, 2, 3):
+            response = client.put('/api/songs/test_id_3/rating', json={'rating': rating})
+            assert response.status_code == 200
+            client.get('/api/songs')
+
+        stats = app.extensions['data_version'].stats()
+        assert stats['own_writes'] == own_writes + 3
+        assert stats['foreign_writes'] == 0
+
+    def test_bulk_upsert_logs_once_per_batch(self, app, client, sample_songs):
+        """Test an own upload: one version per batch, its ids logged, no per-row triggers"""
+        from sqlalchemy import text
+        from data_version import DataVersion
+
+        watcher = app.extensions['data_version']
+        with app.app_context():
+            version = DataVersion.read()
+            DataProcessor.bulk_upsert(DataProcessor.normalize_json(upload_payload(25)), batch_size=10)
+            assert DataVersion.read() == version + 3
+            assert len(DataVersion.changed_since(version)) == 25
+            triggers = db.session.scalars(
+                text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'song_version%'")
+            ).all()
+        assert triggers == []
+
+        client.get('/api/songs')
+        assert watcher.stats()['foreign_writes'] == 0
+
+    def test_rolled_back_writes_are_not_counted(self, app, client, sample_songs):
+        """Test that a rolled-back own write leaves the count alone, so the next outside write is seen"""
+        from data_version import DataVersion
+
+        watcher = app.extensions['data_version']
+        own_writes = watcher.stats()['own_writes']
+        with app.app_context():
+            DataVersion.log_writes(db.session.connection(), ['test_id_1'])
+            db.session.rollback()
+        assert watcher.stats()['own_writes'] == own_writes
+
+        self.write_elsewhere(app, ['test_id_2'], ("UPDATE songs SET star_rating = ? WHERE id = ?", (1, 'test_id_2')))
+        data = json.loads(client.get('/api/songs/test_id_2').data)['data']
+        assert data['star_rating'] == 1
+        assert watcher.stats()['foreign_writes'] == 1
+
+    def test_large_gap_rebuilds(self, app, client, sample_songs):
+        """Test more outside changes than DATA_VERSION_MAX_IDS: everything is rebuilt"""
+        app.extensions['data_version'].max_ids = 1
+        self.write_elsewhere(app, ['outside_10', 'outside_11'], *[
+            ("INSERT INTO songs (\"index\", id, title, star_rating) VALUES (?, ?, ?, 0)",
+             (index, f'outside_{index}', f'Outside Song {index}'))
+            for index in (10, 11)
+        ])
+
+        data = json.loads(client.get('/api/songs?per_page=10').data)
+        assert data['pagination']['total_items'] == 5
+        suggestions = json.loads(client.get('/api/songs/autocomplete?prefix=outside').data)['data']
+        assert sorted(suggestion['id'] for suggestion in suggestions) == ['outside_10', 'outside_11']
+
+
+class TestMetrics:
+    """Test the SQL statement metrics kept by engine events"""
+
+    def test_failed_statements_leave_nothing_behind(self, app, sample_songs):
+        """Test that failing statements leave no timing state on the connection and are not counted"""
+        from sqlalchemy import text
+        from sqlalchemy.exc import OperationalError
+
+        metrics = app.extensions['metrics']
+        before = metrics.sql_statements._values.get((), 0)
+        with app.app_context():
+            connection = db.session.connection()
+            for _ in range(5):
+                with pytest.raises(OperationalError):
+                    connection.execute(text('SELECT * FROM no_such_table'))
+            assert connection.execute(text('SELECT COUNT(*) FROM songs')).scalar() == 3
+            assert not any('metrics' in str(key) for key in connection.info)
+            db.session.rollback()
+
+        assert metrics.sql_statements._values.get((), 0) - before == 1
+
+
+class TestStatementBudgets:
+    """Every route within its statement_budget (QUERY_BUDGET_MODE='raise')"""
+
+    @pytest.mark.parametrize('method,url,body,status', ROUTE_REQUESTS)
+    def test_route_within_budget(self, client, sample_songs, method, url, body, status):
+        """Test a request, on a fresh dataset and again after a write (refreshes, cache misses)"""
+        for _ in range(2):
+            response = client.open(url, method=method, json=body)
+            response.get_data()
+            response.close()
+            assert response.status_code == status
+
+            rating = client.put('/api/songs/test_id_3/rating', json={'rating': 1})
+            assert rating.status_code == 200
+
+    def test_upload_job_routes_within_budget(self, client, sample_songs):
+        """Test the chunked upload flow: create, send chunks, poll"""
+        body = json.dumps(upload_payload(50)).encode('utf-8')
+        half = len(body) // 2
+
+        response = client.post('/api/jobs', json={'size': len(body)})
+        assert response.status_code == 201
+        job_id = json.loads(response.data)['data']['id']
+
+        response = client.put(f'/api/jobs/{job_id}/data', data=body[:half],
+                              headers={'Content-Range': f'bytes 0-{half - 1}/{len(body)}'})
+        assert response.status_code == 200
+        response = client.put(f'/api/jobs/{job_id}/data', data=body[half:],
+                              headers={'Content-Range': f'bytes {half}-{len(body) - 1}/{len(body)}'})
+        assert response.status_code == 202
+
+        deadline = time.time() + 30
+        while True:
+            response = client.get(f'/api/jobs/{job_id}')
+            assert response.status_code == 200
+            job = json.loads(response.data)['data']
+            if job['state'] in ('done', 'failed') or time.time() > deadline:
+                break
+            time.sleep(0.05)
+        assert job['state'] == 'done'
+        assert job['inserted'] == 47  # the first 3 re-upload the sample songs
+
+    def test_every_route_is_exercised(self, app):
+        """Test that ROUTE_REQUESTS (plus the upload job flow) covers every route"""
+        adapter = app.url_map.bind('localhost')
+        exercised = {adapter.match(url.split('?')[0], method=method)[0]
+                     for method, url, _, _ in ROUTE_REQUESTS}
+        exercised |= {'upload_job_data', 'get_upload_job'}
+        routes = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+        assert routes <= exercised
+
+    def test_over_budget_request_raises(self, app, client, sample_songs):
+        """Test that raise mode fails a request that exceeds its route's budget"""
+        from query_budget import QueryBudgetExceeded
+
+        app.view_functions['get_song_by_id'].statement_budget = 0
+        try:
+            with pytest.raises(QueryBudgetExceeded):
+                client.get('/api/songs/test_id_1')
+        finally:
+            app.view_functions['get_song_by_id'].statement_budget = 1
+
+    def test_bulk_upsert_within_budget(self, app):
+        """
+        Test bulk_upsert: per batch one INSERT, the data version log and the
+        trigger deferral, plus
+        an id SELECT, the title and feature index lookups and the search
+        index and stats updates per 900 ids, never per row
+        """
+        from data_processor import (DEFERRED_STATEMENTS_PER_BATCH, DEFERRED_STATEMENTS_PER_CHUNK,
+                                    DEFERRED_TRIGGER_STATEMENTS)
+        from data_version import LOG_WRITES_STATEMENTS
+
+        per_batch = lambda chunks: (1 + LOG_WRITES_STATEMENTS + DEFERRED_TRIGGER_STATEMENTS
+                                    + DEFERRED_STATEMENTS_PER_BATCH + (3 + DEFERRED_STATEMENTS_PER_CHUNK) * chunks)
+        records = DataProcessor.normalize_json(upload_payload(2500))
+        with app.app_context():
+            with query_budget(2 * per_batch(2) + per_batch(1), label='bulk_upsert of 1000 + 1000 + 500 rows'):
+                result = DataProcessor.bulk_upsert(records, batch_size=1000)
+        assert result['inserted'] == 2500
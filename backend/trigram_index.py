@@ -0,0 +1,341 @@
+import logging
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from models import db, Song
+from signals import songs_upserted
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ids looked up per query when applying upserts
+LOOKUP_CHUNK = 900
+
+# Below this many posting entries stale ones are never worth a compaction
+COMPACT_MIN_ENTRIES = 4096
+
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """Casefold, strip accents and collapse punctuation/whitespace to single spaces"""
+    if not title:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', title)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD_RE.sub(' ', stripped.casefold()).strip()
+
+
+def title_trigrams(normalized: str) -> List[str]:
+    """
+    Distinct trigrams of a normalized title.
+
+    The title is padded with two leading spaces and one trailing space, so
+    the first trigrams ("  a", " ab") anchor the start of the title.
+    """
+    padded = f'  {normalized} '
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+def prefix_trigrams(normalized_prefix: str) -> List[str]:
+    """Start-anchored trigrams that every title beginning with the prefix contains"""
+    padded = f'  {normalized_prefix}'
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+class TrigramIndex:
+    """
+    In-memory trigram index over song titles.
+
+    Documents are keyed by Song.index. Storage is array-backed:
+
+        postings   trigram -> array('I') of song indexes
+        _blob      normalized titles, UTF-8, concatenated
+        _start     array('Q') blob offset per song index
+        _length    array('I') byte length per song index (0 = no title)
+        _grams     array('H') distinct trigram count per song index
+
+    Memory is therefore about
+
+        (8 + 4 + 2) x (max index + 1)
+        + (title bytes + 4 x distinct trigrams) per title
+        + ~180 bytes per distinct trigram (key string + array header)
+
+    For 5M titles of ~20 characters this is roughly 70 MB of per-song arrays,
+    100 MB of blob and 400 MB of postings; memory_usage() reports the exact
+    figures. Title changes append new postings and title bytes and leave the
+    old ones behind; every candidate is checked against its current title.
+    Once stale entries make up more than compact_ratio of the postings (or
+    stale bytes of the blob), add() compacts the index with rebuild(), so
+    memory stays within about 1 / (1 - compact_ratio) of a fresh build.
+    """
+
+    def __init__(self, compact_ratio: float = 0.5):
+        self.compact_ratio = compact_ratio
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.postings: Dict[str, array] = {}
+        self._blob = bytearray()
+        self._start = array('Q')
+        self._length = array('I')
+        self._grams = array('H')
+        self.size = 0
+        self._entries = 0  # posting entries, stale ones included
+        self._live_entries = 0  # trigrams of the current titles
+        self._stale_bytes = 0  # blob bytes of replaced titles
+
+    def __len__(self) -> int:
+        return self.size
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def build(self, rows: Iterable[Tuple[int, str]]) -> None:
+        """Replace the index contents with (song index, title) rows"""
+        with self._lock:
+            self._reset()
+            self.add_many(rows)
+
+    def build_from_db(self, chunk_size: int = 10000) -> None:
+        """Build from the songs table, streaming rows in index order"""
+        rows = db.session.execute(
+            select(Song.index, Song.title).order_by(Song.index).execution_options(yield_per=chunk_size)
+        )
+        self.build(rows)
+        logger.info(f"Trigram index built: {self.size} titles, {len(self.postings)} trigrams")
+
+    def rebuild(self) -> None:
+        """Compact the index by rebuilding it from its current titles"""
+        with self._lock:
+            rows = [(doc, self.title(doc)) for doc in range(len(self._length)) if self._length[doc]]
+            self._reset()
+            # Titles are already normalized; normalizing again is a no-op
+            self.add_many(rows)
+            self.compactions += 1
+
+    def add_many(self, rows: Iterable[Tuple[int, str]]) -> None:
+        with self._lock:
+            for doc, title in rows:
+                self.add(doc, title)
+
+    def add(self, doc: int, title: Optional[str]) -> None:
+        """Index or re-index one song's title"""
+        normalized = normalize_title(title)
+        encoded = normalized.encode('utf-8')
+
+        with self._lock:
+            if doc >= len(self._length):
+                grow = doc + 1 - len(self._length)
+                self._start.extend(array('Q', bytes(8 * grow)))
+                self._length.extend(array('I', bytes(4 * grow)))
+                self._grams.extend(array('H', bytes(2 * grow)))
+
+            if self._length[doc]:
+                if self._title_bytes(doc) == encoded:
+                    return
+                # The old title's bytes and postings stay behind until compaction
+                self._stale_bytes += self._length[doc]
+                self._live_entries -= self._grams[doc]
+            else:
+                self.size += 1
+
+            if not encoded:
+                self._length[doc] = 0
+                self._grams[doc] = 0
+                self.size -= 1
+                self._compact_if_stale()
+                return
+
+            self._start[doc] = len(self._blob)
+            self._length[doc] = len(encoded)
+            self._blob += encoded
+
+            grams = title_trigrams(normalized)
+            self._grams[doc] = min(len(grams), 0xFFFF)
+            self._live_entries += self._grams[doc]
+            postings = self.postings
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = array('I', [doc])
+                    self._entries += 1
+                elif posting[-1] != doc:
+                    posting.append(doc)
+                    self._entries += 1
+            self._compact_if_stale()
+
+    def _compact_if_stale(self) -> None:
+        """rebuild() once stale postings or title bytes pass compact_ratio"""
+        if self._entries < COMPACT_MIN_ENTRIES:
+            return
+        limit = self.compact_ratio
+        if (self._entries - self._live_entries > limit * self._entries
+                or self._stale_bytes > limit * len(self._blob)):
+            stale = self._entries - self._live_entries
+            self.rebuild()
+            logger.info(f"Trigram index compacted: {stale} stale postings dropped")
+
+    def _title_bytes(self, doc: int) -> bytes:
+        start = self._start[doc]
+        return bytes(self._blob[start:start + self._length[doc]])
+
+    def title(self, doc: int) -> str:
+        """Current normalized title of a song index ('' if unknown)"""
+        if doc >= len(self._length) or not self._length[doc]:
+            return ''
+        return self._title_bytes(doc).decode('utf-8')
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def autocomplete(self, prefix: str, limit: int = 10, scan_limit: int = 1000) -> List[int]:
+        """
+        Song indexes whose title starts with the prefix.
+
+        Scans the rarest start-anchored trigram's posting list in index order,
+        keeping up to scan_limit verified matches, and returns the shortest
+        titles first.
+        """
+        normalized = normalize_title(prefix)
+        if not normalized:
+            return []
+
+        with self._lock:
+            lists = [self.postings.get(gram) for gram in prefix_trigrams(normalized)]
+            if any(posting is None for posting in lists):
+                return []
+            rarest = min(lists, key=len)
+
+            matches = []
+            seen = set()
+            for doc in rarest:
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                title = self.title(doc)
+                if title.startswith(normalized):
+                    matches.append((len(title), title, doc))
+                    if len(matches) >= scan_limit:
+                        break
+
+        matches.sort()
+        return [doc for _, _, doc in matches[:limit]]
+
+    def search(self, query: str, limit: int = 10, threshold: float = 0.3) -> List[Tuple[int, float]]:
+        """
+        Typo-tolerant title search.
+
+        Candidates are scored by Dice similarity of trigram sets,
+        2 x shared / (query trigrams + title trigrams), and re-checked against
+        their current title.
+
+        Returns:
+            [(song index, score)] best first, scores >= threshold
+        """
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+        grams = title_trigrams(normalized)
+
+        with self._lock:
+            lists = [self.postings[gram] for gram in grams if gram in self.postings]
+            if not lists:
+                return []
+
+            if np is not None:
+                docs, shared = np.unique(
+                    np.concatenate([np.frombuffer(posting, dtype=np.uint32) for posting in lists]),
+                    return_counts=True
+                )
+                title_grams = np.frombuffer(self._grams, dtype=np.uint16)[docs].astype(np.float64)
+                scores = 2.0 * shared / (len(grams) + title_grams)
+                keep = scores >= threshold
+                docs, scores = docs[keep], scores[keep]
+                # Over-fetch: stale postings can inflate a score until verified
+                top = min(len(docs), limit * 4)
+                order = np.argsort(-scores, kind='stable')[:top]
+                candidates = docs[order].tolist()
+            else:
+                counts = Counter()
+                for posting in lists:
+                    counts.update(set(posting))
+                scored = [
+                    (2.0 * shared / (len(grams) + self._grams[doc]), doc)
+                    for doc, shared in counts.items()
+                ]
+                scored = [item for item in scored if item[0] >= threshold]
+                scored.sort(key=lambda item: (-item[0], item[1]))
+                candidates = [doc for _, doc in scored[:limit * 4]]
+
+            # Exact re-score against the current title
+            query_set = set(grams)
+            results = []
+            for doc in candidates:
+                title_set = set(title_trigrams(self.title(doc)))
+                if not title_set:
+                    continue
+                score = 2.0 * len(query_set & title_set) / (len(query_set) + len(title_set))
+                if score >= threshold:
+                    results.append((doc, score))
+
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by the index, by component"""
+        with self._lock:
+            postings = sum(
+                sys.getsizeof(gram) + sys.getsizeof(posting) for gram, posting in self.postings.items()
+            ) + sys.getsizeof(self.postings)
+            titles = sys.getsizeof(self._blob)
+            arrays = sum(sys.getsizeof(part) for part in (self._start, self._length, self._grams))
+        return {
+            'postings_bytes': postings,
+            'titles_bytes': titles,
+            'arrays_bytes': arrays,
+            'total_bytes': postings + titles + arrays,
+            'titles': self.size,
+            'trigrams': len(self.postings),
+            'stale_postings': self._entries - self._live_entries,
+            'compactions': self.compactions
+        }
+
+
+def init_title_index(app) -> TrigramIndex:
+    """
+    Build the title index for an app and keep it updated on upserts.
+
+    Must be called inside an application context.
+    """
+    index = TrigramIndex(app.config['TITLE_INDEX_COMPACT_RATIO'])
+    index.build_from_db()
+    app.extensions['title_index'] = index
+
+    def on_songs_upserted(sender, ids: Optional[List[str]] = None, **extra: Any) -> None:
+        if ids is None:
+            index.build_from_db()
+            return
+        for i in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[i:i + LOOKUP_CHUNK]
+            index.add_many(
+                db.session.execute(select(Song.index, Song.title).where(Song.id.in_(chunk)))
+            )
+
+    songs_upserted.connect(on_songs_upserted, sender=app, weak=False)
+    return index
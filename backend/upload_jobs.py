@@ -0,0 +1,399 @@
+import atexit
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from flask import current_app
+from columnar import ColumnarNormalizer
+from data_processor import DataProcessor
+from json_stream import spill_json_file
+from models import db, UploadJob
+
+try:
+    from ijson import JSONError
+except ImportError:  # pragma: no cover - optional dependency
+    JSONError = ValueError
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bytes copied from a request body to the spool file per read
+SPOOL_READ_BYTES = 1024 * 1024
+
+# Seconds before a job that failed with a retryable error runs again
+RETRY_DELAY = 1.0
+
+# Invalid uploads fail at once; other errors (e.g. a locked database) are retried
+DATA_ERRORS = (ValueError, JSONError)
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)\s*$')
+
+# Job id -> lock of the request writing its spool (dropped once unused)
+_spool_locks: 'weakref.WeakValueDictionary[str, threading.Lock]' = weakref.WeakValueDictionary()
+_spool_locks_guard = threading.Lock()
+
+
+class UploadConflict(Exception):
+    """A chunk does not continue the job's transfer (wrong offset, or the upload is complete)"""
+
+    def __init__(self, message: str, job: UploadJob):
+        super().__init__(message)
+        self.job = job
+
+
+def parse_content_range(header: Optional[str]) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    Parse a chunk's Content-Range header.
+
+    'bytes 0-1048575/4000000' is a chunk of a 4000000-byte upload,
+    'bytes 0-1048575/*' one whose total is not known yet, and
+    'bytes */4000000' (with an empty body) completes an upload whose last
+    chunk did not state the total.
+
+    Returns:
+        (start, length, total); start and length are None for 'bytes */total',
+        total is None for '*'
+
+    Raises:
+        ValueError: If the header is malformed or the range is empty
+    """
+    match = _CONTENT_RANGE.match(header or '')
+    if match is None:
+        raise ValueError("Content-Range must look like 'bytes <first>-<last>/<total or *>'")
+    first, last, total = match.groups()
+    total = None if total == '*' else int(total)
+    if first is None:
+        if total is None:
+            raise ValueError("Content-Range 'bytes */*' does not complete an upload")
+        return None, None, total
+    first, last = int(first), int(last)
+    if last < first or (total is not None and last >= total):
+        raise ValueError(f"Invalid Content-Range {first}-{last}/{total if total is not None else '*'}")
+    return first, last - first + 1, total
+
+
+@contextmanager
+def spool_lock(job: UploadJob) -> Iterator[BinaryIO]:
+    """
+    Hold a job's spool for writing, yielding the open file.
+
+    One lock per job in this process, and an exclusive flock on the file
+    (where available) against other processes. A chunk that arrives while
+    another is being written is refused rather than queued behind it.
+
+    Raises:
+        UploadConflict: If another request is writing to the job
+    """
+    with _spool_locks_guard:
+        lock = _spool_locks.get(job.id)
+        if lock is None:
+            lock = _spool_locks[job.id] = threading.Lock()
+    if not lock.acquire(blocking=False):
+        raise UploadConflict("Another chunk of this upload is being received", job)
+    try:
+        with open(job.spool_path, 'r+b') as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise UploadConflict("Another chunk of this upload is being received", job)
+            yield f
+    finally:
+        lock.release()
+
+
+class UploadJobs:
+    """Upload jobs: creation and the spooled, resumable transfer"""
+
+    @staticmethod
+    def spool_dir() -> str:
+        """UPLOAD_SPOOL_DIR, or uploads/ in the instance folder (created on demand)"""
+        directory = current_app.config['UPLOAD_SPOOL_DIR'] or os.path.join(current_app.instance_path, 'uploads')
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def create(bytes_expected: Optional[int] = None) -> UploadJob:
+        """
+        Create a job in the 'receiving' state with an empty spool file.
+
+        Args:
+            bytes_expected: Total upload size, when the client knows it up front
+
+        Raises:
+            ValueError: If bytes_expected is negative or above UPLOAD_MAX_BYTES
+        """
+        if bytes_expected is not None:
+            UploadJobs._check_size(bytes_expected)
+        job_id = uuid.uuid4().hex
+        spool_path = os.path.join(UploadJobs.spool_dir(), f'{job_id}.json')
+        open(spool_path, 'wb').close()
+
+        job = UploadJob(id=job_id, state='receiving', spool_path=spool_path,
+                        bytes_expected=bytes_expected, bytes_received=0)
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def append(job: UploadJob, stream: BinaryIO, start: Optional[int], length: Optional[int] = None,
+               total: Optional[int] = None, complete: bool = False) -> UploadJob:
+        """
+        Write one chunk of the upload body to the job's spool file.
+
+        The chunk must start where the received bytes end; a client that lost
+        a response reads bytes_received from GET /api/jobs/<id> and resends
+        from there. Chunks of a job are written one at a time (spool_lock),
+        and the job is re-read under the lock, so two requests sending the
+        same range cannot both pass the offset check. Bytes past
+        bytes_received (an interrupted chunk) are discarded first, and the
+        file is synced before bytes_received is committed, so the recorded
+        offset is always on disk. Once all expected bytes are in, the job is
+        queued.
+
+        Args:
+            job: Job in the 'receiving' state
+            stream: Request body stream
+            start: Offset of the chunk (None: no chunk, only a total)
+            length: Chunk length from Content-Range (None: read to the end)
+            total: Upload size, when known
+            complete: The chunk is the rest of the upload (its size is the total)
+
+        Returns:
+            The job, 'queued' if the upload is complete
+
+        Raises:
+            UploadConflict: If the job is not receiving, start is not bytes_received,
+                or another chunk of the job is being written
+            ValueError: If the chunk is short, or sizes disagree or exceed UPLOAD_MAX_BYTES
+        """
+        with spool_lock(job) as spool:
+            # End the read transaction so the job reloads with what other
+            # requests have committed
+            db.session.commit()
+            UploadJobs._append(job, spool, stream, start, length, total, complete)
+        return job
+
+    @staticmethod
+    def _append(job: UploadJob, spool: BinaryIO, stream: BinaryIO, start: Optional[int],
+                length: Optional[int], total: Optional[int], complete: bool) -> None:
+        if job.state != 'receiving':
+            raise UploadConflict(f"Upload is complete (job is {job.state})", job)
+        if start is not None and start != job.bytes_received:
+            raise UploadConflict(f"Chunk starts at byte {start}, expected {job.bytes_received}", job)
+        if total is not None:
+            if job.bytes_expected is not None and total != job.bytes_expected:
+                raise ValueError(f"Upload size {total} does not match the declared {job.bytes_expected} bytes")
+            if total < job.bytes_received:
+                raise ValueError(f"Upload size {total} is below the {job.bytes_received} bytes received")
+            UploadJobs._check_size(total)
+
+        written = 0
+        if start is not None:
+            limit = total if total is not None else job.bytes_expected
+            if limit is None:
+                limit = current_app.config['UPLOAD_MAX_BYTES']
+            written = UploadJobs._write_chunk(spool, stream, start, length, limit)
+
+        job.bytes_received += written
+        if total is not None:
+            job.bytes_expected = total
+        if complete:
+            job.bytes_expected = job.bytes_received
+        if job.bytes_expected is not None and job.bytes_received >= job.bytes_expected:
+            job.state = 'queued'
+        db.session.commit()
+
+    @staticmethod
+    def _check_size(size: int) -> None:
+        if size < 0:
+            raise ValueError("Upload size must be >= 0")
+        if size > current_app.config['UPLOAD_MAX_BYTES']:
+            raise ValueError(f"Upload size {size} exceeds the {current_app.config['UPLOAD_MAX_BYTES']}-byte limit")
+
+    @staticmethod
+    def _write_chunk(f: BinaryIO, stream: BinaryIO, start: int, length: Optional[int], limit: int) -> int:
+        """Copy a chunk into the open spool at start, returning its size; nothing is kept on error"""
+        f.seek(start)
+        f.truncate()
+        written = 0
+        try:
+            while length is None or written < length:
+                size = SPOOL_READ_BYTES if length is None else min(SPOOL_READ_BYTES, length - written)
+                block = stream.read(size)
+                if not block:
+                    break
+                written += len(block)
+                if start + written > limit:
+                    raise ValueError(f"Upload exceeds {limit} bytes")
+                f.write(block)
+            if length is not None and (written != length or stream.read(1)):
+                raise ValueError(f"Chunk length does not match its Content-Range ({length} bytes)")
+            f.flush()
+            os.fsync(f.fileno())
+        except Exception:
+            f.seek(start)
+            f.truncate()
+            raise
+        return written
+
+
+class UploadJobWorker:
+    """
+    Ingests queued upload jobs one at a time in a background thread.
+
+    A job's spool is parsed and spilled like a streamed JSON file
+    (DataProcessor.iter_json_file_records) and upserted in batches. Each
+    commit also records the job's progress (rows_committed, counts,
+    processing time) in the same transaction, so after a crash the job is
+    picked up again at startup and resumes after its last committed batch.
+    Errors other than invalid data (DATA_ERRORS) are retried up to
+    max_attempts times.
+    """
+
+    def __init__(self, app, batch_size: int = 1000, max_attempts: int = 3,
+                 spill_dir: Optional[str] = None):
+        self.app = app
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.spill_dir = spill_dir
+        self._queue: 'queue.Queue[Optional[str]]' = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='upload-jobs', daemon=True)
+        self._thread.start()
+
+    def submit(self, job_id: str) -> None:
+        """Queue a job for ingestion"""
+        self._queue.put(job_id)
+
+    def recover(self) -> int:
+        """Queue the jobs a previous process left queued or running; returns how many"""
+        with self.app.app_context():
+            job_ids = db.session.scalars(
+                db.select(UploadJob.id)
+                .where(UploadJob.state.in_(('queued', 'running')))
+                .order_by(UploadJob.created_at)
+            ).all()
+        for job_id in job_ids:
+            self.submit(job_id)
+        if job_ids:
+            logger.info(f"Resuming {len(job_ids)} upload job(s)")
+        return len(job_ids)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop after the job in progress; queued jobs stay queued for the next start"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                with self.app.app_context():
+                    retry = self.process(job_id)
+            except Exception as e:
+                logger.error(f"Upload job {job_id} could not be processed: {str(e)}")
+                continue
+            if retry:
+                time.sleep(RETRY_DELAY)
+                self.submit(job_id)
+
+    def process(self, job_id: str) -> bool:
+        """
+        Ingest one job from its resume point (blocking; needs an app context).
+
+        Returns:
+            True when the job failed with a retryable error and should run again
+        """
+        job = db.session.get(UploadJob, job_id)
+        if job is None or job.state not in ('queued', 'running'):
+            return False
+        job.state = 'running'
+        job.attempts += 1
+        job.error = None
+        job.started_at = job.started_at or datetime.utcnow()
+        db.session.commit()
+
+        started = time.perf_counter()
+        resume = job.rows_committed
+        base = (job.inserted, job.updated, job.processing_seconds)
+
+        def checkpoint(rows: int, inserted: int, updated: int) -> None:
+            job.rows_committed = resume + rows
+            job.inserted = base[0] + inserted
+            job.updated = base[1] + updated
+            job.processing_seconds = base[2] + time.perf_counter() - started
+
+        try:
+            with spill_json_file(job.spool_path, self.spill_dir) as spill:
+                if not spill.columns:
+                    raise ValueError("No columns found in JSON data")
+                # Like normalize_json, the first column decides the record count
+                job.rows_total = spill.row_counts[spill.columns[0]]
+                if resume:
+                    logger.info(f"Upload job {job_id} resuming at row {resume} of {job.rows_total}")
+                DataProcessor.bulk_upsert(self._records(spill, job.rows_total, resume),
+                                          batch_size=self.batch_size, commit_every=1,
+                                          before_commit=checkpoint)
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(UploadJob, job_id)
+            retry = not isinstance(e, DATA_ERRORS) and job.attempts < self.max_attempts
+            job.state = 'queued' if retry else 'failed'
+            job.error = str(e)
+            if not retry:
+                job.finished_at = datetime.utcnow()
+            db.session.commit()
+            logger.error(f"Upload job {job_id} failed (attempt {job.attempts}): {str(e)}")
+            if not retry:
+                self._remove_spool(job)
+            return retry
+
+        job.state = 'done'
+        job.processing_seconds = base[2] + time.perf_counter() - started
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        self._remove_spool(job)
+        logger.info(f"Upload job {job_id} done: {job.inserted} inserted, {job.updated} updated")
+        return False
+
+    def _records(self, spill, num_records: int, first_row: int) -> Iterator[Dict[str, Any]]:
+        """Normalized records from first_row on, in batch_size blocks aligned with the commits"""
+        for block_number, block in enumerate(spill.iter_batches(num_records, self.batch_size, first_row)):
+            start = first_row + block_number * self.batch_size
+            yield from ColumnarNormalizer.normalize_block(block, start_index=start).iter_rows()
+
+    @staticmethod
+    def _remove_spool(job: UploadJob) -> None:
+        try:
+            os.remove(job.spool_path)
+        except FileNotFoundError:
+            pass
+
+
+def init_upload_jobs(app) -> UploadJobWorker:
+    """Start the app's upload job worker and queue the jobs a previous run left unfinished"""
+    worker = UploadJobWorker(
+        app,
+        batch_size=app.config['INGEST_BATCH_SIZE'],
+        max_attempts=app.config['UPLOAD_JOB_MAX_ATTEMPTS'],
+        spill_dir=app.config['INGEST_SPILL_DIR']
+    )
+    app.extensions['upload_jobs'] = worker
+    worker.recover()
+    atexit.register(worker.close)
+    return worker
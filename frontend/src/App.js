@@ -15,7 +15,8 @@ import './App.css';
 
 function App() {
   const [songs, setSongs] = useState([]);
-  const [allSongs, setAllSongs] = useState([]);
+  const [topRatedSongs, setTopRatedSongs] = useState([]);
+  const [aggregates, setAggregates] = useState(null);
   const [loading, setLoading] = useState(true);
   const [isFetching, setIsFetching] = useState(false);
   const [hasLoadedOnce, setHasLoadedOnce] = useState(false);
@@ -61,35 +62,41 @@ function App() {
     }
   };
 
-  // Fetch all songs for CSV and charts
-  const fetchAllSongs = async () => {
+  // Fetch the highest rated songs for the right rail
+  const fetchTopRated = async () => {
     try {
-      let allSongsData = [];
-      let currentPage = 1;
-      let hasMore = true;
-      const perPageLimit = 100;
-
-      while (hasMore) {
-        const response = await songsAPI.getAllSongs({
-          page: currentPage,
-          per_page: perPageLimit,
-          sort_by: 'index',
-          order: 'asc',
-        });
+      const response = await songsAPI.getAllSongs({
+        page: 1,
+        per_page: 5,
+        sort_by: 'star_rating',
+        order: 'desc',
+      });
 
-        if (response.data.status === 'success') {
-          allSongsData = [...allSongsData, ...response.data.data];
-          const totalPages = response.data.pagination?.total_pages || 1;
-          hasMore = currentPage < totalPages;
-          currentPage++;
-        } else {
-          hasMore = false;
-        }
+      if (response.data.status === 'success') {
+        setTopRatedSongs(response.data.data);
       }
+    } catch (error) {
+      console.error('Error fetching top rated songs:', error);
+    }
+  };
 
-      setAllSongs(allSongsData);
+  // Fetch chart data (binned and downsampled on the server)
+  const fetchAggregates = async () => {
+    try {
+      const response = await songsAPI.getAggregates({
+        histogram: 'duration_ms',
+        'edges.duration_ms': '0,120000,180000,240000,300000,360000,500000',
+        scatter: 'danceability',
+        points: 500,
+        series: 'acousticness,tempo',
+        limit: 20,
+      });
+
+      if (response.data.status === 'success') {
+        setAggregates(response.data.data);
+      }
     } catch (error) {
-      console.error('Error fetching all songs:', error);
+      console.error('Error fetching chart data:', error);
     }
   };
 
@@ -107,7 +114,8 @@ function App() {
 
   useEffect(() => {
     fetchSongs();
-    fetchAllSongs();
+    fetchTopRated();
+    fetchAggregates();
     fetchStats();
   }, []);
 
@@ -170,11 +178,7 @@ function App() {
           )
         );
         
-        setAllSongs(prevSongs =>
-          prevSongs.map(song =>
-            song.id === songId ? { ...song, star_rating: rating } : song
-          )
-        );
+        fetchTopRated();
         
         toast.success('Rating updated!', {
           duration: 2000,
@@ -186,13 +190,10 @@ function App() {
     }
   };
 
-  const topRated = useMemo(() => {
-    const src = Array.isArray(allSongs) && allSongs.length ? allSongs : songs;
-    return [...src]
-      .filter((s) => (s.star_rating || 0) > 0)
-      .sort((a, b) => (b.star_rating || 0) - (a.star_rating || 0))
-      .slice(0, 5);
-  }, [allSongs, songs]);
+  const topRated = useMemo(
+    () => topRatedSongs.filter((s) => (s.star_rating || 0) > 0),
+    [topRatedSongs]
+  );
 
   return (
     <div className="App">
@@ -257,7 +258,11 @@ function App() {
             <>
               <div className="section-row">
                 <SearchBar onSearch={handleSearch} onClear={handleClearSearch} />
-                <CSVDownload data={allSongs} filename="playlist_songs.csv" />
+                <CSVDownload
+                  href={songsAPI.getExportUrl({ format: 'csv', sort_by: sortBy, order: sortOrder })}
+                  filename="playlist_songs.csv"
+                  disabled={totalItems === 0}
+                />
               </div>
 
               <div className="table-container">
@@ -300,8 +305,8 @@ function App() {
           {/* Charts Tab */}
           {activeTab === 'charts' && (
             <div className="charts-section">
-              {allSongs.length > 0 ? (
-                <Charts songs={allSongs} />
+              {aggregates ? (
+                <Charts aggregates={aggregates} />
               ) : (
                 <div className="loading-container glass-card">
                   <div className="spinner"></div>
@@ -1,18 +1,24 @@
 import React, { useState } from 'react';
 import { Download, Check } from 'lucide-react';
-import { exportToCSV } from '../utils/csvExport';
 import './CSVDownload.css';
 
-const CSVDownload = ({ data, filename = 'songs_data.csv' }) => {
+// Downloads straight from the server's streaming export endpoint
+const CSVDownload = ({ href, filename = 'songs_data.csv', disabled = false }) => {
   const [downloaded, setDownloaded] = useState(false);
 
   const handleDownload = () => {
-    if (!data || data.length === 0) {
+    if (!href || disabled) {
       alert('No data available to download');
       return;
     }
 
-    exportToCSV(data, filename);
+    const link = document.createElement('a');
+    link.setAttribute('href', href);
+    link.setAttribute('download', filename);
+    link.style.visibility = 'hidden';
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
     setDownloaded(true);
 
     setTimeout(() => {
@@ -24,7 +30,7 @@ const CSVDownload = ({ data, filename = 'songs_data.csv' }) => {
     <button
       className={`csv-download-button ${downloaded ? 'downloaded' : ''}`}
       onClick={handleDownload}
-      disabled={!data || data.length === 0}
+      disabled={!href || disabled}
     >
       {downloaded ? (
         <>
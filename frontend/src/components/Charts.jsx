@@ -13,42 +13,41 @@ import {
 } from 'recharts';
 import './Charts.css';
 
-const Charts = ({ songs }) => {
-  const danceabilityData = songs.map((song, index) => ({
+// Renders chart data binned and sampled by GET /api/aggregates
+const Charts = ({ aggregates }) => {
+  const shortTitle = (title) => title.substring(0, 12) + (title.length > 12 ? '...' : '');
+
+  const danceabilityData = (aggregates.scatter.danceability?.points || []).map(([index, danceability]) => ({
     index: index + 1,
-    danceability: song.danceability,
-    title: song.title,
+    danceability,
   }));
 
-  const durationBins = [0, 120000, 180000, 240000, 300000, 360000, 500000];
+  // '6m+' is open-ended: songs past the last edge come back as the overflow
   const durationLabels = ['0-2m', '2-3m', '3-4m', '4-5m', '5-6m', '6m+'];
-  const durationData = durationLabels.map((label, index) => {
-    const min = durationBins[index];
-    const max = durationBins[index + 1] || Infinity;
-    const count = songs.filter(s => s.duration_ms >= min && s.duration_ms < max).length;
-    return { label, count };
-  });
+  const durationHistogram = aggregates.histograms.duration_ms || {};
+  const durationCounts = durationHistogram.counts || [];
+  const durationData = durationLabels.map((label, index) => ({
+    label,
+    count:
+      (durationCounts[index] || 0) +
+      (index === durationLabels.length - 1 ? durationHistogram.overflow || 0 : 0),
+  }));
 
-  const acousticsData = songs
-    .filter(song => song.acousticness != null)
-    .slice(0, 20)
-    .map((song, index) => ({
-      name: song.title.substring(0, 12) + (song.title.length > 12 ? '...' : ''),
-      value: song.acousticness || 0,
-    }));
+  const acousticsData = (aggregates.series.acousticness || []).map((song) => ({
+    name: shortTitle(song.title),
+    value: song.value || 0,
+  }));
 
-  const tempoData = songs
-    .slice(0, 20)
-    .map((song) => ({
-      name: song.title.substring(0, 12) + (song.title.length > 12 ? '...' : ''),
-      value: Math.round(song.tempo),
-    }));
+  const tempoData = (aggregates.series.tempo || []).map((song) => ({
+    name: shortTitle(song.title),
+    value: Math.round(song.value),
+  }));
 
   const CustomTooltip = ({ active, payload }) => {
     if (!active || !payload || !payload.length) return null;
 
     const entry = payload[0];
-    const title = entry.payload.title || entry.payload.name;
+    const title = entry.payload.title || entry.payload.name || `Song ${entry.payload.index}`;
     const value =
       typeof entry.value === 'number' ? entry.value.toFixed(3) : entry.value;
 
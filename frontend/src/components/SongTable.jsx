@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { ChevronUp, ChevronDown, Music } from 'lucide-react';
 import StarRating from './StarRating';
-import { formatDuration, formatNumber } from '../utils/csvExport';
+import { formatDuration, formatNumber } from '../utils/format';
 import './SongTable.css';
 
 const SongTable = ({ songs, onSort, sortBy, sortOrder, onRateUpdate }) => {
@@ -45,6 +45,17 @@ export const songsAPI = {
     return api.get(`/songs?${queryParams}`);
   },
 
+  // URL of the streaming export download (format: 'csv' or 'ndjson')
+  getExportUrl: (params = {}) => {
+    const queryParams = new URLSearchParams({
+      format: params.format || 'csv',
+      sort_by: params.sort_by || 'index',
+      order: params.order || 'asc',
+    }).toString();
+
+    return `${API_BASE_URL}/songs/export?${queryParams}`;
+  },
+
   // Search songs by title
   searchSongs: (title, exact = false) => {
     return api.get(`/songs/search?title=${encodeURIComponent(title)}&exact=${exact}`);
@@ -60,6 +71,12 @@ export const songsAPI = {
     return api.put(`/songs/${id}/rating`, { rating });
   },
 
+  // Get server-side chart data (histograms, scatter and series)
+  getAggregates: (params = {}) => {
+    const queryParams = new URLSearchParams(params).toString();
+    return api.get(`/aggregates?${queryParams}`);
+  },
+
   // Get statistics
   getStats: () => {
     return api.get('/stats');
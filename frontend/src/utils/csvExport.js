@@ -1,59 +0,0 @@
-export const exportToCSV = (data, filename = 'songs_data.csv') => {
-  if (!data || data.length === 0) {
-    console.error('No data to export');
-    return;
-  }
-
-  // Get headers from first object
-  const headers = Object.keys(data[0]);
-
-  // Create CSV content
-  const csvContent = [
-    // Headers
-    headers.join(','),
-    // Data rows
-    ...data.map(row => 
-      headers.map(header => {
-        const value = row[header];
-        // Handle null/undefined
-        if (value === null || value === undefined) return '';
-        // Escape quotes and wrap in quotes if contains comma
-        const stringValue = String(value);
-        if (stringValue.includes(',') || stringValue.includes('"') || stringValue.includes('\n')) {
-          return `"${stringValue.replace(/"/g, '""')}"`;
-        }
-        return stringValue;
-      }).join(',')
-    )
-  ].join('\n');
-
-  // Create blob and download
-  const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-  const link = document.createElement('a');
-  
-  if (navigator.msSaveBlob) {
-    // IE 10+
-    navigator.msSaveBlob(blob, filename);
-  } else {
-    const url = URL.createObjectURL(blob);
-    link.setAttribute('href', url);
-    link.setAttribute('download', filename);
-    link.style.visibility = 'hidden';
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
-    URL.revokeObjectURL(url);
-  }
-};
-
-export const formatDuration = (ms) => {
-  if (!ms) return '0:00';
-  const minutes = Math.floor(ms / 60000);
-  const seconds = Math.floor((ms % 60000) / 1000);
-  return `${minutes}:${seconds.toString().padStart(2, '0')}`;
-};
-
-export const formatNumber = (num, decimals = 2) => {
-  if (num === null || num === undefined) return '-';
-  return Number(num).toFixed(decimals);
-};
\ No newline at end of file
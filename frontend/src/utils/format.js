@@ -0,0 +1,11 @@
+export const formatDuration = (ms) => {
+  if (!ms) return '0:00';
+  const minutes = Math.floor(ms / 60000);
+  const seconds = Math.floor((ms % 60000) / 1000);
+  return `${minutes}:${seconds.toString().padStart(2, '0')}`;
+};
+
+export const formatNumber = (num, decimals = 2) => {
+  if (num === null || num === undefined) return '-';
+  return Number(num).toFixed(decimals);
+};
\ No newline at end of file